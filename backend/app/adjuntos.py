@@ -0,0 +1,261 @@
+"""
+Fotos adjuntas a las visitas (incidencias).
+
+Almacén local direccionado por contenido: cada archivo se guarda una sola vez
+bajo su SHA-256 (objetos/ab/abcdef...), así dos subidas iguales comparten el
+archivo y la miniatura. La base solo guarda la relación visita -> hash
+(tabla visitas_adjuntos).
+
+Las subidas son reanudables: se abre una subida con el tamaño total y el
+cliente envía el archivo por partes (PUT con offset); cada parte se escribe
+al disco a medida que llega, sin juntar el archivo en memoria. Si la conexión
+se corta, el cliente consulta cuánto se recibió y sigue desde ahí. Al
+completarse se calcula el hash, se mueve al almacén (o se descarta si ya
+estaba) y la miniatura se genera en el pool de procesos de imágenes.
+
+Los reportes referencian la miniatura (no el original) de cada adjunto. Las
+exportaciones (Excel, PDF) la incluyen como imagen, leída del almacén, y sus
+enlaces son absolutos si se configura adjuntos_url_publica.
+"""
+import hashlib
+import json
+import os
+import secrets
+import time
+from typing import Dict, List, Optional, Set
+from PIL import Image, ImageOps
+from app.config import get_settings
+from app.database import get_supabase_client
+
+settings = get_settings()
+
+POOL_IMAGENES = "imagenes"
+
+TIPOS_PERMITIDOS = {"image/jpeg", "image/png", "image/webp"}
+
+# Bloque de lectura al calcular el hash de un archivo ya recibido
+TAMANO_BLOQUE = 1024 * 1024
+
+# Valores por consulta `in_` al buscar los adjuntos de una página de visitas
+VISITAS_POR_CONSULTA = 200
+
+
+class SubidaInvalidaError(Exception):
+    """La subida o el archivo recibido no son válidos"""
+
+
+def _directorio(*partes: str) -> str:
+    ruta = os.path.join(settings.adjuntos_dir, *partes)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def ruta_objeto(sha256: str) -> str:
+    return os.path.join(_directorio("objetos", sha256[:2]), sha256)
+
+
+def ruta_miniatura(sha256: str) -> str:
+    return os.path.join(_directorio("miniaturas", sha256[:2]), f"{sha256}.jpg")
+
+
+def _ruta_subida(subida_id: str, extension: str) -> str:
+    return os.path.join(_directorio("subidas"), f"{subida_id}.{extension}")
+
+
+def url_miniatura(adjunto_id: int) -> str:
+    return f"/adjuntos/{adjunto_id}/miniatura"
+
+
+def url_archivo(adjunto_id: int) -> str:
+    return f"/adjuntos/{adjunto_id}/archivo"
+
+
+# ============ SUBIDAS REANUDABLES ============
+
+def crear_subida(visita_id: int, usuario_id: int, tamano: int, tipo_contenido: str,
+                 nombre: Optional[str], sha256: Optional[str]) -> dict:
+    """Registra una subida nueva y crea su archivo parcial vacío"""
+    subida = {
+        "id": secrets.token_urlsafe(16),
+        "visita_id": visita_id,
+        "usuario_id": usuario_id,
+        "tamano": tamano,
+        "tipo_contenido": tipo_contenido,
+        "nombre": nombre,
+        "sha256": sha256,
+        "creada": time.time(),
+    }
+    with open(_ruta_subida(subida["id"], "json"), "w") as archivo:
+        json.dump(subida, archivo)
+    open(_ruta_subida(subida["id"], "part"), "wb").close()
+    return subida
+
+
+def leer_subida(subida_id: str) -> Optional[dict]:
+    """Datos de la subida con los bytes ya recibidos, o None si no existe"""
+    # El id viaja en la URL: solo se aceptan ids con el formato de token_urlsafe
+    if not subida_id or not all(c.isalnum() or c in "-_" for c in subida_id):
+        return None
+    try:
+        with open(_ruta_subida(subida_id, "json")) as archivo:
+            subida = json.load(archivo)
+        subida["recibido"] = os.path.getsize(_ruta_subida(subida_id, "part"))
+    except (FileNotFoundError, ValueError):
+        return None
+    return subida
+
+
+def abrir_parte(subida: dict, offset: int):
+    """Archivo parcial abierto para escribir desde offset (que debe ser lo ya recibido)"""
+    if offset != subida["recibido"]:
+        raise SubidaInvalidaError(f"offset debe ser {subida['recibido']}")
+    archivo = open(_ruta_subida(subida["id"], "part"), "r+b")
+    archivo.seek(offset)
+    return archivo
+
+
+def descartar_subida(subida_id: str):
+    for extension in ("json", "part"):
+        try:
+            os.remove(_ruta_subida(subida_id, extension))
+        except FileNotFoundError:
+            pass
+
+
+def limpiar_subidas() -> Set[str]:
+    """
+    Elimina las subidas abandonadas (más viejas que adjuntos_subida_ttl_horas).
+    Devuelve los ids de las subidas eliminadas.
+    """
+    limite = time.time() - settings.adjuntos_subida_ttl_horas * 3600
+    eliminadas = set()
+    for entrada in os.scandir(_directorio("subidas")):
+        try:
+            if entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+                eliminadas.add(entrada.name.rsplit(".", 1)[0])
+        except FileNotFoundError:
+            pass
+    return eliminadas
+
+
+def hash_archivo(ruta: str) -> str:
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def guardar_objeto(subida: dict) -> tuple:
+    """
+    Mueve el archivo completo al almacén. Devuelve (sha256, nuevo): nuevo es
+    False si el mismo contenido ya estaba guardado (la copia recibida se descarta).
+    """
+    parcial = _ruta_subida(subida["id"], "part")
+    sha256 = hash_archivo(parcial)
+    if subida.get("sha256") and subida["sha256"].lower() != sha256:
+        descartar_subida(subida["id"])
+        raise SubidaInvalidaError("El hash del archivo recibido no coincide con el declarado")
+
+    destino = ruta_objeto(sha256)
+    if os.path.exists(destino):
+        descartar_subida(subida["id"])
+        return sha256, False
+    os.replace(parcial, destino)
+    descartar_subida(subida["id"])
+    return sha256, True
+
+
+# ============ MINIATURAS (pool de procesos) ============
+
+def generar_miniatura(origen: str, destino: str, lado: int):
+    """
+    Miniatura JPEG de como máximo lado x lado, respetando la orientación EXIF.
+    Corre en el pool de imágenes; falla si el archivo no es una imagen válida.
+    """
+    with Image.open(origen) as imagen:
+        # En JPEG, draft decodifica directamente a una escala reducida
+        imagen.draft("RGB", (lado, lado))
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen = imagen.convert("RGB")
+        imagen.thumbnail((lado, lado))
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        imagen.save(temporal, format="JPEG", quality=80, optimize=True)
+    os.replace(temporal, destino)
+
+
+# ============ BASE DE DATOS ============
+
+COLUMNAS_ADJUNTO = "id, visita_id, sha256, tipo_contenido, tamano, nombre_original, created_at"
+
+
+def formatear_adjunto(fila: dict) -> dict:
+    return {
+        **fila,
+        "miniatura_url": url_miniatura(fila["id"]),
+        "archivo_url": url_archivo(fila["id"]),
+    }
+
+
+def registrar_adjunto(subida: dict, sha256: str) -> dict:
+    """Relaciona el archivo con la visita (una vez por visita y contenido)"""
+    supabase = get_supabase_client()
+    existente = supabase.table("visitas_adjuntos").select(COLUMNAS_ADJUNTO).eq(
+        "visita_id", subida["visita_id"]
+    ).eq("sha256", sha256).execute()
+    if existente.data:
+        return formatear_adjunto(existente.data[0])
+
+    resp = supabase.table("visitas_adjuntos").insert({
+        "visita_id": subida["visita_id"],
+        "sha256": sha256,
+        "tipo_contenido": subida["tipo_contenido"],
+        "tamano": subida["tamano"],
+        "nombre_original": subida.get("nombre"),
+        "usuario_id": subida["usuario_id"],
+    }).execute()
+    fila = resp.data[0]
+    return formatear_adjunto({k: fila.get(k) for k in COLUMNAS_ADJUNTO.split(", ")})
+
+
+def adjuntos_de_visitas(visita_ids: List[int]) -> Dict[int, List[dict]]:
+    """Adjuntos (con la URL de su miniatura) de varias visitas, con consultas `in_` por tandas"""
+    supabase = get_supabase_client()
+    resultado: Dict[int, List[dict]] = {}
+    ids = sorted(set(visita_ids))
+    for i in range(0, len(ids), VISITAS_POR_CONSULTA):
+        tanda = ids[i:i + VISITAS_POR_CONSULTA]
+        resp = supabase.table("visitas_adjuntos").select(COLUMNAS_ADJUNTO).in_(
+            "visita_id", tanda
+        ).order("id").execute()
+        for fila in resp.data:
+            resultado.setdefault(fila["visita_id"], []).append(formatear_adjunto(fila))
+    return resultado
+
+
+def url_publica(ruta: str) -> str:
+    """URL absoluta para las exportaciones (relativa si no se configuró la URL del backend)"""
+    return settings.adjuntos_url_publica.rstrip("/") + ruta
+
+
+def agregar_miniaturas(visitas: List[dict], para_exportar: bool = False) -> List[dict]:
+    """
+    Agrega a cada visita `adjuntos`: las URL de las miniaturas de sus fotos.
+    Con `para_exportar`, las URL son absolutas (url_publica) y se agrega
+    `miniatura_archivo`: la ruta en disco de la primera miniatura, o None.
+    Si la tabla de adjuntos no está instalada, las visitas quedan sin adjuntos.
+    """
+    try:
+        por_visita = adjuntos_de_visitas([v["id"] for v in visitas if v.get("id")])
+    except Exception:
+        por_visita = {}
+    for visita in visitas:
+        adjuntos = por_visita.get(visita.get("id"), [])
+        if not para_exportar:
+            visita["adjuntos"] = [a["miniatura_url"] for a in adjuntos]
+            continue
+        visita["adjuntos"] = [url_publica(a["miniatura_url"]) for a in adjuntos]
+        archivos = [ruta_miniatura(a["sha256"]) for a in adjuntos]
+        visita["miniatura_archivo"] = next((r for r in archivos if os.path.exists(r)), None)
+    return visitas
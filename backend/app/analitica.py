@@ -0,0 +1,174 @@
+"""
+Analítica de cobertura por punto.
+
+Intervalos entre visitas consecutivas de un mismo punto: distribución
+(p50, p95, máximo) y cuántos superan intervalo_ronda_minutos. Las alertas
+solo miran la última visita; esto muestra los puntos descuidados de forma
+crónica.
+
+Las visitas del período se cargan en columnas (instante, punto) y se ordenan
+una vez por punto e instante; los intervalos salen de un único np.diff. Las
+columnas de cada día local cerrado se cachean, así un período de meses solo
+lee de la base los días que falten.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+import numpy as np
+from app.cache_reportes import dias_consecutivos, obtener_cache_dias
+from app.database import get_supabase_client
+from app.horarios import HorarioCompilado, obtener_horario
+from app.reportes_datos import leer_columnas_visitas
+from app.sincronizacion import leer_puntos
+
+# (instantes epoch, punto_qr_id) ordenados por instante
+Columnas = Tuple[np.ndarray, np.ndarray]
+
+
+def _clave_dia(horario: HorarioCompilado, dia: date) -> tuple:
+    return ("intervalos", horario.servicio_id, horario.zona.zone, dia)
+
+
+def columnas_periodo(horario: HorarioCompilado, fecha_inicio: date, fecha_fin: date) -> Columnas:
+    """Visitas de [fecha_inicio, fecha_fin] (días locales) como columnas; días cerrados desde cache"""
+    cache = obtener_cache_dias()
+    dias = [fecha_inicio + timedelta(days=i) for i in range((fecha_fin - fecha_inicio).days + 1)]
+    hoy = datetime.now(horario.zona).date()
+
+    por_dia: Dict[date, Columnas] = {}
+    faltantes = []
+    for dia in dias:
+        columnas = cache.obtener(_clave_dia(horario, dia)) if dia < hoy else None
+        if columnas is None:
+            faltantes.append(dia)
+        else:
+            por_dia[dia] = columnas
+
+    for tramo in dias_consecutivos(faltantes):
+        limites = [horario.inicio_dia(dia).timestamp() for dia in tramo + [tramo[-1] + timedelta(days=1)]]
+        visitas = leer_columnas_visitas(
+            horario.servicio_id, horario.inicio_dia(tramo[0]), horario.inicio_dia(tramo[-1] + timedelta(days=1))
+        )
+        orden = np.argsort(visitas["instante"], kind="stable")
+        instantes, puntos = visitas["instante"][orden], visitas["punto_qr_id"][orden]
+        # Cortes de cada día sobre las visitas ya ordenadas
+        cortes = np.searchsorted(instantes, limites)
+        for k, dia in enumerate(tramo):
+            columnas = (instantes[cortes[k]:cortes[k + 1]].copy(), puntos[cortes[k]:cortes[k + 1]].copy())
+            por_dia[dia] = columnas
+            if dia < hoy:
+                cache.guardar(_clave_dia(horario, dia), columnas)
+
+    if not por_dia:
+        return np.array([], dtype=np.float64), np.array([], dtype=np.int64)
+    return (
+        np.concatenate([por_dia[dia][0] for dia in dias]),
+        np.concatenate([por_dia[dia][1] for dia in dias]),
+    )
+
+
+def estadisticas_intervalos(
+    instantes: np.ndarray,
+    puntos: np.ndarray,
+    umbral_segundos: float,
+    acumulado: Optional[np.ndarray] = None,
+) -> Dict[int, dict]:
+    """
+    Por punto: visitas, cantidad de intervalos, p50/p95/máximo (minutos),
+    intervalos por encima del umbral y última visita (epoch).
+    Con `acumulado` (segundos de turno hasta cada visita) los intervalos se
+    miden en tiempo de turno en lugar de tiempo de reloj.
+    """
+    if len(instantes) == 0:
+        return {}
+
+    orden = np.lexsort((instantes, puntos))
+    instantes, puntos = instantes[orden], puntos[orden]
+    tiempo = acumulado[orden] if acumulado is not None else instantes
+
+    mismo_punto = puntos[1:] == puntos[:-1]
+    intervalos = np.diff(tiempo)[mismo_punto]
+    punto_intervalo = puntos[1:][mismo_punto]
+
+    ids, primeras, visitas = np.unique(puntos, return_index=True, return_counts=True)
+    # Los intervalos están agrupados por punto en el mismo orden que `ids`
+    cortes = np.searchsorted(punto_intervalo, ids)
+    cortes = np.append(cortes, len(intervalos))
+
+    resultado = {}
+    for k, punto in enumerate(ids.tolist()):
+        propios = intervalos[cortes[k]:cortes[k + 1]]
+        estadistica = {
+            "visitas": int(visitas[k]),
+            "intervalos": len(propios),
+            "p50_minutos": None,
+            "p95_minutos": None,
+            "max_minutos": None,
+            "sobre_intervalo": 0,
+            "ultima_visita": float(instantes[primeras[k] + visitas[k] - 1]),
+        }
+        if len(propios):
+            p50, p95 = np.percentile(propios, [50, 95])
+            estadistica.update({
+                "p50_minutos": round(float(p50) / 60, 1),
+                "p95_minutos": round(float(p95) / 60, 1),
+                "max_minutos": round(float(propios.max()) / 60, 1),
+                "sobre_intervalo": int((propios > umbral_segundos).sum()),
+            })
+        resultado[punto] = estadistica
+    return resultado
+
+
+def reporte_intervalos(
+    servicio_id: int,
+    fecha_inicio: date,
+    fecha_fin: date,
+    solo_turno: bool = True,
+) -> Optional[dict]:
+    """
+    Intervalos entre visitas por punto del servicio en [fecha_inicio, fecha_fin]
+    (días locales). Con solo_turno, el tiempo fuera del horario del servicio no
+    cuenta (una noche sin turno no es un hueco). None si el servicio no existe.
+    Los puntos sin visitas aparecen primero; luego por p95 descendente.
+    """
+    horario = obtener_horario(servicio_id)
+    if horario is None:
+        return None
+
+    supabase = get_supabase_client()
+    puntos = leer_puntos(
+        lambda: supabase.table("puntos_qr").select("id, nombre").eq("servicio_id", servicio_id).eq("activo", True)
+    )
+
+    instantes, puntos_visita = columnas_periodo(horario, fecha_inicio, fecha_fin)
+    validas = np.isin(puntos_visita, [p["id"] for p in puntos])
+    instantes, puntos_visita = instantes[validas], puntos_visita[validas]
+
+    acumulado = horario.segundos_en_servicio_array(instantes) if solo_turno else None
+    estadisticas = estadisticas_intervalos(
+        instantes, puntos_visita, horario.intervalo_ronda_minutos * 60, acumulado
+    )
+
+    filas = []
+    for punto in puntos:
+        estadistica = estadisticas.get(punto["id"])
+        if estadistica is None:
+            estadistica = {
+                "visitas": 0, "intervalos": 0, "p50_minutos": None, "p95_minutos": None,
+                "max_minutos": None, "sobre_intervalo": 0, "ultima_visita": None,
+            }
+        elif estadistica["ultima_visita"] is not None:
+            estadistica["ultima_visita"] = datetime.fromtimestamp(estadistica["ultima_visita"], timezone.utc).isoformat()
+        filas.append({"punto_id": punto["id"], "nombre": punto["nombre"], **estadistica})
+
+    filas.sort(key=lambda f: (f["visitas"] > 0, -(f["p95_minutos"] or 0)))
+
+    return {
+        "servicio_id": servicio_id,
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "zona_horaria": horario.zona.zone,
+        "intervalo_ronda_minutos": horario.intervalo_ronda_minutos,
+        "solo_turno": solo_turno,
+        "total_visitas": int(len(instantes)),
+        "puntos": filas,
+    }
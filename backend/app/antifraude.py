@@ -0,0 +1,224 @@
+"""
+Detección de GPS falso al registrar visitas.
+
+/visits/sync acepta coordenadas y fecha_hora enviadas por el dispositivo, así
+que una ronda se puede inventar. Cada visita se compara con la anterior del
+mismo guardia (en el tiempo) y se marca con:
+- velocidad_imposible: para llegar desde la visita anterior habría que ir más
+  rápido que antifraude_velocidad_max_kmh (los saltos menores que
+  antifraude_tolerancia_m no cuentan: son ruido del GPS)
+- coordenadas_repetidas: exactamente las mismas coordenadas que la visita
+  anterior pero en otro punto (un GPS real nunca repite todos los decimales)
+
+Las marcas se guardan en visitas.alertas_gps; no rechazan la visita. Por
+guardia se mantiene en memoria su última posición, así registrar una visita
+no agrega consultas; si no está (arranque, otro worker) se lee la última
+visita de la base una vez. Un lote de sincronización se evalúa con arrays de
+NumPy, ordenado por fecha_hora junto con esa última posición: las visitas
+offline pueden llegar más viejas que la última registrada.
+
+Si la columna alertas_gps no existe (sql/005 no aplicada), insertar_visita
+guarda la visita sin las marcas en lugar de fallar.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+from postgrest.exceptions import APIError
+from app.config import get_settings
+from app.database import get_supabase_client
+from app.geo import distancias_consecutivas
+
+settings = get_settings()
+
+ALERTA_VELOCIDAD = "velocidad_imposible"
+ALERTA_COORDENADAS = "coordenadas_repetidas"
+
+
+@dataclass
+class UltimaPosicion:
+    instante: float  # epoch de fecha_hora
+    latitud: float
+    longitud: float
+    punto_qr_id: int
+
+
+def _instante(fecha_hora: str) -> float:
+    dt = datetime.fromisoformat(fecha_hora.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _posicion(visita: dict) -> UltimaPosicion:
+    return UltimaPosicion(
+        instante=_instante(visita["fecha_hora"]),
+        latitud=visita["latitud"],
+        longitud=visita["longitud"],
+        punto_qr_id=visita["punto_qr_id"],
+    )
+
+
+def alertas_secuencia(
+    instantes: np.ndarray,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    puntos: np.ndarray,
+    anterior: Optional[UltimaPosicion],
+    velocidad_max_kmh: float,
+    tolerancia_m: float,
+) -> List[List[str]]:
+    """
+    Alertas de cada visita de un mismo guardia (en el orden recibido).
+    `anterior` es la última visita ya registrada; entra en la secuencia pero
+    no recibe alertas: si el salto imposible es hacia ella, se marca la visita
+    nueva que la precede.
+    """
+    n = len(instantes)
+    alertas: List[List[str]] = [[] for _ in range(n)]
+    indices = np.arange(n)
+    if anterior is not None:
+        instantes = np.append(instantes, anterior.instante)
+        latitudes = np.append(latitudes, anterior.latitud)
+        longitudes = np.append(longitudes, anterior.longitud)
+        puntos = np.append(puntos, anterior.punto_qr_id)
+        indices = np.append(indices, -1)
+    if len(instantes) < 2:
+        return alertas
+
+    orden = np.argsort(instantes, kind="stable")
+    instantes, latitudes, longitudes = instantes[orden], latitudes[orden], longitudes[orden]
+    puntos, indices = puntos[orden], indices[orden]
+
+    distancias = distancias_consecutivas(latitudes, longitudes)
+    segundos = np.diff(instantes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        velocidades = np.where(segundos > 0, distancias / segundos * 3.6, np.inf)
+    imposible = (distancias > tolerancia_m) & (velocidades > velocidad_max_kmh)
+    repetidas = (
+        (latitudes[1:] == latitudes[:-1]) & (longitudes[1:] == longitudes[:-1]) & (puntos[1:] != puntos[:-1])
+    )
+
+    # Cada par (k, k+1) se atribuye a la visita posterior, salvo que sea la ya registrada
+    destino = np.where(indices[1:] >= 0, indices[1:], indices[:-1])
+    for alerta, pares in ((ALERTA_VELOCIDAD, imposible), (ALERTA_COORDENADAS, repetidas)):
+        for i in np.unique(destino[pares]).tolist():
+            if i >= 0:
+                alertas[i].append(alerta)
+    return alertas
+
+
+class DetectorGPS:
+    """Última posición conocida por guardia (LRU acotado) y evaluación de visitas"""
+
+    def __init__(self, max_guardias: int):
+        self._max_guardias = max_guardias
+        self._posiciones: "OrderedDict[int, UltimaPosicion]" = OrderedDict()
+        self._bloqueo = threading.Lock()
+
+    def _leer_ultima(self, guardia_id: int) -> Optional[UltimaPosicion]:
+        try:
+            resp = get_supabase_client().table("visitas").select(
+                "fecha_hora, latitud, longitud, punto_qr_id"
+            ).eq("guardia_id", guardia_id).order("fecha_hora", desc=True).limit(1).execute()
+        except Exception:
+            # Sin posición previa solo se comparan las visitas del lote entre sí
+            return None
+        if not resp.data or resp.data[0].get("latitud") is None:
+            return None
+        return _posicion(resp.data[0])
+
+    def ultima_posicion(self, guardia_id: int) -> Optional[UltimaPosicion]:
+        with self._bloqueo:
+            if guardia_id in self._posiciones:
+                self._posiciones.move_to_end(guardia_id)
+                return self._posiciones[guardia_id]
+        posicion = self._leer_ultima(guardia_id)
+        if posicion is not None:
+            self._guardar(guardia_id, posicion)
+        return posicion
+
+    def _guardar(self, guardia_id: int, posicion: UltimaPosicion):
+        with self._bloqueo:
+            actual = self._posiciones.get(guardia_id)
+            # Una visita offline más vieja no reemplaza a la última
+            if actual is None or posicion.instante >= actual.instante:
+                self._posiciones[guardia_id] = posicion
+            self._posiciones.move_to_end(guardia_id)
+            while len(self._posiciones) > self._max_guardias:
+                self._posiciones.popitem(last=False)
+
+    def evaluar(self, visitas: List[dict]) -> List[List[str]]:
+        """
+        Alertas de cada visita (dicts con guardia_id, punto_qr_id, fecha_hora
+        ISO, latitud y longitud), en el mismo orden. Un lote se evalúa por
+        guardia con una sola pasada vectorizada.
+        """
+        alertas: List[List[str]] = [[] for _ in visitas]
+        por_guardia: Dict[int, List[int]] = {}
+        for i, visita in enumerate(visitas):
+            por_guardia.setdefault(visita["guardia_id"], []).append(i)
+
+        for guardia_id, posiciones in por_guardia.items():
+            propias = [visitas[i] for i in posiciones]
+            resultado = alertas_secuencia(
+                np.array([_instante(v["fecha_hora"]) for v in propias]),
+                np.array([v["latitud"] for v in propias], dtype=np.float64),
+                np.array([v["longitud"] for v in propias], dtype=np.float64),
+                np.array([v["punto_qr_id"] for v in propias], dtype=np.int64),
+                self.ultima_posicion(guardia_id),
+                settings.antifraude_velocidad_max_kmh,
+                settings.antifraude_tolerancia_m,
+            )
+            for i, alertas_visita in zip(posiciones, resultado):
+                alertas[i] = alertas_visita
+        return alertas
+
+    def registrar(self, visita: dict):
+        """Actualiza la última posición del guardia con una visita ya guardada"""
+        self._guardar(visita["guardia_id"], _posicion(visita))
+
+
+_detector: Optional[DetectorGPS] = None
+
+
+def obtener_detector() -> DetectorGPS:
+    """Detector compartido por el proceso"""
+    global _detector
+    if _detector is None:
+        _detector = DetectorGPS(settings.antifraude_max_guardias)
+    return _detector
+
+
+# ============ INSERCIÓN ============
+
+# Columna inexistente: no está en el cache de esquema de PostgREST / en la tabla
+CODIGOS_SIN_COLUMNA = {"PGRST204", "42703"}
+
+# None = no se sabe todavía; False = la migración 005 no está aplicada
+_columna_alertas: Optional[bool] = None
+
+
+def insertar_visita(supabase, visita: dict):
+    """
+    Inserta la visita en `visitas`. Sin la columna alertas_gps se reintenta
+    sin las marcas (y no se vuelven a enviar en este proceso).
+    """
+    global _columna_alertas
+    if _columna_alertas is False:
+        return supabase.table("visitas").insert(
+            {k: v for k, v in visita.items() if k != "alertas_gps"}
+        ).execute()
+    try:
+        response = supabase.table("visitas").insert(visita).execute()
+    except APIError as e:
+        if e.code not in CODIGOS_SIN_COLUMNA or "alertas_gps" not in (e.message or ""):
+            raise
+        print("⚠️ visitas.alertas_gps no existe (falta sql/005_visitas_alertas_gps.sql): "
+              "las visitas se guardan sin alertas de GPS")
+        _columna_alertas = False
+        return insertar_visita(supabase, visita)
+    _columna_alertas = True
+    return response
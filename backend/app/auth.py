@@ -24,6 +24,10 @@ def hash_password(password: str) -> str:
     """Genera hash de contraseña (alias de get_password_hash para compatibilidad)"""
     return get_password_hash(password)
 
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """Hash de varias contraseñas (se ejecuta en el pool de procesos)"""
+    return [pwd_context.hash(password) for password in passwords]
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crea token JWT"""
     to_encode = data.copy()
@@ -0,0 +1,287 @@
+"""
+Búsqueda de texto completo en las observaciones de visitas.
+
+La búsqueda la resuelve Postgres (sql/007_visitas_busqueda.sql): columna
+tsvector en español sin acentos, índice GIN por servicio y la función
+buscar_visitas, que ordena por relevancia y pagina por (rango, id) sin
+recorrer las visitas desde el principio en cada página.
+
+Si la migración no está aplicada, se usa un índice invertido en memoria
+construido con las visitas del servicio y período pedidos, con la misma
+normalización (minúsculas, sin acentos, raíces simplificadas del español),
+el mismo orden y el mismo cursor. Sirve también para probar la búsqueda sin
+base de datos. Soporta palabras (todas deben aparecer) y -palabra para
+excluir; las frases y `or` solo las entiende Postgres.
+"""
+import math
+import re
+import unicodedata
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from postgrest.exceptions import APIError
+from app.database import get_supabase_client
+from app.listados import codificar_cursor, decodificar_cursor
+from app.reportes_datos import fin_exclusivo, iterar_paginas_visitas
+
+COLUMNAS_BUSQUEDA = "id, servicio_id, punto_qr_id, guardia_id, tipo, observacion, fecha_hora, created_at"
+
+# Palabras vacías más frecuentes (no se indexan ni se buscan)
+PALABRAS_VACIAS = frozenset(
+    "a al algo ante con de del desde e el en entre es esta este esto hay la las le les lo los "
+    "mas me mi muy no o para pero por que se sin sobre su sus un una uno unos unas y ya".split()
+)
+
+# Sufijos derivativos, del más largo al más corto; se quita a lo sumo uno
+_SUFIJOS = (
+    "amientos", "imientos", "aciones", "uciones", "amiento", "imiento", "idades",
+    "mente", "acion", "ucion", "anzas", "ancia", "encia", "ables", "ibles", "istas",
+    "idad", "anza", "able", "ible", "ista", "osos", "osas", "ando", "iendo",
+    "oso", "osa",
+)
+
+_PALABRA = re.compile(r"\w+")
+
+# Errores de PostgREST que indican que buscar_visitas no existe (migración 007
+# no aplicada): no está en el cache de esquema / función indefinida
+CODIGOS_SIN_FUNCION = {"PGRST202", "42883"}
+
+MARCA_INICIO = "«"
+MARCA_FIN = "»"
+
+# Parámetros de relevancia (BM25) del índice en memoria
+_K1 = 1.2
+_B = 0.75
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos ("Camión" -> "camion")"""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def raiz(palabra: str) -> str:
+    """
+    Raíz aproximada de una palabra ya normalizada: quita un sufijo derivativo,
+    el plural y la vocal final ("puertas", "puerta" -> "puert").
+    """
+    for sufijo in _SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            palabra = palabra[:-len(sufijo)]
+            break
+    if palabra.endswith("es") and len(palabra) >= 5:
+        palabra = palabra[:-2]
+    elif palabra.endswith("s") and len(palabra) >= 4:
+        palabra = palabra[:-1]
+    if palabra[-1] in "aeo" and len(palabra) >= 4:
+        palabra = palabra[:-1]
+    return palabra
+
+
+def terminos(texto: Optional[str]) -> List[str]:
+    """Raíces de las palabras del texto, sin palabras vacías"""
+    return [
+        raiz(palabra) for palabra in _PALABRA.findall(normalizar(texto or ""))
+        if palabra not in PALABRAS_VACIAS
+    ]
+
+
+def analizar_consulta(consulta: str) -> Tuple[List[str], List[str]]:
+    """(raíces requeridas, raíces excluidas) de la consulta"""
+    requeridas, excluidas = [], []
+    for palabra in consulta.replace('"', " ").split():
+        destino = excluidas if palabra.startswith("-") else requeridas
+        destino.extend(t for t in terminos(palabra.lstrip("-")) if t not in destino)
+    return requeridas, excluidas
+
+
+def resaltar(texto: str, raices: List[str]) -> str:
+    """Texto con las palabras que coinciden con la consulta entre « »"""
+    buscadas = set(raices)
+
+    def marcar(m):
+        palabra = m.group(0)
+        if raiz(normalizar(palabra)) in buscadas:
+            return f"{MARCA_INICIO}{palabra}{MARCA_FIN}"
+        return palabra
+
+    return _PALABRA.sub(marcar, texto)
+
+
+def _epoch(valor: Optional[str]) -> Optional[float]:
+    if not valor:
+        return None
+    dt = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class IndiceInvertido:
+    """
+    Índice invertido en memoria: raíz -> {visita_id: frecuencia}. Las
+    búsquedas intersectan las listas de las raíces de la consulta empezando
+    por la más corta y ordenan por BM25.
+    """
+
+    def __init__(self):
+        self._listas: Dict[str, Dict[int, int]] = {}
+        self._visitas: Dict[int, dict] = {}
+        self._longitudes: Dict[int, int] = {}
+        self._instantes: Dict[int, float] = {}
+        self._longitud_total = 0
+
+    def __len__(self) -> int:
+        return len(self._visitas)
+
+    def agregar(self, visita: dict):
+        """Indexa una visita (se ignoran las que no tienen observación)"""
+        raices = terminos(visita.get("observacion"))
+        if not raices or visita["id"] in self._visitas:
+            return
+        self._visitas[visita["id"]] = visita
+        self._longitudes[visita["id"]] = len(raices)
+        self._instantes[visita["id"]] = _epoch(visita.get("created_at"))
+        self._longitud_total += len(raices)
+        for termino in raices:
+            lista = self._listas.setdefault(termino, {})
+            lista[visita["id"]] = lista.get(visita["id"], 0) + 1
+
+    def _rango(self, visita_id: int, requeridas: List[str]) -> float:
+        n = len(self._visitas)
+        promedio = self._longitud_total / n
+        normal = _K1 * (1 - _B + _B * self._longitudes[visita_id] / promedio)
+        rango = 0.0
+        for termino in requeridas:
+            lista = self._listas[termino]
+            frecuencia = lista[visita_id]
+            idf = math.log(1 + (n - len(lista) + 0.5) / (len(lista) + 0.5))
+            rango += idf * frecuencia * (_K1 + 1) / (frecuencia + normal)
+        return rango
+
+    def buscar(
+        self,
+        consulta: str,
+        desde: Optional[float] = None,
+        hasta: Optional[float] = None,
+        tipo: Optional[str] = None,
+        limite: int = 20,
+        cursor: Optional[Tuple[float, int]] = None,
+    ) -> List[dict]:
+        """
+        Página de visitas que contienen todas las raíces de la consulta, por
+        relevancia y luego id descendente. `cursor` = (rango, id) de la última
+        fila de la página anterior.
+        """
+        requeridas, excluidas = analizar_consulta(consulta)
+        if not requeridas or any(t not in self._listas for t in requeridas):
+            return []
+
+        listas = sorted((self._listas[t] for t in requeridas), key=len)
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+        for termino in excluidas:
+            candidatos.difference_update(self._listas.get(termino, ()))
+
+        resultados = []
+        for visita_id in candidatos:
+            visita = self._visitas[visita_id]
+            instante = self._instantes[visita_id]
+            if desde is not None and (instante is None or instante < desde):
+                continue
+            if hasta is not None and (instante is None or instante >= hasta):
+                continue
+            if tipo and visita.get("tipo") != tipo:
+                continue
+            rango = self._rango(visita_id, requeridas)
+            if cursor and (rango, visita_id) >= cursor:
+                continue
+            resultados.append((rango, visita_id))
+
+        resultados.sort(reverse=True)
+        return [
+            {
+                **self._visitas[visita_id],
+                "rango": rango,
+                "fragmento": resaltar(self._visitas[visita_id]["observacion"], requeridas),
+            }
+            for rango, visita_id in resultados[:limite]
+        ]
+
+
+def construir_indice(
+    servicio_id: Optional[int],
+    fecha_inicio: Optional[str],
+    fecha_fin: Optional[str],
+) -> IndiceInvertido:
+    """Índice en memoria de las visitas con observación del servicio y período"""
+    indice = IndiceInvertido()
+    for pagina in iterar_paginas_visitas(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        servicio_id=servicio_id,
+        columnas=COLUMNAS_BUSQUEDA,
+    ):
+        for visita in pagina:
+            indice.agregar(visita)
+    return indice
+
+
+def buscar_en_postgres(
+    consulta: str,
+    servicio_id: Optional[int],
+    fecha_inicio: Optional[str],
+    fecha_fin: Optional[str],
+    tipo: Optional[str],
+    limite: int,
+    cursor: Optional[Tuple[float, int]],
+) -> Optional[List[dict]]:
+    """
+    Página de resultados de la función buscar_visitas. Devuelve None si la
+    función no existe (migración no aplicada), para que el llamador recurra al
+    índice en memoria; ValueError si Postgres rechaza los parámetros (fechas
+    mal formadas). Cualquier otro error se propaga.
+    """
+    supabase = get_supabase_client()
+    try:
+        resp = supabase.rpc("buscar_visitas", {
+            "p_consulta": consulta,
+            "p_servicio_id": servicio_id,
+            "p_desde": fecha_inicio,
+            "p_hasta": fin_exclusivo(fecha_fin) if fecha_fin else None,
+            "p_tipo": tipo,
+            "p_limite": limite,
+            "p_cursor_rango": cursor[0] if cursor else None,
+            "p_cursor_id": cursor[1] if cursor else None,
+        }).execute()
+    except APIError as e:
+        if e.code in CODIGOS_SIN_FUNCION:
+            return None
+        if e.code and e.code.startswith("22"):
+            # Clase 22 de SQLSTATE: dato inválido (p. ej. fecha mal formada)
+            raise ValueError(e.message or "Parámetros de búsqueda inválidos")
+        raise
+    return resp.data or []
+
+
+def leer_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+    """(rango, id) del cursor; ValueError si no es válido"""
+    if not cursor:
+        return None
+    rango, ultimo_id = decodificar_cursor(cursor)
+    try:
+        return float(rango), ultimo_id
+    except (TypeError, ValueError):
+        raise ValueError("Cursor inválido")
+
+
+def pagina_busqueda(resultados: List[dict], limite: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    (resultados de la página, siguiente_cursor o None si no hay más). Se
+    espera una fila de más para saber si hay página siguiente.
+    """
+    if len(resultados) <= limite:
+        return resultados, None
+    resultados = resultados[:limite]
+    ultimo = resultados[-1]
+    return resultados, codificar_cursor(ultimo["rango"], ultimo["id"])
@@ -0,0 +1,196 @@
+"""
+Cache en memoria de resultados de reportes (estadísticas, ranking, densidad...).
+Solo resultados acotados: las listas de visitas no se cachean.
+
+- La clave son los filtros normalizados (servicio, fechas, punto, usuario...).
+- Cada servicio tiene un contador de generación que se incrementa al insertar
+  una visita de ese servicio (y uno global para consultas sin servicio).
+- Los períodos cerrados (terminan antes de hoy UTC) casi no cambian: se
+  cachean sin generación, con TTL largo. Una visita con fecha dentro de un
+  período cerrado (sincronización offline tardía) elimina las entradas
+  cerradas del servicio que cubren esa fecha.
+- Los períodos que tocan hoy incluyen la generación en la clave, así una visita
+  nueva los invalida; un TTL corto cubre las visitas insertadas por otros workers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from app.config import get_settings
+from app.reportes_datos import fin_exclusivo
+from app.trabajos import normalizar_fecha
+
+settings = get_settings()
+
+
+def periodo_cerrado(fecha_fin: Optional[str]) -> bool:
+    """True si el período termina antes del inicio de hoy (UTC)"""
+    if not fecha_fin:
+        return False
+    try:
+        fin = datetime.fromisoformat(fin_exclusivo(fecha_fin))
+    except ValueError:
+        return False
+    if fin.tzinfo is None:
+        fin = fin.replace(tzinfo=timezone.utc)
+    hoy = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return fin <= hoy
+
+
+def _a_utc(valor) -> datetime:
+    """Fecha ISO (o date/datetime) como datetime con zona; sin zona se toma UTC"""
+    if not isinstance(valor, datetime):
+        valor = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    return valor if valor.tzinfo is not None else valor.replace(tzinfo=timezone.utc)
+
+
+class CacheReportes:
+    """LRU con TTL y generaciones por servicio"""
+
+    def __init__(self, max_entradas: int, ttl_abierto: float, ttl_cerrado: float):
+        self.max_entradas = max_entradas
+        self.ttl_abierto = ttl_abierto
+        self.ttl_cerrado = ttl_cerrado
+        self._entradas: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._generaciones: Dict[Optional[int], int] = {}
+
+    def generacion(self, servicio_id: Optional[int]) -> int:
+        return self._generaciones.get(servicio_id, 0)
+
+    def registrar_visita(self, servicio_id: Optional[int], fecha: Optional[str] = None):
+        """
+        Invalida los períodos abiertos del servicio (y los que no filtran por
+        servicio) y, si se indica la fecha de la visita, los cerrados que la cubren.
+        """
+        if servicio_id is not None:
+            self._generaciones[servicio_id] = self.generacion(servicio_id) + 1
+        self._generaciones[None] = self.generacion(None) + 1
+        if not fecha:
+            return
+        try:
+            instante = _a_utc(fecha)
+        except ValueError:
+            return
+        for clave, (_, _, rango) in list(self._entradas.items()):
+            if rango is None or clave[1] not in (servicio_id, None):
+                continue
+            inicio, fin = rango
+            if (inicio is None or inicio <= instante) and instante < fin:
+                self._entradas.pop(clave, None)
+
+    def _clave(self, endpoint: str, servicio_id: Optional[int], fecha_fin: Optional[str], filtros: dict) -> tuple:
+        cerrado = periodo_cerrado(fecha_fin)
+        normalizados = tuple(sorted(
+            (k, normalizar_fecha(v) if k.startswith("fecha") else str(v))
+            for k, v in {**filtros, "fecha_fin": fecha_fin}.items()
+            if v not in (None, "")
+        ))
+        generacion = None if cerrado else self.generacion(servicio_id)
+        return (endpoint, servicio_id, generacion, normalizados)
+
+    def obtener(self, endpoint: str, servicio_id: Optional[int], fecha_fin: Optional[str], **filtros) -> Optional[Any]:
+        clave = self._clave(endpoint, servicio_id, fecha_fin, filtros)
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        expira, valor, _ = entrada
+        if time.monotonic() > expira:
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return valor
+
+    def guardar(self, endpoint: str, servicio_id: Optional[int], fecha_fin: Optional[str], valor: Any, **filtros):
+        clave = self._clave(endpoint, servicio_id, fecha_fin, filtros)
+        if clave[2] is None:
+            # Rango del período cerrado, para invalidarlo por fecha. Se amplía un
+            # día por lado: algunos reportes usan días locales del servicio
+            inicio = filtros.get("fecha_inicio")
+            rango = (
+                _a_utc(inicio) - timedelta(days=1) if inicio else None,
+                _a_utc(fin_exclusivo(fecha_fin)) + timedelta(days=1),
+            )
+            ttl = self.ttl_cerrado
+        else:
+            rango = None
+            ttl = self.ttl_abierto
+        self._entradas[clave] = (time.monotonic() + ttl, valor, rango)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        self._entradas.clear()
+
+
+_cache: Optional[CacheReportes] = None
+
+
+def obtener_cache_reportes() -> CacheReportes:
+    """Cache de reportes compartido por el proceso"""
+    global _cache
+    if _cache is None:
+        _cache = CacheReportes(
+            max_entradas=settings.cache_reportes_max_entradas,
+            ttl_abierto=settings.cache_reportes_ttl_abierto_segundos,
+            ttl_cerrado=settings.cache_reportes_ttl_cerrado_horas * 3600,
+        )
+    return _cache
+
+
+# ============ CACHE POR DÍA ============
+# Los reportes que recorren meses (cumplimiento, intervalos) guardan un valor
+# por día local cerrado y solo calculan los días que falten.
+
+class CacheDias:
+    """LRU con TTL de valores por día cerrado; la clave la arma cada reporte"""
+
+    def __init__(self, max_entradas: int, ttl: float):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bloqueo = threading.Lock()
+
+    def obtener(self, clave: tuple) -> Optional[Any]:
+        with self._bloqueo:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if time.monotonic() > entrada[0]:
+                self._entradas.pop(clave, None)
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[1]
+
+    def guardar(self, clave: tuple, valor: Any):
+        with self._bloqueo:
+            self._entradas[clave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+
+_cache_dias: Optional[CacheDias] = None
+
+
+def obtener_cache_dias() -> CacheDias:
+    """Cache por día compartido por el proceso"""
+    global _cache_dias
+    if _cache_dias is None:
+        _cache_dias = CacheDias(
+            settings.cache_reportes_max_dias,
+            settings.cache_reportes_ttl_cerrado_horas * 3600,
+        )
+    return _cache_dias
+
+
+def dias_consecutivos(dias: List[date]) -> List[List[date]]:
+    """Agrupa días ordenados en tramos consecutivos (una lectura por tramo)"""
+    tramos: List[List[date]] = []
+    for dia in dias:
+        if tramos and tramos[-1][-1] + timedelta(days=1) == dia:
+            tramos[-1].append(dia)
+        else:
+            tramos.append([dia])
+    return tramos
@@ -8,6 +8,46 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 1440
     gps_radius_meters: int = 50
+    # Trabajos de reportes en segundo plano
+    reportes_workers: int = 2
+    reportes_max_pendientes: int = 8
+    reportes_dir: str = ""  # vacío = directorio temporal del sistema
+    reportes_max_mb: int = 512
+    reportes_ttl_minutos: int = 60
+    reportes_pdf_max_segundos: int = 300
+    reportes_pdf_max_memoria_mb: int = 1024
+    # Cache de imágenes QR (memoria + disco)
+    qr_cache_max_entradas: int = 512
+    qr_cache_dir: str = ""  # vacío = directorio temporal del sistema
+    qr_cache_max_mb: int = 64
+    qr_cache_ttl_dias: int = 30
+    qr_workers: int = 2
+    # Hash de contraseñas en el alta masiva de usuarios
+    hash_workers: int = 2
+    # Horarios de servicio: zona horaria de hora_inicio/hora_fin y vigencia del cache
+    zona_horaria_servicios: str = "UTC"
+    horarios_cache_ttl_segundos: int = 60
+    # Paquete offline por servicio: clave HMAC para firmarlo (vacío = sin firma)
+    paquete_offline_clave_firma: str = ""
+    # Detección de GPS falso al registrar visitas
+    antifraude_velocidad_max_kmh: float = 120
+    antifraude_tolerancia_m: int = 100  # saltos menores son ruido del GPS
+    antifraude_max_guardias: int = 10000  # últimas posiciones en memoria
+    # Fotos adjuntas a visitas (almacén local por hash + miniaturas)
+    adjuntos_dir: str = "adjuntos"
+    adjuntos_max_mb: int = 20
+    adjuntos_miniatura_px: int = 320
+    adjuntos_subida_ttl_horas: int = 24  # subidas sin completar
+    adjuntos_url_publica: str = ""  # URL del backend para los enlaces de las exportaciones
+    imagenes_workers: int = 2
+    # Rutas de patrulla: vigencia de las definiciones en memoria y avances por guardia
+    rutas_cache_ttl_segundos: int = 60
+    rutas_max_guardias: int = 10000
+    # Cache de resultados de reportes
+    cache_reportes_max_entradas: int = 128
+    cache_reportes_ttl_abierto_segundos: int = 60
+    cache_reportes_ttl_cerrado_horas: int = 24
+    cache_reportes_max_dias: int = 5000  # días cerrados (cumplimiento, intervalos)
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,227 @@
+"""
+Cumplimiento de rondas: rondas esperadas vs. realizadas.
+
+El horario compilado del servicio (app.horarios) se corta en ventanas de
+intervalo_ronda_minutos. Una ronda de un punto se cumple si el punto tiene al
+menos una visita (por fecha_hora) dentro de la ventana; se atribuye al guardia
+de la primera visita.
+
+El cruce visitas × ventanas se hace con arrays ordenados de NumPy
+(searchsorted) en lugar de una consulta por ventana. El resultado se guarda
+por día local del servicio; los días cerrados se cachean y un reporte de
+varios meses solo calcula los días que falten, leyendo sus visitas de una vez.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.cache_reportes import dias_consecutivos, obtener_cache_dias
+from app.database import get_supabase_client
+from app.horarios import HorarioCompilado, obtener_horario
+from app.reportes_datos import leer_columnas_visitas
+from app.sincronizacion import leer_puntos
+
+
+@dataclass
+class ResumenDia:
+    """Rondas de un día local del servicio"""
+    ventanas: int = 0
+    # punto_qr_id -> rondas cumplidas
+    por_punto: Dict[int, int] = field(default_factory=dict)
+    # guardia_id -> rondas cumplidas
+    por_guardia: Dict[int, int] = field(default_factory=dict)
+
+
+def _firma_puntos(puntos_ids: List[int]) -> str:
+    """Hash corto del conjunto de puntos (crear o reactivar un punto cambia la firma)"""
+    return hashlib.sha1(",".join(map(str, sorted(puntos_ids))).encode()).hexdigest()[:16]
+
+
+def _clave_dia(horario: HorarioCompilado, puntos: str, dia: date) -> tuple:
+    # El horario entero y los puntos forman parte de la clave: si cambian, los días se recalculan
+    return (
+        "cumplimiento", horario.servicio_id, tuple(horario.inicios), tuple(horario.fines),
+        horario.intervalo_ronda_minutos, horario.zona.zone, puntos, dia,
+    )
+
+
+def cruzar_visitas_ventanas(
+    inicios: np.ndarray,
+    fines: np.ndarray,
+    instantes: np.ndarray,
+    puntos: np.ndarray,
+    guardias: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Rondas cumplidas: (ventana, punto, guardia) por cada par ventana × punto con
+    al menos una visita, con el guardia de la primera. `inicios` debe estar
+    ordenado y las ventanas no solaparse.
+    """
+    vacio = np.array([], dtype=np.int64)
+    if len(inicios) == 0 or len(instantes) == 0:
+        return vacio, vacio, vacio
+
+    orden = np.argsort(instantes, kind="stable")
+    instantes, puntos, guardias = instantes[orden], puntos[orden], guardias[orden]
+
+    ventana = np.searchsorted(inicios, instantes, side="right") - 1
+    dentro = ventana >= 0
+    dentro[dentro] &= instantes[dentro] < fines[ventana[dentro]]
+    ventana, puntos, guardias = ventana[dentro], puntos[dentro], guardias[dentro]
+
+    # Un par (ventana, punto) por ronda; return_index da la primera visita (orden temporal)
+    base = int(puntos.max()) + 1 if len(puntos) else 1
+    pares, primera = np.unique(ventana * base + puntos, return_index=True)
+    return pares // base, pares % base, guardias[primera]
+
+
+def calcular_dias(horario: HorarioCompilado, puntos_ids: List[int], dias: List[date]) -> Dict[date, ResumenDia]:
+    """Resumen de días consecutivos, con una sola lectura de visitas"""
+    desde = horario.inicio_dia(dias[0])
+    hasta = horario.inicio_dia(dias[-1] + timedelta(days=1))
+    ventanas = horario.ventanas_ronda(desde, hasta)
+    resumenes = {dia: ResumenDia() for dia in dias}
+    if not ventanas:
+        return resumenes
+
+    inicios = np.array([inicio.timestamp() for inicio, _ in ventanas])
+    fines = np.array([fin.timestamp() for _, fin in ventanas])
+    dia_ventana = [inicio.astimezone(horario.zona).date() for inicio, _ in ventanas]
+    for dia in dia_ventana:
+        resumenes[dia].ventanas += 1
+
+    if not puntos_ids:
+        return resumenes
+
+    # Las ventanas del último día pueden terminar al día siguiente
+    visitas = leer_columnas_visitas(horario.servicio_id, ventanas[0][0], ventanas[-1][1])
+    validas = np.isin(visitas["punto_qr_id"], puntos_ids)
+    instantes, puntos, guardias = (visitas[c][validas] for c in ("instante", "punto_qr_id", "guardia_id"))
+    ventana, punto, guardia = cruzar_visitas_ventanas(inicios, fines, instantes, puntos, guardias)
+    for v, p, g in zip(ventana.tolist(), punto.tolist(), guardia.tolist()):
+        resumen = resumenes[dia_ventana[v]]
+        resumen.por_punto[p] = resumen.por_punto.get(p, 0) + 1
+        resumen.por_guardia[g] = resumen.por_guardia.get(g, 0) + 1
+    return resumenes
+
+
+def resumenes_diarios(horario: HorarioCompilado, puntos_ids: List[int], fecha_inicio: date, fecha_fin: date) -> Dict[date, ResumenDia]:
+    """Resumen por día de [fecha_inicio, fecha_fin]; los días cerrados salen del cache si están"""
+    cache = obtener_cache_dias()
+    dias = [fecha_inicio + timedelta(days=i) for i in range((fecha_fin - fecha_inicio).days + 1)]
+    hoy = datetime.now(horario.zona).date()
+    puntos = _firma_puntos(puntos_ids)
+
+    resumenes: Dict[date, ResumenDia] = {}
+    faltantes = []
+    for dia in dias:
+        resumen = cache.obtener(_clave_dia(horario, puntos, dia)) if dia < hoy else None
+        if resumen is None:
+            faltantes.append(dia)
+        else:
+            resumenes[dia] = resumen
+
+    for tramo in dias_consecutivos(faltantes):
+        for dia, resumen in calcular_dias(horario, puntos_ids, tramo).items():
+            resumenes[dia] = resumen
+            # Solo los días cerrados: el de hoy todavía puede recibir visitas
+            if dia < hoy:
+                cache.guardar(_clave_dia(horario, puntos, dia), resumen)
+    return resumenes
+
+
+def _porcentaje(cumplidas: int, esperadas: int) -> Optional[float]:
+    return round(cumplidas * 100 / esperadas, 2) if esperadas else None
+
+
+def reporte_cumplimiento(
+    servicio_id: int,
+    fecha_inicio: date,
+    fecha_fin: date,
+    punto_qr_id: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Rondas esperadas vs. cumplidas del servicio en [fecha_inicio, fecha_fin]
+    (días locales del servicio), en total, por día, por punto y por guardia.
+    None si el servicio no existe.
+    """
+    horario = obtener_horario(servicio_id)
+    if horario is None:
+        return None
+
+    supabase = get_supabase_client()
+    todos = leer_puntos(
+        lambda: supabase.table("puntos_qr").select("id, nombre").eq("servicio_id", servicio_id).eq("activo", True)
+    )
+    # El cache es por servicio completo: el filtro por punto se aplica al agregar
+    resumenes = resumenes_diarios(horario, [p["id"] for p in todos], fecha_inicio, fecha_fin)
+
+    puntos = [p for p in todos if p["id"] == punto_qr_id] if punto_qr_id else todos
+    puntos_ids = [p["id"] for p in puntos]
+
+    ventanas = sum(r.ventanas for r in resumenes.values())
+    cumplidas_punto = {p: 0 for p in puntos_ids}
+    por_dia = []
+    for dia in sorted(resumenes):
+        resumen = resumenes[dia]
+        cumplidas = 0
+        for p in puntos_ids:
+            n = resumen.por_punto.get(p, 0)
+            cumplidas_punto[p] += n
+            cumplidas += n
+        esperadas = resumen.ventanas * len(puntos_ids)
+        por_dia.append({
+            "fecha": dia.isoformat(),
+            "esperadas": esperadas,
+            "cumplidas": cumplidas,
+            "porcentaje": _porcentaje(cumplidas, esperadas),
+        })
+
+    por_guardia: Dict[int, int] = {}
+    if not punto_qr_id:
+        for resumen in resumenes.values():
+            for g, n in resumen.por_guardia.items():
+                por_guardia[g] = por_guardia.get(g, 0) + n
+
+    guardias_info = {}
+    if por_guardia:
+        resp = supabase.table("usuarios").select("id, nombre, email").in_("id", list(por_guardia)).execute()
+        guardias_info = {u["id"]: u for u in resp.data}
+
+    esperadas_total = ventanas * len(puntos_ids)
+    cumplidas_total = sum(cumplidas_punto.values())
+    return {
+        "servicio_id": servicio_id,
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "zona_horaria": horario.zona.zone,
+        "intervalo_ronda_minutos": horario.intervalo_ronda_minutos,
+        "ventanas": ventanas,
+        "esperadas": esperadas_total,
+        "cumplidas": cumplidas_total,
+        "porcentaje": _porcentaje(cumplidas_total, esperadas_total),
+        "por_dia": por_dia,
+        "por_punto": [
+            {
+                "punto_id": p["id"],
+                "nombre": p["nombre"],
+                "esperadas": ventanas,
+                "cumplidas": cumplidas_punto[p["id"]],
+                "porcentaje": _porcentaje(cumplidas_punto[p["id"]], ventanas),
+            }
+            for p in sorted(puntos, key=lambda p: p["nombre"])
+        ],
+        "por_guardia": sorted(
+            [
+                {
+                    "guardia_id": g,
+                    "nombre": guardias_info.get(g, {}).get("nombre", "Desconocido"),
+                    "rondas_cumplidas": n,
+                }
+                for g, n in por_guardia.items()
+            ],
+            key=lambda g: g["rondas_cumplidas"],
+            reverse=True,
+        ),
+    }
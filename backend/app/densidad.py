@@ -0,0 +1,205 @@
+"""
+Mapas de calor de densidad de visitas.
+
+Las coordenadas GPS de las visitas se cuentan en una grilla sobre las teselas
+del mapa (Web Mercator, PIXELES_POR_CELDA x PIXELES_POR_CELDA píxeles por
+celda). Cada día local cerrado se guarda en el cache por día como histograma
+disperso (celdas con visitas y su cantidad):
+- al nivel ZOOM_BASE, calculado una vez desde las visitas del día
+- a cada zoom pedido, derivado del base desplazando bits (las celdas de un
+  zoom son exactamente 2 x 2 celdas del siguiente), sin volver a la base
+
+Una tesela o una grilla de un período junta los histogramas de sus días con
+operaciones de NumPy; ningún paso recorre las visitas fila por fila.
+"""
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from app.cache_reportes import dias_consecutivos, obtener_cache_dias
+from app.horarios import HorarioCompilado
+from app.mapa import mercator
+from app.reportes_datos import leer_columnas_visitas
+
+TAMANO_TESELA = 256
+
+PIXELES_POR_CELDA = 4
+
+# Celdas por lado de tesela
+CELDAS_TESELA = TAMANO_TESELA // PIXELES_POR_CELDA
+
+# Zoom del histograma base (celdas de ~1,2 m en el ecuador); zoom máximo del mapa de calor
+ZOOM_BASE = 19
+
+# Bits por coordenada de celda al zoom base: 2^ZOOM_BASE teselas x CELDAS_TESELA celdas
+_BITS = ZOOM_BASE + CELDAS_TESELA.bit_length() - 1
+
+# Histograma disperso: (cx, cy, cantidad) de las celdas con visitas
+Histograma = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _vacio() -> Histograma:
+    return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+
+def _compactar(cx: np.ndarray, cy: np.ndarray, pesos: Optional[np.ndarray] = None) -> Histograma:
+    """Suma las repeticiones de cada celda"""
+    if len(cx) == 0:
+        return _vacio()
+    claves, posicion = np.unique((cx << _BITS) | cy, return_inverse=True)
+    cantidades = np.bincount(posicion, weights=pesos).astype(np.int64)
+    mascara = (1 << _BITS) - 1
+    return claves >> _BITS, claves & mascara, cantidades
+
+
+def histograma_base(latitudes: np.ndarray, longitudes: np.ndarray) -> Histograma:
+    """Histograma de coordenadas al zoom base (las coordenadas NaN se descartan)"""
+    validas = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    x, y = mercator(latitudes[validas], longitudes[validas])
+    celdas = float(1 << _BITS)
+    return _compactar(np.floor(x * celdas).astype(np.int64), np.floor(y * celdas).astype(np.int64))
+
+
+def reducir(base: Histograma, zoom: int) -> Histograma:
+    """Histograma al zoom pedido desde el del zoom base"""
+    desplazamiento = ZOOM_BASE - zoom
+    if desplazamiento == 0:
+        return base
+    cx, cy, cantidades = base
+    return _compactar(cx >> desplazamiento, cy >> desplazamiento, cantidades)
+
+
+def _clave_dia(horario: HorarioCompilado, dia: date, zoom: int) -> tuple:
+    return ("densidad", horario.servicio_id, horario.zona.zone, dia, zoom)
+
+
+def histogramas_periodo(
+    horario: HorarioCompilado,
+    fecha_inicio: date,
+    fecha_fin: date,
+    zoom: int,
+) -> List[Histograma]:
+    """Histogramas por día de [fecha_inicio, fecha_fin] al zoom pedido; días cerrados desde cache"""
+    cache = obtener_cache_dias()
+    dias = [fecha_inicio + timedelta(days=i) for i in range((fecha_fin - fecha_inicio).days + 1)]
+    hoy = datetime.now(horario.zona).date()
+
+    por_dia: Dict[date, Histograma] = {}
+    sin_base = []
+    for dia in dias:
+        cerrado = dia < hoy
+        histograma = cache.obtener(_clave_dia(horario, dia, zoom)) if cerrado else None
+        if histograma is None:
+            base = cache.obtener(_clave_dia(horario, dia, ZOOM_BASE)) if cerrado else None
+            if base is None:
+                sin_base.append(dia)
+                continue
+            histograma = reducir(base, zoom)
+            cache.guardar(_clave_dia(horario, dia, zoom), histograma)
+        por_dia[dia] = histograma
+
+    # Los días sin base se leen de la base de datos por tramos consecutivos
+    for tramo in dias_consecutivos(sin_base):
+        limites = [horario.inicio_dia(dia).timestamp() for dia in tramo + [tramo[-1] + timedelta(days=1)]]
+        visitas = leer_columnas_visitas(
+            horario.servicio_id, horario.inicio_dia(tramo[0]), horario.inicio_dia(tramo[-1] + timedelta(days=1))
+        )
+        orden = np.argsort(visitas["instante"], kind="stable")
+        instantes = visitas["instante"][orden]
+        latitudes, longitudes = visitas["latitud"][orden], visitas["longitud"][orden]
+        cortes = np.searchsorted(instantes, limites)
+        for k, dia in enumerate(tramo):
+            base = histograma_base(latitudes[cortes[k]:cortes[k + 1]], longitudes[cortes[k]:cortes[k + 1]])
+            histograma = reducir(base, zoom)
+            por_dia[dia] = histograma
+            if dia < hoy:
+                cache.guardar(_clave_dia(horario, dia, ZOOM_BASE), base)
+                cache.guardar(_clave_dia(horario, dia, zoom), histograma)
+
+    return [por_dia[dia] for dia in dias]
+
+
+def unir(histogramas: List[Histograma]) -> Histograma:
+    """Suma varios histogramas del mismo zoom"""
+    no_vacios = [h for h in histogramas if len(h[0])]
+    if not no_vacios:
+        return _vacio()
+    if len(no_vacios) == 1:
+        return no_vacios[0]
+    return _compactar(
+        np.concatenate([h[0] for h in no_vacios]),
+        np.concatenate([h[1] for h in no_vacios]),
+        np.concatenate([h[2] for h in no_vacios]),
+    )
+
+
+def matriz_tesela(histograma: Histograma, tx: int, ty: int) -> np.ndarray:
+    """Cantidades de la tesela (tx, ty) como matriz CELDAS_TESELA x CELDAS_TESELA [fila=y, columna=x]"""
+    cx, cy, cantidades = histograma
+    x0, y0 = tx * CELDAS_TESELA, ty * CELDAS_TESELA
+    dentro = (cx >= x0) & (cx < x0 + CELDAS_TESELA) & (cy >= y0) & (cy < y0 + CELDAS_TESELA)
+    matriz = np.zeros((CELDAS_TESELA, CELDAS_TESELA), dtype=np.int64)
+    np.add.at(matriz, (cy[dentro] - y0, cx[dentro] - x0), cantidades[dentro])
+    return matriz
+
+
+def _celdas_lat_lon(cx: np.ndarray, cy: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Centro (lat, lon) de las celdas del zoom dado"""
+    celdas = float(2 ** zoom * CELDAS_TESELA)
+    x = (cx + 0.5) / celdas
+    y = (cy + 0.5) / celdas
+    longitudes = x * 360.0 - 180.0
+    latitudes = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y))))
+    return latitudes, longitudes
+
+
+def grilla_bbox(histograma: Histograma, zoom: int, bbox: Tuple[float, float, float, float]) -> dict:
+    """Celdas con visitas dentro de bbox (min_lat, min_lon, max_lat, max_lon): [lat, lon, cantidad]"""
+    cx, cy, cantidades = histograma
+    latitudes, longitudes = _celdas_lat_lon(cx, cy, zoom)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    dentro = (latitudes >= min_lat) & (latitudes <= max_lat) & (longitudes >= min_lon) & (longitudes <= max_lon)
+    return {
+        "zoom": zoom,
+        "tamano_celda_px": PIXELES_POR_CELDA,
+        "maximo": int(cantidades[dentro].max()) if dentro.any() else 0,
+        "celdas": np.column_stack([
+            np.round(latitudes[dentro], 6), np.round(longitudes[dentro], 6), cantidades[dentro]
+        ]).tolist(),
+    }
+
+
+# Rampa de color: transparente -> azul -> verde -> amarillo -> rojo
+_RAMPA = np.array([
+    [0, 0, 255, 0],
+    [0, 0, 255, 120],
+    [0, 200, 0, 170],
+    [255, 230, 0, 200],
+    [255, 0, 0, 230],
+], dtype=np.float64)
+
+
+def colorear(matriz: np.ndarray, maximo: Optional[float] = None) -> np.ndarray:
+    """Matriz de cantidades -> RGBA (escala logarítmica respecto de `maximo`)"""
+    maximo = float(maximo if maximo is not None else matriz.max())
+    if maximo <= 0:
+        return np.zeros(matriz.shape + (4,), dtype=np.uint8)
+    nivel = np.log1p(matriz) / np.log1p(maximo) * (len(_RAMPA) - 1)
+    nivel = np.clip(nivel, 0, len(_RAMPA) - 1)
+    abajo = np.floor(nivel).astype(np.int64)
+    arriba = np.minimum(abajo + 1, len(_RAMPA) - 1)
+    fraccion = (nivel - abajo)[..., None]
+    rgba = _RAMPA[abajo] * (1 - fraccion) + _RAMPA[arriba] * fraccion
+    rgba[matriz == 0] = 0
+    return rgba.astype(np.uint8)
+
+
+def png_tesela(matriz: np.ndarray, maximo: Optional[float] = None) -> bytes:
+    """PNG de TAMANO_TESELA px de la matriz de una tesela"""
+    rgba = colorear(matriz, maximo)
+    # Cada celda ocupa PIXELES_POR_CELDA x PIXELES_POR_CELDA píxeles
+    rgba = np.repeat(np.repeat(rgba, PIXELES_POR_CELDA, axis=0), PIXELES_POR_CELDA, axis=1)
+    salida = BytesIO()
+    Image.fromarray(rgba, "RGBA").save(salida, format="PNG", optimize=True)
+    return salida.getvalue()
@@ -0,0 +1,33 @@
+"""
+Utilidades para respuestas que se generan mientras se envían.
+"""
+import io
+
+
+class SalidaDrenable(io.RawIOBase):
+    """
+    Archivo de solo escritura que acumula bytes hasta que se drenan.
+    Permite que un escritor (pyarrow, zipfile) escriba por partes mientras
+    se envía la respuesta. No admite seek: zipfile usa descriptores de datos.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        self._posicion += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._posicion
+
+    def drenar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
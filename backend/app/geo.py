@@ -0,0 +1,26 @@
+"""
+Cálculos geográficos vectorizados con NumPy.
+
+Misma fórmula de Haversine que calculate_distance (routers/visits.py), pero
+sobre arrays: miles de pares se calculan en una sola operación en lugar de
+un bucle de Python por par.
+"""
+import numpy as np
+
+RADIO_TIERRA_M = 6371000
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distancia en metros entre pares de coordenadas (arrays o escalares, en grados)"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distancias_consecutivas(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Distancia en metros de cada punto al siguiente (n-1 valores)"""
+    return haversine_m(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
@@ -0,0 +1,292 @@
+"""
+Horarios de servicio compilados.
+
+Un servicio guarda hora_inicio, hora_fin (puede cruzar la medianoche) y
+dias_activo (0 = Lunes). Acá se compila una vez en una lista ordenada de
+intervalos semanales [inicio, fin) en segundos desde el lunes 00:00, con los
+turnos nocturnos partidos entre días y los intervalos contiguos unidos. Sobre
+esa lista las consultas son búsquedas binarias:
+- en_servicio(momento): ¿está de turno en ese instante?
+- segundos_en_servicio(desde, hasta): tiempo de turno dentro del rango
+- tramos(desde, hasta) / rondas_esperadas(desde, hasta)
+
+Los horarios son hora de reloj local en la zona `zona_horaria_servicios`.
+Los compilados se cachean por servicio; crear/actualizar/eliminar servicio
+los invalida, y el TTL cubre los cambios hechos desde otros workers.
+"""
+import threading
+import time as reloj
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import pytz
+from app.config import get_settings
+from app.database import get_supabase_client
+
+settings = get_settings()
+
+DIA = 86400
+SEMANA = 7 * DIA
+
+# Un lunes cualquiera: origen de los segundos "de reloj" absolutos
+_LUNES_REFERENCIA = datetime(2001, 1, 1)
+
+COLUMNAS_HORARIO = "id, hora_inicio, hora_fin, dias_activo, intervalo_ronda_minutos, activo, ultima_modificacion"
+
+
+def _segundos_del_dia(hora: str) -> int:
+    """'HH:MM' o 'HH:MM:SS' -> segundos desde la medianoche"""
+    t = time.fromisoformat(hora)
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def intervalos_semanales(hora_inicio: str, hora_fin: str, dias_activo: Iterable[int]) -> List[Tuple[int, int]]:
+    """
+    Intervalos [inicio, fin) en segundos de la semana, ordenados y sin solapes.
+    Un turno que empieza un día y termina al siguiente se asigna al día de
+    inicio; si hora_fin == hora_inicio el turno dura 24 horas.
+    """
+    inicio_dia = _segundos_del_dia(hora_inicio)
+    fin_dia = _segundos_del_dia(hora_fin)
+    duracion = fin_dia - inicio_dia if fin_dia > inicio_dia else DIA - inicio_dia + fin_dia
+
+    crudos = []
+    for dia in set(dias_activo):
+        inicio = dia * DIA + inicio_dia
+        fin = inicio + duracion
+        if fin > SEMANA:
+            # El turno del domingo a la noche termina el lunes de la semana siguiente
+            crudos.append((inicio, SEMANA))
+            crudos.append((0, fin - SEMANA))
+        else:
+            crudos.append((inicio, fin))
+
+    unidos: List[Tuple[int, int]] = []
+    for inicio, fin in sorted(crudos):
+        if unidos and inicio <= unidos[-1][1]:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fin))
+        else:
+            unidos.append((inicio, fin))
+    return unidos
+
+
+@dataclass
+class HorarioCompilado:
+    servicio_id: int
+    inicios: List[int]
+    fines: List[int]
+    intervalo_ronda_minutos: int
+    activo: bool
+    marca: Optional[str] = None  # ultima_modificacion del servicio compilado
+    zona: "pytz.BaseTzInfo" = pytz.UTC
+    compilado: float = field(default_factory=reloj.monotonic)
+    # acumulados[i] = segundos de turno de los intervalos anteriores al i
+    acumulados: List[int] = field(init=False)
+
+    def __post_init__(self):
+        self.acumulados = [0]
+        for inicio, fin in zip(self.inicios, self.fines):
+            self.acumulados.append(self.acumulados[-1] + fin - inicio)
+
+    @property
+    def segundos_por_semana(self) -> int:
+        return self.acumulados[-1]
+
+    # ---- conversión entre instantes y segundos de reloj local ----
+
+    def _a_reloj(self, momento: datetime) -> int:
+        """Segundos de reloj local desde el lunes de referencia (naive = UTC)"""
+        if momento.tzinfo is None:
+            momento = pytz.UTC.localize(momento)
+        local = momento.astimezone(self.zona).replace(tzinfo=None)
+        return int((local - _LUNES_REFERENCIA).total_seconds())
+
+    def _desde_reloj(self, segundos: int) -> datetime:
+        local = _LUNES_REFERENCIA + timedelta(seconds=segundos)
+        return self.zona.normalize(self.zona.localize(local, is_dst=False))
+
+    def _acumulado_hasta(self, t: int) -> int:
+        """Segundos de turno entre el lunes de referencia y t"""
+        semanas, s = divmod(t, SEMANA)
+        i = bisect_right(self.inicios, s)
+        parcial = self.acumulados[i]
+        if i > 0 and s < self.fines[i - 1]:
+            # s cae dentro del intervalo i-1: se descuenta lo que falta de él
+            parcial -= self.fines[i - 1] - s
+        return semanas * self.segundos_por_semana + parcial
+
+    def _a_reloj_array(self, instantes: np.ndarray) -> np.ndarray:
+        """_a_reloj de muchos instantes epoch: el desfase horario se calcula una vez por hora distinta"""
+        horas, posicion = np.unique(np.floor_divide(instantes, 3600), return_inverse=True)
+        desfases = np.array([
+            datetime.fromtimestamp(hora * 3600, tz=self.zona).utcoffset().total_seconds()
+            for hora in horas.tolist()
+        ])
+        referencia = pytz.UTC.localize(_LUNES_REFERENCIA).timestamp()
+        return instantes + desfases[posicion] - referencia
+
+    def inicio_dia(self, dia: date) -> datetime:
+        """Medianoche local del día en la zona del servicio"""
+        return self.zona.localize(datetime.combine(dia, time.min))
+
+    # ---- consultas ----
+
+    def en_servicio(self, momento: datetime) -> bool:
+        """¿Está el servicio de turno en ese instante?"""
+        s = self._a_reloj(momento) % SEMANA
+        i = bisect_right(self.inicios, s) - 1
+        return i >= 0 and s < self.fines[i]
+
+    def segundos_en_servicio(self, desde: datetime, hasta: datetime) -> int:
+        """Segundos de turno dentro de [desde, hasta)"""
+        a, b = self._a_reloj(desde), self._a_reloj(hasta)
+        if b <= a:
+            return 0
+        return self._acumulado_hasta(b) - self._acumulado_hasta(a)
+
+    def segundos_en_servicio_array(self, instantes: np.ndarray) -> np.ndarray:
+        """
+        Segundos de turno acumulados hasta cada instante (epoch). La diferencia
+        entre dos valores es el tiempo de turno entre esos instantes.
+        """
+        if len(instantes) == 0 or not self.inicios:
+            return np.zeros(len(instantes))
+        semanas, s = np.divmod(self._a_reloj_array(instantes), SEMANA)
+        inicios, fines = np.array(self.inicios), np.array(self.fines)
+        i = np.searchsorted(inicios, s, side="right")
+        parcial = np.array(self.acumulados, dtype=np.float64)[i]
+        anterior = np.maximum(i - 1, 0)
+        dentro = (i > 0) & (s < fines[anterior])
+        parcial -= np.where(dentro, fines[anterior] - s, 0)
+        return semanas * self.segundos_por_semana + parcial
+
+    def _tramos_reloj(self, a: int, b: int) -> Iterator[Tuple[int, int]]:
+        if not self.inicios or b <= a:
+            return
+        semana, s = divmod(a, SEMANA)
+        # Primer intervalo que termina después de s
+        i = bisect_right(self.fines, s)
+        actual: Optional[Tuple[int, int]] = None
+        while True:
+            if i == len(self.inicios):
+                semana, i = semana + 1, 0
+            inicio = semana * SEMANA + self.inicios[i]
+            fin = semana * SEMANA + self.fines[i]
+            if inicio >= b:
+                break
+            tramo = (max(inicio, a), min(fin, b))
+            if actual and tramo[0] <= actual[1]:
+                # Turno que cruza del domingo al lunes: un solo tramo
+                actual = (actual[0], tramo[1])
+            else:
+                if actual:
+                    yield actual
+                actual = tramo
+            i += 1
+        if actual:
+            yield actual
+
+    def tramos(self, desde: datetime, hasta: datetime) -> List[Tuple[datetime, datetime]]:
+        """Tramos de turno (inicio, fin) dentro de [desde, hasta), en la zona del servicio"""
+        return [
+            (self._desde_reloj(inicio), self._desde_reloj(fin))
+            for inicio, fin in self._tramos_reloj(self._a_reloj(desde), self._a_reloj(hasta))
+        ]
+
+    def ventanas_ronda(self, desde: datetime, hasta: datetime) -> List[Tuple[datetime, datetime]]:
+        """
+        Ventanas de ronda (inicio, fin) que empiezan en [desde, hasta): cada
+        turno se corta en tramos de intervalo_ronda_minutos desde su inicio real
+        (aunque haya empezado antes de `desde`); el sobrante final no es ventana.
+        """
+        intervalo = self.intervalo_ronda_minutos * 60
+        if intervalo <= 0:
+            return []
+        a, b = self._a_reloj(desde), self._a_reloj(hasta)
+        origen = a - SEMANA
+        ventanas = []
+        for inicio, fin in self._tramos_reloj(origen, b):
+            if inicio == origen:
+                # Turno continuo de más de una semana: se alinea al lunes de referencia
+                inicio = -(-inicio // intervalo) * intervalo
+            k = max(0, -(-(a - inicio) // intervalo))
+            while inicio + (k + 1) * intervalo <= fin and inicio + k * intervalo < b:
+                ventana = inicio + k * intervalo
+                ventanas.append((self._desde_reloj(ventana), self._desde_reloj(ventana + intervalo)))
+                k += 1
+        return ventanas
+
+    def rondas_esperadas(self, desde: datetime, hasta: datetime) -> int:
+        """Rondas completas que entran en los tramos de turno de [desde, hasta)"""
+        intervalo = self.intervalo_ronda_minutos * 60
+        if intervalo <= 0:
+            return 0
+        return sum(
+            (fin - inicio) // intervalo
+            for inicio, fin in self._tramos_reloj(self._a_reloj(desde), self._a_reloj(hasta))
+        )
+
+
+def _zona_servicios():
+    try:
+        return pytz.timezone(settings.zona_horaria_servicios)
+    except pytz.UnknownTimeZoneError:
+        return pytz.UTC
+
+
+def compilar_horario(servicio: dict) -> HorarioCompilado:
+    """Compila una fila de servicios (necesita las columnas de COLUMNAS_HORARIO)"""
+    intervalos = intervalos_semanales(servicio["hora_inicio"], servicio["hora_fin"], servicio.get("dias_activo") or [])
+    return HorarioCompilado(
+        servicio_id=servicio["id"],
+        inicios=[inicio for inicio, _ in intervalos],
+        fines=[fin for _, fin in intervalos],
+        intervalo_ronda_minutos=servicio.get("intervalo_ronda_minutos") or 0,
+        activo=bool(servicio.get("activo", True)),
+        marca=servicio.get("ultima_modificacion"),
+        zona=_zona_servicios(),
+    )
+
+
+# ============ CACHE ============
+
+_horarios: Dict[int, HorarioCompilado] = {}
+_bloqueo = threading.Lock()
+
+
+def _vigente(horario: HorarioCompilado) -> bool:
+    return reloj.monotonic() - horario.compilado < settings.horarios_cache_ttl_segundos
+
+
+def registrar_horario(servicio: dict) -> HorarioCompilado:
+    """Compila y guarda el horario de un servicio recién creado o actualizado"""
+    horario = compilar_horario(servicio)
+    with _bloqueo:
+        _horarios[horario.servicio_id] = horario
+    return horario
+
+
+def invalidar_horario(servicio_id: int):
+    with _bloqueo:
+        _horarios.pop(servicio_id, None)
+
+
+def obtener_horarios(servicio_ids: Iterable[int]) -> Dict[int, HorarioCompilado]:
+    """Horarios de varios servicios; los que faltan se leen en una sola consulta"""
+    ids = set(servicio_ids)
+    with _bloqueo:
+        resultado = {i: _horarios[i] for i in ids if i in _horarios and _vigente(_horarios[i])}
+
+    faltantes = sorted(ids - set(resultado))
+    if faltantes:
+        resp = get_supabase_client().table("servicios").select(COLUMNAS_HORARIO).in_("id", faltantes).execute()
+        for servicio in resp.data:
+            resultado[servicio["id"]] = registrar_horario(servicio)
+    return resultado
+
+
+def obtener_horario(servicio_id: int) -> Optional[HorarioCompilado]:
+    """Horario compilado del servicio, o None si no existe"""
+    return obtener_horarios([servicio_id]).get(servicio_id)
@@ -0,0 +1,272 @@
+"""
+Importación masiva de puntos QR desde CSV o GeoJSON.
+
+En lugar de un pedido por punto (con su consulta de servicio y sus consultas
+de unicidad del código), la importación:
+- valida coordenadas y radios de todas las filas de una vez con numpy
+- verifica los servicios con una sola consulta `in_`
+- genera códigos únicos en memoria contra los códigos existentes, leídos una vez
+- inserta/actualiza en lotes de varias filas, informando errores por fila
+"""
+import csv
+import io
+import json
+import secrets
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from app.database import get_supabase
+
+# Filas por insert/upsert
+FILAS_POR_LOTE = 500
+
+# Mismos límites que crear_punto
+RADIO_MIN = 10
+RADIO_MAX = 500
+RADIO_DEFECTO = 50
+
+VALORES_FALSOS = {"false", "0", "no", "n", "f", "inactivo"}
+
+# Valores de las columnas opcionales para los puntos nuevos; al actualizar un
+# punto existente solo se envían las columnas que trae el archivo
+DEFECTOS_NUEVO = {"descripcion": None, "radio_validacion": RADIO_DEFECTO, "activo": True}
+
+
+class ArchivoInvalidoError(Exception):
+    """El archivo no se puede leer como CSV o GeoJSON de puntos"""
+
+
+def _filas_csv(contenido: str) -> List[dict]:
+    lector = csv.DictReader(io.StringIO(contenido))
+    if not lector.fieldnames or "nombre" not in [c.strip().lower() for c in lector.fieldnames]:
+        raise ArchivoInvalidoError("El CSV debe tener encabezado con al menos: nombre, latitud, longitud")
+    return [{(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in fila.items()} for fila in lector]
+
+
+def _filas_geojson(contenido: str) -> List[dict]:
+    try:
+        datos = json.loads(contenido)
+    except json.JSONDecodeError as e:
+        raise ArchivoInvalidoError(f"GeoJSON inválido: {e}")
+
+    if not isinstance(datos, dict):
+        raise ArchivoInvalidoError("El GeoJSON debe ser un Feature o FeatureCollection")
+    if datos.get("type") == "FeatureCollection":
+        features = datos.get("features") or []
+    elif datos.get("type") == "Feature":
+        features = [datos]
+    else:
+        raise ArchivoInvalidoError("El GeoJSON debe ser un Feature o FeatureCollection")
+    if not isinstance(features, list) or not all(isinstance(f, dict) for f in features):
+        raise ArchivoInvalidoError("features debe ser una lista de Feature")
+
+    filas = []
+    for feature in features:
+        propiedades = feature.get("properties")
+        fila = {k.lower(): v for k, v in propiedades.items()} if isinstance(propiedades, dict) else {}
+        geometria = feature.get("geometry")
+        geometria = geometria if isinstance(geometria, dict) else {}
+        coordenadas = geometria.get("coordinates") if geometria.get("type") == "Point" else None
+        if not isinstance(coordenadas, list):
+            coordenadas = None
+        # GeoJSON usa [longitud, latitud]
+        fila["longitud"] = coordenadas[0] if coordenadas and len(coordenadas) >= 2 else None
+        fila["latitud"] = coordenadas[1] if coordenadas and len(coordenadas) >= 2 else None
+        filas.append(fila)
+    return filas
+
+
+def leer_archivo(contenido: bytes, nombre_archivo: Optional[str]) -> List[dict]:
+    """Filas (dict) del archivo; el formato se decide por extensión o contenido"""
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = contenido.decode("latin-1")
+
+    nombre = (nombre_archivo or "").lower()
+    if nombre.endswith((".geojson", ".json")) or texto.lstrip().startswith("{"):
+        return _filas_geojson(texto)
+    return _filas_csv(texto)
+
+
+def _a_float(valores: list) -> np.ndarray:
+    resultado = np.full(len(valores), np.nan)
+    for i, valor in enumerate(valores):
+        try:
+            resultado[i] = float(str(valor).replace(",", ".")) if valor not in (None, "") else np.nan
+        except ValueError:
+            pass
+    return resultado
+
+
+def validar_filas(filas: List[dict], servicio_defecto: Optional[int]) -> Tuple[List[dict], Dict[int, str]]:
+    """
+    Normaliza y valida todas las filas de una vez.
+    Devuelve (puntos válidos con su número de fila, {fila: error}).
+    Los números de fila empiezan en 1 (sin contar el encabezado).
+    """
+    n = len(filas)
+    latitudes = _a_float([f.get("latitud") for f in filas])
+    longitudes = _a_float([f.get("longitud") for f in filas])
+    radios = _a_float([f.get("radio_validacion") for f in filas])
+    # Solo la celda vacía toma el radio por defecto; un valor no numérico es un error
+    sin_radio = np.array([f.get("radio_validacion") in (None, "") for f in filas], dtype=bool)
+    radios = np.where(sin_radio, RADIO_DEFECTO, radios)
+    servicios = _a_float([f.get("servicio_id") or servicio_defecto for f in filas])
+    nombres = np.array([bool(str(f.get("nombre") or "").strip()) for f in filas], dtype=bool)
+
+    # Chequeos vectorizados; el primero que falla es el error informado de la fila
+    chequeos = [
+        (~nombres, "Falta el nombre"),
+        (np.isnan(latitudes) | np.isnan(longitudes), "Coordenadas faltantes o no numéricas"),
+        ((latitudes < -90) | (latitudes > 90), "Latitud debe estar entre -90 y 90"),
+        ((longitudes < -180) | (longitudes > 180), "Longitud debe estar entre -180 y 180"),
+        (np.isnan(radios), "Radio de validación no numérico"),
+        ((radios < RADIO_MIN) | (radios > RADIO_MAX), f"Radio de validación debe estar entre {RADIO_MIN} y {RADIO_MAX} metros"),
+        (np.isnan(servicios), "Falta servicio_id"),
+    ]
+    errores: Dict[int, str] = {}
+    for mascara, mensaje in chequeos:
+        for i in np.flatnonzero(mascara):
+            errores.setdefault(int(i) + 1, mensaje)
+
+    validos = []
+    for i in range(n):
+        if i + 1 in errores:
+            continue
+        fila = filas[i]
+        punto = {
+            "fila": i + 1,
+            "qr_code": (str(fila.get("qr_code") or "").strip() or None),
+            "nombre": str(fila["nombre"]).strip(),
+            "latitud": float(latitudes[i]),
+            "longitud": float(longitudes[i]),
+            "servicio_id": int(servicios[i]),
+        }
+        # Las columnas opcionales solo se incluyen si la fila las trae, para
+        # no pisar con valores por defecto los puntos que se actualizan
+        if fila.get("descripcion") not in (None, ""):
+            punto["descripcion"] = str(fila["descripcion"]).strip()
+        if fila.get("radio_validacion") not in (None, ""):
+            punto["radio_validacion"] = int(radios[i])
+        activo = fila.get("activo")
+        if activo not in (None, ""):
+            punto["activo"] = not (isinstance(activo, str) and activo.lower() in VALORES_FALSOS) and activo is not False
+        validos.append(punto)
+    return validos, errores
+
+
+def _codigos_existentes(supabase) -> Dict[str, int]:
+    """qr_code -> id de todos los puntos (paginado por id)"""
+    codigos = {}
+    ultimo_id = 0
+    while True:
+        pagina = supabase.table("puntos_qr").select("id, qr_code").gt("id", ultimo_id).order("id").limit(1000).execute().data
+        for punto in pagina:
+            codigos[punto["qr_code"]] = punto["id"]
+        if len(pagina) < 1000:
+            return codigos
+        ultimo_id = pagina[-1]["id"]
+
+
+def generar_codigo(usados: Set[str]) -> str:
+    """Código ACRUX-XXXXXXXXXXXX que no está en `usados` (y lo agrega)"""
+    codigo = f"ACRUX-{secrets.token_hex(6).upper()}"
+    while codigo in usados:
+        codigo = f"ACRUX-{secrets.token_hex(6).upper()}"
+    usados.add(codigo)
+    return codigo
+
+
+def _escribir_lotes(supabase, puntos: List[dict], operacion: str, errores: Dict[int, str]) -> int:
+    """
+    Inserta (o actualiza por qr_code) en lotes. Si un lote falla, se reintenta
+    fila por fila para informar exactamente qué filas fallaron.
+    """
+    escritos = 0
+    for i in range(0, len(puntos), FILAS_POR_LOTE):
+        lote = puntos[i:i + FILAS_POR_LOTE]
+        registros = [{k: v for k, v in p.items() if k != "fila"} for p in lote]
+        try:
+            _ejecutar(supabase, registros, operacion)
+            escritos += len(lote)
+            continue
+        except Exception:
+            pass
+        for punto, registro in zip(lote, registros):
+            try:
+                _ejecutar(supabase, [registro], operacion)
+                escritos += 1
+            except Exception as e:
+                errores[punto["fila"]] = f"Error al guardar: {str(e)}"
+    return escritos
+
+
+def _ejecutar(supabase, registros: List[dict], operacion: str):
+    tabla = supabase.table("puntos_qr")
+    if operacion == "insert":
+        tabla.insert(registros).execute()
+    else:
+        tabla.upsert(registros, on_conflict="qr_code").execute()
+
+
+def importar_puntos(filas: List[dict], servicio_defecto: Optional[int] = None, actualizar: bool = True) -> dict:
+    """
+    Valida e importa las filas. Las filas con un qr_code existente se actualizan
+    (si `actualizar`); el resto se crea con el código indicado o uno generado.
+    """
+    supabase = get_supabase()
+    validos, errores = validar_filas(filas, servicio_defecto)
+
+    # Servicios: una sola consulta para todos
+    servicios_pedidos = sorted({p["servicio_id"] for p in validos})
+    servicios_existentes = set()
+    if servicios_pedidos:
+        resp = supabase.table("servicios").select("id").in_("id", servicios_pedidos).execute()
+        servicios_existentes = {s["id"] for s in resp.data}
+
+    existentes = _codigos_existentes(supabase)
+    usados = set(existentes)
+    ahora = datetime.utcnow().isoformat()
+
+    nuevos, actualizaciones = [], []
+    codigos_archivo = set()
+    for punto in validos:
+        if punto["servicio_id"] not in servicios_existentes:
+            errores[punto["fila"]] = "Servicio no encontrado"
+            continue
+        codigo = punto["qr_code"]
+        if codigo and codigo in codigos_archivo:
+            errores[punto["fila"]] = f"qr_code {codigo} repetido en el archivo"
+            continue
+        if codigo:
+            codigos_archivo.add(codigo)
+
+        if codigo and codigo in existentes:
+            if not actualizar:
+                errores[punto["fila"]] = f"qr_code {codigo} ya existe"
+                continue
+            actualizaciones.append({**punto, "updated_at": ahora})
+        else:
+            if codigo:
+                usados.add(codigo)
+            else:
+                punto["qr_code"] = generar_codigo(usados)
+            nuevos.append({**DEFECTOS_NUEVO, **punto, "created_at": ahora, "updated_at": ahora})
+
+    creados = _escribir_lotes(supabase, nuevos, "insert", errores)
+    # En un upsert por lotes todas las filas deben traer las mismas columnas
+    # (las que faltan quedarían en NULL): se agrupan por columnas presentes
+    por_columnas: Dict[Tuple[str, ...], List[dict]] = {}
+    for punto in actualizaciones:
+        por_columnas.setdefault(tuple(sorted(punto)), []).append(punto)
+    actualizados = sum(
+        _escribir_lotes(supabase, grupo, "upsert", errores) for grupo in por_columnas.values()
+    )
+
+    return {
+        "total": len(filas),
+        "creados": creados,
+        "actualizados": actualizados,
+        "errores": [{"fila": fila, "error": error} for fila, error in sorted(errores.items())],
+    }
@@ -0,0 +1,215 @@
+"""
+Alta masiva de usuarios desde CSV o JSON.
+
+En lugar de un pedido por usuario (con sus consultas de email y servicio y el
+hash bcrypt en el event loop), el alta:
+- verifica los emails existentes y los servicios con pocas consultas `in_`
+- calcula los hash de contraseñas en paralelo en el pool de procesos
+- inserta en lotes de varias filas, informando errores por fila
+"""
+import asyncio
+import csv
+import io
+import json
+from typing import Dict, List, Optional, Tuple
+from email_validator import EmailNotValidError, validate_email
+from app.auth import hash_passwords
+from app.config import get_settings
+from app.database import get_supabase
+from app.procesos import ejecutar_en_proceso
+
+settings = get_settings()
+
+POOL_HASH = "hash"
+
+# Contraseñas por tarea enviada al pool: bcrypt es lento a propósito, lotes chicos reparten mejor
+HASHES_POR_LOTE = 10
+
+# Filas por insert
+FILAS_POR_LOTE = 200
+
+# Valores por consulta `in_` (el filtro viaja en la URL)
+VALORES_POR_CONSULTA = 200
+
+ROLES_VALIDOS = {"guardia", "supervisor", "administrador", "admin"}
+
+VALORES_FALSOS = {"false", "0", "no", "n", "f", "inactivo"}
+
+
+class ArchivoInvalidoError(Exception):
+    """El archivo no se puede leer como CSV o JSON de usuarios"""
+
+
+def _filas_csv(contenido: str) -> List[dict]:
+    lector = csv.DictReader(io.StringIO(contenido))
+    if not lector.fieldnames or "email" not in [c.strip().lower() for c in lector.fieldnames]:
+        raise ArchivoInvalidoError("El CSV debe tener encabezado con al menos: email, password, nombre, rol")
+    return [{(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in fila.items()} for fila in lector]
+
+
+def _filas_json(contenido: str) -> List[dict]:
+    try:
+        datos = json.loads(contenido)
+    except json.JSONDecodeError as e:
+        raise ArchivoInvalidoError(f"JSON inválido: {e}")
+
+    if isinstance(datos, dict):
+        datos = datos.get("usuarios")
+    if not isinstance(datos, list) or not all(isinstance(fila, dict) for fila in datos):
+        raise ArchivoInvalidoError('El JSON debe ser una lista de usuarios o {"usuarios": [...]}')
+    return [{k.lower(): v for k, v in fila.items()} for fila in datos]
+
+
+def leer_archivo(contenido: bytes, nombre_archivo: Optional[str]) -> List[dict]:
+    """Filas (dict) del archivo; el formato se decide por extensión o contenido"""
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = contenido.decode("latin-1")
+
+    nombre = (nombre_archivo or "").lower()
+    if nombre.endswith(".json") or texto.lstrip().startswith(("[", "{")):
+        return _filas_json(texto)
+    return _filas_csv(texto)
+
+
+def _texto(valor) -> str:
+    return str(valor).strip() if valor is not None else ""
+
+
+def validar_filas(filas: List[dict], servicio_defecto: Optional[int]) -> Tuple[List[dict], Dict[int, str]]:
+    """
+    Normaliza y valida las filas sin consultar la base.
+    Devuelve (usuarios válidos con su número de fila y password, {fila: error}).
+    Los números de fila empiezan en 1 (sin contar el encabezado).
+    """
+    validos, errores = [], {}
+    emails_archivo = set()
+    for i, fila in enumerate(filas, start=1):
+        email = _texto(fila.get("email"))
+        password = _texto(fila.get("password"))
+        nombre = _texto(fila.get("nombre"))
+        rol = _texto(fila.get("rol")).lower() or "guardia"
+
+        try:
+            email = validate_email(email, check_deliverability=False).normalized
+        except EmailNotValidError:
+            errores[i] = "Email inválido"
+            continue
+        if email.lower() in emails_archivo:
+            errores[i] = f"Email {email} repetido en el archivo"
+            continue
+        emails_archivo.add(email.lower())
+
+        if not password:
+            errores[i] = "Falta la contraseña"
+            continue
+        if not nombre:
+            errores[i] = "Falta el nombre"
+            continue
+        if rol not in ROLES_VALIDOS:
+            errores[i] = "Rol inválido. Debe ser: guardia, supervisor o administrador"
+            continue
+
+        try:
+            servicio_id = int(fila.get("servicio_id") or servicio_defecto)
+        except (TypeError, ValueError):
+            errores[i] = "Falta servicio_id"
+            continue
+
+        activo = fila.get("activo")
+        validos.append({
+            "fila": i,
+            "password": password,
+            "email": email,
+            "nombre": nombre,
+            "rol": rol,
+            "servicio_id": servicio_id,
+            "telefono": _texto(fila.get("telefono")) or None,
+            "activo": not (isinstance(activo, str) and activo.lower() in VALORES_FALSOS) and activo is not False,
+        })
+    return validos, errores
+
+
+def _valores_existentes(supabase, tabla: str, columna: str, valores: list) -> set:
+    """Cuáles de los valores ya están en tabla.columna, en consultas `in_` por tandas"""
+    existentes = set()
+    for i in range(0, len(valores), VALORES_POR_CONSULTA):
+        tanda = valores[i:i + VALORES_POR_CONSULTA]
+        resp = supabase.table(tabla).select(columna).in_(columna, tanda).execute()
+        existentes.update(fila[columna] for fila in resp.data)
+    return existentes
+
+
+def verificar_contra_base(usuarios: List[dict], errores: Dict[int, str]) -> List[dict]:
+    """Descarta (con su error) los usuarios con email ya registrado o servicio inexistente"""
+    supabase = get_supabase()
+    emails = _valores_existentes(supabase, "usuarios", "email", [u["email"] for u in usuarios])
+    servicios = _valores_existentes(supabase, "servicios", "id", sorted({u["servicio_id"] for u in usuarios}))
+
+    aceptados = []
+    for usuario in usuarios:
+        if usuario["email"] in emails:
+            errores[usuario["fila"]] = "El email ya está registrado"
+        elif usuario["servicio_id"] not in servicios:
+            errores[usuario["fila"]] = "El servicio especificado no existe"
+        else:
+            aceptados.append(usuario)
+    return aceptados
+
+
+async def hashear_passwords(passwords: List[str]) -> List[str]:
+    """Hash de las contraseñas, en el mismo orden, repartido en el pool de procesos"""
+    lotes = [passwords[i:i + HASHES_POR_LOTE] for i in range(0, len(passwords), HASHES_POR_LOTE)]
+    resultados = await asyncio.gather(*[
+        ejecutar_en_proceso(POOL_HASH, settings.hash_workers, hash_passwords, lote)
+        for lote in lotes
+    ])
+    return [hash_ for lote in resultados for hash_ in lote]
+
+
+def insertar_usuarios(usuarios: List[dict], errores: Dict[int, str]) -> List[dict]:
+    """
+    Inserta en lotes y devuelve los usuarios creados. Si un lote falla, se
+    reintenta fila por fila para informar exactamente qué filas fallaron.
+    """
+    supabase = get_supabase()
+    columnas = "id, email, nombre, rol, servicio_id"
+    creados = []
+    for i in range(0, len(usuarios), FILAS_POR_LOTE):
+        lote = usuarios[i:i + FILAS_POR_LOTE]
+        registros = [{k: v for k, v in u.items() if k not in ("fila", "password")} for u in lote]
+        try:
+            creados.extend(supabase.table("usuarios").insert(registros).execute().data)
+            continue
+        except Exception:
+            pass
+        for usuario, registro in zip(lote, registros):
+            try:
+                creados.extend(supabase.table("usuarios").insert(registro).execute().data)
+            except Exception as e:
+                errores[usuario["fila"]] = f"Error al guardar: {str(e)}"
+    return [{k: u.get(k) for k in columnas.split(", ")} for u in creados]
+
+
+async def importar_usuarios(filas: List[dict], servicio_defecto: Optional[int] = None) -> dict:
+    """
+    Valida y crea los usuarios de las filas. Las consultas a la base corren en
+    un hilo y los hash en el pool de procesos: el event loop queda libre.
+    """
+    validos, errores = validar_filas(filas, servicio_defecto)
+    if validos:
+        validos = await asyncio.to_thread(verificar_contra_base, validos, errores)
+
+    hashes = await hashear_passwords([u.pop("password") for u in validos])
+    for usuario, hash_ in zip(validos, hashes):
+        usuario["password_hash"] = hash_
+
+    creados = await asyncio.to_thread(insertar_usuarios, validos, errores) if validos else []
+
+    return {
+        "total": len(filas),
+        "creados": len(creados),
+        "usuarios": creados,
+        "errores": [{"fila": fila, "error": error} for fila, error in sorted(errores.items())],
+    }
@@ -0,0 +1,94 @@
+"""
+Búsqueda, orden y paginación keyset para los listados de administración.
+
+- Búsqueda: `ilike` sobre las columnas indicadas (nombre, email...). Con 3 o
+  más caracteres busca la subcadena y la resuelven los índices trigram de
+  sql/003_busqueda_trigram.sql; con menos, busca por prefijo.
+- Paginación keyset sobre (columna de orden, id): cada página cuesta lo mismo
+  sin importar cuán adelante esté, a diferencia de offset.
+- El cursor es opaco para el cliente: base64 de [valor, id] de la última fila.
+"""
+import base64
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+# Comodines de `like` que deben buscarse literalmente
+_COMODINES_LIKE = re.compile(r"([\\%_])")
+
+MIN_SUBCADENA = 3
+
+
+def codificar_cursor(valor: Any, id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([valor, id]).encode("utf-8")).decode("ascii")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Any, int]:
+    """[valor, id] del cursor; ValueError si no es válido"""
+    try:
+        valor, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return valor, int(id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _literal(valor: Any) -> str:
+    """Valor entre comillas para un filtro lógico de PostgREST"""
+    texto = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{texto}"'
+
+
+def _condiciones_busqueda(q: Optional[str], columnas: List[str]) -> Optional[str]:
+    # `*` es el comodín de PostgREST: se descarta; `%`, `_` y la barra invertida se escapan para like
+    termino = " ".join((q or "").replace("*", " ").split())
+    if not termino:
+        return None
+    escapado = _COMODINES_LIKE.sub(r"\\\1", termino)
+    patron = f"*{escapado}*" if len(termino) >= MIN_SUBCADENA else f"{escapado}*"
+    return "or(" + ",".join(f"{columna}.ilike.{_literal(patron)}" for columna in columnas) + ")"
+
+
+def _condiciones_cursor(columna: str, descendente: bool, cursor: Optional[str]) -> Optional[str]:
+    if not cursor:
+        return None
+    valor, ultimo_id = decodificar_cursor(cursor)
+    op = "lt" if descendente else "gt"
+    if columna == "id":
+        return f"and(id.{op}.{ultimo_id})"
+    return f"or({columna}.{op}.{_literal(valor)},and({columna}.eq.{_literal(valor)},id.{op}.{ultimo_id}))"
+
+
+def aplicar_listado(
+    query,
+    q: Optional[str],
+    columnas_busqueda: List[str],
+    orden: str,
+    descendente: bool,
+    cursor: Optional[str],
+    limit: int,
+):
+    """
+    Aplica búsqueda, cursor, orden y límite a la query. Se pide una fila de más
+    para saber si hay página siguiente (ver pagina_listado).
+    """
+    condiciones = [c for c in (
+        _condiciones_busqueda(q, columnas_busqueda),
+        _condiciones_cursor(orden, descendente, cursor),
+    ) if c]
+    if condiciones:
+        # Un único filtro lógico: or=(and(busqueda,cursor))
+        query = query.or_(f"and({','.join(condiciones)})")
+
+    query = query.order(orden, desc=descendente)
+    if orden != "id":
+        query = query.order("id", desc=descendente)
+    return query.limit(limit + 1)
+
+
+def pagina_listado(filas: List[dict], orden: str, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """(filas de la página, siguiente_cursor o None si no hay más)"""
+    if len(filas) <= limit:
+        return filas, None
+    filas = filas[:limit]
+    ultima = filas[-1]
+    return filas, codificar_cursor(ultima[orden], ultima["id"])
@@ -3,7 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.routers import auth, qr, visits, puntos, alertas
 from app.routers import usuarios, servicios, qr_generator
 from app.routers import puntos_qr_adapted as puntos_admin
-from app.routers import reportes
+from app.routers import reportes, mapa, adjuntos, rutas
+from app.procesos import cerrar_pools
 
 app = FastAPI(title="Sistema de Recorridas QR - Acrux 360")
 
@@ -23,6 +24,9 @@ app.include_router(visits.router)
 app.include_router(puntos.router)
 app.include_router(alertas.router)
 app.include_router(reportes.router)
+app.include_router(mapa.router)
+app.include_router(adjuntos.router)
+app.include_router(rutas.router)
 
 # Routers nuevos del panel admin
 app.include_router(usuarios.router)
@@ -30,6 +34,11 @@ app.include_router(servicios.router)
 app.include_router(puntos_admin.router, prefix="/admin")
 app.include_router(qr_generator.router)
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Cerrar pools de procesos (reportes, imágenes, etc.)
+    cerrar_pools()
+
 @app.get("/")
 async def root():
     return {
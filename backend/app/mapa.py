@@ -0,0 +1,163 @@
+"""
+Agregados del mapa de supervisión.
+
+En lugar de mandar al mapa todos los puntos y las visitas de semanas, los
+puntos del servicio se agrupan en una grilla sobre las teselas del mapa
+(Web Mercator) según el zoom: cada celda devuelve cuántos puntos tiene, sus
+visitas e incidencias del período y la antigüedad de la última visita. Así
+el mapa carga unos cientos de grupos en lugar de decenas de miles de puntos.
+
+Las coordenadas y los totales por punto se calculan una vez por servicio y
+período (columnas de NumPy que /mapa guarda en el cache de reportes, y que
+una visita nueva invalida); cada consulta de bbox/zoom solo filtra y agrupa
+esos arrays.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import numpy as np
+from app.database import get_supabase_client
+from app.reportes_datos import leer_columnas_visitas
+from app.sincronizacion import leer_puntos
+
+# Celdas por lado de cada tesela de 256 px: grupos de ~64 px en pantalla
+CELDAS_POR_TESELA = 4
+
+ZOOM_MAX = 22
+
+# Latitud máxima representable en Web Mercator
+LATITUD_MAX_MERCATOR = 85.05112878
+
+
+@dataclass
+class CapaPuntos:
+    """Puntos activos de un servicio con sus totales del período, como columnas"""
+    ids: np.ndarray
+    nombres: List[str]
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    x: np.ndarray  # Web Mercator normalizado a [0, 1)
+    y: np.ndarray
+    visitas: np.ndarray
+    incidencias: np.ndarray
+    ultima_visita: np.ndarray  # epoch; NaN si no tuvo visitas en el período
+    calculada: float  # epoch
+
+
+def mercator(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Coordenadas Web Mercator normalizadas a [0, 1) (x hacia el este, y hacia el sur)"""
+    lat = np.radians(np.clip(latitudes, -LATITUD_MAX_MERCATOR, LATITUD_MAX_MERCATOR))
+    x = (np.asarray(longitudes) + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.clip(x, 0, np.nextafter(1, 0)), np.clip(y, 0, np.nextafter(1, 0))
+
+
+def construir_capa(servicio_id: int, dias: int) -> CapaPuntos:
+    """Puntos activos del servicio con visitas, incidencias y última visita de los últimos `dias` días"""
+    supabase = get_supabase_client()
+    puntos = leer_puntos(
+        lambda: supabase.table("puntos_qr").select("id, nombre, latitud, longitud").eq(
+            "servicio_id", servicio_id
+        ).eq("activo", True)
+    )
+    puntos = [p for p in puntos if p.get("latitud") is not None and p.get("longitud") is not None]
+    ids = np.array([p["id"] for p in puntos], dtype=np.int64)
+    latitudes = np.array([p["latitud"] for p in puntos], dtype=np.float64)
+    longitudes = np.array([p["longitud"] for p in puntos], dtype=np.float64)
+    x, y = mercator(latitudes, longitudes)
+
+    ahora = datetime.now(timezone.utc)
+    visitas = leer_columnas_visitas(servicio_id, ahora - timedelta(days=dias), ahora + timedelta(minutes=5))
+
+    # ids viene ordenado por id (leer_puntos): cada visita se ubica en su punto por búsqueda binaria
+    posicion = np.searchsorted(ids, visitas["punto_qr_id"])
+    propias = posicion < len(ids)
+    propias[propias] &= ids[posicion[propias]] == visitas["punto_qr_id"][propias]
+    posicion = posicion[propias]
+
+    ultima = np.full(len(ids), np.nan)
+    np.fmax.at(ultima, posicion, visitas["instante"][propias])
+    return CapaPuntos(
+        ids=ids,
+        nombres=[p["nombre"] for p in puntos],
+        latitudes=latitudes,
+        longitudes=longitudes,
+        x=x,
+        y=y,
+        visitas=np.bincount(posicion, minlength=len(ids)),
+        incidencias=np.bincount(posicion, weights=visitas["incidencia"][propias], minlength=len(ids)).astype(np.int64),
+        ultima_visita=ultima,
+        calculada=ahora.timestamp(),
+    )
+
+
+def _en_bbox(capa: CapaPuntos, bbox: Tuple[float, float, float, float]) -> np.ndarray:
+    min_lat, min_lon, max_lat, max_lon = bbox
+    dentro = (capa.latitudes >= min_lat) & (capa.latitudes <= max_lat)
+    if min_lon <= max_lon:
+        return dentro & (capa.longitudes >= min_lon) & (capa.longitudes <= max_lon)
+    # La caja cruza el antimeridiano
+    return dentro & ((capa.longitudes >= min_lon) | (capa.longitudes <= max_lon))
+
+
+def _minutos(segundos: float) -> Optional[int]:
+    return int(segundos // 60) if np.isfinite(segundos) else None
+
+
+def agrupar(capa: CapaPuntos, zoom: int, bbox: Tuple[float, float, float, float], ahora: Optional[float] = None) -> dict:
+    """
+    Grupos de puntos dentro de bbox (min_lat, min_lon, max_lat, max_lon) para
+    el zoom dado. Un grupo de un solo punto incluye su id y nombre.
+    """
+    ahora = time.time() if ahora is None else ahora
+    dentro = _en_bbox(capa, bbox)
+    indices = np.flatnonzero(dentro)
+
+    celdas = float(2 ** zoom * CELDAS_POR_TESELA)
+    cx = np.floor(capa.x[indices] * celdas).astype(np.int64)
+    cy = np.floor(capa.y[indices] * celdas).astype(np.int64)
+    claves, grupo, puntos = np.unique(cx * int(celdas) + cy, return_inverse=True, return_counts=True)
+    n = len(claves)
+
+    def suma(valores):
+        return np.bincount(grupo, weights=valores, minlength=n)
+
+    latitud = suma(capa.latitudes[indices]) / np.maximum(puntos, 1)
+    longitud = suma(capa.longitudes[indices]) / np.maximum(puntos, 1)
+    visitas = suma(capa.visitas[indices])
+    incidencias = suma(capa.incidencias[indices])
+    ultima = capa.ultima_visita[indices]
+    sin_visitas = suma(np.isnan(ultima).astype(np.float64))
+
+    mas_reciente = np.full(n, np.nan)
+    np.fmax.at(mas_reciente, grupo, ultima)
+    # El punto más descuidado del grupo (entre los que tuvieron visitas)
+    mas_antigua = np.full(n, np.nan)
+    np.fmin.at(mas_antigua, grupo, ultima)
+    # Índice del único punto en los grupos de uno
+    unico = np.zeros(n, dtype=np.int64)
+    unico[grupo] = indices
+
+    grupos = []
+    for k in range(n):
+        grupo_mapa = {
+            "latitud": round(float(latitud[k]), 6),
+            "longitud": round(float(longitud[k]), 6),
+            "puntos": int(puntos[k]),
+            "visitas": int(visitas[k]),
+            "incidencias": int(incidencias[k]),
+            "puntos_sin_visitas": int(sin_visitas[k]),
+            "minutos_desde_ultima_visita": _minutos(ahora - mas_reciente[k]),
+            "minutos_sin_visita_max": _minutos(ahora - mas_antigua[k]),
+        }
+        if puntos[k] == 1:
+            grupo_mapa["punto_id"] = int(capa.ids[unico[k]])
+            grupo_mapa["nombre"] = capa.nombres[unico[k]]
+        grupos.append(grupo_mapa)
+
+    return {
+        "zoom": zoom,
+        "total_puntos": int(len(indices)),
+        "grupos": grupos,
+    }
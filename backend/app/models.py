@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from datetime import datetime
 
 # ============ AUTH MODELS ============
@@ -58,6 +58,8 @@ class VisitResponse(BaseModel):
     fecha_hora: datetime
     sincronizado: bool
     created_at: datetime
+    alertas_gps: List[str] = []
+    ruta: Optional[dict] = None  # avance en la ruta de patrulla (app.rutas)
 
 # ============ GPS VALIDATION ============
 class GPSValidation(BaseModel):
@@ -0,0 +1,107 @@
+"""
+Pools de procesos para trabajo pesado (reportes, imágenes, hashing).
+
+Cada tipo de trabajo usa su propio pool con un número acotado de procesos,
+así un reporte grande no compite por los mismos workers que el escaneo de QR.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_pools: Dict[str, ProcessPoolExecutor] = {}
+
+
+def obtener_pool(nombre: str, max_workers: int) -> ProcessPoolExecutor:
+    """Devuelve (creándolo si hace falta) el pool de procesos con ese nombre"""
+    pool = _pools.get(nombre)
+    if pool is None:
+        # spawn: los hijos no heredan el event loop ni los hilos del servidor
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _pools[nombre] = pool
+    return pool
+
+
+async def ejecutar_en_proceso(nombre: str, max_workers: int, funcion: Callable, *args):
+    """Ejecuta funcion(*args) en el pool indicado sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(obtener_pool(nombre, max_workers), funcion, *args)
+    except BrokenProcessPool:
+        descartar_pool(nombre)
+        raise
+
+
+def descartar_pool(nombre: str):
+    """Descarta un pool roto (p.ej. un hijo murió por falta de memoria) para que se recree"""
+    pool = _pools.pop(nombre, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def cerrar_pools():
+    """Cierra todos los pools (al apagar la aplicación)"""
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+class PresupuestoExcedidoError(Exception):
+    """Un trabajo superó el tiempo máximo asignado"""
+
+
+def _memoria_virtual_actual() -> Optional[int]:
+    """Tamaño de memoria virtual del proceso en bytes (solo Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def presupuesto(segundos: Optional[int] = None, memoria_mb: Optional[int] = None):
+    """
+    Limita tiempo y memoria adicional de un trabajo dentro de un proceso del pool.
+    Al exceder el tiempo se lanza PresupuestoExcedidoError; al exceder la memoria,
+    MemoryError. Los límites se restauran al salir (el proceso se reutiliza).
+    Solo tiene efecto en sistemas POSIX; en otros se ignora.
+    """
+    limite_anterior = None
+    alarma_anterior = None
+
+    if memoria_mb and resource is not None:
+        actual = _memoria_virtual_actual()
+        if actual is not None:
+            limite_anterior = resource.getrlimit(resource.RLIMIT_AS)
+            nuevo = actual + memoria_mb * 1024 * 1024
+            if limite_anterior[1] != resource.RLIM_INFINITY:
+                nuevo = min(nuevo, limite_anterior[1])
+            resource.setrlimit(resource.RLIMIT_AS, (nuevo, limite_anterior[1]))
+
+    if segundos and hasattr(signal, "SIGALRM"):
+        def _vencido(signum, frame):
+            raise PresupuestoExcedidoError(f"El trabajo superó el tiempo máximo de {segundos} segundos")
+        alarma_anterior = signal.signal(signal.SIGALRM, _vencido)
+        signal.alarm(segundos)
+
+    try:
+        yield
+    finally:
+        if alarma_anterior is not None:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, alarma_anterior)
+        if limite_anterior is not None:
+            resource.setrlimit(resource.RLIMIT_AS, limite_anterior)
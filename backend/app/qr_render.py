@@ -0,0 +1,298 @@
+"""
+Generación de imágenes QR con cache direccionado por contenido.
+
+La clave de una imagen es el hash de (contenido, tamaño, corrección de errores,
+borde): la misma clave siempre produce los mismos bytes, así que sirve también
+como ETag fuerte. Hay dos niveles de cache:
+- memoria: LRU de PNG recientes (la grilla del generador pide los mismos puntos)
+- disco: AlmacenArtefactos compartido por todos los workers de uvicorn
+
+La imagen se dibuja directamente con un tamaño de módulo entero que entra en el
+tamaño pedido (sin generar a tamaño completo y luego reescalar).
+
+Para PDF y SVG no se rasteriza: los módulos negros de cada fila se agrupan en
+rectángulos y se dibujan como vectores (archivo más chico, nítido a cualquier tamaño).
+Esos tramos también se guardan en el cache (formato "tramos", JSON), así las
+hojas de etiquetas no recalculan la matriz de cada punto.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import List, Optional, Tuple
+import qrcode
+from PIL import Image
+from app.config import get_settings
+from app.procesos import ejecutar_en_proceso
+from app.trabajos import AlmacenArtefactos
+
+settings = get_settings()
+
+POOL_QR = "qr"
+
+# QR por tarea enviada al pool (menos viajes entre procesos que uno por QR)
+QR_POR_LOTE = 50
+
+# Cambiar si cambia la forma de dibujar, para no servir imágenes viejas del disco
+VERSION_RENDER = 1
+
+NIVELES_CORRECCION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+# (x, y, ancho) en módulos: tramo horizontal de módulos negros, y = fila desde arriba
+Tramo = Tuple[int, int, int]
+
+
+def clave_qr(contenido: str, size: int, correccion: str = "H", border: int = 4, formato: str = "png") -> str:
+    """Clave (y ETag) de la imagen QR para estos parámetros"""
+    texto = f"{VERSION_RENDER}|{formato}|{contenido}|{size}|{correccion}|{border}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:32]
+
+
+def matriz_qr(contenido: str, correccion: str = "H", border: int = 4) -> List[List[bool]]:
+    """Matriz de módulos del QR (True = negro), borde incluido"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=NIVELES_CORRECCION[correccion],
+        box_size=1,
+        border=border,
+    )
+    qr.add_data(contenido)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def renderizar_png(contenido: str, size: int, correccion: str = "H", border: int = 4) -> bytes:
+    """
+    PNG de size × size px. Cada módulo mide un número entero de píxeles (bordes
+    nítidos); el sobrante se reparte como margen blanco alrededor.
+    """
+    matriz = matriz_qr(contenido, correccion, border)
+    modulos = len(matriz)
+
+    img = Image.new("1", (modulos, modulos), 1)
+    img.putdata([0 if celda else 1 for fila in matriz for celda in fila])
+
+    lado = max(size // modulos, 1) * modulos
+    if lado != modulos:
+        img = img.resize((lado, lado), Image.NEAREST)
+    if lado != size:
+        if lado > size:
+            # Tamaño menor que un píxel por módulo: no queda otra que reducir
+            img = img.resize((size, size), Image.NEAREST)
+        else:
+            lienzo = Image.new("1", (size, size), 1)
+            offset = (size - lado) // 2
+            lienzo.paste(img, (offset, offset))
+            img = lienzo
+
+    buffer = BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def tramos_qr(contenido: str, correccion: str = "H", border: int = 4) -> Tuple[int, List[Tramo]]:
+    """(módulos por lado, tramos negros) del QR: una fila de módulos contiguos = un rectángulo"""
+    matriz = matriz_qr(contenido, correccion, border)
+    tramos: List[Tramo] = []
+    for y, fila in enumerate(matriz):
+        x = 0
+        while x < len(fila):
+            if fila[x]:
+                inicio = x
+                while x < len(fila) and fila[x]:
+                    x += 1
+                tramos.append((inicio, y, x - inicio))
+            else:
+                x += 1
+    return len(matriz), tramos
+
+
+def renderizar_svg(contenido: str, size: int, correccion: str = "H", border: int = 4) -> bytes:
+    """SVG del QR con un único path; size es el tamaño sugerido en píxeles"""
+    modulos, tramos = tramos_qr(contenido, correccion, border)
+    d = "".join(f"M{x} {y}h{ancho}v1h-{ancho}z" for x, y, ancho in tramos)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {modulos} {modulos}" shape-rendering="crispEdges">'
+        f'<rect width="{modulos}" height="{modulos}" fill="#fff"/>'
+        f'<path d="{d}" fill="#000"/></svg>'
+    ).encode("utf-8")
+
+
+def dibujar_qr_vectorial(c, modulos: int, tramos: List[Tramo], x: float, y: float, lado: float):
+    """
+    Dibuja el QR en un canvas de ReportLab como rectángulos, con la esquina
+    inferior izquierda en (x, y) y lado `lado` en puntos.
+    """
+    escala = lado / modulos
+    c.saveState()
+    c.setFillColorRGB(1, 1, 1)
+    c.rect(x, y, lado, lado, stroke=0, fill=1)
+    c.setFillColorRGB(0, 0, 0)
+    path = c.beginPath()
+    for tx, ty, ancho in tramos:
+        # En PDF el eje y crece hacia arriba; la fila 0 del QR es la de arriba
+        path.rect(x + tx * escala, y + (modulos - ty - 1) * escala, ancho * escala, escala)
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
+
+
+class CacheQR:
+    """
+    LRU en memoria delante de un almacén en disco. Se usa desde el event loop
+    y desde hilos (el ZIP se genera en el threadpool de Starlette), así que el
+    LRU se protege con un lock; la lectura y escritura en disco quedan afuera.
+    """
+
+    def __init__(self, max_entradas: int, almacen: AlmacenArtefactos, limpiar_cada: int = 200):
+        self.max_entradas = max_entradas
+        self.almacen = almacen
+        self.limpiar_cada = limpiar_cada
+        self._entradas: "OrderedDict[str, bytes]" = OrderedDict()
+        self._escrituras = 0
+        self._bloqueo = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        with self._bloqueo:
+            datos = self._entradas.get(clave)
+            if datos is not None:
+                self._entradas.move_to_end(clave)
+                return datos
+
+        ruta = self.almacen.buscar(clave)
+        if ruta is None:
+            return None
+        try:
+            with open(ruta, "rb") as f:
+                datos = f.read()
+        except FileNotFoundError:
+            return None
+        self._recordar(clave, datos)
+        return datos
+
+    def guardar(self, clave: str, datos: bytes, extension: str = "png"):
+        self._recordar(clave, datos)
+
+        ruta = self.almacen.ruta(clave, extension)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.almacen.directorio)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(datos)
+            os.replace(tmp, ruta)
+        except OSError:
+            # El disco es solo un segundo nivel: si falla, se sigue con la memoria
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            return
+
+        with self._bloqueo:
+            self._escrituras += 1
+            limpiar = self._escrituras % self.limpiar_cada == 0
+        if limpiar:
+            self.almacen.limpiar()
+
+    def _recordar(self, clave: str, datos: bytes):
+        with self._bloqueo:
+            self._entradas[clave] = datos
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+
+_cache: Optional[CacheQR] = None
+
+
+def obtener_cache_qr() -> CacheQR:
+    """Cache de imágenes QR compartido por el proceso"""
+    global _cache
+    if _cache is None:
+        directorio = settings.qr_cache_dir or os.path.join(tempfile.gettempdir(), "acrux_qr")
+        almacen = AlmacenArtefactos(
+            directorio,
+            max_bytes=settings.qr_cache_max_mb * 1024 * 1024,
+            ttl_segundos=settings.qr_cache_ttl_dias * 86400,
+        )
+        _cache = CacheQR(settings.qr_cache_max_entradas, almacen)
+    return _cache
+
+
+RENDERIZADORES = {
+    "png": renderizar_png,
+    "svg": renderizar_svg,
+}
+
+
+def obtener_imagen_qr(contenido: str, size: int, correccion: str = "H", border: int = 4, formato: str = "png") -> Tuple[bytes, str]:
+    """(imagen, clave) desde el cache, generándola solo si no está"""
+    clave = clave_qr(contenido, size, correccion, border, formato)
+    cache = obtener_cache_qr()
+    datos = cache.obtener(clave)
+    if datos is None:
+        datos = RENDERIZADORES[formato](contenido, size, correccion, border)
+        cache.guardar(clave, datos, formato)
+    return datos, clave
+
+
+def obtener_png_qr(contenido: str, size: int, correccion: str = "H", border: int = 4) -> Tuple[bytes, str]:
+    """(PNG, clave) desde el cache, generándolo solo si no está"""
+    return obtener_imagen_qr(contenido, size, correccion, border, "png")
+
+
+def tramos_lote(contenidos: List[str], correccion: str = "H", border: int = 4) -> List[Tuple[int, List[Tramo]]]:
+    """Calcula los tramos de varios QR (se ejecuta en el pool de procesos)"""
+    return [tramos_qr(contenido, correccion, border) for contenido in contenidos]
+
+
+def _tramos_cacheados(claves: List[str]) -> List[Optional[Tuple[int, List[Tramo]]]]:
+    """Tramos guardados en el cache (JSON [módulos, tramos]) o None si falta alguno"""
+    cache = obtener_cache_qr()
+    resultado = []
+    for clave in claves:
+        datos = cache.obtener(clave)
+        if datos is None:
+            resultado.append(None)
+            continue
+        modulos, tramos = json.loads(datos)
+        resultado.append((modulos, [tuple(t) for t in tramos]))
+    return resultado
+
+
+def _guardar_tramos(claves: List[str], calculados: List[Tuple[int, List[Tramo]]]):
+    cache = obtener_cache_qr()
+    for clave, (modulos, tramos) in zip(claves, calculados):
+        datos = json.dumps([modulos, tramos], separators=(",", ":")).encode("utf-8")
+        cache.guardar(clave, datos, "json")
+
+
+async def obtener_tramos_qr(contenidos: List[str], correccion: str = "H", border: int = 4) -> List[Tuple[int, List[Tramo]]]:
+    """
+    Tramos de varios QR, en el mismo orden. Se leen del cache de imágenes
+    (formato "tramos"); solo los que faltan se calculan en paralelo en el pool.
+    """
+    claves = [clave_qr(contenido, 0, correccion, border, formato="tramos") for contenido in contenidos]
+    resultado = await asyncio.to_thread(_tramos_cacheados, claves)
+
+    faltantes = [i for i, tramos in enumerate(resultado) if tramos is None]
+    lotes = [faltantes[i:i + QR_POR_LOTE] for i in range(0, len(faltantes), QR_POR_LOTE)]
+    calculados = await asyncio.gather(*[
+        ejecutar_en_proceso(POOL_QR, settings.qr_workers, tramos_lote, [contenidos[j] for j in lote], correccion, border)
+        for lote in lotes
+    ])
+    for lote, tramos_lote_calculados in zip(lotes, calculados):
+        for j, tramos in zip(lote, tramos_lote_calculados):
+            resultado[j] = tramos
+    if faltantes:
+        await asyncio.to_thread(_guardar_tramos, [claves[j] for j in faltantes], [resultado[j] for j in faltantes])
+    return resultado
@@ -0,0 +1,230 @@
+"""
+Recorridos de los guardias: secuencia de visitas por guardia y turno, con la
+distancia total y la velocidad entre escaneos.
+
+Las visitas del período se cargan en columnas y se ordenan una sola vez por
+(guardia, turno, instante). Los turnos salen del horario compilado del
+servicio; las visitas fuera de turno se agrupan por día local. Las distancias
+entre escaneos consecutivos se calculan todas juntas con app.geo y se suman
+por recorrido con reduceat, sin bucles de Python por par.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+import numpy as np
+from app.database import get_supabase_client
+from app.geo import distancias_consecutivas
+from app.horarios import HorarioCompilado, obtener_horario
+from app.reportes_datos import leer_columnas_visitas
+
+
+def _fecha_iso(instante: float) -> str:
+    return datetime.fromtimestamp(instante, timezone.utc).isoformat()
+
+
+def _redondear(valor: float, decimales: int = 1) -> Optional[float]:
+    return round(float(valor), decimales) if np.isfinite(valor) else None
+
+
+def segmentos_periodo(horario: HorarioCompilado, desde: datetime, hasta: datetime) -> tuple:
+    """
+    (inicios de turno, fines de turno, límites de los días locales) en epoch:
+    los tramos de turno del período y, para agrupar las visitas fuera de
+    turno, los días locales (n días, n + 1 límites).
+    """
+    tramos = horario.tramos(desde, hasta)
+    inicios_turno = np.array([inicio.timestamp() for inicio, _ in tramos])
+    fines_turno = np.array([fin.timestamp() for _, fin in tramos])
+
+    dias = []
+    dia = desde.astimezone(horario.zona).date()
+    while horario.inicio_dia(dia) < hasta:
+        dias.append(dia)
+        dia += timedelta(days=1)
+    limites_dia = np.array([horario.inicio_dia(d).timestamp() for d in dias + [dia]])
+    return inicios_turno, fines_turno, limites_dia
+
+
+def asignar_segmentos(
+    instantes: np.ndarray,
+    inicios_turno: np.ndarray,
+    fines_turno: np.ndarray,
+    limites_dia: np.ndarray,
+) -> np.ndarray:
+    """
+    Segmento de cada visita: el índice del turno que la contiene o, si está
+    fuera de turno, len(inicios_turno) + índice del día local.
+    """
+    turno = np.searchsorted(inicios_turno, instantes, side="right") - 1
+    dentro = turno >= 0
+    dentro[dentro] &= instantes[dentro] < fines_turno[turno[dentro]]
+    dia = np.clip(np.searchsorted(limites_dia, instantes, side="right") - 1, 0, max(len(limites_dia) - 2, 0))
+    return np.where(dentro, turno, len(inicios_turno) + dia)
+
+
+def calcular_recorridos(
+    instantes: np.ndarray,
+    guardias: np.ndarray,
+    segmentos: np.ndarray,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+) -> dict:
+    """
+    Ordena las visitas por (guardia, segmento, instante) y calcula, para cada
+    visita, la distancia (m) y la velocidad (km/h) desde la anterior del mismo
+    recorrido; y por recorrido, la distancia total y la velocidad máxima.
+    Devuelve los arrays ordenados y los cortes de cada recorrido.
+    """
+    orden = np.lexsort((instantes, segmentos, guardias))
+    instantes, guardias, segmentos = instantes[orden], guardias[orden], segmentos[orden]
+    latitudes, longitudes = latitudes[orden], longitudes[orden]
+
+    n = len(instantes)
+    nuevo = np.ones(n, dtype=bool)
+    nuevo[1:] = (guardias[1:] != guardias[:-1]) | (segmentos[1:] != segmentos[:-1])
+    inicios = np.flatnonzero(nuevo)
+
+    distancias = np.zeros(n)
+    velocidades = np.full(n, np.nan)
+    if n > 1:
+        tramo = distancias_consecutivas(latitudes, longitudes)
+        segundos = np.diff(instantes)
+        mismo = ~nuevo[1:]
+        distancias[1:] = np.where(mismo, tramo, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            velocidades[1:] = np.where(mismo & (segundos > 0), tramo / segundos * 3.6, np.nan)
+    distancias[nuevo] = 0
+
+    totales = np.add.reduceat(distancias, inicios) if n else np.array([])
+    maximas = np.fmax.reduceat(velocidades, inicios) if n else np.array([])
+    return {
+        "orden": orden,
+        "instantes": instantes,
+        "guardias": guardias,
+        "segmentos": segmentos,
+        "latitudes": latitudes,
+        "longitudes": longitudes,
+        "distancias": distancias,
+        "velocidades": velocidades,
+        "cortes": np.append(inicios, n),
+        "totales": totales,
+        "maximas": maximas,
+    }
+
+
+def reporte_recorridos(
+    servicio_id: int,
+    fecha_inicio: date,
+    fecha_fin: date,
+    guardia_id: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Recorridos por guardia y turno del servicio en [fecha_inicio, fecha_fin]
+    (días locales). Las visitas sin coordenadas no entran en el recorrido.
+    None si el servicio no existe.
+    """
+    horario = obtener_horario(servicio_id)
+    if horario is None:
+        return None
+
+    desde = horario.inicio_dia(fecha_inicio)
+    hasta = horario.inicio_dia(fecha_fin + timedelta(days=1))
+    visitas = leer_columnas_visitas(servicio_id, desde, hasta)
+
+    del_guardia = visitas["guardia_id"] == guardia_id if guardia_id else np.ones(len(visitas["id"]), dtype=bool)
+    con_coordenadas = ~np.isnan(visitas["latitud"]) & ~np.isnan(visitas["longitud"])
+    validas = del_guardia & con_coordenadas
+    sin_coordenadas = int((del_guardia & ~con_coordenadas).sum())
+    columnas = {c: v[validas] for c, v in visitas.items()}
+
+    inicios_turno, fines_turno, limites_dia = segmentos_periodo(horario, desde, hasta)
+    segmentos = asignar_segmentos(columnas["instante"], inicios_turno, fines_turno, limites_dia)
+    r = calcular_recorridos(
+        columnas["instante"], columnas["guardia_id"], segmentos, columnas["latitud"], columnas["longitud"]
+    )
+    ids, puntos = columnas["id"][r["orden"]], columnas["punto_qr_id"][r["orden"]]
+
+    supabase = get_supabase_client()
+    guardias_ids = sorted(set(r["guardias"].tolist()))
+    guardias_info = {}
+    if guardias_ids:
+        resp = supabase.table("usuarios").select("id, nombre").in_("id", guardias_ids).execute()
+        guardias_info = {u["id"]: u["nombre"] for u in resp.data}
+    puntos_info = {}
+    if len(puntos):
+        resp = supabase.table("puntos_qr").select("id, nombre").eq("servicio_id", servicio_id).execute()
+        puntos_info = {p["id"]: p["nombre"] for p in resp.data}
+
+    recorridos: List[dict] = []
+    n_turnos = len(inicios_turno)
+    cortes = r["cortes"]
+    for k in range(len(cortes) - 1):
+        a, b = int(cortes[k]), int(cortes[k + 1])
+        segmento = int(r["segmentos"][a])
+        guardia = int(r["guardias"][a])
+        en_turno = segmento < n_turnos
+        if en_turno:
+            inicio_segmento, fin_segmento = inicios_turno[segmento], fines_turno[segmento]
+        else:
+            dia = segmento - n_turnos
+            inicio_segmento, fin_segmento = limites_dia[dia], limites_dia[dia + 1]
+        duracion = r["instantes"][b - 1] - r["instantes"][a]
+        distancia = r["totales"][k]
+        recorridos.append({
+            "guardia_id": guardia,
+            "nombre": guardias_info.get(guardia, "Desconocido"),
+            "en_turno": en_turno,
+            "turno_inicio": _fecha_iso(inicio_segmento),
+            "turno_fin": _fecha_iso(fin_segmento),
+            "visitas": b - a,
+            "distancia_m": round(float(distancia), 1),
+            "duracion_minutos": round(float(duracion) / 60, 1),
+            "velocidad_media_kmh": _redondear(distancia / duracion * 3.6) if duracion > 0 else None,
+            "velocidad_max_kmh": _redondear(r["maximas"][k]),
+            "secuencia": [
+                {
+                    "visita_id": int(ids[i]),
+                    "punto_id": int(puntos[i]),
+                    "punto": puntos_info.get(int(puntos[i]), "Desconocido"),
+                    "fecha_hora": _fecha_iso(r["instantes"][i]),
+                    "latitud": float(r["latitudes"][i]),
+                    "longitud": float(r["longitudes"][i]),
+                    "distancia_desde_anterior_m": round(float(r["distancias"][i]), 1),
+                    "velocidad_kmh": _redondear(r["velocidades"][i]),
+                }
+                for i in range(a, b)
+            ],
+        })
+
+    recorridos.sort(key=lambda rec: (rec["turno_inicio"], rec["nombre"]))
+    return {
+        "servicio_id": servicio_id,
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "zona_horaria": horario.zona.zone,
+        "total_visitas": int(len(r["instantes"])),
+        "visitas_sin_coordenadas": sin_coordenadas,
+        "distancia_total_m": round(float(r["totales"].sum()), 1) if len(r["totales"]) else 0.0,
+        "recorridos": recorridos,
+    }
+
+
+def recorridos_geojson(reporte: dict) -> dict:
+    """FeatureCollection con un LineString por recorrido (coordenadas [lon, lat])"""
+    features = []
+    for recorrido in reporte["recorridos"]:
+        coordenadas = [[v["longitud"], v["latitud"]] for v in recorrido["secuencia"]]
+        propiedades = {k: v for k, v in recorrido.items() if k != "secuencia"}
+        propiedades["visitas_ids"] = [v["visita_id"] for v in recorrido["secuencia"]]
+        features.append({
+            "type": "Feature",
+            "geometry": (
+                {"type": "LineString", "coordinates": coordenadas}
+                if len(coordenadas) > 1 else {"type": "Point", "coordinates": coordenadas[0]}
+            ),
+            "properties": propiedades,
+        })
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "properties": {k: v for k, v in reporte.items() if k != "recorridos"},
+    }
@@ -0,0 +1,223 @@
+"""
+Acceso a datos compartido por los reportes.
+
+Las exportaciones grandes no pueden traer todas las visitas en una sola
+consulta: aquí se arman los filtros una sola vez y se recorren las visitas
+por páginas (keyset sobre `id`), enriqueciendo cada página con dos consultas
+`in_` en lugar de una consulta por fila.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+from app.database import get_supabase_client
+
+# Filas por página al recorrer visitas (limita la memoria usada por página)
+TAMANO_PAGINA = 1000
+
+# Columnas (y su tipo) que devuelve leer_columnas_visitas
+COLUMNAS_ANALITICA = {
+    "id": np.int64,
+    "instante": np.float64,
+    "punto_qr_id": np.int64,
+    "guardia_id": np.int64,
+    "latitud": np.float64,
+    "longitud": np.float64,
+    "incidencia": np.bool_,
+}
+
+
+def fin_exclusivo(fecha_fin: str) -> str:
+    """Convierte fecha_fin en límite exclusivo sumando un día (incluye todo el día final)"""
+    fecha_fin_dt = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
+    return (fecha_fin_dt + timedelta(days=1)).isoformat()
+
+
+def obtener_puntos_servicio(servicio_id: int) -> List[int]:
+    """IDs de los puntos QR que pertenecen a un servicio"""
+    supabase = get_supabase_client()
+    puntos_resp = supabase.table("puntos_qr").select("id").eq("servicio_id", servicio_id).execute()
+    return [p["id"] for p in puntos_resp.data]
+
+
+def aplicar_filtros_visitas(
+    query,
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    punto_qr_id: Optional[str] = None,
+    tipo: Optional[str] = None,
+    puntos_ids: Optional[List[int]] = None,
+    hasta: Optional[str] = None,
+    solo_alertas_gps: bool = False,
+):
+    """
+    Aplica a una query de visitas los mismos filtros que usan los reportes.
+    `hasta` es un límite exclusivo exacto (no se le suma un día como a fecha_fin).
+    `solo_alertas_gps` deja solo las visitas marcadas por app.antifraude.
+    """
+    if fecha_inicio:
+        query = query.gte("created_at", fecha_inicio)
+    if fecha_fin:
+        query = query.lt("created_at", fin_exclusivo(fecha_fin))
+    if hasta:
+        query = query.lt("created_at", hasta)
+    if usuario_id:
+        query = query.eq("usuario_id", usuario_id)
+    if punto_qr_id:
+        query = query.eq("punto_qr_id", punto_qr_id)
+    if tipo:
+        query = query.eq("tipo", tipo)
+    if puntos_ids is not None:
+        query = query.in_("punto_qr_id", puntos_ids)
+    if solo_alertas_gps:
+        query = query.neq("alertas_gps", "{}")
+    return query
+
+
+def iterar_paginas_visitas(
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    servicio_id: Optional[int] = None,
+    punto_qr_id: Optional[str] = None,
+    tipo: Optional[str] = None,
+    columnas: str = "*",
+    tamano_pagina: int = TAMANO_PAGINA,
+    desde_id: Optional[int] = None,
+    hasta: Optional[str] = None,
+    solo_alertas_gps: bool = False,
+) -> Iterator[List[dict]]:
+    """
+    Recorre las visitas filtradas en páginas, de la más reciente a la más antigua.
+    Usa paginación keyset (id < último id) para que cada página cueste lo mismo
+    sin importar cuán profundo se esté en el resultado.
+    """
+    supabase = get_supabase_client()
+
+    # El filtro por servicio se resuelve vía puntos_qr, igual que en los reportes
+    puntos_ids = obtener_puntos_servicio(servicio_id) if servicio_id else None
+    if puntos_ids is not None and not puntos_ids:
+        return
+
+    ultimo_id = desde_id
+    while True:
+        query = supabase.table("visitas").select(columnas)
+        query = aplicar_filtros_visitas(
+            query, fecha_inicio, fecha_fin, usuario_id, punto_qr_id, tipo, puntos_ids, hasta, solo_alertas_gps
+        )
+        if ultimo_id is not None:
+            query = query.lt("id", ultimo_id)
+
+        pagina = query.order("id", desc=True).limit(tamano_pagina).execute().data
+        if not pagina:
+            return
+
+        yield pagina
+
+        if len(pagina) < tamano_pagina:
+            return
+        ultimo_id = pagina[-1]["id"]
+
+
+def _epoch(valor: str) -> float:
+    dt = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def leer_columnas_visitas(servicio_id: int, desde: datetime, hasta: datetime) -> Dict[str, np.ndarray]:
+    """
+    Visitas del servicio con fecha_hora (momento del escaneo) en [desde, hasta)
+    como columnas, sin orden: id, instante (epoch), punto_qr_id, guardia_id,
+    latitud, longitud e incidencia (tipo == "incidencia"). Para analíticas
+    que recorren meses: unos pocos arrays en lugar de miles de dicts.
+    """
+    supabase = get_supabase_client()
+    columnas: Dict[str, list] = {c: [] for c in COLUMNAS_ANALITICA}
+    ultimo_id = 0
+    while True:
+        pagina = supabase.table("visitas").select("id, punto_qr_id, guardia_id, fecha_hora, latitud, longitud, tipo").eq(
+            "servicio_id", servicio_id
+        ).gte("fecha_hora", desde.isoformat()).lt(
+            "fecha_hora", hasta.isoformat()
+        ).gt("id", ultimo_id).order("id").limit(TAMANO_PAGINA).execute().data
+        for visita in pagina:
+            columnas["id"].append(visita["id"])
+            columnas["instante"].append(_epoch(visita["fecha_hora"]))
+            columnas["punto_qr_id"].append(visita.get("punto_qr_id") or 0)
+            columnas["guardia_id"].append(visita.get("guardia_id") or 0)
+            columnas["latitud"].append(visita.get("latitud") if visita.get("latitud") is not None else np.nan)
+            columnas["longitud"].append(visita.get("longitud") if visita.get("longitud") is not None else np.nan)
+            columnas["incidencia"].append(visita.get("tipo") == "incidencia")
+        if len(pagina) < TAMANO_PAGINA:
+            break
+        ultimo_id = pagina[-1]["id"]
+    return {c: np.array(valores, dtype=COLUMNAS_ANALITICA[c]) for c, valores in columnas.items()}
+
+
+def obtener_nombres(
+    visitas: List[dict],
+    usuarios_cache: Dict[int, dict],
+    puntos_cache: Dict[int, dict],
+) -> None:
+    """
+    Completa los caches de usuarios y puntos con los IDs de una página de visitas.
+    Solo consulta los IDs que aún no están en cache, con una query `in_` por tabla.
+    """
+    supabase = get_supabase_client()
+
+    guardias_faltantes = {v["guardia_id"] for v in visitas if v.get("guardia_id")} - usuarios_cache.keys()
+    if guardias_faltantes:
+        try:
+            user_resp = supabase.table("usuarios").select("id, nombre, email").in_("id", list(guardias_faltantes)).execute()
+            for usuario in user_resp.data:
+                usuarios_cache[usuario["id"]] = usuario
+        except Exception:
+            pass
+        for guardia_id in guardias_faltantes - usuarios_cache.keys():
+            usuarios_cache[guardia_id] = {"nombre": "Desconocido", "email": ""}
+
+    puntos_faltantes = {v["punto_qr_id"] for v in visitas if v.get("punto_qr_id")} - puntos_cache.keys()
+    if puntos_faltantes:
+        try:
+            punto_resp = supabase.table("puntos_qr").select("id, nombre, qr_code").in_("id", list(puntos_faltantes)).execute()
+            for punto in punto_resp.data:
+                puntos_cache[punto["id"]] = punto
+        except Exception:
+            pass
+        for punto_id in puntos_faltantes - puntos_cache.keys():
+            puntos_cache[punto_id] = {"nombre": "Desconocido", "qr_code": ""}
+
+
+def enriquecer_visitas(
+    visitas: List[dict],
+    usuarios_cache: Dict[int, dict],
+    puntos_cache: Dict[int, dict],
+) -> List[dict]:
+    """Agrega usuario_nombre, usuario_email, punto_nombre y punto_codigo a cada visita"""
+    obtener_nombres(visitas, usuarios_cache, puntos_cache)
+
+    for visita in visitas:
+        usuario = usuarios_cache.get(visita.get("guardia_id"), {})
+        punto = puntos_cache.get(visita.get("punto_qr_id"), {})
+        visita["usuario_nombre"] = usuario.get("nombre", "Desconocido")
+        visita["usuario_email"] = usuario.get("email", "")
+        visita["punto_nombre"] = punto.get("nombre", "Desconocido")
+        visita["punto_codigo"] = punto.get("qr_code", "")
+        if visita.get("observacion") is None:
+            visita["observacion"] = ""
+
+    return visitas
+
+
+def formatear_fecha_local(created_at: Optional[str], user_tz) -> tuple:
+    """Devuelve (fecha 'dd/mm/YYYY', hora 'HH:MM') en la zona horaria del usuario"""
+    if not created_at:
+        return "", ""
+    try:
+        dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        dt_local = dt.astimezone(user_tz)
+        return dt_local.strftime('%d/%m/%Y'), dt_local.strftime('%H:%M')
+    except Exception:
+        return "", ""
@@ -0,0 +1,203 @@
+"""
+Renderizado del reporte PDF de visitas en el pool de procesos.
+
+El proceso principal lee y enriquece las visitas (consultas a la base) y las
+escribe en lotes a un archivo temporal; el proceso hijo solo arma el documento.
+La tabla de visitas se divide en varias tablas de FILAS_POR_TABLA filas: una
+tabla única de miles de filas hace que ReportLab recalcule el corte de página
+sobre toda la tabla en cada página, y el costo deja de ser lineal. Las visitas
+con fotos muestran la miniatura de la primera (leída del almacén de adjuntos).
+"""
+import os
+import pickle
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+import pytz
+from app.procesos import presupuesto
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.lib.enums import TA_CENTER
+except ImportError:
+    pass
+
+# Filas de visitas por cada Table (la cabecera se repite en cada página)
+FILAS_POR_TABLA = 500
+
+# Lado máximo de la miniatura de la foto en la tabla
+LADO_MINIATURA = 0.6  # pulgadas
+
+# (fecha, hora, punto, guardia, ruta de la miniatura o None)
+FilaPdf = Tuple[str, str, str, str, Optional[str]]
+
+
+def escribir_lote(archivo, filas: List[FilaPdf]):
+    """Agrega un lote de filas al archivo intermedio (lo usa el proceso principal)"""
+    pickle.dump(filas, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def leer_lotes(ruta_filas: str) -> Iterator[List[FilaPdf]]:
+    """Lee los lotes escritos con escribir_lote, en orden"""
+    with open(ruta_filas, "rb") as archivo:
+        while True:
+            try:
+                yield pickle.load(archivo)
+            except EOFError:
+                return
+
+
+def _estilo_visitas():
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+    ])
+
+
+def _tablas_visitas(ruta_filas: str) -> Iterator["Table"]:
+    """Agrupa las filas del archivo en tablas de FILAS_POR_TABLA filas con cabecera"""
+    cabecera = ["Fecha", "Hora", "Punto", "Guardia", "Foto"]
+    estilo = _estilo_visitas()
+    bloque: List[list] = []
+    for lote in leer_lotes(ruta_filas):
+        for *datos, miniatura in lote:
+            bloque.append(datos + [_miniatura(miniatura)])
+            if len(bloque) == FILAS_POR_TABLA:
+                yield _tabla_visitas(cabecera, bloque, estilo)
+                bloque = []
+    if bloque:
+        yield _tabla_visitas(cabecera, bloque, estilo)
+
+
+def _miniatura(ruta: Optional[str]):
+    """Imagen de la miniatura escalada a LADO_MINIATURA, o "" si no hay (o no se puede leer)"""
+    if not ruta:
+        return ""
+    try:
+        imagen = Image(ruta)
+    except Exception:
+        return ""
+    escala = LADO_MINIATURA * inch / max(imagen.imageWidth, imagen.imageHeight, 1)
+    imagen.drawWidth = imagen.imageWidth * escala
+    imagen.drawHeight = imagen.imageHeight * escala
+    return imagen
+
+
+def _tabla_visitas(cabecera: list, filas: List[list], estilo) -> "Table":
+    tabla = Table([cabecera] + filas, colWidths=[1.3*inch, 0.8*inch, 2.3*inch, 1.8*inch, 0.8*inch], repeatRows=1)
+    tabla.setStyle(estilo)
+    return tabla
+
+
+def renderizar_pdf_visitas(
+    destino,
+    tipo: str = "visitas",
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    timezone: str = "UTC",
+    stats: Optional[dict] = None,
+    ruta_filas: Optional[str] = None,
+    max_segundos: Optional[int] = None,
+    max_memoria_mb: Optional[int] = None,
+):
+    """
+    Genera el reporte PDF en destino. Se ejecuta en el pool de procesos de reportes,
+    dentro del presupuesto de tiempo y memoria indicado. Borra ruta_filas al terminar.
+    """
+    try:
+        with presupuesto(max_segundos, max_memoria_mb):
+            _construir(destino, tipo, fecha_inicio, fecha_fin, timezone, stats, ruta_filas)
+    finally:
+        if ruta_filas:
+            try:
+                os.remove(ruta_filas)
+            except FileNotFoundError:
+                pass
+
+
+def _construir(destino, tipo, fecha_inicio, fecha_fin, timezone, stats, ruta_filas):
+    doc = SimpleDocTemplate(destino, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Obtener zona horaria del usuario
+    try:
+        user_tz = pytz.timezone(timezone)
+    except Exception:
+        user_tz = pytz.UTC
+
+    # Estilo personalizado para título
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#366092'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+    # Título
+    elements.append(Paragraph(f"REPORTE DE {tipo.upper()} - ACRUX 360", title_style))
+    elements.append(Spacer(1, 0.2*inch))
+
+    # Metadatos con zona horaria local
+    meta_style = styles['Normal']
+    now_local = datetime.now(pytz.UTC).astimezone(user_tz)
+    elements.append(Paragraph(f"<b>Generado:</b> {now_local.strftime('%d/%m/%Y %H:%M')}", meta_style))
+
+    if fecha_inicio or fecha_fin:
+        elements.append(Paragraph(f"<b>Período:</b> {fecha_inicio or 'Inicio'} - {fecha_fin or 'Actualidad'}", meta_style))
+    elements.append(Spacer(1, 0.3*inch))
+
+    if stats is not None:
+        stats_data = [
+            ["Estadística", "Valor"],
+            ["Total de visitas", str(stats["total_visitas"])],
+            ["Usuarios únicos", str(stats["usuarios_unicos"])],
+            ["Puntos visitados", str(stats["puntos_visitados"])]
+        ]
+
+        stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
+        stats_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        elements.append(stats_table)
+        elements.append(Spacer(1, 0.5*inch))
+
+    if ruta_filas:
+        elements.append(Paragraph("<b>VISITAS DEL PERÍODO</b>", styles['Heading2']))
+        elements.append(Spacer(1, 0.2*inch))
+        elements.extend(_tablas_visitas(ruta_filas))
+
+    # Footer
+    elements.append(Spacer(1, 0.5*inch))
+    footer_style = ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.grey,
+        alignment=TA_CENTER
+    )
+    elements.append(Paragraph("Sistema de Recorridas QR - Acrux 360", footer_style))
+
+    # Construir PDF
+    doc.build(elements)
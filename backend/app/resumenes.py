@@ -0,0 +1,185 @@
+"""
+Lectura del resumen diario de visitas (tabla visitas_resumen_diario).
+
+La tabla se mantiene en la base de datos (ver sql/001_visitas_resumen_diario.sql):
+un trigger la incrementa con cada visita insertada y
+reconstruir_visitas_resumen_diario() la rehace desde cero.
+
+Los reportes piden conteos por punto × guardia para un período. Los días
+completos del período salen del resumen; si los límites no caen a medianoche
+UTC, los tramos parciales de los extremos se cuentan sobre las visitas crudas,
+así el resultado es idéntico al de recorrer todas las visitas.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from app.database import get_supabase_client
+from app.reportes_datos import fin_exclusivo, iterar_paginas_visitas, obtener_puntos_servicio
+
+# (punto_qr_id, guardia_id) -> cantidad de visitas
+Conteos = Dict[Tuple[int, int], int]
+
+
+def _parsear_utc(valor: str) -> datetime:
+    dt = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _medianoche(dia: date) -> datetime:
+    return datetime.combine(dia, time.min, tzinfo=timezone.utc)
+
+
+def dividir_periodo(
+    fecha_inicio: Optional[str],
+    fecha_fin: Optional[str],
+) -> Tuple[Optional[date], Optional[date], List[Tuple[Optional[datetime], Optional[datetime]]], bool]:
+    """
+    Divide el período [fecha_inicio, fin_exclusivo(fecha_fin)) en:
+    - días completos [desde, hasta) que se leen del resumen
+    - tramos parciales (inicio, fin) que se cuentan sobre visitas crudas
+    El último valor indica si hay días completos para leer del resumen.
+    """
+    inicio = _parsear_utc(fecha_inicio) if fecha_inicio else None
+    fin = _parsear_utc(fin_exclusivo(fecha_fin)) if fecha_fin else None
+
+    desde = None
+    if inicio is not None:
+        desde = inicio.date() if inicio.timetz().replace(tzinfo=None) == time.min else inicio.date() + timedelta(days=1)
+    hasta = fin.date() if fin is not None else None
+
+    if desde is not None and hasta is not None and desde >= hasta:
+        # No hay ningún día completo: todo el período es un tramo parcial
+        return None, None, [(inicio, fin)], False
+
+    tramos = []
+    if inicio is not None and inicio < _medianoche(desde):
+        tramos.append((inicio, _medianoche(desde)))
+    if fin is not None and _medianoche(hasta) < fin:
+        tramos.append((_medianoche(hasta), fin))
+    return desde, hasta, tramos, True
+
+
+def _sumar_paginas(paginas, conteos: Conteos):
+    """Suma a `conteos` las visitas de cada página"""
+    for pagina in paginas:
+        for visita in pagina:
+            if not visita.get("punto_qr_id"):
+                continue
+            clave = (visita["punto_qr_id"], visita.get("guardia_id") or 0)
+            conteos[clave] = conteos.get(clave, 0) + 1
+
+
+def _conteos_crudos(
+    inicio: Optional[datetime],
+    fin: Optional[datetime],
+    servicio_id: Optional[int],
+    punto_qr_id: Optional[int],
+    tipo: Optional[str],
+    conteos: Conteos,
+):
+    """Suma a `conteos` las visitas crudas de un tramo parcial (como mucho un día)"""
+    _sumar_paginas(iterar_paginas_visitas(
+        fecha_inicio=inicio.isoformat() if inicio else None,
+        hasta=fin.isoformat() if fin else None,
+        servicio_id=servicio_id,
+        punto_qr_id=punto_qr_id,
+        tipo=tipo,
+        columnas="id, punto_qr_id, guardia_id",
+    ), conteos)
+
+
+def conteos_punto_guardia(
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    servicio_id: Optional[int] = None,
+    punto_qr_id: Optional[int] = None,
+    tipo: Optional[str] = None,
+) -> Optional[Conteos]:
+    """
+    Conteos de visitas por (punto, guardia) para el período y filtros dados.
+    Devuelve None si el resumen no está disponible (p.ej. migración no aplicada),
+    para que el llamador recurra al cálculo sobre visitas crudas.
+    """
+    supabase = get_supabase_client()
+
+    puntos_ids = None
+    if servicio_id:
+        puntos_ids = obtener_puntos_servicio(servicio_id)
+        if not puntos_ids:
+            return {}
+    if punto_qr_id:
+        punto_qr_id = int(punto_qr_id)
+        if puntos_ids is not None and punto_qr_id not in puntos_ids:
+            return {}
+        puntos_ids = [punto_qr_id]
+
+    desde, hasta, tramos, usar_resumen = dividir_periodo(fecha_inicio, fecha_fin)
+
+    conteos: Conteos = {}
+    if usar_resumen:
+        try:
+            resp = supabase.rpc("resumen_visitas_periodo", {
+                "p_puntos": puntos_ids,
+                "p_desde": desde.isoformat() if desde else None,
+                "p_hasta": hasta.isoformat() if hasta else None,
+                "p_tipo": tipo,
+            }).execute()
+        except Exception:
+            return None
+        for fila in resp.data or []:
+            clave = (fila["punto_qr_id"], fila["guardia_id"])
+            conteos[clave] = conteos.get(clave, 0) + int(fila["total"])
+
+    for inicio, fin in tramos:
+        _conteos_crudos(inicio, fin, servicio_id, punto_qr_id, tipo, conteos)
+
+    return conteos
+
+
+def contar_visitas_crudas(
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    servicio_id: Optional[int] = None,
+    punto_qr_id: Optional[str] = None,
+    tipo: Optional[str] = None,
+) -> Conteos:
+    """Conteos por (punto, guardia) recorriendo las visitas crudas (solo columnas mínimas)"""
+    conteos: Conteos = {}
+    _sumar_paginas(iterar_paginas_visitas(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        usuario_id=usuario_id,
+        servicio_id=servicio_id,
+        punto_qr_id=punto_qr_id,
+        tipo=tipo,
+        columnas="id, punto_qr_id, guardia_id",
+    ), conteos)
+    return conteos
+
+
+def estadisticas_desde_conteos(conteos: Conteos) -> dict:
+    """total_visitas, usuarios_unicos y puntos_visitados a partir de los conteos"""
+    return {
+        "total_visitas": sum(conteos.values()),
+        "usuarios_unicos": len({guardia for _, guardia in conteos if guardia}),
+        "puntos_visitados": len({punto for punto, _ in conteos}),
+    }
+
+
+def ranking_desde_conteos(conteos: Conteos, limit: int) -> List[Tuple[int, int]]:
+    """[(punto_qr_id, total_visitas)] ordenado de mayor a menor"""
+    por_punto: Dict[int, int] = {}
+    for (punto, _), cantidad in conteos.items():
+        por_punto[punto] = por_punto.get(punto, 0) + cantidad
+    return sorted(por_punto.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+
+def reconstruir_resumen(desde: Optional[date] = None) -> int:
+    """Rehace el resumen diario (completo o a partir de `desde`). Devuelve filas generadas"""
+    supabase = get_supabase_client()
+    resp = supabase.rpc("reconstruir_visitas_resumen_diario", {
+        "p_desde": desde.isoformat() if desde else None,
+    }).execute()
+    return resp.data or 0
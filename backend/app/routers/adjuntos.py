@@ -0,0 +1,276 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.auth import get_current_user
+from app.models import UserResponse
+from app.database import get_supabase_client
+from app.config import get_settings
+from app.procesos import ejecutar_en_proceso
+from app.adjuntos import (
+    COLUMNAS_ADJUNTO, POOL_IMAGENES, TIPOS_PERMITIDOS, SubidaInvalidaError,
+    abrir_parte, adjuntos_de_visitas, crear_subida, descartar_subida, formatear_adjunto,
+    generar_miniatura, guardar_objeto, leer_subida, limpiar_subidas, registrar_adjunto, ruta_miniatura,
+    ruta_objeto
+)
+import asyncio
+import os
+import re
+
+router = APIRouter(prefix="/adjuntos", tags=["Adjuntos"])
+settings = get_settings()
+
+# Las URL de adjuntos no cambian de contenido (direccionadas por hash)
+CACHE_CONTROL_ADJUNTO = "private, max-age=31536000, immutable"
+
+_SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+
+# Una parte a la vez por subida (dentro de este worker). Se crean solo para
+# subidas existentes y se quitan al completarlas, cancelarlas o al limpiar las
+# abandonadas; solo se tocan desde el event loop
+_bloqueos: Dict[str, asyncio.Lock] = {}
+
+
+class SubidaCreate(BaseModel):
+    visita_id: int
+    tamano: int
+    tipo_contenido: str
+    nombre: Optional[str] = None
+    sha256: Optional[str] = None  # si se envía y el archivo ya existe, no hace falta subirlo
+
+
+def _leer_visita(visita_id: int) -> dict:
+    supabase = get_supabase_client()
+    resp = supabase.table("visitas").select("id, servicio_id, guardia_id, tipo").eq("id", visita_id).execute()
+    if not resp.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Visita no encontrada")
+    return resp.data[0]
+
+
+def verificar_acceso_visita(current_user: UserResponse, visita: dict):
+    """Guardia: sus visitas. Supervisor: las de su servicio. Administrador: todas"""
+    if current_user.rol in ["administrador", "admin"]:
+        return
+    if current_user.rol == "supervisor" and current_user.servicio_id == visita["servicio_id"]:
+        return
+    if current_user.rol == "guardia" and current_user.id == visita["guardia_id"]:
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso a esta visita")
+
+
+def _estado_subida(subida: dict) -> dict:
+    return {
+        "subida_id": subida["id"],
+        "visita_id": subida["visita_id"],
+        "tamano": subida["tamano"],
+        "recibido": subida["recibido"],
+        "completo": False,
+    }
+
+
+async def _asegurar_miniatura(sha256: str, nuevo: bool):
+    """Genera la miniatura en el pool de imágenes si falta; valida que sea una imagen"""
+    if os.path.exists(ruta_miniatura(sha256)):
+        return
+    try:
+        await ejecutar_en_proceso(
+            POOL_IMAGENES, settings.imagenes_workers, generar_miniatura,
+            ruta_objeto(sha256), ruta_miniatura(sha256), settings.adjuntos_miniatura_px
+        )
+    except Exception:
+        if nuevo:
+            try:
+                os.remove(ruta_objeto(sha256))
+            except FileNotFoundError:
+                pass
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El archivo no es una imagen válida")
+
+
+async def _completar_subida(subida: dict) -> dict:
+    try:
+        sha256, nuevo = await asyncio.to_thread(guardar_objeto, subida)
+    except SubidaInvalidaError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        # Otro pedido (en otro worker) ya la completó o se canceló
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La subida ya fue completada o cancelada")
+    await _asegurar_miniatura(sha256, nuevo)
+    adjunto = await asyncio.to_thread(registrar_adjunto, subida, sha256)
+    return {"subida_id": subida["id"], "completo": True, "duplicado": not nuevo, "adjunto": adjunto}
+
+
+@router.post("/subidas")
+async def crear_subida_adjunto(
+    datos: SubidaCreate,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Inicia la subida de una foto de la visita. El archivo se envía después con
+    PUT /adjuntos/subidas/{subida_id}?offset=N (en una o varias partes).
+    Si se envía sha256 y ese archivo ya está guardado, se adjunta sin subirlo.
+    """
+    visita = await asyncio.to_thread(_leer_visita, datos.visita_id)
+    verificar_acceso_visita(current_user, visita)
+    if visita["tipo"] != "incidencia":
+        raise HTTPException(status_code=400, detail="Solo se pueden adjuntar fotos a visitas de tipo incidencia")
+
+    if datos.tipo_contenido not in TIPOS_PERMITIDOS:
+        raise HTTPException(status_code=400, detail="Tipo de archivo no permitido. Debe ser JPEG, PNG o WebP")
+    if not 0 < datos.tamano <= settings.adjuntos_max_mb * 1024 * 1024:
+        raise HTTPException(status_code=400, detail=f"El archivo debe pesar entre 1 byte y {settings.adjuntos_max_mb} MB")
+    if datos.sha256 and not _SHA256.match(datos.sha256):
+        raise HTTPException(status_code=400, detail="sha256 inválido")
+
+    subida = {
+        "visita_id": datos.visita_id,
+        "usuario_id": current_user.id,
+        "tamano": datos.tamano,
+        "tipo_contenido": datos.tipo_contenido,
+        "nombre": datos.nombre,
+        "sha256": datos.sha256.lower() if datos.sha256 else None,
+    }
+
+    # Mismo contenido ya guardado: solo se registra la relación con la visita
+    if subida["sha256"] and os.path.exists(ruta_objeto(subida["sha256"])):
+        await _asegurar_miniatura(subida["sha256"], False)
+        adjunto = await asyncio.to_thread(registrar_adjunto, subida, subida["sha256"])
+        return {"subida_id": None, "completo": True, "duplicado": True, "adjunto": adjunto}
+
+    for vencida in await asyncio.to_thread(limpiar_subidas):
+        _bloqueos.pop(vencida, None)
+    subida = await asyncio.to_thread(crear_subida, **subida)
+    return _estado_subida({**subida, "recibido": 0})
+
+
+@router.get("/subidas/{subida_id}")
+async def obtener_subida_adjunto(
+    subida_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Bytes ya recibidos de una subida, para reanudarla desde ahí"""
+    subida = leer_subida(subida_id)
+    if subida is None or subida["usuario_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    return _estado_subida(subida)
+
+
+@router.put("/subidas/{subida_id}")
+async def enviar_parte_adjunto(
+    subida_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Bytes ya recibidos (ver GET de la subida)"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Recibe una parte del archivo (cuerpo binario) y la escribe en disco a
+    medida que llega. Si la conexión se corta, lo recibido se conserva.
+    Con la última parte se completa la subida y se devuelve el adjunto.
+    """
+    subida = leer_subida(subida_id)
+    if subida is None or subida["usuario_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+
+    async with _bloqueos.setdefault(subida_id, asyncio.Lock()):
+        # Releída con el lock: otra parte pudo avanzarla, completarla o cancelarla
+        subida = leer_subida(subida_id)
+        if subida is None:
+            _bloqueos.pop(subida_id, None)
+            raise HTTPException(status_code=404, detail="Subida no encontrada")
+
+        try:
+            archivo = abrir_parte(subida, offset)
+        except SubidaInvalidaError as e:
+            raise HTTPException(status_code=409, detail={"mensaje": str(e), "recibido": subida["recibido"]})
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Subida no encontrada")
+
+        recibido = offset
+        with archivo:
+            try:
+                async for bloque in request.stream():
+                    if recibido + len(bloque) > subida["tamano"]:
+                        archivo.truncate(offset)
+                        raise HTTPException(status_code=400, detail="Se recibieron más bytes que el tamaño declarado")
+                    archivo.write(bloque)
+                    recibido += len(bloque)
+            except ClientDisconnect:
+                # Lo escrito hasta acá queda; el cliente reanuda desde el nuevo tamaño
+                pass
+
+        subida["recibido"] = recibido
+        if recibido < subida["tamano"]:
+            return _estado_subida(subida)
+
+        # Se completa con el lock tomado: un reintento de la última parte
+        # espera y, al releer, ya no encuentra la subida
+        try:
+            return await _completar_subida(subida)
+        finally:
+            _bloqueos.pop(subida_id, None)
+
+
+@router.delete("/subidas/{subida_id}")
+async def cancelar_subida_adjunto(
+    subida_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    subida = leer_subida(subida_id)
+    if subida is None or subida["usuario_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    descartar_subida(subida_id)
+    _bloqueos.pop(subida_id, None)
+    return {"message": "Subida cancelada"}
+
+
+@router.get("/")
+async def listar_adjuntos(
+    visita_id: int = Query(...),
+    current_user: UserResponse = Depends(get_current_user)
+) -> List[dict]:
+    """Adjuntos de una visita, con las URL de la miniatura y del archivo original"""
+    visita = await asyncio.to_thread(_leer_visita, visita_id)
+    verificar_acceso_visita(current_user, visita)
+    por_visita = await asyncio.to_thread(adjuntos_de_visitas, [visita_id])
+    return por_visita.get(visita_id, [])
+
+
+def _leer_adjunto(adjunto_id: int, current_user: UserResponse) -> dict:
+    supabase = get_supabase_client()
+    resp = supabase.table("visitas_adjuntos").select(COLUMNAS_ADJUNTO).eq("id", adjunto_id).execute()
+    if not resp.data:
+        raise HTTPException(status_code=404, detail="Adjunto no encontrado")
+    adjunto = resp.data[0]
+    verificar_acceso_visita(current_user, _leer_visita(adjunto["visita_id"]))
+    return formatear_adjunto(adjunto)
+
+
+def _respuesta_archivo(ruta: str, media_type: str, sha256: str, sufijo: str) -> FileResponse:
+    if not os.path.exists(ruta):
+        raise HTTPException(status_code=404, detail="Archivo no disponible")
+    return FileResponse(
+        ruta,
+        media_type=media_type,
+        headers={"ETag": f'"{sha256}{sufijo}"', "Cache-Control": CACHE_CONTROL_ADJUNTO},
+    )
+
+
+@router.get("/{adjunto_id}/miniatura")
+async def obtener_miniatura_adjunto(
+    adjunto_id: int,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    adjunto = await asyncio.to_thread(_leer_adjunto, adjunto_id, current_user)
+    sha256 = adjunto["sha256"]
+    if not os.path.exists(ruta_miniatura(sha256)) and os.path.exists(ruta_objeto(sha256)):
+        await _asegurar_miniatura(sha256, False)
+    return _respuesta_archivo(ruta_miniatura(sha256), "image/jpeg", sha256, "-miniatura")
+
+
+@router.get("/{adjunto_id}/archivo")
+async def obtener_archivo_adjunto(
+    adjunto_id: int,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    adjunto = await asyncio.to_thread(_leer_adjunto, adjunto_id, current_user)
+    return _respuesta_archivo(ruta_objeto(adjunto["sha256"]), adjunto["tipo_contenido"], adjunto["sha256"], "")
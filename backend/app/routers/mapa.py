@@ -0,0 +1,155 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import Optional
+from datetime import date, datetime, timezone
+from app.auth import get_current_user
+from app.models import UserResponse
+from app.cache_reportes import obtener_cache_reportes, periodo_cerrado
+from app.densidad import ZOOM_BASE, grilla_bbox, histogramas_periodo, matriz_tesela, png_tesela, unir
+from app.horarios import obtener_horario
+from app.mapa import ZOOM_MAX, agrupar, construir_capa
+import asyncio
+
+router = APIRouter(prefix="/mapa", tags=["Mapa"])
+
+
+def servicio_permitido(current_user: UserResponse, servicio_id: Optional[int]) -> int:
+    """Servicio a consultar: el propio para supervisores, el indicado para administradores"""
+    if current_user.rol == "supervisor":
+        if not current_user.servicio_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Supervisor sin servicio asignado"
+            )
+        return current_user.servicio_id
+    if current_user.rol in ["administrador", "admin"]:
+        if not servicio_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="servicio_id es obligatorio"
+            )
+        return servicio_id
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="No tienes permisos para ver el mapa"
+    )
+
+
+@router.get("/grupos")
+async def obtener_grupos_mapa(
+    zoom: int = Query(..., ge=0, le=ZOOM_MAX),
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    servicio_id: Optional[int] = None,
+    dias: int = Query(7, ge=1, le=90, description="Período de visitas e incidencias"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Puntos del servicio agrupados en una grilla según el zoom, dentro de la
+    caja visible: cantidad de puntos, visitas e incidencias de los últimos
+    `dias` días y antigüedad de la última visita por grupo.
+    """
+    servicio_id = servicio_permitido(current_user, servicio_id)
+    if max_lat < min_lat:
+        raise HTTPException(status_code=400, detail="max_lat debe ser mayor que min_lat")
+
+    # Las columnas por punto se reutilizan para cualquier bbox/zoom hasta la próxima visita
+    cache = obtener_cache_reportes()
+    capa = cache.obtener("mapa", servicio_id, None, dias=dias)
+    if capa is None:
+        capa = await asyncio.to_thread(construir_capa, servicio_id, dias)
+        cache.guardar("mapa", servicio_id, None, capa, dias=dias)
+
+    return {
+        "servicio_id": servicio_id,
+        "dias": dias,
+        "calculado": datetime.fromtimestamp(capa.calculada, timezone.utc).isoformat(),
+        **agrupar(capa, zoom, (min_lat, min_lon, max_lat, max_lon)),
+    }
+
+
+def _validar_periodo(fecha_inicio: date, fecha_fin: date):
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="fecha_fin debe ser posterior a fecha_inicio")
+    if (fecha_fin - fecha_inicio).days > 366:
+        raise HTTPException(status_code=400, detail="El período máximo es de un año")
+
+
+async def _histograma_densidad(servicio_id: int, fecha_inicio: date, fecha_fin: date, zoom: int):
+    """Histograma de visitas del período al zoom pedido (unión de los días, cacheada)"""
+    cache = obtener_cache_reportes()
+    filtros = {"fecha_inicio": fecha_inicio.isoformat(), "zoom": zoom}
+    histograma = cache.obtener("densidad", servicio_id, fecha_fin.isoformat(), **filtros)
+    if histograma is not None:
+        return histograma
+
+    horario = await asyncio.to_thread(obtener_horario, servicio_id)
+    if horario is None:
+        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+
+    def calcular():
+        return unir(histogramas_periodo(horario, fecha_inicio, fecha_fin, zoom))
+
+    histograma = await asyncio.to_thread(calcular)
+    cache.guardar("densidad", servicio_id, fecha_fin.isoformat(), histograma, **filtros)
+    return histograma
+
+
+@router.get("/densidad")
+async def obtener_densidad(
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    zoom: int = Query(..., ge=0, le=ZOOM_BASE),
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    servicio_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Grilla de densidad de visitas (por coordenadas GPS) dentro de la caja
+    visible: celdas [lat, lon, cantidad] con visitas. Las fechas son días
+    locales del servicio (fecha_fin incluida).
+    """
+    servicio_id = servicio_permitido(current_user, servicio_id)
+    _validar_periodo(fecha_inicio, fecha_fin)
+
+    histograma = await _histograma_densidad(servicio_id, fecha_inicio, fecha_fin, zoom)
+    return {
+        "servicio_id": servicio_id,
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        **grilla_bbox(histograma, zoom, (min_lat, min_lon, max_lat, max_lon)),
+    }
+
+
+@router.get("/densidad/{zoom}/{x}/{y}.png")
+async def obtener_tesela_densidad(
+    zoom: int,
+    x: int,
+    y: int,
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    servicio_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Tesela PNG (256 px) del mapa de calor de visitas. Los colores se escalan
+    respecto de la celda con más visitas del período, igual en todas las teselas.
+    """
+    servicio_id = servicio_permitido(current_user, servicio_id)
+    _validar_periodo(fecha_inicio, fecha_fin)
+    if not 0 <= zoom <= ZOOM_BASE:
+        raise HTTPException(status_code=400, detail=f"El zoom máximo del mapa de calor es {ZOOM_BASE}")
+    if not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        raise HTTPException(status_code=404, detail="Tesela fuera del mapa")
+
+    histograma = await _histograma_densidad(servicio_id, fecha_inicio, fecha_fin, zoom)
+    maximo = int(histograma[2].max()) if len(histograma[2]) else 0
+    contenido = png_tesela(matriz_tesela(histograma, x, y), maximo)
+
+    # Un período cerrado no cambia: el navegador puede reutilizar la tesela
+    cache_control = "private, max-age=86400" if periodo_cerrado(fecha_fin.isoformat()) else "private, max-age=60"
+    return Response(content=contenido, media_type="image/png", headers={"Cache-Control": cache_control})
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from fastapi.responses import JSONResponse, Response
 from app.models import UserResponse
 from app.database import get_supabase_client
 from app.auth import get_current_user
+from app.sincronizacion import COLUMNAS_SYNC, leer_puntos, punto_offline, version_puntos
 from typing import List, Optional
+from datetime import datetime, timezone
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/puntos", tags=["Puntos QR"])
@@ -62,6 +65,86 @@ async def get_puntos(
     
     return puntos
 
+@router.get("/cambios")
+async def get_cambios_puntos(
+    request: Request,
+    version: Optional[int] = Query(None, description="Versión que ya tiene el dispositivo (vacío = lista completa)"),
+    desde: Optional[datetime] = Query(None, description="Alternativa a version si el versionado no está instalado"),
+    servicio_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Sincronización delta de puntos para la copia offline del dispositivo.
+    Devuelve solo los puntos creados/modificados desde `version` y los IDs de
+    los que hay que quitar (desactivados, borrados o movidos a otro servicio).
+    Responde 304 si el ETag del dispositivo ya corresponde a la versión actual.
+    """
+    if current_user.rol in ["guardia", "supervisor"]:
+        if not current_user.servicio_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Usuario sin servicio asignado"
+            )
+        servicio_id = current_user.servicio_id
+    elif not servicio_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar servicio_id"
+        )
+    
+    supabase = get_supabase_client()
+    
+    # La versión se lee antes que los puntos: un cambio concurrente puede
+    # llegar dos veces, pero nunca perderse
+    version_actual = version_puntos(supabase, servicio_id)
+    servidor_fecha = datetime.now(timezone.utc)
+    
+    headers = {}
+    if version_actual is not None:
+        etag = f'"puntos-{servicio_id}-{version_actual}"'
+        headers["ETag"] = etag
+        if etag in [e.strip() for e in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+    
+    completo = version is None and desde is None
+    
+    def query_base():
+        query = supabase.table("puntos_qr").select(COLUMNAS_SYNC).eq("servicio_id", servicio_id)
+        if completo:
+            return query.eq("activo", True)
+        if version is not None and version_actual is not None:
+            return query.gt("version", version)
+        # Sin versionado: por updated_at (no detecta puntos borrados o movidos)
+        return query.gt("updated_at", (desde or datetime.fromtimestamp(0, timezone.utc)).isoformat())
+    
+    filas = leer_puntos(query_base)
+    
+    puntos = []
+    eliminados = []
+    for punto in filas:
+        if not punto["activo"]:
+            eliminados.append(punto["id"])
+            continue
+        puntos.append(punto_offline(punto))
+    
+    if not completo and version is not None and version_actual is not None:
+        bajas = supabase.table("puntos_qr_bajas").select("punto_qr_id").eq(
+            "servicio_id", servicio_id
+        ).gt("version", version).execute()
+        eliminados.extend(b["punto_qr_id"] for b in bajas.data)
+    
+    return JSONResponse(
+        content={
+            "servicio_id": servicio_id,
+            "version": version_actual,
+            "servidor_fecha": servidor_fecha.isoformat(),
+            "completo": completo,
+            "puntos": puntos,
+            "eliminados": sorted(set(eliminados)),
+        },
+        headers=headers,
+    )
+
 @router.get("/{punto_id}", response_model=PuntoQRResponse)
 async def get_punto(
     punto_id: int,  # CORREGIDO: int
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from app.auth import get_current_user
 from app.database import get_supabase
+from app.listados import aplicar_listado, pagina_listado
+from app.importar_puntos import ArchivoInvalidoError, importar_puntos, leer_archivo
+import asyncio
 import secrets
 
 router = APIRouter(prefix="/puntos", tags=["puntos"])
@@ -102,6 +105,56 @@ async def listar_puntos(
     
     return puntos
 
+# GET - Listado paginado con búsqueda (antes de /{punto_id})
+@router.get("/pagina")
+async def listar_puntos_pagina(
+    q: Optional[str] = Query(None, description="Busca en nombre y código QR"),
+    activo: Optional[bool] = None,
+    servicio_id: Optional[int] = None,
+    orden: str = Query("nombre", regex="^(nombre|created_at|id)$"),
+    desc: bool = False,
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user = Depends(get_current_user)
+):
+    """
+    Puntos paginados (keyset) con búsqueda por nombre o código, con el nombre
+    del servicio resuelto en una sola consulta por página.
+    """
+    supabase = get_supabase()
+    
+    query = supabase.table("puntos_qr").select("*")
+    if activo is not None:
+        query = query.eq("activo", activo)
+    if servicio_id:
+        query = query.eq("servicio_id", servicio_id)
+    
+    try:
+        query = aplicar_listado(query, q, ["nombre", "qr_code"], orden, desc, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    puntos, siguiente = pagina_listado(query.execute().data, orden, limit)
+    
+    servicios_ids = list({p["servicio_id"] for p in puntos if p.get("servicio_id")})
+    nombres_servicios = {}
+    if servicios_ids:
+        servicios = supabase.table("servicios").select("id, nombre").in_("id", servicios_ids).execute()
+        nombres_servicios = {s["id"]: s["nombre"] for s in servicios.data}
+    
+    return {
+        "puntos": [
+            {
+                **punto,
+                "codigo_qr": punto.get("qr_code", ""),  # Agregar alias
+                "servicio_nombre": nombres_servicios.get(punto.get("servicio_id"))
+            }
+            for punto in puntos
+        ],
+        "siguiente_cursor": siguiente,
+        "limit": limit
+    }
+
 # GET - Obtener punto por ID
 @router.get("/{punto_id}", response_model=PuntoResponse)
 async def obtener_punto(
@@ -180,6 +233,36 @@ async def crear_punto(
     result = supabase.table("puntos_qr").insert(nuevo_punto).execute()
     return result.data[0]
 
+# POST - Importación masiva desde CSV o GeoJSON
+@router.post("/importar")
+async def importar_puntos_archivo(
+    archivo: UploadFile = File(...),
+    servicio_id: Optional[int] = Form(None),  # Servicio para filas sin servicio_id
+    actualizar: bool = Form(True),  # Actualizar puntos cuyo qr_code ya existe
+    current_user = Depends(require_admin)
+):
+    """
+    Crea o actualiza puntos desde un CSV (nombre, latitud, longitud, descripcion,
+    servicio_id, radio_validacion, activo, qr_code) o un GeoJSON de Points con
+    esas propiedades. Devuelve cuántos se crearon/actualizaron y los errores por fila.
+    """
+    contenido = await archivo.read()
+    try:
+        filas = leer_archivo(contenido, archivo.filename)
+    except ArchivoInvalidoError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not filas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo no contiene puntos"
+        )
+    
+    return await asyncio.to_thread(importar_puntos, filas, servicio_id, actualizar)
+
 # PUT - Actualizar punto QR
 @router.put("/{punto_id}", response_model=PuntoResponse)
 async def actualizar_punto(
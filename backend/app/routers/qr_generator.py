@@ -1,22 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse, FileResponse
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Optional
 from pydantic import BaseModel
 from app.auth import get_current_user
 from app.database import get_supabase
-import qrcode
-from io import BytesIO
+from app.flujos import SalidaDrenable
+from app.qr_render import obtener_imagen_qr, obtener_tramos_qr, dibujar_qr_vectorial
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-import os
+import asyncio
+import re
 import tempfile
+import zipfile
 
 router = APIRouter(prefix="/qr-generator", tags=["qr-generator"])
 
+# Etiquetas por página -> (columnas, filas) en A4
+DISPOSICIONES_QR = {
+    4: (2, 2),
+    12: (3, 4),
+    24: (4, 6),
+}
+
+# IDs por consulta `in_` (evita URLs demasiado largas hacia PostgREST)
+IDS_POR_CONSULTA = 200
+
 class QRGenerateRequest(BaseModel):
     punto_ids: List[int]  # CORREGIDO: int en lugar de str
+    por_pagina: int = 4
+
+class QRZipRequest(BaseModel):
+    punto_ids: Optional[List[int]] = None
+    servicio_id: Optional[int] = None
+    formato: str = "png"  # png o svg
+    size: int = 600
+
+# Las imágenes no cambian mientras no cambie el qr_code del punto: el navegador
+# las reutiliza un día y después revalida con el ETag
+CACHE_CONTROL_QR = "private, max-age=86400"
+
+
+# formato de descarga -> media type
+TIPOS_IMAGEN_QR = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+def _respuesta_qr(request: Request, datos: bytes, clave: str, formato: str = "png", headers: dict = None) -> Response:
+    """Imagen QR con ETag fuerte; 304 si el navegador ya tiene esa versión"""
+    etag = f'"{clave}"'
+    cabeceras = {"ETag": etag, "Cache-Control": CACHE_CONTROL_QR, **(headers or {})}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [e.strip() for e in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL_QR})
+    return Response(content=datos, media_type=TIPOS_IMAGEN_QR[formato], headers=cabeceras)
 
 # Dependency para admin O supervisor
 def require_admin_or_supervisor(current_user = Depends(get_current_user)):
@@ -30,12 +69,14 @@ def require_admin_or_supervisor(current_user = Depends(get_current_user)):
 @router.get("/punto/{punto_id}")
 async def generar_qr_individual(
     punto_id: int,  # CORREGIDO: int
-    size: int = 300,
+    request: Request,
+    size: int = Query(300, ge=64, le=2000),
+    formato: str = Query("png", regex="^(png|svg)$"),
     current_user = Depends(require_admin_or_supervisor)
 ):
     """
     Genera un código QR individual para un punto específico
-    Retorna una imagen PNG
+    Retorna una imagen PNG o SVG (vectorial, para imprenta)
     """
     supabase = get_supabase()
     
@@ -58,45 +99,99 @@ async def generar_qr_individual(
                 detail="No tienes acceso a este punto"
             )
     
-    # Generar QR
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=4,
-    )
-    
-    qr.add_data(punto["qr_code"])
-    qr.make(fit=True)
-    
-    # Crear imagen
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Redimensionar si es necesario
-    if size != 300:
-        img = img.resize((size, size))
-    
-    # Convertir a bytes
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="image/png",
-        headers={
-            "Content-Disposition": f"attachment; filename=qr_{punto['nombre'].replace(' ', '_')}.png"
-        }
+    datos, clave = obtener_imagen_qr(punto["qr_code"], size, formato=formato)
+    return _respuesta_qr(
+        request, datos, clave, formato,
+        {"Content-Disposition": f"attachment; filename=qr_{punto['nombre'].replace(' ', '_')}.{formato}"}
     )
 
+def _obtener_puntos(supabase, punto_ids: List[int]) -> List[dict]:
+    """Trae los puntos pedidos con consultas `in_` (en el orden pedido)"""
+    por_id = {}
+    for i in range(0, len(punto_ids), IDS_POR_CONSULTA):
+        lote = punto_ids[i:i + IDS_POR_CONSULTA]
+        result = supabase.table("puntos_qr").select("id, nombre, descripcion, qr_code, servicio_id").in_("id", lote).execute()
+        for punto in result.data:
+            por_id[punto["id"]] = punto
+    return [por_id[punto_id] for punto_id in dict.fromkeys(punto_ids) if punto_id in por_id]
+
+
+def _dibujar_hoja_qr(destino, puntos: List[dict], qrs: List[tuple], por_pagina: int):
+    """Dibuja las etiquetas en una grilla de por_pagina por hoja A4, con footer en cada hoja"""
+    columnas, filas = DISPOSICIONES_QR[por_pagina]
+    c = canvas.Canvas(destino, pagesize=A4)
+    width, height = A4
+
+    margin = 0.75 * inch
+    pie = 0.5 * inch
+    celda_w = (width - 2 * margin) / columnas
+    celda_h = (height - 2 * margin - pie) / filas
+
+    # Espacio para textos arriba (nombre) y abajo (código, descripción) según la densidad
+    tam_nombre = 12 if por_pagina <= 4 else 8 if por_pagina <= 12 else 6
+    tam_texto = tam_nombre - 3
+    alto_textos = tam_nombre + 2 * tam_texto + 14
+    qr_size = min(celda_w * 0.85, celda_h - alto_textos)
+    max_desc = int(celda_w / (tam_texto * 0.5))
+
+    def pie_de_pagina():
+        c.setFont("Helvetica", 8)
+        c.drawString(margin, 0.5 * inch, "Sistema de Recorridas QR - Acrux 360")
+
+    for idx, (punto, (modulos, tramos)) in enumerate(zip(puntos, qrs)):
+        # Nueva página cada por_pagina QR
+        if idx > 0 and idx % por_pagina == 0:
+            pie_de_pagina()
+            c.showPage()
+
+        posicion = idx % por_pagina
+        col, fila = posicion % columnas, posicion // columnas
+        x = margin + col * celda_w + (celda_w - qr_size) / 2
+        y = height - margin - (fila + 1) * celda_h + (celda_h - qr_size) / 2
+
+        # Dibujar QR en PDF como vectores
+        dibujar_qr_vectorial(c, modulos, tramos, x, y, qr_size)
+
+        # Título del punto
+        c.setFont("Helvetica-Bold", tam_nombre)
+        c.drawString(x, y + qr_size + tam_nombre * 0.6, punto["nombre"][:max_desc])
+
+        # Código QR
+        c.setFont("Helvetica", tam_texto)
+        c.drawString(x, y - tam_texto - 4, f"Código: {punto['qr_code']}")
+
+        # Descripción (si existe)
+        if punto.get("descripcion"):
+            # Truncar descripción si es muy larga
+            desc = punto["descripcion"]
+            desc = desc[:max_desc] + "..." if len(desc) > max_desc else desc
+            c.drawString(x, y - 2 * tam_texto - 8, desc)
+
+    pie_de_pagina()
+    c.save()
+
+
+def _leer_y_cerrar(archivo):
+    """Envía el archivo en bloques y lo cierra al terminar (o si el cliente corta)"""
+    try:
+        archivo.seek(0)
+        while True:
+            bloque = archivo.read(64 * 1024)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
+
+
 @router.post("/generar-pdf")
 async def generar_qr_pdf(
     request: QRGenerateRequest,
     current_user = Depends(require_admin_or_supervisor)
 ):
     """
-    Genera un PDF con múltiples códigos QR
-    4 QR por página en formato A4
+    Genera un PDF con múltiples códigos QR.
+    Etiquetas por página según `por_pagina` (4, 12 o 24) en formato A4.
     """
     supabase = get_supabase()
     
@@ -106,19 +201,18 @@ async def generar_qr_pdf(
             detail="Debe seleccionar al menos un punto"
         )
     
+    if request.por_pagina not in DISPOSICIONES_QR:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"por_pagina debe ser uno de: {', '.join(str(n) for n in DISPOSICIONES_QR)}"
+        )
+    
     # Obtener puntos
-    puntos = []
-    for punto_id in request.punto_ids:
-        result = supabase.table("puntos_qr").select("*").eq("id", punto_id).execute()
-        if result.data:
-            punto = result.data[0]
-            
-            # Verificar permisos de supervisor
-            if current_user.rol == "supervisor":
-                if punto["servicio_id"] != current_user.servicio_id:
-                    continue  # Saltar puntos que no son del servicio del supervisor
-            
-            puntos.append(punto)
+    puntos = _obtener_puntos(supabase, request.punto_ids)
+    
+    # Verificar permisos de supervisor: saltar puntos que no son de su servicio
+    if current_user.rol == "supervisor":
+        puntos = [p for p in puntos if p["servicio_id"] == current_user.servicio_id]
     
     if not puntos:
         raise HTTPException(
@@ -126,89 +220,119 @@ async def generar_qr_pdf(
             detail="No se encontraron puntos válidos"
         )
     
-    # Crear PDF temporal
-    temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    temp_pdf_path = temp_pdf.name
-    temp_pdf.close()
+    # Módulos de cada QR calculados en paralelo en el pool de procesos
+    qrs = await obtener_tramos_qr([p["qr_code"] for p in puntos], border=2)
     
-    # Crear PDF
-    c = canvas.Canvas(temp_pdf_path, pagesize=A4)
-    width, height = A4
+    # El PDF se arma en un archivo temporal anónimo (en memoria hasta cierto tamaño,
+    # se borra solo al cerrarse) y se envía por partes
+    archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        await asyncio.to_thread(_dibujar_hoja_qr, archivo, puntos, qrs, request.por_pagina)
+    except Exception:
+        archivo.close()
+        raise
     
-    # Configuración de layout (2x2 = 4 QR por página)
-    qr_size = 2.5 * inch  # Tamaño del QR
-    margin = 0.75 * inch
-    spacing_x = (width - 2 * margin - 2 * qr_size) / 1
-    spacing_y = (height - 2 * margin - 2 * qr_size) / 1
+    return StreamingResponse(
+        _leer_y_cerrar(archivo),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": "attachment; filename=codigos_qr_acrux.pdf"
+        }
+    )
+
+def _nombre_entrada(punto: dict, extension: str, usados: set) -> str:
+    """Nombre de archivo seguro y único dentro del ZIP"""
+    base = re.sub(r"[^\w\-]+", "_", f"{punto['nombre']}_{punto['qr_code']}").strip("_") or str(punto["id"])
+    nombre = f"{base}.{extension}"
+    n = 2
+    while nombre in usados:
+        nombre = f"{base}_{n}.{extension}"
+        n += 1
+    usados.add(nombre)
+    return nombre
+
+
+def _generar_zip(puntos: List[dict], formato: str, size: int):
+    """
+    Genera el ZIP entrada por entrada y lo va entregando por partes: nunca
+    tiene en memoria más que la imagen actual. Las imágenes salen del cache de QR.
+    """
+    salida = SalidaDrenable()
+    # PNG ya viene comprimido; SVG es texto y se comprime bien
+    compresion = zipfile.ZIP_STORED if formato == "png" else zipfile.ZIP_DEFLATED
+    usados = set()
+    with zipfile.ZipFile(salida, mode="w", compression=compresion) as archivo_zip:
+        for punto in puntos:
+            datos, _ = obtener_imagen_qr(punto["qr_code"], size, formato=formato)
+            archivo_zip.writestr(_nombre_entrada(punto, formato, usados), datos)
+            bloque = salida.drenar()
+            if bloque:
+                yield bloque
+    yield salida.drenar()
+
+
+@router.post("/zip")
+async def descargar_qr_zip(
+    request: QRZipRequest,
+    current_user = Depends(require_admin_or_supervisor)
+):
+    """
+    Descarga un ZIP con la imagen QR (PNG o SVG) de cada punto,
+    de una lista de punto_ids o de todos los puntos de un servicio.
+    El archivo se genera mientras se envía.
+    """
+    supabase = get_supabase()
     
-    positions = [
-        (margin, height - margin - qr_size),  # Top-left
-        (margin + qr_size + spacing_x, height - margin - qr_size),  # Top-right
-        (margin, height - margin - 2 * qr_size - spacing_y),  # Bottom-left
-        (margin + qr_size + spacing_x, height - margin - 2 * qr_size - spacing_y),  # Bottom-right
-    ]
+    if not request.punto_ids and not request.servicio_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar punto_ids o servicio_id"
+        )
     
-    for idx, punto in enumerate(puntos):
-        # Nueva página cada 4 QR
-        if idx > 0 and idx % 4 == 0:
-            c.showPage()
-        
-        position_idx = idx % 4
-        x, y = positions[position_idx]
-        
-        # Generar QR
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=2,
+    if request.formato not in TIPOS_IMAGEN_QR:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"formato debe ser uno de: {', '.join(TIPOS_IMAGEN_QR)}"
+        )
+    
+    if not 64 <= request.size <= 2000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="size debe estar entre 64 y 2000"
         )
-        qr.add_data(punto["qr_code"])
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a BytesIO
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        # Dibujar QR en PDF
-        c.drawImage(ImageReader(buffer), x, y, width=qr_size, height=qr_size)
-        
-        # Título del punto
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(x, y + qr_size + 10, punto["nombre"])
-        
-        # Código QR
-        c.setFont("Helvetica", 9)
-        c.drawString(x, y - 20, f"Código: {punto['qr_code']}")
-        
-        # Descripción (si existe)
-        if punto.get("descripcion"):
-            c.setFont("Helvetica", 8)
-            # Truncar descripción si es muy larga
-            desc = punto["descripcion"][:50] + "..." if len(punto["descripcion"]) > 50 else punto["descripcion"]
-            c.drawString(x, y - 35, desc)
     
-    # Agregar footer en cada página
-    c.setFont("Helvetica", 8)
-    c.drawString(margin, 0.5 * inch, "Sistema de Recorridas QR - Acrux 360")
+    if request.punto_ids:
+        puntos = _obtener_puntos(supabase, request.punto_ids)
+        if request.servicio_id:
+            puntos = [p for p in puntos if p["servicio_id"] == request.servicio_id]
+    else:
+        result = supabase.table("puntos_qr").select(
+            "id, nombre, descripcion, qr_code, servicio_id"
+        ).eq("servicio_id", request.servicio_id).order("id").execute()
+        puntos = result.data
     
-    c.save()
+    # Verificar permisos de supervisor: solo puntos de su servicio
+    if current_user.rol == "supervisor":
+        puntos = [p for p in puntos if p["servicio_id"] == current_user.servicio_id]
     
-    # Retornar archivo PDF
-    return FileResponse(
-        temp_pdf_path,
-        media_type="application/pdf",
-        filename="codigos_qr_acrux.pdf",
+    if not puntos:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontraron puntos válidos"
+        )
+    
+    return StreamingResponse(
+        _generar_zip(puntos, request.formato, request.size),
+        media_type="application/zip",
         headers={
-            "Content-Disposition": "attachment; filename=codigos_qr_acrux.pdf"
+            "Content-Disposition": f"attachment; filename=codigos_qr_{request.formato}.zip"
         }
     )
 
 @router.get("/preview/{punto_id}")
 async def preview_qr(
     punto_id: int,  # CORREGIDO: int
+    request: Request,
     current_user = Depends(get_current_user)
 ):
     """
@@ -235,24 +359,6 @@ async def preview_qr(
                 detail="No tienes acceso a este punto"
             )
     
-    # Generar QR
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=4,
-    )
-    
-    qr.add_data(punto["qr_code"])
-    qr.make(fit=True)
-    
-    # Crear imagen pequeña para preview
-    img = qr.make_image(fill_color="black", back_color="white")
-    img = img.resize((300, 300))
-    
-    # Convertir a bytes
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    return StreamingResponse(buffer, media_type="image/png")
\ No newline at end of file
+    # Vista previa en el tamaño final (sin generar a tamaño completo y reescalar)
+    png, clave = obtener_imagen_qr(punto["qr_code"], 300)
+    return _respuesta_qr(request, png, clave)
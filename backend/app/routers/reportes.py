@@ -4,8 +4,28 @@ from datetime import datetime, date
 from app.auth import get_current_user
 from app.database import get_supabase_client
 from app.models import UserResponse
+from app.config import get_settings
+from app.reportes_datos import iterar_paginas_visitas, enriquecer_visitas, formatear_fecha_local
+from app.reportes_pdf import escribir_lote, renderizar_pdf_visitas
+from app.flujos import SalidaDrenable
+from app.trabajos import Trabajo, ColaLlenaError, clave_trabajo, obtener_cola
+from app.cache_reportes import obtener_cache_reportes, periodo_cerrado
+from app.analitica import reporte_intervalos
+from app.cumplimiento import reporte_cumplimiento
+from app.recorridos import recorridos_geojson, reporte_recorridos
+from app.adjuntos import agregar_miniaturas
+from app.busqueda import buscar_en_postgres, construir_indice, leer_cursor, pagina_busqueda
+from app.resumenes import (
+    conteos_punto_guardia, contar_visitas_crudas, estadisticas_desde_conteos,
+    ranking_desde_conteos, reconstruir_resumen
+)
+import asyncio
 import io
-from fastapi.responses import StreamingResponse
+import os
+import csv
+import json
+import tempfile
+from fastapi.responses import StreamingResponse, FileResponse
 import pytz
 
 # Para Excel
@@ -13,19 +33,19 @@ try:
     from openpyxl import Workbook
     from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
     from openpyxl.chart import BarChart, Reference
+    from openpyxl.drawing.image import Image as ImagenExcel
 except ImportError:
     pass
 
-# Para PDF
+# Para Parquet / Arrow (opcional)
 try:
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    import pyarrow as pa
+    import pyarrow.parquet as pq
 except ImportError:
-    pass
+    pa = None
+    pq = None
+
+settings = get_settings()
 
 router = APIRouter(prefix="/reportes", tags=["reportes"])
 
@@ -143,6 +163,179 @@ async def obtener_reporte_visitas(
         raise HTTPException(status_code=500, detail=f"Error al obtener visitas: {str(e)}")
 
 
+@router.get("/visitas/estadisticas")
+async def obtener_estadisticas_visitas(
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    usuario_id: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    punto_qr_id: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Estadísticas del reporte de visitas sin traer las visitas.
+    Usa el resumen diario; con filtro de usuario cuenta sobre columnas mínimas.
+    """
+    verificar_admin(current_user)
+    
+    cache = obtener_cache_reportes()
+    filtros_cache = {"fecha_inicio": fecha_inicio, "usuario_id": usuario_id, "punto_qr_id": punto_qr_id}
+    estadisticas = cache.obtener("visitas-estadisticas", servicio_id, fecha_fin, **filtros_cache)
+    if estadisticas is not None:
+        return estadisticas
+    
+    try:
+        conteos = None
+        if not usuario_id:
+            conteos = conteos_punto_guardia(fecha_inicio, fecha_fin, servicio_id, punto_qr_id)
+        if conteos is None:
+            conteos = contar_visitas_crudas(fecha_inicio, fecha_fin, usuario_id, servicio_id, punto_qr_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
+    
+    estadisticas = {
+        **estadisticas_desde_conteos(conteos),
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_fin
+    }
+    cache.guardar("visitas-estadisticas", servicio_id, fecha_fin, estadisticas, **filtros_cache)
+    
+    return estadisticas
+
+
+@router.get("/visitas/pagina")
+async def obtener_pagina_visitas(
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    usuario_id: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    punto_qr_id: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="siguiente_cursor de la página anterior"),
+    solo_alertas_gps: bool = Query(False, description="Solo visitas con alertas de GPS"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Una página de visitas enriquecidas, de la más reciente a la más antigua.
+    Para la página siguiente enviar cursor=siguiente_cursor (null = no hay más).
+    """
+    verificar_admin(current_user)
+    
+    try:
+        paginas = iterar_paginas_visitas(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            usuario_id=usuario_id,
+            servicio_id=servicio_id,
+            punto_qr_id=punto_qr_id,
+            tamano_pagina=limit,
+            desde_id=cursor,
+            solo_alertas_gps=solo_alertas_gps,
+        )
+        visitas = next(paginas, [])
+        enriquecer_visitas(visitas, {}, {})
+        agregar_miniaturas(visitas)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener visitas: {str(e)}")
+    
+    return {
+        "visitas": visitas,
+        "siguiente_cursor": visitas[-1]["id"] if len(visitas) == limit else None,
+        "limit": limit
+    }
+
+
+@router.get("/visitas/buscar")
+async def buscar_visitas(
+    q: str = Query(..., min_length=2, max_length=200, description="Palabras a buscar en las observaciones"),
+    servicio_id: Optional[int] = Query(None),
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    tipo: Optional[str] = Query(None, regex="^(normal|observacion|incidencia)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Busca en las observaciones de las visitas (español, sin distinguir
+    acentos ni plurales: "puerta abierta" encuentra "Puertas abiertas").
+    Resultados de más a menos relevantes, con `fragmento` (coincidencias
+    entre « »). Para la página siguiente enviar cursor=siguiente_cursor.
+    """
+    verificar_admin(current_user)
+    # Los supervisores solo buscan en su servicio
+    if current_user.rol == "supervisor":
+        servicio_id = current_user.servicio_id
+
+    try:
+        posicion = leer_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        resultados = await asyncio.to_thread(
+            buscar_en_postgres, q, servicio_id, fecha_inicio, fecha_fin, tipo, limit + 1, posicion
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar visitas: {str(e)}")
+    if resultados is None:
+        # Sin la migración 007: índice en memoria del servicio y período (cacheado)
+        cache = obtener_cache_reportes()
+        filtros = {"fecha_inicio": fecha_inicio}
+        indice = cache.obtener("busqueda", servicio_id, fecha_fin, **filtros)
+        if indice is None:
+            indice = await asyncio.to_thread(construir_indice, servicio_id, fecha_inicio, fecha_fin)
+            cache.guardar("busqueda", servicio_id, fecha_fin, indice, **filtros)
+        resultados = indice.buscar(q, tipo=tipo, limite=limit + 1, cursor=posicion)
+
+    resultados, siguiente = pagina_busqueda(resultados, limit)
+    try:
+        await asyncio.to_thread(enriquecer_visitas, resultados, {}, {})
+        await asyncio.to_thread(agregar_miniaturas, resultados)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al buscar visitas: {str(e)}")
+
+    return {
+        "resultados": resultados,
+        "siguiente_cursor": siguiente,
+        "limit": limit
+    }
+
+
+@router.get("/visitas/stream")
+async def stream_visitas(
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    usuario_id: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    punto_qr_id: Optional[str] = Query(None),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Todas las visitas filtradas como NDJSON (una visita JSON por línea).
+    Se envían página por página, así el cliente puede ir mostrándolas.
+    """
+    verificar_admin(current_user)
+    
+    def generar():
+        usuarios_cache = {}
+        puntos_cache = {}
+        for pagina in iterar_paginas_visitas(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            usuario_id=usuario_id,
+            servicio_id=servicio_id,
+            punto_qr_id=punto_qr_id,
+            tamano_pagina=500,
+        ):
+            enriquecer_visitas(pagina, usuarios_cache, puntos_cache)
+            yield "".join(json.dumps(v, default=str, ensure_ascii=False) + "\n" for v in pagina).encode("utf-8")
+    
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
+
+
 @router.get("/puntos-ranking")
 async def obtener_ranking_puntos(
     fecha_inicio: Optional[str] = Query(None),
@@ -156,64 +349,164 @@ async def obtener_ranking_puntos(
     """
     verificar_admin(current_user)
     
+    cache = obtener_cache_reportes()
+    filtros_cache = {"fecha_inicio": fecha_inicio, "limit": limit}
+    resultado_cache = cache.obtener("puntos-ranking", servicio_id, fecha_fin, **filtros_cache)
+    if resultado_cache is not None:
+        return resultado_cache
+    
     supabase = get_supabase_client()
     
     try:
-        # Obtener visitas con filtros
-        query = supabase.table("visitas").select("punto_qr_id")
+        # Conteos desde el resumen diario (si está disponible)
+        conteos = conteos_punto_guardia(fecha_inicio, fecha_fin, servicio_id)
         
-        if fecha_inicio:
-            query = query.gte("created_at", fecha_inicio)
-        if fecha_fin:
-            fecha_fin_dt = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
-            from datetime import timedelta
-            fecha_fin_dt = fecha_fin_dt + timedelta(days=1)
-            query = query.lt("created_at", fecha_fin_dt.isoformat())
-        
-        response = query.execute()
-        visitas = response.data
-        
-        # ⭐ FILTRAR POR SERVICIO_ID ⭐
-        if servicio_id:
-            puntos_resp = supabase.table("puntos_qr").select("id").eq("servicio_id", servicio_id).execute()
-            puntos_ids = [p["id"] for p in puntos_resp.data]
-            visitas = [v for v in visitas if v.get("punto_qr_id") in puntos_ids]
-        
-        # Contar visitas por punto
-        contador = {}
-        for visita in visitas:
-            punto_id = visita.get("punto_qr_id")
-            if punto_id:
-                contador[punto_id] = contador.get(punto_id, 0) + 1
+        if conteos is not None:
+            ranking = ranking_desde_conteos(conteos, limit)
+        else:
+            # Obtener visitas con filtros
+            query = supabase.table("visitas").select("punto_qr_id")
+            
+            if fecha_inicio:
+                query = query.gte("created_at", fecha_inicio)
+            if fecha_fin:
+                fecha_fin_dt = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
+                from datetime import timedelta
+                fecha_fin_dt = fecha_fin_dt + timedelta(days=1)
+                query = query.lt("created_at", fecha_fin_dt.isoformat())
+            
+            response = query.execute()
+            visitas = response.data
+            
+            # ⭐ FILTRAR POR SERVICIO_ID ⭐
+            if servicio_id:
+                puntos_resp = supabase.table("puntos_qr").select("id").eq("servicio_id", servicio_id).execute()
+                puntos_ids = [p["id"] for p in puntos_resp.data]
+                visitas = [v for v in visitas if v.get("punto_qr_id") in puntos_ids]
+            
+            # Contar visitas por punto
+            contador = {}
+            for visita in visitas:
+                punto_id = visita.get("punto_qr_id")
+                if punto_id:
+                    contador[punto_id] = contador.get(punto_id, 0) + 1
+            
+            # Ordenar por cantidad de visitas
+            ranking = sorted(contador.items(), key=lambda x: x[1], reverse=True)[:limit]
         
-        # Ordenar por cantidad de visitas
-        ranking = sorted(contador.items(), key=lambda x: x[1], reverse=True)[:limit]
+        # Obtener información de los puntos (una sola query)
+        puntos_info = {}
+        if ranking:
+            try:
+                punto_resp = supabase.table("puntos_qr").select("id, nombre, qr_code").in_("id", [p for p, _ in ranking]).execute()
+                puntos_info = {p["id"]: p for p in punto_resp.data}
+            except:
+                pass
         
-        # Obtener información de los puntos
         resultado = []
         for punto_id, visitas_count in ranking:
-            try:
-                punto_resp = supabase.table("puntos_qr").select("*").eq("id", punto_id).execute()
-                if punto_resp.data:
-                    punto = punto_resp.data[0]
-                    resultado.append({
-                        "punto_id": punto_id,
-                        "nombre": punto.get("nombre"),
-                        "codigo": punto.get("qr_code"),
-                        "total_visitas": visitas_count
-                    })
-            except:
-                continue
+            punto = puntos_info.get(punto_id)
+            if punto:
+                resultado.append({
+                    "punto_id": punto_id,
+                    "nombre": punto.get("nombre"),
+                    "codigo": punto.get("qr_code"),
+                    "total_visitas": visitas_count
+                })
         
-        return {
+        respuesta = {
             "ranking": resultado,
             "total_puntos": len(resultado)
         }
+        cache.guardar("puntos-ranking", servicio_id, fecha_fin, respuesta, **filtros_cache)
+        
+        return respuesta
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener ranking: {str(e)}")
 
 
+@router.get("/cumplimiento")
+async def obtener_reporte_cumplimiento(
+    servicio_id: int = Query(...),
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    punto_qr_id: Optional[int] = Query(None),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Rondas esperadas vs. cumplidas según el horario y el intervalo de ronda del
+    servicio, en total, por día, por punto y por guardia. Las fechas son días
+    locales del servicio (fecha_fin incluida).
+    """
+    verificar_admin(current_user)
+    
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="fecha_fin debe ser posterior a fecha_inicio")
+    if (fecha_fin - fecha_inicio).days > 366:
+        raise HTTPException(status_code=400, detail="El período máximo es de un año")
+    
+    resultado = await asyncio.to_thread(reporte_cumplimiento, servicio_id, fecha_inicio, fecha_fin, punto_qr_id)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+    return resultado
+
+
+@router.get("/intervalos")
+async def obtener_reporte_intervalos(
+    servicio_id: int = Query(...),
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    solo_turno: bool = Query(True, description="Medir los intervalos solo en horario de servicio"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Intervalos entre visitas consecutivas de cada punto (p50, p95, máximo y
+    cuántos superan el intervalo de ronda), para detectar puntos descuidados.
+    Las fechas son días locales del servicio (fecha_fin incluida).
+    """
+    verificar_admin(current_user)
+    
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="fecha_fin debe ser posterior a fecha_inicio")
+    if (fecha_fin - fecha_inicio).days > 366:
+        raise HTTPException(status_code=400, detail="El período máximo es de un año")
+    
+    resultado = await asyncio.to_thread(reporte_intervalos, servicio_id, fecha_inicio, fecha_fin, solo_turno)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+    return resultado
+
+
+@router.get("/recorridos")
+async def obtener_reporte_recorridos(
+    servicio_id: int = Query(...),
+    fecha_inicio: date = Query(...),
+    fecha_fin: date = Query(...),
+    guardia_id: Optional[int] = None,
+    formato: str = Query("json", regex="^(json|geojson)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Recorridos por guardia y turno: secuencia de visitas, distancia total y
+    velocidad entre escaneos. formato=geojson devuelve un FeatureCollection
+    con un LineString por recorrido. Las fechas son días locales del servicio.
+    """
+    verificar_admin(current_user)
+    
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=400, detail="fecha_fin debe ser posterior a fecha_inicio")
+    if (fecha_fin - fecha_inicio).days > 31:
+        raise HTTPException(status_code=400, detail="El período máximo es de 31 días")
+    
+    resultado = await asyncio.to_thread(reporte_recorridos, servicio_id, fecha_inicio, fecha_fin, guardia_id)
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+    if formato == "geojson":
+        return recorridos_geojson(resultado)
+    return resultado
+
+
 @router.get("/alertas")
 async def obtener_reporte_alertas(
     fecha_inicio: Optional[str] = Query(None),
@@ -274,193 +567,328 @@ async def obtener_reporte_alertas(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener alertas: {str(e)}")
     
-@router.post("/exportar-excel")
-async def exportar_excel(
-    fecha_inicio: Optional[str] = Query(None),
-    fecha_fin: Optional[str] = Query(None),
-    servicio_id: Optional[int] = Query(None),
-    tipo: str = Query("visitas", regex="^(visitas|ranking|alertas|incidencias)$"),
-    timezone: str = Query("UTC"),
-    current_user: UserResponse = Depends(get_current_user)
+# Alto en píxeles de la miniatura embebida en cada fila del Excel
+ALTO_MINIATURA_EXCEL = 48
+
+
+def construir_excel(
+    destino,
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    servicio_id: Optional[int] = None,
+    tipo: str = "visitas",
+    timezone: str = "UTC"
 ):
     """
-    Exporta reportes a Excel
+    Genera el reporte Excel y lo guarda en destino (ruta o archivo).
+    Se ejecuta en el pool de procesos de reportes.
     """
-    verificar_admin(current_user)
+    # Crear workbook
+    wb = Workbook()
+    ws = wb.active
     
-    supabase = get_supabase_client()
+    # Estilos
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(color="FFFFFF", bold=True, size=12)
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
     
+    # Obtener zona horaria del usuario
     try:
-        # Crear workbook
-        wb = Workbook()
-        ws = wb.active
-        
-        # Estilos
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True, size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        user_tz = pytz.timezone(timezone)
+    except:
+        user_tz = pytz.UTC
+    
+    if tipo == "visitas" or tipo == "incidencias":
+        # Título y metadatos
+        ws.title = "Reporte de Incidencias" if tipo == "incidencias" else "Reporte de Visitas"
+        ws['A1'] = f"REPORTE DE {'INCIDENCIAS' if tipo == 'incidencias' else 'VISITAS'} - ACRUX 360"
+        ws['A1'].font = Font(size=16, bold=True)
+        ws.merge_cells('A1:F1')
         
-        # Obtener zona horaria del usuario
-        try:
-            user_tz = pytz.timezone(timezone)
-        except:
-            user_tz = pytz.UTC
+        # Convertir hora actual a zona horaria del usuario
+        now_utc = datetime.now(pytz.UTC)
+        now_local = now_utc.astimezone(user_tz)
+        ws['A2'] = f"Generado: {now_local.strftime('%d/%m/%Y %H:%M')}"
         
-        if tipo == "visitas" or tipo == "incidencias":
-            # Obtener datos de visitas
-            query = supabase.table("visitas").select("*")
-            if fecha_inicio:
-                query = query.gte("created_at", fecha_inicio)
-            if fecha_fin:
-                fecha_fin_dt = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
-                from datetime import timedelta
-                fecha_fin_dt = fecha_fin_dt + timedelta(days=1)
-                query = query.lt("created_at", fecha_fin_dt.isoformat())
-            
-            # Filtrar por tipo de visita si es incidencias
-            if tipo == "incidencias":
-                query = query.eq("tipo", "incidencia")
-            
-            query = query.order("created_at", desc=True)
-            response = query.execute()
-            visitas = response.data
-            
-            # ⭐ FILTRAR POR SERVICIO_ID ⭐
-            if servicio_id:
-                puntos_resp = supabase.table("puntos_qr").select("id").eq("servicio_id", servicio_id).execute()
-                puntos_ids = [p["id"] for p in puntos_resp.data]
-                visitas = [v for v in visitas if v.get("punto_qr_id") in puntos_ids]
-            
-            # Título y metadatos
-            ws.title = "Reporte de Incidencias" if tipo == "incidencias" else "Reporte de Visitas"
-            ws['A1'] = f"REPORTE DE {'INCIDENCIAS' if tipo == 'incidencias' else 'VISITAS'} - ACRUX 360"
-            ws['A1'].font = Font(size=16, bold=True)
-            ws.merge_cells('A1:F1')
-            
-            # Convertir hora actual a zona horaria del usuario
-            now_utc = datetime.now(pytz.UTC)
-            now_local = now_utc.astimezone(user_tz)
-            ws['A2'] = f"Generado: {now_local.strftime('%d/%m/%Y %H:%M')}"
-            
-            if fecha_inicio or fecha_fin:
-                ws['A3'] = f"Período: {fecha_inicio or 'Inicio'} - {fecha_fin or 'Actualidad'}"
-            
-            # Headers - COLUMNAS ACTUALIZADAS
-            headers = ["Fecha", "Hora", "Punto Visitado", "Guardia", "Estatus", "Observaciones"]
-            ws.append([])  # Fila vacía
-            ws.append(headers)
-            
-            header_row = ws.max_row
-            for col in range(1, len(headers) + 1):
-                cell = ws.cell(row=header_row, column=col)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.border = border
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Enriquecer y agregar datos
-            usuarios_cache = {}
-            puntos_cache = {}
+        if fecha_inicio or fecha_fin:
+            ws['A3'] = f"Período: {fecha_inicio or 'Inicio'} - {fecha_fin or 'Actualidad'}"
+        
+        # Headers - COLUMNAS ACTUALIZADAS
+        headers = ["Fecha", "Hora", "Punto Visitado", "Guardia", "Estatus", "Observaciones", "Adjuntos", "Foto"]
+        ws.append([])  # Fila vacía
+        ws.append(headers)
+        
+        header_row = ws.max_row
+        for col in range(1, len(headers) + 1):
+            cell = ws.cell(row=header_row, column=col)
+            cell.fill = header_fill
+            cell.font = header_font
+            cell.border = border
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+        
+        # Visitas por páginas, enriquecidas con consultas `in_` por página
+        usuarios_cache = {}
+        puntos_cache = {}
+        total = 0
+        guardias = set()
+        puntos = set()
+        
+        for pagina in iterar_paginas_visitas(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            servicio_id=servicio_id,
+            tipo="incidencia" if tipo == "incidencias" else None,
+            columnas="id, created_at, guardia_id, punto_qr_id, observacion",
+        ):
+            enriquecer_visitas(pagina, usuarios_cache, puntos_cache)
+            agregar_miniaturas(pagina, para_exportar=True)
             
-            for visita in visitas:
-                # Obtener nombres
-                usuario_nombre = "Desconocido"
-                if visita.get("guardia_id"):
-                    if visita["guardia_id"] not in usuarios_cache:
-                        try:
-                            user_resp = supabase.table("usuarios").select("nombre, email").eq("id", visita["guardia_id"]).execute()
-                            if user_resp.data:
-                                usuarios_cache[visita["guardia_id"]] = user_resp.data[0]
-                        except:
-                            usuarios_cache[visita["guardia_id"]] = {"nombre": "Desconocido", "email": ""}
-                    
-                    usuario_nombre = usuarios_cache[visita["guardia_id"]].get("nombre", "Desconocido")
-                
-                punto_nombre = "Desconocido"
-                if visita.get("punto_qr_id"):
-                    if visita["punto_qr_id"] not in puntos_cache:
-                        try:
-                            punto_resp = supabase.table("puntos_qr").select("nombre, qr_code").eq("id", visita["punto_qr_id"]).execute()
-                            if punto_resp.data:
-                                puntos_cache[visita["punto_qr_id"]] = punto_resp.data[0]
-                        except:
-                            puntos_cache[visita["punto_qr_id"]] = {"nombre": "Desconocido", "qr_code": ""}
-                    
-                    punto_nombre = puntos_cache[visita["punto_qr_id"]].get("nombre", "Desconocido")
+            for visita in pagina:
+                fecha_str, hora_str = formatear_fecha_local(visita.get("created_at"), user_tz)
                 
-                # Formatear fecha con zona horaria del usuario
-                created_at = visita.get("created_at", "")
-                fecha_str = ""
-                hora_str = ""
-                if created_at:
-                    try:
-                        dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                        dt_local = dt.astimezone(user_tz)
-                        fecha_str = dt_local.strftime('%d/%m/%Y')
-                        hora_str = dt_local.strftime('%H:%M')
-                    except:
-                        pass
-                
-                # COLUMNAS ACTUALIZADAS: Fecha, Hora, Punto, Guardia, Estatus, Observaciones
+                # COLUMNAS ACTUALIZADAS: Fecha, Hora, Punto, Guardia, Estatus, Observaciones, Adjuntos, Foto
                 row_data = [
                     fecha_str,
                     hora_str,
-                    punto_nombre,
-                    usuario_nombre,
+                    visita["punto_nombre"],
+                    visita["usuario_nombre"],
                     "Visitado",  # Estatus
-                    visita.get("observacion", "")
+                    visita.get("observacion", ""),
+                    " ".join(visita["adjuntos"])  # URL de las miniaturas
                 ]
                 ws.append(row_data)
+                fila = ws.max_row
                 
                 # Aplicar bordes
                 for col in range(1, len(headers) + 1):
-                    ws.cell(row=ws.max_row, column=col).border = border
-            
-            # Ajustar anchos de columna
-            ws.column_dimensions['A'].width = 12  # Fecha
-            ws.column_dimensions['B'].width = 8   # Hora
-            ws.column_dimensions['C'].width = 30  # Punto
-            ws.column_dimensions['D'].width = 25  # Guardia
-            ws.column_dimensions['E'].width = 12  # Estatus
-            ws.column_dimensions['F'].width = 40  # Observaciones
-            
-            # Agregar hoja de estadísticas
-            ws_stats = wb.create_sheet("Estadísticas")
-            ws_stats['A1'] = "ESTADÍSTICAS DEL PERÍODO"
-            ws_stats['A1'].font = Font(size=14, bold=True)
-            ws_stats.append([])
-            ws_stats.append(["Total de visitas:", len(visitas)])
-            ws_stats.append(["Usuarios únicos:", len(set(v.get("guardia_id") for v in visitas if v.get("guardia_id")))])
-            ws_stats.append(["Puntos visitados:", len(set(v.get("punto_qr_id") for v in visitas if v.get("punto_qr_id")))])
-            
-        elif tipo == "ranking":
-            ws.title = "Ranking de Puntos"
-            # Implementar similar a visitas
-            
-        elif tipo == "alertas":
-            ws.title = "Reporte de Alertas"
-            # Implementar similar a visitas
+                    ws.cell(row=fila, column=col).border = border
+                
+                # Miniatura de la primera foto, embebida en la columna Foto
+                if visita["miniatura_archivo"]:
+                    imagen = ImagenExcel(visita["miniatura_archivo"])
+                    escala = ALTO_MINIATURA_EXCEL / max(imagen.height, 1)
+                    imagen.width, imagen.height = imagen.width * escala, ALTO_MINIATURA_EXCEL
+                    ws.add_image(imagen, f"H{fila}")
+                    ws.row_dimensions[fila].height = ALTO_MINIATURA_EXCEL * 0.75 + 4  # px -> pt
+                
+                total += 1
+                if visita.get("guardia_id"):
+                    guardias.add(visita["guardia_id"])
+                if visita.get("punto_qr_id"):
+                    puntos.add(visita["punto_qr_id"])
         
-        # Guardar en memoria
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        # Ajustar anchos de columna
+        ws.column_dimensions['A'].width = 12  # Fecha
+        ws.column_dimensions['B'].width = 8   # Hora
+        ws.column_dimensions['C'].width = 30  # Punto
+        ws.column_dimensions['D'].width = 25  # Guardia
+        ws.column_dimensions['E'].width = 12  # Estatus
+        ws.column_dimensions['F'].width = 40  # Observaciones
+        ws.column_dimensions['G'].width = 30  # Adjuntos
+        ws.column_dimensions['H'].width = 12  # Foto
         
-        filename = f"reporte_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        # Agregar hoja de estadísticas
+        ws_stats = wb.create_sheet("Estadísticas")
+        ws_stats['A1'] = "ESTADÍSTICAS DEL PERÍODO"
+        ws_stats['A1'].font = Font(size=14, bold=True)
+        ws_stats.append([])
+        ws_stats.append(["Total de visitas:", total])
+        ws_stats.append(["Usuarios únicos:", len(guardias)])
+        ws_stats.append(["Puntos visitados:", len(puntos)])
         
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+    elif tipo == "ranking":
+        ws.title = "Ranking de Puntos"
+        # Implementar similar a visitas
         
+    elif tipo == "alertas":
+        ws.title = "Reporte de Alertas"
+        # Implementar similar a visitas
+    
+    wb.save(destino)
+
+
+def preparar_pdf(
+    fecha_inicio: Optional[str] = None,
+    fecha_fin: Optional[str] = None,
+    servicio_id: Optional[int] = None,
+    tipo: str = "visitas",
+    timezone: str = "UTC"
+) -> dict:
+    """
+    Parte del reporte PDF que corre en el proceso principal: lee y enriquece
+    todas las visitas del período por páginas y las escribe en lotes a un
+    archivo intermedio. Devuelve los kwargs de renderizar_pdf_visitas.
+    """
+    kwargs = {
+        "tipo": tipo,
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_fin,
+        "timezone": timezone,
+        "stats": None,
+        "ruta_filas": None,
+        "max_segundos": settings.reportes_pdf_max_segundos,
+        "max_memoria_mb": settings.reportes_pdf_max_memoria_mb,
+    }
+    if tipo not in ("visitas", "incidencias"):
+        return kwargs
+
+    tipo_visita = "incidencia" if tipo == "incidencias" else None
+    user_tz = _zona_horaria(timezone)
+
+    fd, ruta_filas = tempfile.mkstemp(suffix=".filas.tmp", dir=obtener_cola().almacen.directorio)
+    total = 0
+    guardias = set()
+    puntos = set()
+    try:
+        with os.fdopen(fd, "wb") as archivo:
+            usuarios_cache = {}
+            puntos_cache = {}
+            for pagina in iterar_paginas_visitas(
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                servicio_id=servicio_id,
+                tipo=tipo_visita,
+                columnas="id, created_at, guardia_id, punto_qr_id",
+            ):
+                enriquecer_visitas(pagina, usuarios_cache, puntos_cache)
+                agregar_miniaturas(pagina, para_exportar=True)
+                lote = []
+                for visita in pagina:
+                    fecha_str, hora_str = formatear_fecha_local(visita.get("created_at"), user_tz)
+                    lote.append((
+                        fecha_str, hora_str, visita["punto_nombre"], visita["usuario_nombre"],
+                        visita["miniatura_archivo"]
+                    ))
+                    if visita.get("guardia_id"):
+                        guardias.add(visita["guardia_id"])
+                    if visita.get("punto_qr_id"):
+                        puntos.add(visita["punto_qr_id"])
+                total += len(lote)
+                escribir_lote(archivo, lote)
+    except Exception:
+        os.remove(ruta_filas)
+        raise
+
+    # Estadísticas del período completo (resumen diario); si no está, de las visitas leídas
+    conteos = conteos_punto_guardia(fecha_inicio, fecha_fin, servicio_id, tipo=tipo_visita)
+    if conteos is not None:
+        kwargs["stats"] = estadisticas_desde_conteos(conteos)
+    else:
+        kwargs["stats"] = {
+            "total_visitas": total,
+            "usuarios_unicos": len(guardias),
+            "puntos_visitados": len(puntos),
+        }
+    kwargs["ruta_filas"] = ruta_filas
+    return kwargs
+
+
+@router.post("/resumenes/reconstruir")
+async def reconstruir_resumenes(
+    desde: Optional[date] = Query(None, description="Reconstruir a partir de este día (vacío = todo)"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Reconstruye el resumen diario de visitas desde las visitas crudas.
+    Normalmente no hace falta: el resumen se actualiza con cada visita insertada.
+    """
+    if current_user.rol not in ["admin", "administrador"]:
+        raise HTTPException(
+            status_code=403,
+            detail="Solo administradores pueden reconstruir los resúmenes"
+        )
+    
+    try:
+        filas = reconstruir_resumen(desde)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al exportar Excel: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error al reconstruir resúmenes: {str(e)}")
+    
+    return {"filas": filas, "desde": desde}
+
+
+# ============ TRABAJOS DE REPORTES EN SEGUNDO PLANO ============
+
+# formato -> (función que genera el archivo en el pool, extensión, media type)
+FORMATOS_REPORTE = {
+    "excel": (construir_excel, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": (renderizar_pdf_visitas, "pdf", "application/pdf"),
+}
+
+# Formatos cuyos datos se leen en el proceso principal antes de enviar al pool
+PREPARAR_REPORTE = {
+    "pdf": preparar_pdf,
+}
+
+
+def _encolar_reporte(
+    formato: str,
+    fecha_inicio: Optional[str],
+    fecha_fin: Optional[str],
+    servicio_id: Optional[int],
+    tipo: str,
+    timezone: str
+) -> Trabajo:
+    """Encola (o reutiliza) el trabajo que genera el reporte con estos filtros"""
+    funcion, extension, _ = FORMATOS_REPORTE[formato]
+    filtros = {
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_fin,
+        "servicio_id": servicio_id,
+        "tipo": tipo,
+        "timezone": timezone,
+    }
+    clave = clave_trabajo(formato=formato, **filtros)
+    try:
+        # Si el período incluye hoy, un archivo ya terminado puede no tener
+        # las últimas visitas: solo se comparte el trabajo en curso
+        return obtener_cola().enviar(
+            clave, f"reporte_{tipo}.{extension}", funcion,
+            preparar=PREPARAR_REPORTE.get(formato),
+            reutilizar_terminado=periodo_cerrado(fecha_fin), **filtros
+        )
+    except ColaLlenaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _respuesta_archivo(trabajo: Trabajo, formato: str) -> FileResponse:
+    _, extension, media_type = FORMATOS_REPORTE[formato]
+    tipo = trabajo.nombre.split(".")[0].replace("reporte_", "")
+    fecha = (trabajo.finalizado or datetime.utcnow()).strftime('%Y%m%d_%H%M%S')
+    filename = f"reporte_{tipo}_{fecha}.{extension}"
+    return FileResponse(
+        trabajo.ruta,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.post("/exportar-excel")
+async def exportar_excel(
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    tipo: str = Query("visitas", regex="^(visitas|ranking|alertas|incidencias)$"),
+    timezone: str = Query("UTC"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Exporta reportes a Excel.
+    La generación corre en el pool de reportes; pedidos idénticos comparten el archivo.
+    """
+    verificar_admin(current_user)
+    
+    cola = obtener_cola()
+    trabajo = await cola.esperar(_encolar_reporte("excel", fecha_inicio, fecha_fin, servicio_id, tipo, timezone))
+    
+    if trabajo.estado != "completado":
+        raise HTTPException(status_code=500, detail=f"Error al exportar Excel: {trabajo.error}")
+    
+    return _respuesta_archivo(trabajo, "excel")
 
 
 @router.post("/exportar-pdf")
@@ -473,181 +901,260 @@ async def exportar_pdf(
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
-    Exporta reportes a PDF
+    Exporta reportes a PDF.
+    La generación corre en el pool de reportes; pedidos idénticos comparten el archivo.
     """
     verificar_admin(current_user)
     
-    supabase = get_supabase_client()
+    cola = obtener_cola()
+    trabajo = await cola.esperar(_encolar_reporte("pdf", fecha_inicio, fecha_fin, servicio_id, tipo, timezone))
+    
+    if trabajo.estado != "completado":
+        raise HTTPException(status_code=500, detail=f"Error al exportar PDF: {trabajo.error}")
     
+    return _respuesta_archivo(trabajo, "pdf")
+
+
+@router.post("/trabajos")
+async def crear_trabajo_reporte(
+    formato: str = Query("excel", regex="^(excel|pdf)$"),
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    tipo: str = Query("visitas", regex="^(visitas|ranking|alertas|incidencias)$"),
+    timezone: str = Query("UTC"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Encola la generación de un reporte y responde de inmediato.
+    Consultar GET /reportes/trabajos/{trabajo_id} y descargar con /descarga.
+    """
+    verificar_admin(current_user)
+    
+    trabajo = _encolar_reporte(formato, fecha_inicio, fecha_fin, servicio_id, tipo, timezone)
+    return {**trabajo.a_dict(), "formato": formato}
+
+
+@router.get("/trabajos/{trabajo_id}")
+async def obtener_trabajo_reporte(
+    trabajo_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Estado de un trabajo de reporte"""
+    verificar_admin(current_user)
+    
+    trabajo = obtener_cola().obtener(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    
+    return trabajo.a_dict()
+
+
+@router.get("/trabajos/{trabajo_id}/descarga")
+async def descargar_trabajo_reporte(
+    trabajo_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Descarga el archivo generado por un trabajo completado"""
+    verificar_admin(current_user)
+    
+    trabajo = obtener_cola().obtener(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    if trabajo.estado == "error":
+        raise HTTPException(status_code=500, detail=f"Error al generar reporte: {trabajo.error}")
+    if trabajo.estado != "completado":
+        raise HTTPException(status_code=409, detail="El reporte todavía se está generando")
+    
+    formato = "pdf" if trabajo.nombre.endswith(".pdf") else "excel"
+    return _respuesta_archivo(trabajo, formato)
+
+
+# ============ EXPORTACIONES STREAMING (CSV / PARQUET / ARROW) ============
+
+COLUMNAS_EXPORTACION = [
+    "id", "fecha", "hora", "created_at", "fecha_hora", "servicio_id",
+    "punto_qr_id", "punto_nombre", "punto_codigo", "guardia_id",
+    "usuario_nombre", "tipo", "observacion", "latitud", "longitud", "alertas_gps",
+    "adjuntos"
+]
+
+
+def _filas_exportacion(
+    fecha_inicio: Optional[str],
+    fecha_fin: Optional[str],
+    servicio_id: Optional[int],
+    tipo: str,
+    user_tz,
+):
+    """
+    Genera listas de filas (una lista por página de visitas) ya enriquecidas.
+    Los caches de nombres crecen con la cantidad de guardias/puntos, no con las visitas.
+    """
+    usuarios_cache = {}
+    puntos_cache = {}
+
+    for pagina in iterar_paginas_visitas(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin,
+        servicio_id=servicio_id,
+        tipo="incidencia" if tipo == "incidencias" else None,
+    ):
+        enriquecer_visitas(pagina, usuarios_cache, puntos_cache)
+        agregar_miniaturas(pagina, para_exportar=True)
+
+        filas = []
+        for visita in pagina:
+            fecha_str, hora_str = formatear_fecha_local(visita.get("created_at"), user_tz)
+            filas.append({
+                **{col: visita.get(col) for col in COLUMNAS_EXPORTACION},
+                "fecha": fecha_str,
+                "hora": hora_str,
+                "alertas_gps": ",".join(visita.get("alertas_gps") or []),
+                "adjuntos": " ".join(visita["adjuntos"]),
+            })
+        yield filas
+
+
+def _zona_horaria(timezone: str):
     try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Obtener zona horaria del usuario
+        return pytz.timezone(timezone)
+    except Exception:
+        return pytz.UTC
+
+
+@router.post("/exportar-csv")
+async def exportar_csv(
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    tipo: str = Query("visitas", regex="^(visitas|incidencias)$"),
+    timezone: str = Query("UTC"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Exporta visitas a CSV, enviando fila por fila a medida que se leen las páginas.
+    No tiene límite de filas: la memoria usada es la de una página.
+    """
+    verificar_admin(current_user)
+
+    user_tz = _zona_horaria(timezone)
+
+    def generar():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORTACION)
+
+        # BOM para que Excel detecte UTF-8
+        buffer.write("\ufeff")
+        writer.writeheader()
+        yield buffer.getvalue().encode("utf-8")
+
+        for filas in _filas_exportacion(fecha_inicio, fecha_fin, servicio_id, tipo, user_tz):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(filas)
+            yield buffer.getvalue().encode("utf-8")
+
+    filename = f"reporte_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def _parsear_timestamp(valor: Optional[str]):
+    if not valor:
+        return None
+    try:
+        dt = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    return dt
+
+
+def _esquema_arrow():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("fecha", pa.string()),
+        ("hora", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("fecha_hora", pa.timestamp("us", tz="UTC")),
+        ("servicio_id", pa.int64()),
+        ("punto_qr_id", pa.int64()),
+        ("punto_nombre", pa.string()),
+        ("punto_codigo", pa.string()),
+        ("guardia_id", pa.int64()),
+        ("usuario_nombre", pa.string()),
+        ("tipo", pa.string()),
+        ("observacion", pa.string()),
+        ("latitud", pa.float64()),
+        ("longitud", pa.float64()),
+        ("alertas_gps", pa.string()),
+        ("adjuntos", pa.string()),
+    ])
+
+
+def _tabla_arrow(filas: List[dict], esquema):
+    """Convierte una página de filas a una tabla Arrow columnar"""
+    columnas = {col: [fila.get(col) for fila in filas] for col in esquema.names}
+    columnas["created_at"] = [_parsear_timestamp(v) for v in columnas["created_at"]]
+    columnas["fecha_hora"] = [_parsear_timestamp(v) for v in columnas["fecha_hora"]]
+    return pa.Table.from_pydict(columnas, schema=esquema)
+
+
+@router.post("/exportar-columnar")
+async def exportar_columnar(
+    fecha_inicio: Optional[str] = Query(None),
+    fecha_fin: Optional[str] = Query(None),
+    servicio_id: Optional[int] = Query(None),
+    tipo: str = Query("visitas", regex="^(visitas|incidencias)$"),
+    formato: str = Query("parquet", regex="^(parquet|arrow)$"),
+    timezone: str = Query("UTC"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Exporta visitas en formato columnar para BI:
+    - parquet: un row group por página de visitas
+    - arrow: stream IPC de Arrow, un record batch por página
+    """
+    verificar_admin(current_user)
+
+    if pa is None:
+        raise HTTPException(status_code=501, detail="Exportación columnar no disponible: falta pyarrow")
+
+    user_tz = _zona_horaria(timezone)
+    esquema = _esquema_arrow()
+
+    def generar():
+        salida = SalidaDrenable()
+        if formato == "parquet":
+            writer = pq.ParquetWriter(salida, esquema, compression="snappy")
+        else:
+            writer = pa.ipc.new_stream(salida, esquema)
+
         try:
-            user_tz = pytz.timezone(timezone)
-        except:
-            user_tz = pytz.UTC
-        
-        # Estilo personalizado para título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#366092'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        # Título
-        elements.append(Paragraph(f"REPORTE DE {tipo.upper()} - ACRUX 360", title_style))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Metadatos con zona horaria local
-        meta_style = styles['Normal']
-        now_utc = datetime.now(pytz.UTC)
-        now_local = now_utc.astimezone(user_tz)
-        elements.append(Paragraph(f"<b>Generado:</b> {now_local.strftime('%d/%m/%Y %H:%M')}", meta_style))
-        
-        if fecha_inicio or fecha_fin:
-            elements.append(Paragraph(f"<b>Período:</b> {fecha_inicio or 'Inicio'} - {fecha_fin or 'Actualidad'}", meta_style))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        if tipo == "visitas" or tipo == "incidencias":
-            # Obtener datos
-            query = supabase.table("visitas").select("*")
-            if fecha_inicio:
-                query = query.gte("created_at", fecha_inicio)
-            if fecha_fin:
-                fecha_fin_dt = datetime.fromisoformat(fecha_fin.replace('Z', '+00:00'))
-                from datetime import timedelta
-                fecha_fin_dt = fecha_fin_dt + timedelta(days=1)
-                query = query.lt("created_at", fecha_fin_dt.isoformat())
-            
-            # Filtrar por tipo de visita si es incidencias
-            if tipo == "incidencias":
-                query = query.eq("tipo", "incidencia")
-            
-            query = query.order("created_at", desc=True).limit(100)  # Limitar para PDF
-            response = query.execute()
-            visitas = response.data
-            
-            # ⭐ FILTRAR POR SERVICIO_ID ⭐
-            if servicio_id:
-                puntos_resp = supabase.table("puntos_qr").select("id").eq("servicio_id", servicio_id).execute()
-                puntos_ids = [p["id"] for p in puntos_resp.data]
-                visitas = [v for v in visitas if v.get("punto_qr_id") in puntos_ids]
-            
-            # Estadísticas
-            stats_data = [
-                ["Estadística", "Valor"],
-                ["Total de visitas", str(len(visitas))],
-                ["Usuarios únicos", str(len(set(v.get("guardia_id") for v in visitas if v.get("guardia_id"))))],
-                ["Puntos visitados", str(len(set(v.get("punto_qr_id") for v in visitas if v.get("punto_qr_id"))))]
-            ]
-            
-            stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
-            stats_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            elements.append(stats_table)
-            elements.append(Spacer(1, 0.5*inch))
-            
-            # Tabla de visitas (limitada a primeras 50) - COLUMNAS ACTUALIZADAS
-            elements.append(Paragraph("<b>ÚLTIMAS VISITAS (Máx. 50)</b>", styles['Heading2']))
-            elements.append(Spacer(1, 0.2*inch))
-            
-            table_data = [["Fecha", "Hora", "Punto", "Guardia"]]
-            
-            usuarios_cache = {}
-            puntos_cache = {}
-            
-            for visita in visitas[:50]:
-                # Obtener nombres
-                usuario_nombre = "Desconocido"
-                if visita.get("guardia_id"):
-                    if visita["guardia_id"] not in usuarios_cache:
-                        try:
-                            user_resp = supabase.table("usuarios").select("nombre").eq("id", visita["guardia_id"]).execute()
-                            if user_resp.data:
-                                usuarios_cache[visita["guardia_id"]] = user_resp.data[0].get("nombre", "Desconocido")
-                        except:
-                            usuarios_cache[visita["guardia_id"]] = "Desconocido"
-                    usuario_nombre = usuarios_cache[visita["guardia_id"]]
-                
-                punto_nombre = "Desconocido"
-                if visita.get("punto_qr_id"):
-                    if visita["punto_qr_id"] not in puntos_cache:
-                        try:
-                            punto_resp = supabase.table("puntos_qr").select("nombre").eq("id", visita["punto_qr_id"]).execute()
-                            if punto_resp.data:
-                                puntos_cache[visita["punto_qr_id"]] = punto_resp.data[0].get("nombre", "Desconocido")
-                        except:
-                            puntos_cache[visita["punto_qr_id"]] = "Desconocido"
-                    punto_nombre = puntos_cache[visita["punto_qr_id"]]
-                
-                # Formatear fecha con zona horaria del usuario
-                created_at = visita.get("created_at", "")
-                fecha_str = ""
-                hora_str = ""
-                if created_at:
-                    try:
-                        dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                        dt_local = dt.astimezone(user_tz)
-                        fecha_str = dt_local.strftime('%d/%m/%Y')
-                        hora_str = dt_local.strftime('%H:%M')
-                    except:
-                        pass
-                
-                table_data.append([fecha_str, hora_str, punto_nombre, usuario_nombre])
-            
-            visits_table = Table(table_data, colWidths=[1.5*inch, 1*inch, 2.5*inch, 2*inch])
-            visits_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#366092')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-            ]))
-            
-            elements.append(visits_table)
-        
-        # Footer
-        elements.append(Spacer(1, 0.5*inch))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.grey,
-            alignment=TA_CENTER
-        )
-        elements.append(Paragraph("Sistema de Recorridas QR - Acrux 360", footer_style))
-        
-        # Construir PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        filename = f"reporte_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al exportar PDF: {str(e)}")
\ No newline at end of file
+            for filas in _filas_exportacion(fecha_inicio, fecha_fin, servicio_id, tipo, user_tz):
+                writer.write_table(_tabla_arrow(filas, esquema))
+                datos = salida.drenar()
+                if datos:
+                    yield datos
+        finally:
+            writer.close()
+
+        datos = salida.drenar()
+        if datos:
+            yield datos
+
+    extension = "parquet" if formato == "parquet" else "arrow"
+    media_type = "application/vnd.apache.parquet" if formato == "parquet" else "application/vnd.apache.arrow.stream"
+    filename = f"reporte_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+    return StreamingResponse(
+        generar(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,183 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+from typing import List, Optional
+from app.auth import get_current_user
+from app.models import UserResponse
+from app.database import get_supabase_client
+from app.rutas import COLUMNAS_RUTA, leer_rutas, obtener_seguidor
+from app.routers.mapa import servicio_permitido
+import asyncio
+
+router = APIRouter(prefix="/rutas", tags=["Rutas"])
+
+
+class RutaPunto(BaseModel):
+    punto_qr_id: int
+    minutos_esperados: int = 0  # desde el punto anterior de la ruta
+
+
+class RutaCreate(BaseModel):
+    servicio_id: Optional[int] = None  # los supervisores usan su servicio
+    nombre: str
+    tolerancia_minutos: int = 5
+    puntos: List[RutaPunto]
+
+
+class RutaUpdate(BaseModel):
+    nombre: Optional[str] = None
+    tolerancia_minutos: Optional[int] = None
+    activa: Optional[bool] = None
+    puntos: Optional[List[RutaPunto]] = None
+
+
+def _validar_puntos(servicio_id: int, puntos: List[RutaPunto]):
+    """Al menos dos puntos, sin repetir, del servicio y con tiempos no negativos"""
+    if len(puntos) < 2:
+        raise HTTPException(status_code=400, detail="La ruta debe tener al menos dos puntos")
+    ids = [p.punto_qr_id for p in puntos]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Un punto no puede repetirse en la ruta")
+    if any(p.minutos_esperados < 0 for p in puntos):
+        raise HTTPException(status_code=400, detail="minutos_esperados no puede ser negativo")
+
+    supabase = get_supabase_client()
+    resp = supabase.table("puntos_qr").select("id").eq("servicio_id", servicio_id).in_("id", ids).execute()
+    ajenos = set(ids) - {p["id"] for p in resp.data}
+    if ajenos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Puntos que no pertenecen al servicio: {sorted(ajenos)}"
+        )
+
+
+def _guardar_puntos(ruta_id: int, puntos: List[RutaPunto]):
+    supabase = get_supabase_client()
+    supabase.table("rutas_puntos").delete().eq("ruta_id", ruta_id).execute()
+    supabase.table("rutas_puntos").insert([
+        {
+            "ruta_id": ruta_id,
+            "orden": orden,
+            "punto_qr_id": punto.punto_qr_id,
+            "minutos_esperados": punto.minutos_esperados,
+        }
+        for orden, punto in enumerate(puntos)
+    ]).execute()
+
+
+def _leer_ruta(ruta_id: int, current_user: UserResponse) -> dict:
+    supabase = get_supabase_client()
+    resp = supabase.table("rutas").select(COLUMNAS_RUTA).eq("id", ruta_id).execute()
+    if not resp.data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ruta no encontrada")
+    ruta = resp.data[0]
+    if servicio_permitido(current_user, ruta["servicio_id"]) != ruta["servicio_id"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes acceso a esta ruta")
+    return ruta
+
+
+@router.get("/")
+async def listar_rutas(
+    servicio_id: Optional[int] = None,
+    incluir_inactivas: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Rutas del servicio con sus puntos en orden"""
+    servicio_id = servicio_permitido(current_user, servicio_id)
+    return await asyncio.to_thread(leer_rutas, servicio_id, not incluir_inactivas)
+
+
+@router.get("/estado")
+async def obtener_estado_rutas(
+    servicio_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Avance de cada guardia del servicio en su ruta: vuelta actual, próximo
+    punto, puntos saltados, visitas fuera de orden, retrasos y si está
+    atrasado para el próximo punto. Se arma con el avance guardado al
+    registrar cada visita, sin recorrer el historial.
+    """
+    servicio_id = servicio_permitido(current_user, servicio_id)
+    guardias = await asyncio.to_thread(obtener_seguidor().estado_servicio, servicio_id)
+    return {
+        "servicio_id": servicio_id,
+        "guardias": guardias,
+        "atrasados": sum(1 for g in guardias if g["atrasado"]),
+    }
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def crear_ruta(
+    ruta: RutaCreate,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    servicio_id = servicio_permitido(current_user, ruta.servicio_id)
+    if not ruta.nombre.strip():
+        raise HTTPException(status_code=400, detail="El nombre es obligatorio")
+    if ruta.tolerancia_minutos < 0:
+        raise HTTPException(status_code=400, detail="tolerancia_minutos no puede ser negativo")
+
+    def crear():
+        _validar_puntos(servicio_id, ruta.puntos)
+        resp = get_supabase_client().table("rutas").insert({
+            "servicio_id": servicio_id,
+            "nombre": ruta.nombre.strip(),
+            "tolerancia_minutos": ruta.tolerancia_minutos,
+        }).execute()
+        _guardar_puntos(resp.data[0]["id"], ruta.puntos)
+        return resp.data[0]["id"]
+
+    ruta_id = await asyncio.to_thread(crear)
+    obtener_seguidor().invalidar(servicio_id)
+    rutas = await asyncio.to_thread(leer_rutas, servicio_id, False)
+    return next(r for r in rutas if r["id"] == ruta_id)
+
+
+@router.put("/{ruta_id}")
+async def actualizar_ruta(
+    ruta_id: int,
+    cambios: RutaUpdate,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Actualiza la ruta; si se envían puntos, reemplazan a los anteriores"""
+    actual = await asyncio.to_thread(_leer_ruta, ruta_id, current_user)
+    servicio_id = actual["servicio_id"]
+
+    datos = {}
+    if cambios.nombre is not None:
+        if not cambios.nombre.strip():
+            raise HTTPException(status_code=400, detail="El nombre es obligatorio")
+        datos["nombre"] = cambios.nombre.strip()
+    if cambios.tolerancia_minutos is not None:
+        if cambios.tolerancia_minutos < 0:
+            raise HTTPException(status_code=400, detail="tolerancia_minutos no puede ser negativo")
+        datos["tolerancia_minutos"] = cambios.tolerancia_minutos
+    if cambios.activa is not None:
+        datos["activa"] = cambios.activa
+
+    def actualizar():
+        if cambios.puntos is not None:
+            _validar_puntos(servicio_id, cambios.puntos)
+        if datos:
+            get_supabase_client().table("rutas").update(datos).eq("id", ruta_id).execute()
+        if cambios.puntos is not None:
+            _guardar_puntos(ruta_id, cambios.puntos)
+
+    await asyncio.to_thread(actualizar)
+    obtener_seguidor().invalidar(servicio_id)
+    rutas = await asyncio.to_thread(leer_rutas, servicio_id, False)
+    return next(r for r in rutas if r["id"] == ruta_id)
+
+
+@router.delete("/{ruta_id}")
+async def eliminar_ruta(
+    ruta_id: int,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Desactiva la ruta (se conserva para el historial de avances)"""
+    actual = await asyncio.to_thread(_leer_ruta, ruta_id, current_user)
+    await asyncio.to_thread(
+        lambda: get_supabase_client().table("rutas").update({"activa": False}).eq("id", ruta_id).execute()
+    )
+    obtener_seguidor().invalidar(actual["servicio_id"])
+    return {"message": "Ruta desactivada"}
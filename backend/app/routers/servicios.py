@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime, time
+from datetime import datetime, time, timedelta, timezone
 from app.auth import get_current_user
 from app.database import get_supabase
+from app.horarios import invalidar_horario, obtener_horario, registrar_horario
+from app.listados import aplicar_listado, pagina_listado
+from app.sincronizacion import ServicioNoEncontradoError, obtener_paquete
+import asyncio
 
 router = APIRouter(prefix="/servicios", tags=["servicios"])
 
@@ -72,6 +77,39 @@ async def listar_servicios(
     result = query.order("nombre").execute()
     return result.data
 
+# GET - Listado paginado con búsqueda (antes de /{servicio_id})
+@router.get("/pagina")
+async def listar_servicios_pagina(
+    q: Optional[str] = Query(None, description="Busca en el nombre"),
+    activo: Optional[bool] = None,
+    orden: str = Query("nombre", regex="^(nombre|fecha_creacion|id)$"),
+    desc: bool = False,
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Servicios paginados (keyset) con búsqueda por nombre.
+    Para la página siguiente enviar cursor=siguiente_cursor (null = no hay más).
+    """
+    supabase = get_supabase()
+    
+    query = supabase.table("servicios").select("*")
+    if activo is not None:
+        query = query.eq("activo", activo)
+    
+    try:
+        query = aplicar_listado(query, q, ["nombre"], orden, desc, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    servicios, siguiente = pagina_listado(query.execute().data, orden, limit)
+    return {
+        "servicios": servicios,
+        "siguiente_cursor": siguiente,
+        "limit": limit
+    }
+
 # GET - Obtener servicio por ID
 @router.get("/{servicio_id}", response_model=ServicioResponse)
 async def obtener_servicio(
@@ -89,6 +127,103 @@ async def obtener_servicio(
     
     return result.data[0]
 
+# GET - Paquete offline del servicio (servicio, horario y puntos en un solo blob)
+@router.get("/{servicio_id}/offline")
+async def paquete_offline(
+    servicio_id: int,
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    """
+    Paquete comprimido para la copia offline del dispositivo. Es el mismo blob
+    para todos los dispositivos del servicio y solo se rearma cuando cambian el
+    servicio o sus puntos. Responde 304 si el ETag del dispositivo está vigente.
+    """
+    if current_user.rol in ["guardia", "supervisor"] and current_user.servicio_id != servicio_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a este servicio"
+        )
+    
+    try:
+        paquete = await asyncio.to_thread(obtener_paquete, servicio_id)
+    except ServicioNoEncontradoError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Servicio no encontrado"
+        )
+    
+    headers = {
+        "ETag": paquete.etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if paquete.firma:
+        headers["X-Firma"] = paquete.firma
+    
+    if paquete.etag in [e.strip() for e in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    aceptadas = request.headers.get("accept-encoding", "").lower()
+    if paquete.brotli is not None and "br" in aceptadas:
+        contenido, headers["Content-Encoding"] = paquete.brotli, "br"
+    elif "gzip" in aceptadas:
+        contenido, headers["Content-Encoding"] = paquete.gzip, "gzip"
+    else:
+        contenido = paquete.identidad
+    
+    return Response(content=contenido, media_type="application/json", headers=headers)
+
+# GET - Horario compilado: turno actual, tramos y rondas esperadas
+@router.get("/{servicio_id}/horario")
+async def horario_servicio(
+    servicio_id: int,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Estado del turno ahora y, si se indica un rango (por defecto las próximas
+    24 horas), los tramos de turno y las rondas esperadas en él. Las fechas
+    sin zona horaria se interpretan en la zona de los servicios.
+    """
+    horario = await asyncio.to_thread(obtener_horario, servicio_id)
+    if horario is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Servicio no encontrado"
+        )
+    
+    # Sin zona horaria, desde/hasta son hora local del servicio
+    if desde is not None and desde.tzinfo is None:
+        desde = horario.zona.localize(desde, is_dst=False)
+    if hasta is not None and hasta.tzinfo is None:
+        hasta = horario.zona.localize(hasta, is_dst=False)
+    
+    ahora = datetime.now(timezone.utc)
+    desde = desde or ahora
+    hasta = hasta or desde + timedelta(days=1)
+    if hasta <= desde:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="hasta debe ser posterior a desde"
+        )
+    if hasta - desde > timedelta(days=366):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El rango máximo es de un año"
+        )
+    
+    return {
+        "servicio_id": servicio_id,
+        "en_servicio": horario.en_servicio(ahora),
+        "desde": desde,
+        "hasta": hasta,
+        "segundos_en_servicio": horario.segundos_en_servicio(desde, hasta),
+        "rondas_esperadas": horario.rondas_esperadas(desde, hasta),
+        "tramos": [{"inicio": inicio, "fin": fin} for inicio, fin in horario.tramos(desde, hasta)],
+    }
+
 # POST - Crear servicio
 @router.post("/", response_model=ServicioResponse, status_code=status.HTTP_201_CREATED)
 async def crear_servicio(
@@ -151,6 +286,7 @@ async def crear_servicio(
     }
     
     result = supabase.table("servicios").insert(nuevo_servicio).execute()
+    registrar_horario(result.data[0])
     return result.data[0]
 
 # PUT - Actualizar servicio
@@ -234,6 +370,7 @@ async def actualizar_servicio(
     update_data["ultima_modificacion"] = datetime.utcnow().isoformat()
     
     result = supabase.table("servicios").update(update_data).eq("id", servicio_id).execute()
+    registrar_horario(result.data[0])
     return result.data[0]
 
 # DELETE - Eliminar servicio
@@ -271,6 +408,7 @@ async def eliminar_servicio(
             "ultima_modificacion": datetime.utcnow().isoformat()
         }).eq("id", servicio_id).execute()
     
+    invalidar_horario(servicio_id)
     return None
 
 # GET - Estadísticas de servicios
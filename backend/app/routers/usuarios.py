@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 from app.auth import get_current_user, hash_password
 from app.database import get_supabase
+from app.importar_usuarios import ArchivoInvalidoError, importar_usuarios, leer_archivo
+from app.listados import aplicar_listado, pagina_listado
 
 router = APIRouter(prefix="/usuarios", tags=["usuarios"])
 
+# Columnas públicas de usuario (sin password_hash)
+COLUMNAS_USUARIO = "id, email, nombre, rol, servicio_id, telefono, activo, created_at, updated_at"
+
 # Schemas CORREGIDOS - servicio_id OBLIGATORIO
 class UsuarioCreate(BaseModel):
     email: EmailStr
@@ -65,6 +70,45 @@ async def listar_usuarios(
     result = query.order("created_at", desc=True).execute()
     return result.data
 
+# GET - Listado paginado con búsqueda (DEBE IR ANTES DE /{usuario_id})
+@router.get("/pagina")
+async def listar_usuarios_pagina(
+    q: Optional[str] = Query(None, description="Busca en nombre y email"),
+    activo: Optional[bool] = None,
+    rol: Optional[str] = None,
+    servicio_id: Optional[int] = None,
+    orden: str = Query("nombre", regex="^(nombre|email|created_at|id)$"),
+    desc: bool = False,
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user = Depends(require_admin)
+):
+    """
+    Usuarios paginados (keyset) con búsqueda por nombre/email.
+    Para la página siguiente enviar cursor=siguiente_cursor (null = no hay más).
+    """
+    supabase = get_supabase()
+    
+    query = supabase.table("usuarios").select(COLUMNAS_USUARIO)
+    if activo is not None:
+        query = query.eq("activo", activo)
+    if rol:
+        query = query.eq("rol", rol)
+    if servicio_id:
+        query = query.eq("servicio_id", servicio_id)
+    
+    try:
+        query = aplicar_listado(query, q, ["nombre", "email"], orden, desc, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    usuarios, siguiente = pagina_listado(query.execute().data, orden, limit)
+    return {
+        "usuarios": usuarios,
+        "siguiente_cursor": siguiente,
+        "limit": limit
+    }
+
 # ⭐ GET - Listar guardias (DEBE IR ANTES DE /{usuario_id}) ⭐
 @router.get("/guardias", response_model=List[UsuarioResponse])
 async def listar_guardias(
@@ -159,6 +203,36 @@ async def crear_usuario(
     result = supabase.table("usuarios").insert(nuevo_usuario).execute()
     return result.data[0]
 
+# POST - Alta masiva desde CSV o JSON
+@router.post("/importar")
+async def importar_usuarios_archivo(
+    archivo: UploadFile = File(...),
+    servicio_id: Optional[int] = Form(None),  # Servicio para filas sin servicio_id
+    current_user = Depends(require_admin)
+):
+    """
+    Crea usuarios desde un CSV (email, password, nombre, rol, servicio_id,
+    telefono, activo) o un JSON con una lista de objetos con esos campos.
+    Devuelve los usuarios creados y los errores por fila; una fila con error
+    no impide crear las demás.
+    """
+    contenido = await archivo.read()
+    try:
+        filas = leer_archivo(contenido, archivo.filename)
+    except ArchivoInvalidoError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not filas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo no contiene usuarios"
+        )
+    
+    return await importar_usuarios(filas, servicio_id)
+
 # PUT - Actualizar usuario
 @router.put("/{usuario_id}", response_model=UsuarioResponse)
 async def actualizar_usuario(
@@ -3,6 +3,9 @@ from app.models import VisitCreate, VisitResponse, UserResponse, GPSValidation
 from app.database import get_supabase_client
 from app.auth import get_current_user
 from app.config import get_settings
+from app.cache_reportes import obtener_cache_reportes
+from app.antifraude import insertar_visita, obtener_detector
+from app.rutas import obtener_seguidor
 from datetime import datetime
 from math import radians, sin, cos, sqrt, atan2
 from typing import List, Optional
@@ -129,8 +132,12 @@ async def create_visit(
         "sincronizado": True
     }
     
+    # Marcar (sin rechazar) saltos imposibles o coordenadas repetidas
+    detector = obtener_detector()
+    visit_data["alertas_gps"] = detector.evaluar([visit_data])[0]
+    
     # Guardar visita
-    response = supabase.table("visitas").insert(visit_data).execute()
+    response = insertar_visita(supabase, visit_data)
     
     if not response.data:
         raise HTTPException(
@@ -139,6 +146,16 @@ async def create_visit(
         )
     
     saved_visit = response.data[0]
+    detector.registrar(visit_data)
+    
+    # Avance del guardia en su ruta (no bloquea el registro de la visita)
+    try:
+        ruta = obtener_seguidor().registrar(visit_data)
+    except Exception:
+        ruta = None
+    
+    # Invalidar reportes del servicio (abiertos y los cerrados que cubren la visita)
+    obtener_cache_reportes().registrar_visita(visit.servicio_id, visit_data["fecha_hora"])
     
     return VisitResponse(
         id=saved_visit["id"],
@@ -151,7 +168,9 @@ async def create_visit(
         longitud=saved_visit["longitud"],
         fecha_hora=datetime.fromisoformat(saved_visit["fecha_hora"]),
         sincronizado=saved_visit["sincronizado"],
-        created_at=datetime.fromisoformat(saved_visit["created_at"])
+        created_at=datetime.fromisoformat(saved_visit["created_at"]),
+        alertas_gps=saved_visit.get("alertas_gps") or [],
+        ruta=ruta
     )
 
 @router.get("/", response_model=List[VisitResponse])
@@ -197,7 +216,8 @@ async def get_visits(
             longitud=visit_data["longitud"],
             fecha_hora=datetime.fromisoformat(visit_data["fecha_hora"]),
             sincronizado=visit_data["sincronizado"],
-            created_at=datetime.fromisoformat(visit_data["created_at"])
+            created_at=datetime.fromisoformat(visit_data["created_at"]),
+            alertas_gps=visit_data.get("alertas_gps") or []
         ))
     
     return visits
@@ -218,35 +238,46 @@ async def sync_offline_visits(
         "failed": []
     }
     
+    # Validar acceso y preparar datos
+    aceptadas = []
     for visit in visits:
+        if current_user.rol in ["guardia", "supervisor"]:
+            if current_user.servicio_id != visit.servicio_id:
+                results["failed"].append({
+                    "visit": visit.dict(),
+                    "error": "No tienes acceso a este servicio"
+                })
+                continue
+        
+        visit_data = {
+            "servicio_id": visit.servicio_id,
+            "punto_qr_id": visit.punto_qr_id,
+            "guardia_id": visit.guardia_id,
+            "tipo": visit.tipo,
+            "observacion": visit.observacion,
+            "latitud": visit.latitud,
+            "longitud": visit.longitud,
+            "fecha_hora": visit.fecha_hora.isoformat() if visit.fecha_hora else datetime.utcnow().isoformat(),
+            "sincronizado": True
+        }
+        aceptadas.append((visit, visit_data))
+    
+    # Alertas de GPS del lote completo: una pasada vectorizada por guardia
+    detector = obtener_detector()
+    alertas = detector.evaluar([visit_data for _, visit_data in aceptadas])
+    guardadas = []
+    
+    for (visit, visit_data), alertas_gps in zip(aceptadas, alertas):
+        visit_data["alertas_gps"] = alertas_gps
         try:
-            # Validar acceso al servicio
-            if current_user.rol in ["guardia", "supervisor"]:
-                if current_user.servicio_id != visit.servicio_id:
-                    results["failed"].append({
-                        "visit": visit.dict(),
-                        "error": "No tienes acceso a este servicio"
-                    })
-                    continue
-            
-            # Preparar datos
-            visit_data = {
-                "servicio_id": visit.servicio_id,
-                "punto_qr_id": visit.punto_qr_id,
-                "guardia_id": visit.guardia_id,
-                "tipo": visit.tipo,
-                "observacion": visit.observacion,
-                "latitud": visit.latitud,
-                "longitud": visit.longitud,
-                "fecha_hora": visit.fecha_hora.isoformat() if visit.fecha_hora else datetime.utcnow().isoformat(),
-                "sincronizado": True
-            }
-            
             # Guardar
-            response = supabase.table("visitas").insert(visit_data).execute()
+            response = insertar_visita(supabase, visit_data)
             
             if response.data:
                 results["success"].append(response.data[0]["id"])
+                detector.registrar(visit_data)
+                guardadas.append(visit_data)
+                obtener_cache_reportes().registrar_visita(visit.servicio_id, visit_data["fecha_hora"])
             else:
                 results["failed"].append({
                     "visit": visit.dict(),
@@ -259,4 +290,10 @@ async def sync_offline_visits(
                 "error": str(e)
             })
     
-    return results
\ No newline at end of file
+    # Avance en las rutas en orden de fecha_hora (el lote puede venir desordenado)
+    try:
+        obtener_seguidor().registrar_lote(guardadas)
+    except Exception:
+        pass
+    
+    return results
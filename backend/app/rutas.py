@@ -0,0 +1,367 @@
+"""
+Rutas de patrulla y seguimiento incremental del avance de cada guardia.
+
+Una ruta es una lista ordenada de puntos de un servicio con los minutos
+esperados entre un punto y el siguiente. Las rutas de cada servicio se
+compilan en memoria (punto -> posición en la ruta, tiempos acumulados) y se
+cachean con TTL; crear/editar/desactivar una ruta las invalida.
+
+Por guardia se mantiene su avance en la ruta actual (ProgresoRuta). Cada
+visita lo avanza en O(1): la posición del punto se busca en un dict y el
+tiempo esperado desde la visita anterior es una resta de acumulados. Según
+la posición del punto respecto del siguiente esperado, la visita queda:
+- en_orden: es el punto esperado
+- puntos_saltados: está más adelante; los intermedios se marcan saltados
+- fuera_de_orden: es un punto ya visitado en esta vuelta (no mueve el avance)
+- ignorada: es más vieja que la última registrada (visita offline tardía)
+Volver al primer punto con la vuelta empezada cierra la vuelta incompleta y
+empieza otra. El avance se guarda en rutas_progreso (una fila por guardia),
+así el estado de todos los guardias se consulta sin recorrer visitas. Esa
+tabla es la fuente de verdad: con varios workers de uvicorn las visitas de un
+mismo guardia pueden llegar a cualquiera, así que cada visita a un punto de
+ruta lee el avance guardado (una consulta por clave primaria). La copia en
+memoria solo se usa si la tabla no responde (p. ej. sin la migración 008).
+"""
+import threading
+import time as reloj
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.config import get_settings
+from app.database import get_supabase_client
+
+settings = get_settings()
+
+EN_ORDEN = "en_orden"
+PUNTOS_SALTADOS = "puntos_saltados"
+FUERA_DE_ORDEN = "fuera_de_orden"
+IGNORADA = "ignorada"
+
+COLUMNAS_RUTA = "id, servicio_id, nombre, tolerancia_minutos, activa"
+
+
+@dataclass
+class RutaCompilada:
+    id: int
+    servicio_id: int
+    nombre: str
+    puntos: List[int]
+    acumulados: List[int]  # segundos esperados desde el primer punto hasta cada punto
+    tolerancia: int  # segundos
+    posiciones: Dict[int, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.posiciones = {punto: i for i, punto in enumerate(self.puntos)}
+
+
+def compilar_ruta(ruta: dict, puntos: List[dict]) -> RutaCompilada:
+    """Compila una ruta con sus filas de rutas_puntos (en cualquier orden)"""
+    puntos = sorted(puntos, key=lambda p: p["orden"])
+    acumulados, total = [], 0
+    for i, punto in enumerate(puntos):
+        # El primer punto no tiene tiempo desde el anterior
+        total += (punto.get("minutos_esperados") or 0) * 60 if i else 0
+        acumulados.append(total)
+    return RutaCompilada(
+        id=ruta["id"],
+        servicio_id=ruta["servicio_id"],
+        nombre=ruta["nombre"],
+        puntos=[p["punto_qr_id"] for p in puntos],
+        acumulados=acumulados,
+        tolerancia=(ruta.get("tolerancia_minutos") or 0) * 60,
+    )
+
+
+@dataclass
+class RutasServicio:
+    """Rutas activas de un servicio e índice punto -> rutas que lo incluyen"""
+    rutas: Dict[int, RutaCompilada]
+    por_punto: Dict[int, List[RutaCompilada]]
+    compilado: float = field(default_factory=reloj.monotonic)
+
+
+def indexar_rutas(rutas: List[RutaCompilada]) -> RutasServicio:
+    por_punto: Dict[int, List[RutaCompilada]] = {}
+    for ruta in sorted(rutas, key=lambda r: r.id):
+        for punto in ruta.puntos:
+            por_punto.setdefault(punto, []).append(ruta)
+    return RutasServicio(rutas={r.id: r for r in rutas}, por_punto=por_punto)
+
+
+@dataclass
+class ProgresoRuta:
+    """Avance de un guardia en la vuelta actual de su ruta"""
+    guardia_id: int
+    servicio_id: int
+    ruta_id: int
+    vuelta: int = 1
+    siguiente: int = 0  # posición del próximo punto esperado
+    inicio: Optional[float] = None  # epoch de la primera visita de la vuelta
+    ultima: Optional[float] = None  # epoch de la última visita registrada
+    ultimo_punto: Optional[int] = None
+    visitados: int = 0
+    saltados: List[int] = field(default_factory=list)
+    fuera_de_orden: int = 0
+    retrasos: int = 0
+    completadas: int = 0
+    ultima_vuelta: Optional[dict] = None  # resumen de la última vuelta cerrada
+
+    def _cerrar_vuelta(self, ruta: RutaCompilada):
+        completa = self.siguiente >= len(ruta.puntos) and not self.saltados
+        self.ultima_vuelta = {
+            "vuelta": self.vuelta,
+            "completa": completa,
+            "inicio": self.inicio,
+            "fin": self.ultima,
+            "duracion_minutos": round((self.ultima - self.inicio) / 60, 1) if self.inicio is not None else None,
+            "visitados": self.visitados,
+            "saltados": self.saltados + ruta.puntos[self.siguiente:],
+            "fuera_de_orden": self.fuera_de_orden,
+            "retrasos": self.retrasos,
+        }
+        if completa:
+            self.completadas += 1
+        self.vuelta += 1
+        self.siguiente = 0
+        self.inicio = None
+        self.visitados = 0
+        self.saltados = []
+        self.fuera_de_orden = 0
+        self.retrasos = 0
+
+    def avanzar(self, ruta: RutaCompilada, punto_qr_id: int, instante: float) -> dict:
+        """Registra la visita al punto (que debe estar en la ruta) y devuelve el resultado"""
+        evento = {"ruta_id": ruta.id, "nombre": ruta.nombre, "vuelta": self.vuelta,
+                  "estado": EN_ORDEN, "saltados": [], "retraso": False, "vuelta_completa": False}
+
+        if self.ultima is not None and instante < self.ultima:
+            evento["estado"] = IGNORADA
+            evento["siguiente_punto_id"] = ruta.puntos[self.siguiente]
+            return evento
+
+        posicion = ruta.posiciones[punto_qr_id]
+        if posicion == 0 and self.siguiente > 1:
+            # Vuelve a empezar: la vuelta anterior queda incompleta
+            self._cerrar_vuelta(ruta)
+            evento["vuelta"] = self.vuelta
+
+        if posicion == 0 and self.siguiente == 1:
+            # Escaneó de nuevo el punto de inicio: la vuelta empieza ahora
+            self.inicio = instante
+        elif posicion >= self.siguiente:
+            if posicion > self.siguiente:
+                evento["estado"] = PUNTOS_SALTADOS
+                evento["saltados"] = ruta.puntos[self.siguiente:posicion]
+                self.saltados.extend(evento["saltados"])
+            if self.siguiente > 0 and self.ultima is not None:
+                esperado = ruta.acumulados[posicion] - ruta.acumulados[self.siguiente - 1]
+                if instante - self.ultima > esperado + ruta.tolerancia:
+                    evento["retraso"] = True
+                    self.retrasos += 1
+            if self.inicio is None:
+                self.inicio = instante
+            self.siguiente = posicion + 1
+            self.visitados += 1
+        else:
+            evento["estado"] = FUERA_DE_ORDEN
+            self.fuera_de_orden += 1
+
+        self.ultima = instante
+        self.ultimo_punto = punto_qr_id
+        if self.siguiente >= len(ruta.puntos):
+            self._cerrar_vuelta(ruta)
+            evento["vuelta_completa"] = self.ultima_vuelta["completa"]
+        evento["siguiente_punto_id"] = ruta.puntos[self.siguiente]
+        return evento
+
+    def resumen(self, ruta: Optional[RutaCompilada], ahora: float) -> dict:
+        """Estado para consultar: avance de la vuelta y si está atrasado para el próximo punto"""
+        datos = asdict(self)
+        datos["ultima_visita"] = _iso(self.ultima)
+        datos["minutos_desde_ultima_visita"] = int((ahora - self.ultima) // 60) if self.ultima is not None else None
+        if ruta is None or self.siguiente >= len(ruta.puntos):
+            datos.update({"ruta_activa": False, "total_puntos": None, "avance": None,
+                          "siguiente_punto_id": None, "atrasado": False})
+            return datos
+        esperado = None
+        if self.siguiente > 0 and self.ultima is not None:
+            esperado = ruta.acumulados[self.siguiente] - ruta.acumulados[self.siguiente - 1] + ruta.tolerancia
+        datos.update({
+            "ruta_activa": True,
+            "ruta_nombre": ruta.nombre,
+            "total_puntos": len(ruta.puntos),
+            "avance": round(self.siguiente / len(ruta.puntos), 3),
+            "siguiente_punto_id": ruta.puntos[self.siguiente],
+            "atrasado": esperado is not None and ahora - self.ultima > esperado,
+        })
+        return datos
+
+
+def _iso(instante: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(instante, timezone.utc).isoformat() if instante is not None else None
+
+
+def _instante(fecha_hora: str) -> float:
+    dt = datetime.fromisoformat(fecha_hora.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# ============ LECTURA DE RUTAS ============
+
+def leer_rutas(servicio_id: int, solo_activas: bool = True) -> List[dict]:
+    """Rutas del servicio con sus puntos ordenados (filas de rutas_puntos en `puntos`)"""
+    supabase = get_supabase_client()
+    query = supabase.table("rutas").select(COLUMNAS_RUTA).eq("servicio_id", servicio_id)
+    if solo_activas:
+        query = query.eq("activa", True)
+    rutas = query.order("id").execute().data
+    if not rutas:
+        return []
+    filas = supabase.table("rutas_puntos").select("ruta_id, orden, punto_qr_id, minutos_esperados").in_(
+        "ruta_id", [r["id"] for r in rutas]
+    ).order("ruta_id").order("orden").execute().data
+    por_ruta: Dict[int, List[dict]] = {}
+    for fila in filas:
+        por_ruta.setdefault(fila["ruta_id"], []).append(fila)
+    for ruta in rutas:
+        ruta["puntos"] = por_ruta.get(ruta["id"], [])
+    return rutas
+
+
+# ============ SEGUIMIENTO ============
+
+class SeguidorRutas:
+    """Rutas compiladas por servicio (con TTL) y avance por guardia (LRU acotado)"""
+
+    def __init__(self, max_guardias: int, ttl_rutas: float):
+        self._max_guardias = max_guardias
+        self._ttl_rutas = ttl_rutas
+        self._rutas: Dict[int, RutasServicio] = {}
+        self._progresos: "OrderedDict[int, ProgresoRuta]" = OrderedDict()
+        self._bloqueo = threading.Lock()
+
+    def rutas_servicio(self, servicio_id: int) -> RutasServicio:
+        with self._bloqueo:
+            rutas = self._rutas.get(servicio_id)
+            if rutas is not None and reloj.monotonic() - rutas.compilado < self._ttl_rutas:
+                return rutas
+        try:
+            filas = leer_rutas(servicio_id)
+        except Exception:
+            # Sin la migración de rutas no hay nada que seguir
+            filas = []
+        rutas = indexar_rutas([compilar_ruta(r, r["puntos"]) for r in filas if r["puntos"]])
+        with self._bloqueo:
+            self._rutas[servicio_id] = rutas
+        return rutas
+
+    def invalidar(self, servicio_id: int):
+        with self._bloqueo:
+            self._rutas.pop(servicio_id, None)
+
+
+    def _guardar_progreso(self, progreso: ProgresoRuta):
+        with self._bloqueo:
+            self._progresos[progreso.guardia_id] = progreso
+            self._progresos.move_to_end(progreso.guardia_id)
+            while len(self._progresos) > self._max_guardias:
+                self._progresos.popitem(last=False)
+        try:
+            get_supabase_client().table("rutas_progreso").upsert({
+                "guardia_id": progreso.guardia_id,
+                "servicio_id": progreso.servicio_id,
+                "ruta_id": progreso.ruta_id,
+                "estado": asdict(progreso),
+                "actualizado": datetime.now(timezone.utc).isoformat(),
+            }).execute()
+        except Exception:
+            # El avance sigue en memoria; la próxima visita lo vuelve a guardar
+            pass
+
+    def progreso(self, guardia_id: int) -> Optional[ProgresoRuta]:
+        """Avance guardado en rutas_progreso; el de memoria si la tabla no responde"""
+        try:
+            resp = get_supabase_client().table("rutas_progreso").select("estado").eq(
+                "guardia_id", guardia_id
+            ).execute()
+        except Exception:
+            with self._bloqueo:
+                progreso = self._progresos.get(guardia_id)
+                if progreso is not None:
+                    self._progresos.move_to_end(guardia_id)
+                return progreso
+        if not resp.data:
+            return None
+        return ProgresoRuta(**resp.data[0]["estado"])
+
+    def registrar(self, visita: dict) -> Optional[dict]:
+        """
+        Avanza la ruta del guardia con una visita ya guardada (dict con
+        servicio_id, guardia_id, punto_qr_id y fecha_hora ISO). Devuelve el
+        resultado de la visita en la ruta, o None si el punto no está en
+        ninguna ruta activa del servicio.
+        """
+        rutas = self.rutas_servicio(visita["servicio_id"])
+        punto_qr_id = visita["punto_qr_id"]
+        if punto_qr_id not in rutas.por_punto:
+            # Punto fuera de toda ruta (o servicio sin rutas): no hace falta
+            # leer el avance del guardia
+            return None
+        progreso = self.progreso(visita["guardia_id"])
+
+        ruta = rutas.rutas.get(progreso.ruta_id) if progreso is not None else None
+        # Otra ruta, o la ruta cambió y el avance guardado ya no le corresponde
+        if ruta is None or punto_qr_id not in ruta.posiciones or progreso.siguiente >= len(ruta.puntos):
+            candidatas = rutas.por_punto.get(punto_qr_id)
+            if not candidatas:
+                return None
+            # Se prefiere la ruta que empieza en este punto
+            ruta = next((r for r in candidatas if r.posiciones[punto_qr_id] == 0), candidatas[0])
+            progreso = ProgresoRuta(
+                guardia_id=visita["guardia_id"], servicio_id=visita["servicio_id"], ruta_id=ruta.id
+            )
+
+        with self._bloqueo:
+            evento = progreso.avanzar(ruta, punto_qr_id, _instante(visita["fecha_hora"]))
+        if evento["estado"] != IGNORADA:
+            self._guardar_progreso(progreso)
+        return evento
+
+    def registrar_lote(self, visitas: List[dict]) -> List[Optional[dict]]:
+        """Como registrar, para un lote offline: se procesa por fecha_hora, no por orden de llegada"""
+        orden = sorted(range(len(visitas)), key=lambda i: _instante(visitas[i]["fecha_hora"]))
+        eventos: List[Optional[dict]] = [None] * len(visitas)
+        for i in orden:
+            eventos[i] = self.registrar(visitas[i])
+        return eventos
+
+    def estado_servicio(self, servicio_id: int, ahora: Optional[float] = None) -> List[dict]:
+        """Avance de todos los guardias del servicio con ruta, desde rutas_progreso (o memoria)"""
+        ahora = reloj.time() if ahora is None else ahora
+        rutas = self.rutas_servicio(servicio_id)
+        try:
+            filas = get_supabase_client().table("rutas_progreso").select("estado").eq(
+                "servicio_id", servicio_id
+            ).execute().data
+            progresos = [ProgresoRuta(**fila["estado"]) for fila in filas]
+        except Exception:
+            with self._bloqueo:
+                progresos = [p for p in self._progresos.values() if p.servicio_id == servicio_id]
+        return [
+            p.resumen(rutas.rutas.get(p.ruta_id), ahora)
+            for p in sorted(progresos, key=lambda p: p.guardia_id)
+        ]
+
+
+_seguidor: Optional[SeguidorRutas] = None
+
+
+def obtener_seguidor() -> SeguidorRutas:
+    """Seguidor de rutas compartido por el proceso"""
+    global _seguidor
+    if _seguidor is None:
+        _seguidor = SeguidorRutas(settings.rutas_max_guardias, settings.rutas_cache_ttl_segundos)
+    return _seguidor
@@ -0,0 +1,185 @@
+"""
+Datos para la copia offline de los dispositivos de guardia.
+
+- Sincronización delta de puntos (/puntos/cambios): versión por servicio
+  mantenida por sql/002_puntos_versiones.sql.
+- Paquete offline por servicio (/servicios/{id}/offline): servicio, horario y
+  puntos en un único JSON comprimido. Se arma una vez por versión del servicio
+  y se guarda en memoria ya comprimido (gzip y, si está instalado, brotli);
+  todos los dispositivos del servicio reciben el mismo blob.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from app.config import get_settings
+from app.database import get_supabase_client
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+settings = get_settings()
+
+# Columnas que necesita la copia offline del dispositivo
+COLUMNAS_SYNC = "id, servicio_id, nombre, descripcion, latitud, longitud, qr_code, activo"
+
+COLUMNAS_SERVICIO = "id, nombre, descripcion, hora_inicio, hora_fin, dias_activo, intervalo_ronda_minutos, activo, ultima_modificacion"
+
+TAMANO_PAGINA_PUNTOS = 1000
+
+# Cambiar si cambia el formato del paquete
+FORMATO_PAQUETE = 1
+
+
+def version_puntos(supabase, servicio_id: int) -> Optional[int]:
+    """Versión actual de los puntos del servicio, o None si el versionado no está instalado"""
+    try:
+        resp = supabase.table("servicios_puntos_version").select("version").eq("servicio_id", servicio_id).execute()
+    except Exception:
+        return None
+    return resp.data[0]["version"] if resp.data else 0
+
+
+def leer_puntos(query_base: Callable) -> List[dict]:
+    """Todas las filas de la consulta, paginando por id (PostgREST limita a 1000 por respuesta)"""
+    filas = []
+    ultimo_id = 0
+    while True:
+        pagina = query_base().gt("id", ultimo_id).order("id").limit(TAMANO_PAGINA_PUNTOS).execute().data
+        filas.extend(pagina)
+        if len(pagina) < TAMANO_PAGINA_PUNTOS:
+            return filas
+        ultimo_id = pagina[-1]["id"]
+
+
+def punto_offline(punto: dict) -> dict:
+    """Punto en el formato de la copia offline"""
+    return {
+        "id": punto["id"],
+        "servicio_id": punto["servicio_id"],
+        "nombre": punto["nombre"],
+        "descripcion": punto.get("descripcion"),
+        "latitud": float(punto["latitud"]),
+        "longitud": float(punto["longitud"]),
+        "qr_code": punto["qr_code"],
+        "activo": punto["activo"],
+    }
+
+
+# ============ PAQUETE OFFLINE ============
+
+class ServicioNoEncontradoError(Exception):
+    """El servicio pedido no existe"""
+
+
+@dataclass
+class PaqueteOffline:
+    version: str
+    identidad: bytes
+    gzip: bytes
+    brotli: Optional[bytes]
+    firma: Optional[str]
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+_paquetes: Dict[int, PaqueteOffline] = {}
+# Un bloqueo de armado por servicio; _bloqueo solo protege el diccionario
+_bloqueos: Dict[int, threading.Lock] = {}
+_bloqueo = threading.Lock()
+
+
+def _bloqueo_servicio(servicio_id: int) -> threading.Lock:
+    with _bloqueo:
+        return _bloqueos.setdefault(servicio_id, threading.Lock())
+
+
+def version_paquete(supabase, servicio_id: int) -> str:
+    """
+    Versión del paquete: cambia si cambia el servicio (ultima_modificacion) o
+    alguno de sus puntos. Son dos consultas de una fila, mucho más baratas que
+    armar el paquete.
+    """
+    resp = supabase.table("servicios").select("id, ultima_modificacion, fecha_creacion").eq("id", servicio_id).execute()
+    if not resp.data:
+        raise ServicioNoEncontradoError()
+    servicio = resp.data[0]
+    marca_servicio = servicio.get("ultima_modificacion") or servicio.get("fecha_creacion") or ""
+
+    version = version_puntos(supabase, servicio_id)
+    if version is not None:
+        marca_puntos = str(version)
+    else:
+        # Sin versionado: último updated_at y cantidad de puntos
+        ultimo = supabase.table("puntos_qr").select("updated_at", count="exact").eq(
+            "servicio_id", servicio_id
+        ).order("updated_at", desc=True).limit(1).execute()
+        marca_puntos = f"{ultimo.count}:{ultimo.data[0]['updated_at'] if ultimo.data else ''}"
+
+    contenido = f"{FORMATO_PAQUETE}|{servicio_id}|{marca_servicio}|{marca_puntos}"
+    return f"{servicio_id}-{hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _firmar(datos: bytes) -> Optional[str]:
+    """HMAC-SHA256 del JSON sin comprimir, si hay clave configurada"""
+    if not settings.paquete_offline_clave_firma:
+        return None
+    return hmac.new(settings.paquete_offline_clave_firma.encode("utf-8"), datos, hashlib.sha256).hexdigest()
+
+
+def construir_paquete(supabase, servicio_id: int, version: str) -> PaqueteOffline:
+    """Arma y comprime el paquete offline del servicio"""
+    resp = supabase.table("servicios").select(COLUMNAS_SERVICIO).eq("id", servicio_id).execute()
+    if not resp.data:
+        raise ServicioNoEncontradoError()
+
+    # La versión se lee antes que los puntos (ver /puntos/cambios)
+    version_de_puntos = version_puntos(supabase, servicio_id)
+    puntos = leer_puntos(
+        lambda: supabase.table("puntos_qr").select(COLUMNAS_SYNC).eq("servicio_id", servicio_id).eq("activo", True)
+    )
+
+    contenido = {
+        "formato": FORMATO_PAQUETE,
+        "version": version,
+        "version_puntos": version_de_puntos,
+        "generado": datetime.now(timezone.utc).isoformat(),
+        "servicio": resp.data[0],
+        "puntos": [punto_offline(p) for p in puntos],
+    }
+    identidad = json.dumps(contenido, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+    return PaqueteOffline(
+        version=version,
+        identidad=identidad,
+        gzip=gzip.compress(identidad, compresslevel=9, mtime=0),
+        brotli=brotli.compress(identidad, quality=11) if brotli is not None else None,
+        firma=_firmar(identidad),
+    )
+
+
+def obtener_paquete(servicio_id: int) -> PaqueteOffline:
+    """Paquete vigente del servicio; se rearma solo si cambió su versión"""
+    supabase = get_supabase_client()
+    version = version_paquete(supabase, servicio_id)
+
+    paquete = _paquetes.get(servicio_id)
+    if paquete is not None and paquete.version == version:
+        return paquete
+
+    # Un solo armado por servicio aunque lleguen muchos dispositivos a la vez;
+    # los demás servicios no esperan
+    with _bloqueo_servicio(servicio_id):
+        paquete = _paquetes.get(servicio_id)
+        if paquete is None or paquete.version != version:
+            paquete = construir_paquete(supabase, servicio_id, version)
+            _paquetes[servicio_id] = paquete
+    return paquete
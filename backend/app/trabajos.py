@@ -0,0 +1,280 @@
+"""
+Cola de trabajos de reportes con artefactos en disco.
+
+- Los reportes se generan en un pool de procesos acotado (app.procesos).
+- Dos pedidos con los mismos filtros normalizados comparten el mismo trabajo:
+  el id del trabajo ES la clave de los filtros. Un archivo ya generado solo se
+  reutiliza si el llamador lo permite (períodos cerrados); si el período
+  incluye hoy, se comparte el trabajo en curso pero no el archivo terminado.
+- Los archivos generados quedan en un almacén en disco con TTL y tamaño máximo;
+  como el id es la clave, cualquier worker de uvicorn puede encontrar el archivo.
+"""
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+from app.config import get_settings
+from app.procesos import obtener_pool, descartar_pool
+
+settings = get_settings()
+
+POOL_REPORTES = "reportes"
+
+
+class ColaLlenaError(Exception):
+    """Hay demasiados trabajos pendientes para aceptar uno nuevo"""
+
+
+def normalizar_fecha(valor: Optional[str]) -> Optional[str]:
+    """Normaliza fechas ISO para que '2025-01-01T00:00:00Z' y '2025-01-01T00:00:00+00:00' den la misma clave"""
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor.replace('Z', '+00:00')).isoformat()
+    except ValueError:
+        return valor
+
+
+def clave_trabajo(**filtros) -> str:
+    """Clave estable de un reporte a partir de sus filtros"""
+    normalizados = {
+        k: normalizar_fecha(v) if k.startswith("fecha") else v
+        for k, v in filtros.items()
+        if v not in (None, "")
+    }
+    contenido = json.dumps(normalizados, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+
+def _generar_a_archivo(funcion: Callable, ruta: str, kwargs: dict) -> int:
+    """Se ejecuta en el proceso hijo: genera el reporte directo a disco y devuelve su tamaño"""
+    funcion(ruta, **kwargs)
+    return os.path.getsize(ruta)
+
+
+class AlmacenArtefactos:
+    """Directorio de archivos generados con expiración por TTL y límite de tamaño (LRU)"""
+
+    def __init__(self, directorio: str, max_bytes: int, ttl_segundos: int):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        os.makedirs(directorio, exist_ok=True)
+
+    def ruta(self, clave: str, nombre: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.{nombre}")
+
+    def buscar(self, clave: str) -> Optional[str]:
+        """Ruta del artefacto vigente para la clave, o None"""
+        for ruta in glob.glob(os.path.join(self.directorio, f"{clave}.*")):
+            if ruta.endswith(".tmp"):
+                continue
+            try:
+                # mtime = momento de generación (TTL); atime = último uso (LRU)
+                mtime = os.path.getmtime(ruta)
+                if time.time() - mtime > self.ttl_segundos:
+                    os.remove(ruta)
+                    continue
+                os.utime(ruta, (time.time(), mtime))
+            except FileNotFoundError:
+                continue
+            return ruta
+        return None
+
+    def limpiar(self):
+        """Elimina artefactos vencidos y, si se supera el tamaño máximo, los menos usados"""
+        ahora = time.time()
+        archivos = []
+        for entrada in os.scandir(self.directorio):
+            if not entrada.is_file():
+                continue
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            # Los .tmp huérfanos (proceso caído) también vencen por TTL
+            if ahora - info.st_mtime > self.ttl_segundos:
+                try:
+                    os.remove(entrada.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if not entrada.name.endswith(".tmp"):
+                archivos.append((info.st_atime, info.st_size, entrada.path))
+
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+
+
+class Trabajo:
+    """Estado de un trabajo de reporte"""
+
+    def __init__(self, id: str, nombre: str):
+        self.id = id
+        self.nombre = nombre
+        self.estado = "pendiente"  # pendiente, en_proceso, completado, error
+        self.error: Optional[str] = None
+        self.ruta: Optional[str] = None
+        self.tamano: Optional[int] = None
+        self.creado = datetime.utcnow()
+        self.finalizado: Optional[datetime] = None
+        self._future: Optional[Future] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in ("pendiente", "en_proceso")
+
+    def actualizar_estado(self):
+        if self.estado == "pendiente" and self._future is not None and self._future.running():
+            self.estado = "en_proceso"
+
+    def a_dict(self) -> dict:
+        self.actualizar_estado()
+        return {
+            "trabajo_id": self.id,
+            "estado": self.estado,
+            "archivo": self.nombre,
+            "tamano_bytes": self.tamano,
+            "error": self.error,
+            "creado": self.creado,
+            "finalizado": self.finalizado,
+        }
+
+
+class ColaTrabajos:
+    """Encola reportes en el pool de procesos, deduplicando por clave de filtros"""
+
+    def __init__(self, almacen: AlmacenArtefactos, max_workers: int, max_pendientes: int):
+        self.almacen = almacen
+        self.max_workers = max_workers
+        self.max_pendientes = max_pendientes
+        self._trabajos: Dict[str, Trabajo] = {}
+
+    def obtener(self, clave: str) -> Optional[Trabajo]:
+        """Trabajo conocido por este proceso o, si no, artefacto ya generado en disco"""
+        trabajo = self._trabajos.get(clave)
+        if trabajo is not None and (trabajo.activo or trabajo.estado == "error"):
+            return trabajo
+
+        ruta = self.almacen.buscar(clave)
+        if ruta is None:
+            return None
+
+        if trabajo is None:
+            trabajo = Trabajo(clave, os.path.basename(ruta)[len(clave) + 1:])
+            trabajo.estado = "completado"
+            trabajo.finalizado = datetime.utcfromtimestamp(os.path.getmtime(ruta))
+            self._trabajos[clave] = trabajo
+        trabajo.ruta = ruta
+        trabajo.tamano = os.path.getsize(ruta)
+        return trabajo
+
+    def enviar(
+        self,
+        clave: str,
+        nombre: str,
+        funcion: Callable,
+        preparar: Optional[Callable] = None,
+        reutilizar_terminado: bool = True,
+        **kwargs
+    ) -> Trabajo:
+        """
+        Devuelve el trabajo existente para la clave (en curso o, si
+        `reutilizar_terminado`, ya generado) o encola uno nuevo. Debe llamarse
+        desde el event loop.
+
+        Si se pasa `preparar`, primero se ejecuta preparar(**kwargs) en un hilo
+        del proceso principal (consultas a la base) y lo que devuelve son los
+        kwargs de `funcion`, que corre en el pool (trabajo de CPU).
+        """
+        existente = self.obtener(clave)
+        if existente is not None and (existente.activo or (reutilizar_terminado and existente.estado == "completado")):
+            return existente
+
+        pendientes = sum(1 for t in self._trabajos.values() if t.activo)
+        if pendientes >= self.max_pendientes:
+            raise ColaLlenaError("Hay demasiados reportes en proceso. Intente más tarde")
+
+        trabajo = Trabajo(clave, nombre)
+        ruta = self.almacen.ruta(clave, nombre)
+        trabajo._tarea = asyncio.ensure_future(self._ejecutar(trabajo, ruta, funcion, preparar, kwargs))
+        self._trabajos[clave] = trabajo
+        return trabajo
+
+    def _enviar_al_pool(self, funcion: Callable, ruta: str, kwargs: dict) -> Future:
+        try:
+            pool = obtener_pool(POOL_REPORTES, self.max_workers)
+            return pool.submit(_generar_a_archivo, funcion, ruta, kwargs)
+        except BrokenProcessPool:
+            descartar_pool(POOL_REPORTES)
+            pool = obtener_pool(POOL_REPORTES, self.max_workers)
+            return pool.submit(_generar_a_archivo, funcion, ruta, kwargs)
+
+    async def _ejecutar(self, trabajo: Trabajo, ruta: str, funcion: Callable, preparar: Optional[Callable], kwargs: dict):
+        try:
+            if preparar is not None:
+                kwargs = await asyncio.to_thread(preparar, **kwargs)
+            trabajo._future = self._enviar_al_pool(funcion, ruta + ".tmp", kwargs)
+            trabajo.tamano = await asyncio.wrap_future(trabajo._future)
+            os.replace(ruta + ".tmp", ruta)
+            trabajo.ruta = ruta
+            trabajo.estado = "completado"
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                descartar_pool(POOL_REPORTES)
+            trabajo.estado = "error"
+            trabajo.error = str(e) or e.__class__.__name__
+            try:
+                os.remove(ruta + ".tmp")
+            except FileNotFoundError:
+                pass
+        finally:
+            trabajo.finalizado = datetime.utcnow()
+            trabajo._future = None
+            self._olvidar_finalizados()
+            self.almacen.limpiar()
+
+    def _olvidar_finalizados(self):
+        """Los trabajos terminados viven en disco; en memoria se guardan solo unos pocos"""
+        finalizados = [t for t in self._trabajos.values() if not t.activo]
+        sobrantes = len(finalizados) - self.max_pendientes * 4
+        for trabajo in sorted(finalizados, key=lambda t: t.finalizado)[:max(sobrantes, 0)]:
+            self._trabajos.pop(trabajo.id, None)
+
+    async def esperar(self, trabajo: Trabajo) -> Trabajo:
+        """Espera a que termine un trabajo (para los endpoints de exportación síncronos)"""
+        if trabajo._tarea is not None:
+            await asyncio.shield(trabajo._tarea)
+        return trabajo
+
+
+_cola: Optional[ColaTrabajos] = None
+
+
+def obtener_cola() -> ColaTrabajos:
+    """Cola de reportes compartida por el proceso"""
+    global _cola
+    if _cola is None:
+        directorio = settings.reportes_dir or os.path.join(tempfile.gettempdir(), "acrux_reportes")
+        almacen = AlmacenArtefactos(
+            directorio,
+            max_bytes=settings.reportes_max_mb * 1024 * 1024,
+            ttl_segundos=settings.reportes_ttl_minutos * 60,
+        )
+        _cola = ColaTrabajos(almacen, settings.reportes_workers, settings.reportes_max_pendientes)
+    return _cola
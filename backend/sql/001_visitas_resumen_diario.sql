@@ -0,0 +1,140 @@
+-- ============================================================
+-- Resumen diario de visitas: servicio × punto × guardia × día
+-- ============================================================
+-- El día es el de created_at en UTC (mismo campo que filtran los reportes).
+-- Se actualiza de forma incremental con un trigger AFTER INSERT sobre visitas
+-- y se puede reconstruir completo (o desde una fecha) con
+-- reconstruir_visitas_resumen_diario().
+
+CREATE TABLE IF NOT EXISTS visitas_resumen_diario (
+    servicio_id     INTEGER     NOT NULL DEFAULT 0,
+    punto_qr_id     INTEGER     NOT NULL,
+    guardia_id      INTEGER     NOT NULL DEFAULT 0,
+    dia             DATE        NOT NULL,
+    total           INTEGER     NOT NULL DEFAULT 0,
+    normales        INTEGER     NOT NULL DEFAULT 0,
+    observaciones   INTEGER     NOT NULL DEFAULT 0,
+    incidencias     INTEGER     NOT NULL DEFAULT 0,
+    primera_visita  TIMESTAMPTZ,
+    ultima_visita   TIMESTAMPTZ,
+    PRIMARY KEY (servicio_id, punto_qr_id, guardia_id, dia)
+);
+
+CREATE INDEX IF NOT EXISTS idx_visitas_resumen_punto_dia
+    ON visitas_resumen_diario (punto_qr_id, dia);
+
+CREATE INDEX IF NOT EXISTS idx_visitas_resumen_dia
+    ON visitas_resumen_diario (dia);
+
+
+-- Incremento por cada visita insertada
+CREATE OR REPLACE FUNCTION trg_visitas_resumen_diario() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.punto_qr_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO visitas_resumen_diario AS r (
+        servicio_id, punto_qr_id, guardia_id, dia,
+        total, normales, observaciones, incidencias,
+        primera_visita, ultima_visita
+    ) VALUES (
+        COALESCE(NEW.servicio_id, 0),
+        NEW.punto_qr_id,
+        COALESCE(NEW.guardia_id, 0),
+        (NEW.created_at AT TIME ZONE 'UTC')::date,
+        1,
+        (NEW.tipo = 'normal')::int,
+        (NEW.tipo = 'observacion')::int,
+        (NEW.tipo = 'incidencia')::int,
+        NEW.created_at,
+        NEW.created_at
+    )
+    ON CONFLICT (servicio_id, punto_qr_id, guardia_id, dia) DO UPDATE SET
+        total          = r.total + 1,
+        normales       = r.normales + EXCLUDED.normales,
+        observaciones  = r.observaciones + EXCLUDED.observaciones,
+        incidencias    = r.incidencias + EXCLUDED.incidencias,
+        primera_visita = LEAST(r.primera_visita, EXCLUDED.primera_visita),
+        ultima_visita  = GREATEST(r.ultima_visita, EXCLUDED.ultima_visita);
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visitas_resumen_diario_insert ON visitas;
+CREATE TRIGGER visitas_resumen_diario_insert
+    AFTER INSERT ON visitas
+    FOR EACH ROW EXECUTE FUNCTION trg_visitas_resumen_diario();
+
+
+-- Reconstrucción desde cero (p_desde NULL) o a partir de un día
+CREATE OR REPLACE FUNCTION reconstruir_visitas_resumen_diario(p_desde DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    filas INTEGER;
+BEGIN
+    -- Bloquea los inserts del trigger mientras se reconstruye
+    LOCK TABLE visitas_resumen_diario IN EXCLUSIVE MODE;
+
+    DELETE FROM visitas_resumen_diario
+    WHERE p_desde IS NULL OR dia >= p_desde;
+
+    INSERT INTO visitas_resumen_diario (
+        servicio_id, punto_qr_id, guardia_id, dia,
+        total, normales, observaciones, incidencias,
+        primera_visita, ultima_visita
+    )
+    SELECT
+        COALESCE(servicio_id, 0),
+        punto_qr_id,
+        COALESCE(guardia_id, 0),
+        (created_at AT TIME ZONE 'UTC')::date AS dia,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE tipo = 'normal'),
+        COUNT(*) FILTER (WHERE tipo = 'observacion'),
+        COUNT(*) FILTER (WHERE tipo = 'incidencia'),
+        MIN(created_at),
+        MAX(created_at)
+    FROM visitas
+    WHERE punto_qr_id IS NOT NULL
+      AND (p_desde IS NULL OR created_at >= (p_desde::timestamp AT TIME ZONE 'UTC'))
+    GROUP BY 1, 2, 3, 4;
+
+    GET DIAGNOSTICS filas = ROW_COUNT;
+    RETURN filas;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Conteos por punto × guardia de un período de días completos [p_desde, p_hasta).
+-- El resultado depende de puntos × guardias, no de la cantidad de días ni de visitas.
+CREATE OR REPLACE FUNCTION resumen_visitas_periodo(
+    p_puntos INTEGER[] DEFAULT NULL,
+    p_desde DATE DEFAULT NULL,
+    p_hasta DATE DEFAULT NULL,
+    p_tipo TEXT DEFAULT NULL
+)
+RETURNS TABLE (punto_qr_id INTEGER, guardia_id INTEGER, total BIGINT) AS $$
+    SELECT r.punto_qr_id, r.guardia_id, SUM(
+        CASE p_tipo
+            WHEN 'normal' THEN r.normales
+            WHEN 'observacion' THEN r.observaciones
+            WHEN 'incidencia' THEN r.incidencias
+            ELSE r.total
+        END
+    ) AS total
+    FROM visitas_resumen_diario r
+    WHERE (p_puntos IS NULL OR r.punto_qr_id = ANY(p_puntos))
+      AND (p_desde IS NULL OR r.dia >= p_desde)
+      AND (p_hasta IS NULL OR r.dia < p_hasta)
+    GROUP BY r.punto_qr_id, r.guardia_id
+    HAVING SUM(
+        CASE p_tipo
+            WHEN 'normal' THEN r.normales
+            WHEN 'observacion' THEN r.observaciones
+            WHEN 'incidencia' THEN r.incidencias
+            ELSE r.total
+        END
+    ) > 0;
+$$ LANGUAGE sql STABLE;
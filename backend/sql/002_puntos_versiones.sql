@@ -0,0 +1,61 @@
+-- ============================================================
+-- Versionado de puntos QR por servicio (sincronización delta)
+-- ============================================================
+-- Cada servicio tiene un contador que se incrementa con cada cambio en sus
+-- puntos. El punto guarda el valor del contador de su último cambio, así un
+-- dispositivo con la versión N pide solo los puntos con version > N.
+-- Los puntos que salen de un servicio (borrado o cambio de servicio) quedan
+-- registrados en puntos_qr_bajas para que el dispositivo los quite.
+
+CREATE TABLE IF NOT EXISTS servicios_puntos_version (
+    servicio_id INTEGER PRIMARY KEY,
+    version     BIGINT  NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS puntos_qr_bajas (
+    servicio_id INTEGER     NOT NULL,
+    punto_qr_id INTEGER     NOT NULL,
+    version     BIGINT      NOT NULL,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_puntos_qr_bajas_servicio_version
+    ON puntos_qr_bajas (servicio_id, version);
+
+ALTER TABLE puntos_qr ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_puntos_qr_servicio_version
+    ON puntos_qr (servicio_id, version);
+
+
+-- Siguiente versión del servicio (crea el contador si no existe)
+CREATE OR REPLACE FUNCTION siguiente_version_puntos(p_servicio_id INTEGER)
+RETURNS BIGINT AS $$
+    INSERT INTO servicios_puntos_version AS s (servicio_id, version)
+    VALUES (COALESCE(p_servicio_id, 0), 1)
+    ON CONFLICT (servicio_id) DO UPDATE SET version = s.version + 1
+    RETURNING version;
+$$ LANGUAGE sql;
+
+
+CREATE OR REPLACE FUNCTION trg_puntos_qr_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND NEW.servicio_id IS DISTINCT FROM OLD.servicio_id) THEN
+        INSERT INTO puntos_qr_bajas (servicio_id, punto_qr_id, version)
+        VALUES (COALESCE(OLD.servicio_id, 0), OLD.id, siguiente_version_puntos(OLD.servicio_id));
+
+        IF TG_OP = 'DELETE' THEN
+            RETURN OLD;
+        END IF;
+    END IF;
+
+    NEW.version := siguiente_version_puntos(NEW.servicio_id);
+    NEW.updated_at := now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS puntos_qr_version ON puntos_qr;
+CREATE TRIGGER puntos_qr_version
+    BEFORE INSERT OR UPDATE OR DELETE ON puntos_qr
+    FOR EACH ROW EXECUTE FUNCTION trg_puntos_qr_version();
@@ -0,0 +1,28 @@
+-- ============================================================
+-- Búsqueda y paginación de los listados de administración
+-- ============================================================
+-- Índices trigram para las búsquedas `ilike '%texto%'` de los endpoints
+-- /usuarios/pagina, /servicios/pagina y /admin/puntos/pagina, e índices
+-- (columna, id) para la paginación keyset por cada orden disponible.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_trgm
+    ON usuarios USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_usuarios_email_trgm
+    ON usuarios USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_servicios_nombre_trgm
+    ON servicios USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_puntos_qr_nombre_trgm
+    ON puntos_qr USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_puntos_qr_qr_code_trgm
+    ON puntos_qr USING gin (qr_code gin_trgm_ops);
+
+-- Keyset: (orden, id)
+CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_id      ON usuarios (nombre, id);
+CREATE INDEX IF NOT EXISTS idx_usuarios_email_id       ON usuarios (email, id);
+CREATE INDEX IF NOT EXISTS idx_usuarios_created_at_id  ON usuarios (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_servicios_nombre_id     ON servicios (nombre, id);
+CREATE INDEX IF NOT EXISTS idx_servicios_fecha_creacion_id ON servicios (fecha_creacion, id);
+CREATE INDEX IF NOT EXISTS idx_puntos_qr_nombre_id     ON puntos_qr (nombre, id);
+CREATE INDEX IF NOT EXISTS idx_puntos_qr_created_at_id ON puntos_qr (created_at, id);
@@ -0,0 +1,8 @@
+-- ============================================================
+-- Índice para el reporte de cumplimiento de rondas
+-- ============================================================
+-- /reportes/cumplimiento lee las visitas de un servicio por fecha_hora
+-- (momento del escaneo, no de la sincronización) para rangos de varios meses.
+
+CREATE INDEX IF NOT EXISTS idx_visitas_servicio_fecha_hora
+    ON visitas (servicio_id, fecha_hora);
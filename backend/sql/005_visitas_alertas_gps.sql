@@ -0,0 +1,18 @@
+-- ============================================================
+-- Alertas de GPS en visitas
+-- ============================================================
+-- Al registrar o sincronizar visitas se marcan (sin rechazarlas) las que
+-- implican una velocidad imposible desde la visita anterior del guardia o
+-- repiten exactamente sus coordenadas en otro punto (ver app/antifraude.py).
+
+ALTER TABLE visitas
+    ADD COLUMN IF NOT EXISTS alertas_gps TEXT[] NOT NULL DEFAULT '{}';
+
+-- Última visita de un guardia (posición previa cuando no está en memoria)
+CREATE INDEX IF NOT EXISTS idx_visitas_guardia_fecha_hora
+    ON visitas (guardia_id, fecha_hora DESC);
+
+-- Listado de visitas con alertas: pocas filas, índice parcial
+CREATE INDEX IF NOT EXISTS idx_visitas_con_alertas_gps
+    ON visitas (id DESC)
+    WHERE alertas_gps <> '{}';
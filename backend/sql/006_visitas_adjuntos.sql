@@ -0,0 +1,23 @@
+-- ============================================================
+-- Fotos adjuntas a visitas
+-- ============================================================
+-- Los archivos se guardan en el almacén local del backend bajo su SHA-256
+-- (ADJUNTOS_DIR, ver app/adjuntos.py); esta tabla solo relaciona cada
+-- visita con los archivos adjuntos. El mismo contenido subido dos veces a
+-- una visita se registra una sola vez.
+
+CREATE TABLE IF NOT EXISTS visitas_adjuntos (
+    id BIGSERIAL PRIMARY KEY,
+    visita_id INTEGER NOT NULL REFERENCES visitas(id) ON DELETE CASCADE,
+    sha256 CHAR(64) NOT NULL,
+    tipo_contenido TEXT NOT NULL,
+    tamano BIGINT NOT NULL,
+    nombre_original TEXT,
+    usuario_id INTEGER REFERENCES usuarios(id),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (visita_id, sha256)
+);
+
+-- Archivos compartidos entre visitas (limpieza de objetos sin referencias)
+CREATE INDEX IF NOT EXISTS idx_visitas_adjuntos_sha256
+    ON visitas_adjuntos (sha256);
@@ -0,0 +1,90 @@
+-- ============================================================
+-- Búsqueda de texto completo en las observaciones de visitas
+-- ============================================================
+-- Configuración de texto en español sin acentos ("camión" = "camion") con
+-- raíces (stemming: "puertas abiertas" encuentra "puerta abierta"), columna
+-- tsvector generada e índice GIN por (servicio_id, observacion_tsv).
+-- La función buscar_visitas devuelve una página ordenada por relevancia con
+-- paginación keyset sobre (rango, id); la usa /reportes/visitas/buscar
+-- (ver app/busqueda.py).
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_sin_acentos') THEN
+        CREATE TEXT SEARCH CONFIGURATION public.es_sin_acentos (COPY = pg_catalog.spanish);
+        ALTER TEXT SEARCH CONFIGURATION public.es_sin_acentos
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END $$;
+
+ALTER TABLE visitas
+    ADD COLUMN IF NOT EXISTS observacion_tsv TSVECTOR
+    GENERATED ALWAYS AS (
+        to_tsvector('public.es_sin_acentos'::regconfig, COALESCE(observacion, ''))
+    ) STORED;
+
+-- btree_gin permite filtrar por servicio dentro del mismo índice
+CREATE INDEX IF NOT EXISTS idx_visitas_observacion_tsv
+    ON visitas USING gin (servicio_id, observacion_tsv);
+
+-- Página de resultados de [p_desde, p_hasta) (created_at, igual que los reportes).
+-- Sintaxis de consulta de websearch_to_tsquery: palabras (todas deben
+-- aparecer), "frase exacta", palabra1 or palabra2 y -palabra para excluir.
+-- Para la página siguiente se pasan rango e id de la última fila.
+CREATE OR REPLACE FUNCTION buscar_visitas(
+    p_consulta TEXT,
+    p_servicio_id INTEGER DEFAULT NULL,
+    p_desde TIMESTAMPTZ DEFAULT NULL,
+    p_hasta TIMESTAMPTZ DEFAULT NULL,
+    p_tipo TEXT DEFAULT NULL,
+    p_limite INTEGER DEFAULT 20,
+    p_cursor_rango REAL DEFAULT NULL,
+    p_cursor_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    id INTEGER,
+    servicio_id INTEGER,
+    punto_qr_id INTEGER,
+    guardia_id INTEGER,
+    tipo TEXT,
+    observacion TEXT,
+    fecha_hora TIMESTAMPTZ,
+    created_at TIMESTAMPTZ,
+    rango REAL,
+    fragmento TEXT
+) AS $$
+    WITH consulta AS (
+        SELECT websearch_to_tsquery('public.es_sin_acentos'::regconfig, p_consulta) AS q
+    ),
+    coincidencias AS (
+        SELECT v.id, v.servicio_id, v.punto_qr_id, v.guardia_id, v.tipo::TEXT AS tipo,
+               v.observacion, v.fecha_hora::TIMESTAMPTZ AS fecha_hora,
+               v.created_at::TIMESTAMPTZ AS created_at,
+               ts_rank_cd(v.observacion_tsv, c.q) AS rango
+        FROM visitas v, consulta c
+        WHERE v.observacion_tsv @@ c.q
+          AND (p_servicio_id IS NULL OR v.servicio_id = p_servicio_id)
+          AND (p_desde IS NULL OR v.created_at >= p_desde)
+          AND (p_hasta IS NULL OR v.created_at < p_hasta)
+          AND (p_tipo IS NULL OR v.tipo = p_tipo)
+    ),
+    pagina AS (
+        SELECT m.*
+        FROM coincidencias m
+        WHERE p_cursor_id IS NULL
+           OR m.rango < p_cursor_rango
+           OR (m.rango = p_cursor_rango AND m.id < p_cursor_id)
+        ORDER BY m.rango DESC, m.id DESC
+        LIMIT p_limite
+    )
+    -- El fragmento resaltado se calcula solo para las filas de la página
+    SELECT p.id, p.servicio_id, p.punto_qr_id, p.guardia_id, p.tipo, p.observacion,
+           p.fecha_hora, p.created_at, p.rango,
+           ts_headline('public.es_sin_acentos'::regconfig, p.observacion, c.q,
+                       'StartSel=«, StopSel=», MaxWords=30, MinWords=10, MaxFragments=2')
+    FROM pagina p, consulta c
+    ORDER BY p.rango DESC, p.id DESC;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,43 @@
+-- ============================================================
+-- Rutas de patrulla
+-- ============================================================
+-- Una ruta es una lista ordenada de puntos de un servicio, con los minutos
+-- esperados desde el punto anterior. El avance de cada guardia en su ruta
+-- se actualiza al registrar cada visita (ver app/rutas.py) y se guarda en
+-- rutas_progreso, así el estado de todos los guardias se consulta sin
+-- recorrer el historial de visitas.
+
+CREATE TABLE IF NOT EXISTS rutas (
+    id SERIAL PRIMARY KEY,
+    servicio_id INTEGER NOT NULL REFERENCES servicios(id) ON DELETE CASCADE,
+    nombre TEXT NOT NULL,
+    tolerancia_minutos INTEGER NOT NULL DEFAULT 5,
+    activa BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_rutas_servicio_activa
+    ON rutas (servicio_id)
+    WHERE activa;
+
+-- Un punto aparece una sola vez por ruta
+CREATE TABLE IF NOT EXISTS rutas_puntos (
+    ruta_id INTEGER NOT NULL REFERENCES rutas(id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    punto_qr_id INTEGER NOT NULL REFERENCES puntos_qr(id) ON DELETE CASCADE,
+    minutos_esperados INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ruta_id, orden),
+    UNIQUE (ruta_id, punto_qr_id)
+);
+
+-- Avance actual de cada guardia (una fila por guardia)
+CREATE TABLE IF NOT EXISTS rutas_progreso (
+    guardia_id INTEGER PRIMARY KEY REFERENCES usuarios(id) ON DELETE CASCADE,
+    servicio_id INTEGER NOT NULL,
+    ruta_id INTEGER NOT NULL REFERENCES rutas(id) ON DELETE CASCADE,
+    estado JSONB NOT NULL,
+    actualizado TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_rutas_progreso_servicio
+    ON rutas_progreso (servicio_id);
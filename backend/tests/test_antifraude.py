@@ -0,0 +1,59 @@
+import numpy as np
+from app.antifraude import ALERTA_COORDENADAS, ALERTA_VELOCIDAD, UltimaPosicion, alertas_secuencia
+
+VELOCIDAD_MAX_KMH = 120
+TOLERANCIA_M = 100
+
+# Un grado de latitud son ~111 km
+BASE_LAT, BASE_LON = -31.4, -64.18
+
+
+def _alertas(visitas, anterior=None):
+    """visitas: (segundos, latitud, longitud, punto)"""
+    instantes, latitudes, longitudes, puntos = zip(*visitas)
+    return alertas_secuencia(
+        np.array(instantes, dtype=float), np.array(latitudes), np.array(longitudes),
+        np.array(puntos, dtype=np.int64), anterior, VELOCIDAD_MAX_KMH, TOLERANCIA_M,
+    )
+
+
+def test_sin_alertas_a_velocidad_normal():
+    # ~1,1 km en 10 minutos = ~67 km/h
+    assert _alertas([(0, BASE_LAT, BASE_LON, 1), (600, BASE_LAT + 0.01, BASE_LON, 2)]) == [[], []]
+
+
+def test_velocidad_imposible_se_marca_en_la_posterior():
+    # ~11 km en 1 minuto
+    alertas = _alertas([(0, BASE_LAT, BASE_LON, 1), (60, BASE_LAT + 0.1, BASE_LON, 2)])
+    assert alertas == [[], [ALERTA_VELOCIDAD]]
+
+
+def test_salto_menor_a_la_tolerancia_es_ruido():
+    # ~55 m en el mismo segundo
+    assert _alertas([(0, BASE_LAT, BASE_LON, 1), (0, BASE_LAT + 0.0005, BASE_LON, 2)]) == [[], []]
+
+
+def test_coordenadas_repetidas_en_puntos_distintos():
+    alertas = _alertas([(0, BASE_LAT, BASE_LON, 1), (600, BASE_LAT, BASE_LON, 2), (1200, BASE_LAT, BASE_LON, 2)])
+    assert alertas == [[], [ALERTA_COORDENADAS], []]
+
+
+def test_se_ordenan_por_instante():
+    # Recibidas fuera de orden: el salto es entre la de t=0 y la de t=60
+    alertas = _alertas([(60, BASE_LAT + 0.1, BASE_LON, 2), (0, BASE_LAT, BASE_LON, 1), (4000, BASE_LAT + 0.2, BASE_LON, 3)])
+    assert alertas == [[ALERTA_VELOCIDAD], [], []]
+
+
+def test_anterior_entra_en_la_secuencia_sin_recibir_alertas():
+    anterior = UltimaPosicion(instante=0, latitud=BASE_LAT, longitud=BASE_LON, punto_qr_id=1)
+    assert _alertas([(60, BASE_LAT + 0.1, BASE_LON, 2)], anterior) == [[ALERTA_VELOCIDAD]]
+
+
+def test_salto_hacia_la_ya_registrada_se_marca_en_la_nueva_anterior():
+    # Visita offline tardía: la nueva es anterior a la registrada y el salto imposible es hacia ella
+    anterior = UltimaPosicion(instante=600, latitud=BASE_LAT + 0.1, longitud=BASE_LON, punto_qr_id=2)
+    assert _alertas([(540, BASE_LAT, BASE_LON, 1)], anterior) == [[ALERTA_VELOCIDAD]]
+
+
+def test_una_sola_visita_sin_anterior():
+    assert _alertas([(0, BASE_LAT, BASE_LON, 1)]) == [[]]
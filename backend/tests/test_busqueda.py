@@ -0,0 +1,90 @@
+import pytest
+from app.busqueda import IndiceInvertido, analizar_consulta, leer_cursor, pagina_busqueda, raiz, terminos
+
+
+def _indice(observaciones):
+    indice = IndiceInvertido()
+    for i, observacion in enumerate(observaciones, start=1):
+        indice.agregar({
+            "id": i,
+            "tipo": "incidencia" if i % 2 else "ronda",
+            "observacion": observacion,
+            "created_at": f"2025-01-{i:02d}T12:00:00Z",
+        })
+    return indice
+
+
+def test_raiz_une_singular_plural_y_derivados():
+    assert raiz("puertas") == raiz("puerta") == "puert"
+    assert raiz("camiones") == "camion"
+    assert raiz("rapidamente") == "rapid"
+    assert raiz("iluminacion") == "ilumin"
+
+
+def test_raiz_no_recorta_palabras_cortas():
+    assert raiz("sol") == "sol"
+    assert raiz("mes") == "mes"
+
+
+def test_terminos_normaliza_y_quita_palabras_vacias():
+    assert terminos("La puerta del Depósito estaba ABIERTA") == ["puert", "deposit", "estab", "abiert"]
+    assert terminos(None) == []
+    assert terminos("de la y") == []
+
+
+def test_analizar_consulta_separa_excluidas():
+    assert analizar_consulta('puertas "abiertas" -portón') == (["puert", "abiert"], ["porton"])
+
+
+def test_buscar_requiere_todas_las_palabras():
+    indice = _indice(["Puerta abierta", "Puerta cerrada", "Ventana abierta"])
+    assert [v["id"] for v in indice.buscar("puertas abiertas")] == [1]
+    assert indice.buscar("portón") == []
+
+
+def test_buscar_excluye_y_filtra():
+    indice = _indice(["Puerta abierta", "Puerta cerrada", "Puerta rota"])
+    assert sorted(v["id"] for v in indice.buscar("puerta -cerrada")) == [1, 3]
+    assert [v["id"] for v in indice.buscar("puerta", tipo="ronda")] == [2]
+    resultados = indice.buscar("puerta", desde=1735732800.0)  # 2025-01-01T12:00Z
+    assert sorted(v["id"] for v in resultados) == [1, 2, 3]
+    resultados = indice.buscar("puerta", desde=1735732801.0, hasta=1735905600.0)  # hasta el 3 excluido
+    assert [v["id"] for v in resultados] == [2]
+
+
+def test_buscar_resalta_el_fragmento():
+    indice = _indice(["Se encontró la puerta abierta"])
+    assert indice.buscar("puertas")[0]["fragmento"] == "Se encontró la «puerta» abierta"
+
+
+def test_buscar_ordena_por_relevancia_y_luego_id():
+    indice = _indice(["ruido", "ruido ruido ruido", "ruido en el portón de entrada trasero", "ruido"])
+    ids = [v["id"] for v in indice.buscar("ruido")]
+    assert ids[0] == 2
+    assert ids[-1] == 3
+    # A igual relevancia, id descendente
+    assert ids.index(4) < ids.index(1)
+
+
+def test_paginado_con_cursor_recorre_todo_sin_repetir():
+    indice = _indice([f"ronda {i} sin novedad" for i in range(7)])
+    vistos, cursor = [], None
+    while True:
+        resultados = indice.buscar("novedad", limite=3 + 1, cursor=leer_cursor(cursor))
+        pagina, cursor = pagina_busqueda(resultados, 3)
+        vistos.extend(v["id"] for v in pagina)
+        if cursor is None:
+            break
+    assert sorted(vistos) == list(range(1, 8))
+    assert len(vistos) == len(set(vistos))
+
+
+def test_pagina_busqueda_sin_mas_filas_no_tiene_cursor():
+    filas = [{"id": 1, "rango": 1.0}]
+    assert pagina_busqueda(filas, 3) == (filas, None)
+
+
+def test_leer_cursor_invalido():
+    assert leer_cursor(None) is None
+    with pytest.raises(ValueError):
+        leer_cursor("no-es-un-cursor")
@@ -0,0 +1,44 @@
+import numpy as np
+from app.cumplimiento import cruzar_visitas_ventanas
+
+# Ventanas [0, 100), [100, 200), [300, 400): hay un hueco entre 200 y 300
+INICIOS = np.array([0, 100, 300], dtype=float)
+FINES = np.array([100, 200, 400], dtype=float)
+
+
+def _cruzar(visitas):
+    """visitas: (instante, punto, guardia)"""
+    instantes, puntos, guardias = (np.array(c) for c in zip(*visitas))
+    ventanas, puntos, guardias = cruzar_visitas_ventanas(
+        INICIOS, FINES, instantes.astype(float), puntos.astype(np.int64), guardias.astype(np.int64)
+    )
+    return sorted(zip(ventanas.tolist(), puntos.tolist(), guardias.tolist()))
+
+
+def test_una_ronda_por_ventana_y_punto():
+    assert _cruzar([(10, 1, 5), (50, 1, 6), (60, 2, 6), (150, 1, 7)]) == [
+        (0, 1, 5), (0, 2, 6), (1, 1, 7),
+    ]
+
+
+def test_la_ronda_es_del_guardia_de_la_primera_visita():
+    # Recibidas fuera de orden: la primera en el tiempo es la del guardia 8
+    assert _cruzar([(90, 1, 5), (20, 1, 8)]) == [(0, 1, 8)]
+
+
+def test_visitas_fuera_de_ventanas_no_cuentan():
+    assert _cruzar([(-5, 1, 5), (250, 1, 5), (400, 1, 5)]) == []
+
+
+def test_limites_de_la_ventana():
+    # El inicio está incluido y el fin no
+    assert _cruzar([(100, 1, 5), (300, 2, 5), (399.9, 3, 5)]) == [(1, 1, 5), (2, 2, 5), (2, 3, 5)]
+
+
+def test_sin_visitas_o_sin_ventanas():
+    vacio = np.array([], dtype=float)
+    for resultado in (
+        cruzar_visitas_ventanas(INICIOS, FINES, vacio, vacio.astype(np.int64), vacio.astype(np.int64)),
+        cruzar_visitas_ventanas(vacio, vacio, np.array([1.0]), np.array([1]), np.array([1])),
+    ):
+        assert all(len(parte) == 0 for parte in resultado)
@@ -0,0 +1,52 @@
+import numpy as np
+from app.densidad import CELDAS_TESELA, ZOOM_BASE, histograma_base, matriz_tesela, reducir, unir
+
+
+def _como_dict(histograma):
+    cx, cy, cantidades = histograma
+    return dict(zip(zip(cx.tolist(), cy.tolist()), cantidades.tolist()))
+
+
+def test_histograma_base_cuenta_repetidas_y_descarta_nan():
+    latitudes = np.array([-31.4, -31.4, np.nan, 10.0])
+    longitudes = np.array([-64.18, -64.18, -64.0, np.nan])
+    cx, cy, cantidades = histograma_base(latitudes, longitudes)
+    assert cantidades.tolist() == [2]
+
+
+def test_reducir_suma_las_celdas_hijas():
+    # Coordenadas distintas al zoom base que caen en la misma celda a zoom 0
+    latitudes = np.array([-31.4, -31.4001, 40.0])
+    longitudes = np.array([-64.18, -64.1801, 120.0])
+    base = histograma_base(latitudes, longitudes)
+    assert len(base[0]) == 3
+    assert reducir(base, ZOOM_BASE) is base
+    assert sorted(_como_dict(reducir(base, 0)).values()) == [1, 2]
+    assert sum(reducir(base, 10)[2].tolist()) == 3
+
+
+def test_reducir_a_zoom_cero_queda_en_la_tesela_unica():
+    base = histograma_base(np.array([0.0, 60.0, -60.0]), np.array([0.0, 90.0, -90.0]))
+    cx, cy, _ = reducir(base, 0)
+    assert ((0 <= cx) & (cx < CELDAS_TESELA) & (0 <= cy) & (cy < CELDAS_TESELA)).all()
+
+
+def test_unir_suma_histogramas():
+    a = histograma_base(np.array([-31.4]), np.array([-64.18]))
+    b = histograma_base(np.array([-31.4, 40.0]), np.array([-64.18, 120.0]))
+    assert sorted(_como_dict(unir([a, b])).values()) == [1, 2]
+    assert len(unir([])[0]) == 0
+
+
+def test_matriz_tesela():
+    histograma = (np.array([0, 63, 64, 70]), np.array([0, 10, 0, 70]), np.array([3, 1, 5, 2]))
+    matriz = matriz_tesela(histograma, 0, 0)
+    assert matriz.shape == (CELDAS_TESELA, CELDAS_TESELA)
+    # [fila=y, columna=x]
+    assert matriz[0, 0] == 3
+    assert matriz[10, 63] == 1
+    assert matriz.sum() == 4
+
+    vecina = matriz_tesela(histograma, 1, 1)
+    assert vecina[70 - CELDAS_TESELA, 70 - CELDAS_TESELA] == 2
+    assert vecina.sum() == 2
@@ -0,0 +1,108 @@
+from datetime import datetime
+import numpy as np
+import pytz
+from app.horarios import DIA, SEMANA, HorarioCompilado, intervalos_semanales
+
+HORA = 3600
+LUNES, DOMINGO = 0, 6
+
+
+def _horario(hora_inicio, hora_fin, dias, intervalo=60, zona=pytz.UTC):
+    intervalos = intervalos_semanales(hora_inicio, hora_fin, dias)
+    return HorarioCompilado(
+        servicio_id=1,
+        inicios=[inicio for inicio, _ in intervalos],
+        fines=[fin for _, fin in intervalos],
+        intervalo_ronda_minutos=intervalo,
+        activo=True,
+        zona=zona,
+    )
+
+
+def _utc(*args):
+    # 2025-01-06 es lunes
+    return datetime(*args, tzinfo=pytz.UTC)
+
+
+def test_turno_diurno():
+    assert intervalos_semanales("08:00", "16:00", [LUNES]) == [(8 * HORA, 16 * HORA)]
+
+
+def test_turno_nocturno_queda_en_el_dia_de_inicio():
+    assert intervalos_semanales("22:00", "06:00", [LUNES, 1]) == [
+        (22 * HORA, DIA + 6 * HORA),
+        (DIA + 22 * HORA, 2 * DIA + 6 * HORA),
+    ]
+
+
+def test_turno_del_domingo_a_la_noche_pasa_al_lunes():
+    assert intervalos_semanales("22:00", "06:00", [DOMINGO]) == [
+        (0, 6 * HORA),
+        (6 * DIA + 22 * HORA, SEMANA),
+    ]
+
+
+def test_turnos_contiguos_se_unen():
+    # hora_fin == hora_inicio: 24 horas
+    assert intervalos_semanales("08:00", "08:00", [LUNES, 1]) == [(8 * HORA, 2 * DIA + 8 * HORA)]
+
+
+def test_dias_repetidos_no_duplican():
+    assert intervalos_semanales("08:00", "16:00", [2, 2]) == [(2 * DIA + 8 * HORA, 2 * DIA + 16 * HORA)]
+
+
+def test_en_servicio_turno_nocturno_del_domingo():
+    horario = _horario("22:00", "06:00", [DOMINGO])
+    assert horario.en_servicio(_utc(2025, 1, 12, 23))  # domingo
+    assert horario.en_servicio(_utc(2025, 1, 13, 5, 59))  # lunes
+    assert not horario.en_servicio(_utc(2025, 1, 13, 6))
+    assert not horario.en_servicio(_utc(2025, 1, 12, 21))
+
+
+def test_segundos_en_servicio_cruzando_semanas():
+    horario = _horario("22:00", "06:00", [DOMINGO])
+    assert horario.segundos_en_servicio(_utc(2025, 1, 12), _utc(2025, 1, 13, 12)) == 8 * HORA
+    # Dos semanas completas
+    assert horario.segundos_en_servicio(_utc(2025, 1, 6), _utc(2025, 1, 20)) == 2 * 8 * HORA
+    assert horario.segundos_en_servicio(_utc(2025, 1, 13), _utc(2025, 1, 12)) == 0
+
+
+def test_tramos_unen_el_turno_que_cruza_la_semana():
+    horario = _horario("22:00", "06:00", [DOMINGO])
+    assert horario.tramos(_utc(2025, 1, 12), _utc(2025, 1, 14)) == [
+        (_utc(2025, 1, 12, 22), _utc(2025, 1, 13, 6)),
+    ]
+
+
+def test_ventanas_y_rondas_esperadas():
+    horario = _horario("22:00", "06:00", [DOMINGO], intervalo=180)
+    ventanas = horario.ventanas_ronda(_utc(2025, 1, 12), _utc(2025, 1, 14))
+    # 8 horas en ventanas de 3: dos completas, el sobrante no cuenta
+    assert ventanas == [
+        (_utc(2025, 1, 12, 22), _utc(2025, 1, 13, 1)),
+        (_utc(2025, 1, 13, 1), _utc(2025, 1, 13, 4)),
+    ]
+    assert horario.rondas_esperadas(_utc(2025, 1, 12), _utc(2025, 1, 14)) == 2
+
+
+def test_ventanas_de_un_turno_empezado_antes_del_rango():
+    horario = _horario("08:00", "16:00", [LUNES], intervalo=120)
+    ventanas = horario.ventanas_ronda(_utc(2025, 1, 6, 9), _utc(2025, 1, 6, 16))
+    # Las ventanas se alinean al inicio real del turno (08:00)
+    assert [inicio.hour for inicio, _ in ventanas] == [10, 12, 14]
+
+
+def test_horario_en_la_zona_del_servicio():
+    zona = pytz.timezone("America/Argentina/Cordoba")  # UTC-3
+    horario = _horario("08:00", "16:00", [LUNES], zona=zona)
+    assert horario.en_servicio(_utc(2025, 1, 6, 11))
+    assert not horario.en_servicio(_utc(2025, 1, 6, 9))
+    assert horario.inicio_dia(datetime(2025, 1, 6).date()) == zona.localize(datetime(2025, 1, 6))
+
+
+def test_segundos_en_servicio_array_coincide_con_escalar():
+    horario = _horario("22:00", "06:00", [DOMINGO, 2])
+    instantes = [_utc(2025, 1, 8, 23), _utc(2025, 1, 12, 23, 30), _utc(2025, 1, 13, 3), _utc(2025, 1, 20)]
+    acumulados = horario.segundos_en_servicio_array(np.array([i.timestamp() for i in instantes]))
+    for (a, b), diferencia in zip(zip(instantes, instantes[1:]), np.diff(acumulados)):
+        assert diferencia == horario.segundos_en_servicio(a, b)
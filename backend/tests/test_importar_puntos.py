@@ -0,0 +1,81 @@
+import pytest
+from app.importar_puntos import RADIO_MAX, ArchivoInvalidoError, leer_archivo, validar_filas
+
+
+def _fila(**valores):
+    fila = {"nombre": "Portón", "latitud": "-31.4", "longitud": "-64.18"}
+    fila.update(valores)
+    return fila
+
+
+def test_fila_valida_solo_lleva_las_columnas_opcionales_presentes():
+    validos, errores = validar_filas([_fila()], servicio_defecto=3)
+    assert errores == {}
+    assert validos == [{
+        "fila": 1, "qr_code": None, "nombre": "Portón",
+        "latitud": -31.4, "longitud": -64.18, "servicio_id": 3,
+    }]
+
+
+def test_columnas_opcionales():
+    validos, _ = validar_filas(
+        [_fila(qr_code=" QR-1 ", descripcion=" Entrada ", radio_validacion="30", activo="no", servicio_id="4")],
+        servicio_defecto=3,
+    )
+    punto = validos[0]
+    assert punto["qr_code"] == "QR-1"
+    assert punto["descripcion"] == "Entrada"
+    assert punto["radio_validacion"] == 30
+    assert punto["activo"] is False
+    assert punto["servicio_id"] == 4
+
+
+def test_coma_decimal():
+    validos, _ = validar_filas([_fila(latitud="-31,4", longitud="-64,18")], servicio_defecto=3)
+    assert (validos[0]["latitud"], validos[0]["longitud"]) == (-31.4, -64.18)
+
+
+@pytest.mark.parametrize("valores, error", [
+    ({"nombre": " "}, "Falta el nombre"),
+    ({"latitud": "abc"}, "Coordenadas faltantes o no numéricas"),
+    ({"longitud": None}, "Coordenadas faltantes o no numéricas"),
+    ({"latitud": "91"}, "Latitud debe estar entre -90 y 90"),
+    ({"longitud": "-181"}, "Longitud debe estar entre -180 y 180"),
+    ({"radio_validacion": "cincuenta"}, "Radio de validación no numérico"),
+    ({"radio_validacion": str(RADIO_MAX + 1)}, "Radio de validación debe estar entre"),
+])
+def test_errores_por_fila(valores, error):
+    validos, errores = validar_filas([_fila(), _fila(**valores)], servicio_defecto=3)
+    assert [p["fila"] for p in validos] == [1]
+    assert errores[2].startswith(error)
+
+
+def test_falta_servicio():
+    _, errores = validar_filas([_fila()], servicio_defecto=None)
+    assert errores == {1: "Falta servicio_id"}
+
+
+def test_se_informa_el_primer_error_de_la_fila():
+    _, errores = validar_filas([_fila(nombre="", latitud="x")], servicio_defecto=3)
+    assert errores == {1: "Falta el nombre"}
+
+
+def test_leer_csv():
+    contenido = "Nombre,Latitud,Longitud\nPortón, -31.4 ,-64.18\n".encode("utf-8")
+    assert leer_archivo(contenido, "puntos.csv") == [{"nombre": "Portón", "latitud": "-31.4", "longitud": "-64.18"}]
+
+
+def test_leer_geojson():
+    contenido = b'''{"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"Nombre": "Norte"}, "geometry": {"type": "Point", "coordinates": [-64.18, -31.4]}},
+        {"type": "Feature", "properties": null, "geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}}
+    ]}'''
+    filas = leer_archivo(contenido, "puntos.geojson")
+    assert filas[0] == {"nombre": "Norte", "longitud": -64.18, "latitud": -31.4}
+    assert filas[1] == {"longitud": None, "latitud": None}
+
+
+@pytest.mark.parametrize("contenido", [b"[1, 2]", b'{"type": "Point"}', b'{"type": "FeatureCollection", "features": [1]}', b"{"])
+def test_geojson_invalido(contenido):
+    with pytest.raises(ArchivoInvalidoError):
+        leer_archivo(contenido, "puntos.json")
@@ -0,0 +1,118 @@
+from app.rutas import (
+    EN_ORDEN, FUERA_DE_ORDEN, IGNORADA, PUNTOS_SALTADOS, ProgresoRuta, compilar_ruta,
+)
+
+MINUTO = 60
+
+
+def _ruta(tolerancia_minutos=5):
+    # Puntos 10 -> 20 -> 30 -> 40, diez minutos entre cada uno
+    return compilar_ruta(
+        {"id": 1, "servicio_id": 7, "nombre": "Perímetro", "tolerancia_minutos": tolerancia_minutos},
+        [{"punto_qr_id": p, "orden": i, "minutos_esperados": 10} for i, p in enumerate([10, 20, 30, 40])],
+    )
+
+
+def _progreso():
+    return ProgresoRuta(guardia_id=3, servicio_id=7, ruta_id=1)
+
+
+def test_compilar_ruta_acumula_tiempos_en_orden():
+    ruta = compilar_ruta(
+        {"id": 1, "servicio_id": 7, "nombre": "R"},
+        [
+            {"punto_qr_id": 30, "orden": 2, "minutos_esperados": 5},
+            {"punto_qr_id": 10, "orden": 0, "minutos_esperados": 99},
+            {"punto_qr_id": 20, "orden": 1, "minutos_esperados": 10},
+        ],
+    )
+    assert ruta.puntos == [10, 20, 30]
+    assert ruta.acumulados == [0, 600, 900]
+    assert ruta.posiciones == {10: 0, 20: 1, 30: 2}
+
+
+def test_vuelta_completa_en_orden():
+    ruta, progreso = _ruta(), _progreso()
+    eventos = [progreso.avanzar(ruta, p, i * 10 * MINUTO) for i, p in enumerate([10, 20, 30, 40])]
+    assert [e["estado"] for e in eventos] == [EN_ORDEN] * 4
+    assert eventos[-1]["vuelta_completa"] is True
+    assert progreso.completadas == 1
+    assert progreso.vuelta == 2
+    assert progreso.ultima_vuelta["saltados"] == []
+    assert eventos[-1]["siguiente_punto_id"] == 10
+
+
+def test_punto_salteado():
+    ruta, progreso = _ruta(), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    evento = progreso.avanzar(ruta, 30, 20 * MINUTO)
+    assert evento["estado"] == PUNTOS_SALTADOS
+    assert evento["saltados"] == [20]
+    assert evento["siguiente_punto_id"] == 40
+
+    # La vuelta termina pero con saltos no cuenta como completa
+    evento = progreso.avanzar(ruta, 40, 30 * MINUTO)
+    assert evento["vuelta_completa"] is False
+    assert progreso.completadas == 0
+    assert progreso.ultima_vuelta["saltados"] == [20]
+
+
+def test_retraso_respecto_del_tiempo_esperado():
+    ruta, progreso = _ruta(tolerancia_minutos=5), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    assert progreso.avanzar(ruta, 20, 14 * MINUTO)["retraso"] is False
+    assert progreso.avanzar(ruta, 30, 30 * MINUTO)["retraso"] is True
+    assert progreso.retrasos == 1
+
+
+def test_punto_ya_visitado_es_fuera_de_orden():
+    ruta, progreso = _ruta(), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    progreso.avanzar(ruta, 20, 10 * MINUTO)
+    evento = progreso.avanzar(ruta, 20, 12 * MINUTO)
+    assert evento["estado"] == FUERA_DE_ORDEN
+    assert evento["siguiente_punto_id"] == 30
+    assert progreso.fuera_de_orden == 1
+
+
+def test_volver_al_inicio_cierra_la_vuelta_incompleta():
+    ruta, progreso = _ruta(), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    progreso.avanzar(ruta, 20, 10 * MINUTO)
+    evento = progreso.avanzar(ruta, 10, 20 * MINUTO)
+    assert evento["estado"] == EN_ORDEN
+    assert evento["vuelta"] == 2
+    assert progreso.ultima_vuelta["completa"] is False
+    assert progreso.ultima_vuelta["saltados"] == [30, 40]
+    assert progreso.completadas == 0
+    assert progreso.siguiente == 1
+
+
+def test_reescanear_el_inicio_reinicia_el_reloj_de_la_vuelta():
+    ruta, progreso = _ruta(), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    progreso.avanzar(ruta, 10, 5 * MINUTO)
+    assert progreso.vuelta == 1
+    assert progreso.inicio == 5 * MINUTO
+    assert progreso.visitados == 1
+
+
+def test_visita_offline_tardia_se_ignora():
+    ruta, progreso = _ruta(), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    progreso.avanzar(ruta, 20, 10 * MINUTO)
+    evento = progreso.avanzar(ruta, 30, 5 * MINUTO)
+    assert evento["estado"] == IGNORADA
+    assert evento["siguiente_punto_id"] == 30
+    assert progreso.siguiente == 2
+    assert progreso.ultima == 10 * MINUTO
+
+
+def test_resumen_marca_atraso_para_el_proximo_punto():
+    ruta, progreso = _ruta(tolerancia_minutos=5), _progreso()
+    progreso.avanzar(ruta, 10, 0)
+    assert progreso.resumen(ruta, 14 * MINUTO)["atrasado"] is False
+    resumen = progreso.resumen(ruta, 16 * MINUTO)
+    assert resumen["atrasado"] is True
+    assert resumen["avance"] == 0.25
+    assert resumen["siguiente_punto_id"] == 20
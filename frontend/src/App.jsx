@@ -57,6 +57,9 @@ function App() {
       const response = await api.login(loginForm.email, loginForm.password);
       setUser(response.user);
       await storage.saveUser(response.user);
+      sync.syncPaqueteOffline(response.user.servicio_id).catch(error => {
+        console.error('Error descargando paquete offline:', error);
+      });
       
       // Redirigir según el rol
       if (response.user.rol === 'admin' || response.user.rol === 'administrador') {
@@ -10,6 +10,8 @@ function VisitForm({ qrData, user, onSuccess, onCancel, devMode = false }) {
   const [location, setLocation] = useState(null);
   const [gpsValid, setGpsValid] = useState(null);
   const [puntoInfo, setPuntoInfo] = useState(null);
+  const [foto, setFoto] = useState(null);
+  const [progresoFoto, setProgresoFoto] = useState(null);
 
   useEffect(() => {
     validateQRAndGetLocation();
@@ -111,18 +113,45 @@ function VisitForm({ qrData, user, onSuccess, onCancel, devMode = false }) {
       fecha_hora: new Date().toISOString()
     };
 
+    let visita;
     try {
-      await api.createVisit(visitData);
-      alert('✅ Visita registrada correctamente');
-      if (onSuccess) onSuccess();
+      visita = await api.createVisit(visitData);
     } catch (err) {
       console.log('Sin conexión, guardando offline...');
       await storage.saveVisitOffline(visitData);
-      alert('📴 Visita guardada offline. Se sincronizará cuando haya conexión.');
-      if (onSuccess) onSuccess();
-    } finally {
+      alert(foto && tipo === 'incidencia'
+        ? '📴 Visita guardada offline (sin la foto). Se sincronizará cuando haya conexión.'
+        : '📴 Visita guardada offline. Se sincronizará cuando haya conexión.');
       setLoading(false);
+      if (onSuccess) onSuccess();
+      return;
     }
+
+    if (foto && tipo === 'incidencia') {
+      try {
+        await api.subirAdjunto(visita.id, foto, setProgresoFoto);
+      } catch (err) {
+        console.error('Error subiendo foto:', err);
+        alert('⚠️ Visita registrada, pero no se pudo adjuntar la foto');
+        setLoading(false);
+        if (onSuccess) onSuccess();
+        return;
+      }
+    }
+
+    // Avance en la ruta de patrulla (si el punto pertenece a una)
+    let avisoRuta = '';
+    if (visita.ruta?.estado === 'puntos_saltados') {
+      avisoRuta = `\n⚠️ Ruta ${visita.ruta.nombre}: saltaste ${visita.ruta.saltados.length} punto(s)`;
+    } else if (visita.ruta?.estado === 'fuera_de_orden') {
+      avisoRuta = `\n⚠️ Ruta ${visita.ruta.nombre}: punto fuera de orden`;
+    } else if (visita.ruta?.vuelta_completa) {
+      avisoRuta = `\n🏁 Ruta ${visita.ruta.nombre}: vuelta completa`;
+    }
+
+    alert('✅ Visita registrada correctamente' + avisoRuta);
+    setLoading(false);
+    if (onSuccess) onSuccess();
   };
 
   if (loading && !puntoInfo) {
@@ -236,6 +265,26 @@ function VisitForm({ qrData, user, onSuccess, onCancel, devMode = false }) {
           />
         </div>
 
+        {tipo === 'incidencia' && (
+          <div style={{ marginBottom: '15px' }}>
+            <label style={{ display: 'block', marginBottom: '5px', fontWeight: 'bold' }}>
+              Foto (opcional):
+            </label>
+            <input
+              type="file"
+              accept="image/jpeg,image/png,image/webp"
+              capture="environment"
+              onChange={(e) => setFoto(e.target.files[0] || null)}
+              style={{ width: '100%', fontSize: '16px' }}
+            />
+            {progresoFoto !== null && (
+              <div style={{ marginTop: '5px', color: '#555' }}>
+                📤 Subiendo foto... {Math.round(progresoFoto * 100)}%
+              </div>
+            )}
+          </div>
+        )}
+
         <div style={{ display: 'flex', gap: '10px' }}>
           <button
             type="submit"
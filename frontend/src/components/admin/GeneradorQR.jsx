@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { puntosAdminAPI } from '../../services/adminAPI';
 
+const PREVIEWS_EN_PARALELO = 6;
+
 const GeneradorQR = () => {
   const [puntos, setPuntos] = useState([]);
   const [puntosSeleccionados, setPuntosSeleccionados] = useState([]);
@@ -10,6 +12,7 @@ const GeneradorQR = () => {
   const [filtroServicio, setFiltroServicio] = useState('');
   const [servicios, setServicios] = useState([]);
   const [previews, setPreviews] = useState({}); // Para almacenar las imágenes base64
+  const [porPagina, setPorPagina] = useState(4); // Etiquetas por hoja del PDF
 
   useEffect(() => {
     cargarDatos();
@@ -39,7 +42,9 @@ const GeneradorQR = () => {
     const token = localStorage.getItem('token');
     const previewsObj = {};
 
-    for (const punto of puntosData) {
+    // El backend responde con ETag/Cache-Control: el navegador reutiliza las
+    // imágenes ya descargadas. Se piden varias a la vez en lugar de una por una.
+    const cargarPreview = async (punto) => {
       try {
         const response = await fetch(`http://127.0.0.1:3001/qr-generator/preview/${punto.id}`, {
           headers: {
@@ -59,7 +64,15 @@ const GeneradorQR = () => {
       } catch (error) {
         console.error(`Error cargando preview de ${punto.nombre}:`, error);
       }
-    }
+    };
+
+    const pendientes = [...puntosData];
+    const trabajadores = Array.from({ length: Math.min(PREVIEWS_EN_PARALELO, pendientes.length) }, async () => {
+      while (pendientes.length > 0) {
+        await cargarPreview(pendientes.shift());
+      }
+    });
+    await Promise.all(trabajadores);
 
     setPreviews(previewsObj);
   };
@@ -126,7 +139,8 @@ const GeneradorQR = () => {
           'Authorization': `Bearer ${token}`
         },
         body: JSON.stringify({
-          punto_ids: puntosSeleccionados
+          punto_ids: puntosSeleccionados,
+          por_pagina: porPagina
         })
       });
 
@@ -151,6 +165,47 @@ const GeneradorQR = () => {
     }
   };
 
+  const descargarZIP = async (formato) => {
+    if (puntosSeleccionados.length === 0) {
+      alert('Selecciona al menos un punto QR');
+      return;
+    }
+
+    try {
+      setGenerando(true);
+      const token = localStorage.getItem('token');
+
+      const response = await fetch('http://127.0.0.1:3001/qr-generator/zip', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({
+          punto_ids: puntosSeleccionados,
+          formato
+        })
+      });
+
+      if (!response.ok) throw new Error('Error al generar ZIP');
+
+      const blob = await response.blob();
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `Codigos_QR_Acrux_360_${formato}.zip`;
+      document.body.appendChild(a);
+      a.click();
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
+    } catch (error) {
+      console.error('Error generando ZIP:', error);
+      alert('Error al generar ZIP');
+    } finally {
+      setGenerando(false);
+    }
+  };
+
   const mostrarPreview = (punto) => {
     setPreviewPunto(punto);
   };
@@ -164,6 +219,15 @@ const GeneradorQR = () => {
       <div className="admin-section-header">
         <h2>📱 Generador de Códigos QR</h2>
         <div style={{ display: 'flex', gap: '10px' }}>
+          <select
+            value={porPagina}
+            onChange={(e) => setPorPagina(Number(e.target.value))}
+            disabled={generando}
+          >
+            <option value={4}>4 por hoja</option>
+            <option value={12}>12 por hoja</option>
+            <option value={24}>24 por hoja</option>
+          </select>
           <button 
             className="btn-primary"
             onClick={generarPDF}
@@ -171,6 +235,20 @@ const GeneradorQR = () => {
           >
             {generando ? '⏳ Generando...' : `📄 Generar PDF (${puntosSeleccionados.length})`}
           </button>
+          <button
+            className="btn-secondary"
+            onClick={() => descargarZIP('png')}
+            disabled={puntosSeleccionados.length === 0 || generando}
+          >
+            🗜️ ZIP PNG
+          </button>
+          <button
+            className="btn-secondary"
+            onClick={() => descargarZIP('svg')}
+            disabled={puntosSeleccionados.length === 0 || generando}
+          >
+            🗜️ ZIP SVG
+          </button>
         </div>
       </div>
 
@@ -4,6 +4,8 @@ import { puntosAdminAPI, serviciosAPI } from '../../services/adminAPI';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
 
+const TAMANO_PAGINA = 50;
+
 // Fix para íconos de Leaflet
 delete L.Icon.Default.prototype._getIconUrl;
 L.Icon.Default.mergeOptions({
@@ -30,6 +32,9 @@ const PuntosAdmin = ({ onUpdate }) => {
   const [showForm, setShowForm] = useState(false);
   const [editingPunto, setEditingPunto] = useState(null);
   const [filtros, setFiltros] = useState({ servicio_id: '' });
+  const [busqueda, setBusqueda] = useState('');
+  const [siguienteCursor, setSiguienteCursor] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
   
   const [formData, setFormData] = useState({
     nombre: '',
@@ -43,19 +48,23 @@ const PuntosAdmin = ({ onUpdate }) => {
 
   const [mapPosition, setMapPosition] = useState(null);
   const [showMap, setShowMap] = useState(false);
+  const [importando, setImportando] = useState(false);
 
+  // La búsqueda espera a que se deje de escribir
   useEffect(() => {
-    cargarDatos();
-  }, [filtros]);
+    const timer = setTimeout(cargarDatos, busqueda ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [filtros, busqueda]);
 
   const cargarDatos = async () => {
     try {
       setLoading(true);
-      const [puntosData, serviciosData] = await Promise.all([
-        puntosAdminAPI.listar(filtros),
+      const [pagina, serviciosData] = await Promise.all([
+        puntosAdminAPI.pagina({ ...filtros, q: busqueda, limit: TAMANO_PAGINA }),
         serviciosAPI.listar({ activo: true })
       ]);
-      setPuntos(puntosData);
+      setPuntos(pagina.puntos);
+      setSiguienteCursor(pagina.siguiente_cursor);
       setServicios(serviciosData);
     } catch (error) {
       console.error('Error cargando datos:', error);
@@ -65,6 +74,24 @@ const PuntosAdmin = ({ onUpdate }) => {
     }
   };
 
+  const cargarMas = async () => {
+    if (!siguienteCursor) return;
+
+    setCargandoMas(true);
+    try {
+      const pagina = await puntosAdminAPI.pagina({
+        ...filtros, q: busqueda, limit: TAMANO_PAGINA, cursor: siguienteCursor
+      });
+      setPuntos(prev => [...prev, ...pagina.puntos]);
+      setSiguienteCursor(pagina.siguiente_cursor);
+    } catch (error) {
+      console.error('Error cargando puntos:', error);
+      alert('Error al cargar más puntos QR');
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
 
@@ -131,6 +158,34 @@ const PuntosAdmin = ({ onUpdate }) => {
     }
   };
 
+  const handleImportar = async (e) => {
+    const archivo = e.target.files[0];
+    e.target.value = '';
+    if (!archivo) return;
+
+    try {
+      setImportando(true);
+      const resultado = await puntosAdminAPI.importar(archivo, filtros.servicio_id || null);
+      const errores = resultado.errores
+        .slice(0, 10)
+        .map(err => `Fila ${err.fila}: ${err.error}`)
+        .join('\n');
+      alert(
+        `Importación finalizada: ${resultado.creados} creados, ${resultado.actualizados} actualizados, ` +
+        `${resultado.errores.length} con errores` +
+        (errores ? `\n\n${errores}` : '') +
+        (resultado.errores.length > 10 ? '\n...' : '')
+      );
+      cargarDatos();
+      if (onUpdate) onUpdate();
+    } catch (error) {
+      console.error('Error importando puntos:', error);
+      alert(error.message || 'Error al importar puntos');
+    } finally {
+      setImportando(false);
+    }
+  };
+
   const resetForm = () => {
     setFormData({
       nombre: '',
@@ -181,16 +236,35 @@ const PuntosAdmin = ({ onUpdate }) => {
     <div className="puntos-admin">
       <div className="admin-section-header">
         <h2>Gestión de Puntos QR</h2>
-        <button 
-          className="btn-primary"
-          onClick={() => setShowForm(!showForm)}
-        >
-          {showForm ? '❌ Cancelar' : '➕ Nuevo Punto QR'}
-        </button>
+        <div style={{ display: 'flex', gap: '10px' }}>
+          <label className="btn-secondary" title="CSV (nombre, latitud, longitud...) o GeoJSON. Usa el servicio filtrado para filas sin servicio_id">
+            {importando ? '⏳ Importando...' : '📥 Importar CSV/GeoJSON'}
+            <input
+              type="file"
+              accept=".csv,.geojson,.json"
+              onChange={handleImportar}
+              disabled={importando}
+              style={{ display: 'none' }}
+            />
+          </label>
+          <button 
+            className="btn-primary"
+            onClick={() => setShowForm(!showForm)}
+          >
+            {showForm ? '❌ Cancelar' : '➕ Nuevo Punto QR'}
+          </button>
+        </div>
       </div>
 
       {/* Filtros */}
       <div className="filtros">
+        <input
+          type="search"
+          placeholder="Buscar por nombre o código"
+          value={busqueda}
+          onChange={(e) => setBusqueda(e.target.value)}
+        />
+
         <select 
           value={filtros.servicio_id}
           onChange={(e) => setFiltros({ ...filtros, servicio_id: e.target.value })}
@@ -417,7 +491,15 @@ const PuntosAdmin = ({ onUpdate }) => {
           </table>
 
           {puntos.length === 0 && (
-            <p className="no-data">No hay puntos QR creados</p>
+            <p className="no-data">{busqueda ? 'No se encontraron puntos QR' : 'No hay puntos QR creados'}</p>
+          )}
+
+          {siguienteCursor && (
+            <div style={{ textAlign: 'center', marginTop: '1rem' }}>
+              <button className="btn-secondary" onClick={cargarMas} disabled={cargandoMas}>
+                {cargandoMas ? 'Cargando...' : 'Cargar más'}
+              </button>
+            </div>
           )}
         </div>
       )}
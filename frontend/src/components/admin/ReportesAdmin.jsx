@@ -2,6 +2,9 @@ import React, { useState, useEffect } from 'react';
 import { usuariosAPI, serviciosAPI, puntosAdminAPI, reportesAPI } from '../../services/adminAPI';
 import '../admin/AdminPanel.css';
 
+// Visitas por página en la tabla de resultados
+const TAMANO_PAGINA = 100;
+
 const ReportesAdmin = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -14,12 +17,15 @@ const ReportesAdmin = () => {
   const [usuarioId, setUsuarioId] = useState('');
   const [servicioId, setServicioId] = useState(''); // OBLIGATORIO
   const [puntoQrId, setPuntoQrId] = useState('');
+  const [soloAlertasGps, setSoloAlertasGps] = useState(false);
 
   // Datos
   const [usuarios, setUsuarios] = useState([]);
   const [servicios, setServicios] = useState([]);
   const [puntosQr, setPuntosQr] = useState([]);
   const [reporteData, setReporteData] = useState(null);
+  const [filtrosVisitas, setFiltrosVisitas] = useState('');
+  const [cargandoMas, setCargandoMas] = useState(false);
 
   useEffect(() => {
     cargarDatosIniciales();
@@ -66,11 +72,43 @@ const ReportesAdmin = () => {
 
       let data;
       if (tipoReporte === 'visitas') {
-        data = await reportesAPI.getReporteVisitas(params.toString());
+        // Estadísticas y primera página por separado: la tabla se muestra sin esperar el total
+        if (soloAlertasGps) params.append('solo_alertas_gps', 'true');
+        const paginaParams = new URLSearchParams(params);
+        paginaParams.append('limit', TAMANO_PAGINA);
+        const [estadisticas, pagina] = await Promise.all([
+          reportesAPI.getEstadisticasVisitas(params.toString()),
+          reportesAPI.getPaginaVisitas(paginaParams.toString())
+        ]);
+        setFiltrosVisitas(params.toString());
+        data = { estadisticas, visitas: pagina.visitas, siguiente_cursor: pagina.siguiente_cursor };
       } else if (tipoReporte === 'ranking') {
         data = await reportesAPI.getRankingPuntos(params.toString());
       } else if (tipoReporte === 'alertas') {
         data = await reportesAPI.getReporteAlertas(params.toString());
+      } else if (tipoReporte === 'cumplimiento') {
+        // Días locales del servicio: fechas sin hora
+        const cumplimientoParams = new URLSearchParams({
+          servicio_id: servicioId,
+          fecha_inicio: fechaInicio,
+          fecha_fin: fechaFin
+        });
+        if (puntoQrId) cumplimientoParams.append('punto_qr_id', puntoQrId);
+        data = await reportesAPI.getCumplimiento(cumplimientoParams.toString());
+      } else if (tipoReporte === 'intervalos') {
+        const intervalosParams = new URLSearchParams({
+          servicio_id: servicioId,
+          fecha_inicio: fechaInicio,
+          fecha_fin: fechaFin
+        });
+        data = await reportesAPI.getIntervalos(intervalosParams.toString());
+      } else if (tipoReporte === 'recorridos') {
+        const recorridosParams = new URLSearchParams({
+          servicio_id: servicioId,
+          fecha_inicio: fechaInicio,
+          fecha_fin: fechaFin
+        });
+        data = await reportesAPI.getRecorridos(recorridosParams.toString());
       }
 
       setReporteData(data);
@@ -82,6 +120,27 @@ const ReportesAdmin = () => {
     }
   };
 
+  const cargarMasVisitas = async () => {
+    if (!reporteData?.siguiente_cursor) return;
+
+    setCargandoMas(true);
+    try {
+      const params = new URLSearchParams(filtrosVisitas);
+      params.append('limit', TAMANO_PAGINA);
+      params.append('cursor', reporteData.siguiente_cursor);
+      const pagina = await reportesAPI.getPaginaVisitas(params.toString());
+      setReporteData(prev => ({
+        ...prev,
+        visitas: [...prev.visitas, ...pagina.visitas],
+        siguiente_cursor: pagina.siguiente_cursor
+      }));
+    } catch (err) {
+      setError(err.message || 'Error al cargar más visitas');
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
   const exportarExcel = async () => {
     if (!servicioId) {
       setError('Debe seleccionar un servicio');
@@ -196,6 +255,9 @@ const ReportesAdmin = () => {
               <option value="visitas">Visitas</option>
               <option value="ranking">Ranking de Puntos</option>
               <option value="alertas">Alertas</option>
+              <option value="cumplimiento">Cumplimiento de Rondas</option>
+              <option value="intervalos">Intervalos entre Visitas</option>
+              <option value="recorridos">Recorridos de Guardias</option>
             </select>
           </div>
 
@@ -269,6 +331,17 @@ const ReportesAdmin = () => {
                   ))}
                 </select>
               </div>
+
+              <div className="form-group">
+                <label>
+                  <input
+                    type="checkbox"
+                    checked={soloAlertasGps}
+                    onChange={(e) => setSoloAlertasGps(e.target.checked)}
+                  />
+                  {' '}Solo visitas con alertas de GPS
+                </label>
+              </div>
             </>
           )}
         </div>
@@ -363,7 +436,7 @@ const ReportesAdmin = () => {
                   </tr>
                 </thead>
                 <tbody>
-                  {reporteData.visitas.slice(0, 100).map((visita, idx) => {
+                  {reporteData.visitas.map((visita, idx) => {
                     const { fecha, hora } = formatearFechaHora(visita.created_at);
                     return (
                       <tr key={idx}>
@@ -372,7 +445,13 @@ const ReportesAdmin = () => {
                         <td>{visita.punto_nombre || 'Desconocido'}</td>
                         <td>{visita.usuario_nombre || 'Desconocido'}</td>
                         <td>
-                          <span className="badge badge-success">✓ Visitado</span>
+                          {visita.alertas_gps && visita.alertas_gps.length > 0 ? (
+                            <span className="badge badge-warning" title={visita.alertas_gps.join(', ')}>
+                              ⚠ GPS sospechoso
+                            </span>
+                          ) : (
+                            <span className="badge badge-success">✓ Visitado</span>
+                          )}
                         </td>
                         <td>{visita.observacion || visita.observaciones || '-'}</td>
                       </tr>
@@ -380,15 +459,156 @@ const ReportesAdmin = () => {
                   })}
                 </tbody>
               </table>
-              {reporteData.visitas.length > 100 && (
-                <p className="table-note">
-                  Mostrando 100 de {reporteData.visitas.length} visitas. 
-                  Exporta a Excel o PDF para ver todos los resultados.
-                </p>
+              {reporteData.siguiente_cursor && (
+                <div className="table-note">
+                  <p>
+                    Mostrando {reporteData.visitas.length} de {reporteData.estadisticas?.total_visitas} visitas.
+                  </p>
+                  <button
+                    onClick={cargarMasVisitas}
+                    disabled={cargandoMas}
+                    className="btn btn-secondary"
+                  >
+                    {cargandoMas ? 'Cargando...' : 'Cargar más'}
+                  </button>
+                </div>
               )}
             </div>
           )}
 
+          {/* Cumplimiento de rondas */}
+          {tipoReporte === 'cumplimiento' && reporteData.por_punto && (
+            <>
+              <div className="stats-grid">
+                <div className="stat-card">
+                  <div className="stat-value">{reporteData.porcentaje ?? '-'}%</div>
+                  <div className="stat-label">Cumplimiento</div>
+                </div>
+                <div className="stat-card">
+                  <div className="stat-value">{reporteData.cumplidas}</div>
+                  <div className="stat-label">Rondas Cumplidas</div>
+                </div>
+                <div className="stat-card">
+                  <div className="stat-value">{reporteData.esperadas}</div>
+                  <div className="stat-label">Rondas Esperadas</div>
+                </div>
+              </div>
+
+              <div className="table-container">
+                <table className="admin-table">
+                  <thead>
+                    <tr>
+                      <th>Punto QR</th>
+                      <th>Esperadas</th>
+                      <th>Cumplidas</th>
+                      <th>%</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {reporteData.por_punto.map((punto) => (
+                      <tr key={punto.punto_id}>
+                        <td>{punto.nombre}</td>
+                        <td>{punto.esperadas}</td>
+                        <td>{punto.cumplidas}</td>
+                        <td>{punto.porcentaje ?? '-'}</td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+
+              {reporteData.por_guardia.length > 0 && (
+                <div className="table-container">
+                  <table className="admin-table">
+                    <thead>
+                      <tr>
+                        <th>Guardia</th>
+                        <th>Rondas Cumplidas</th>
+                      </tr>
+                    </thead>
+                    <tbody>
+                      {reporteData.por_guardia.map((guardia) => (
+                        <tr key={guardia.guardia_id}>
+                          <td>{guardia.nombre}</td>
+                          <td>{guardia.rondas_cumplidas}</td>
+                        </tr>
+                      ))}
+                    </tbody>
+                  </table>
+                </div>
+              )}
+            </>
+          )}
+
+          {/* Intervalos entre visitas */}
+          {tipoReporte === 'intervalos' && reporteData.puntos && (
+            <div className="table-container">
+              <table className="admin-table">
+                <thead>
+                  <tr>
+                    <th>Punto QR</th>
+                    <th>Visitas</th>
+                    <th>Mediana (min)</th>
+                    <th>P95 (min)</th>
+                    <th>Máximo (min)</th>
+                    <th>Sobre {reporteData.intervalo_ronda_minutos} min</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {reporteData.puntos.map((punto) => (
+                    <tr key={punto.punto_id}>
+                      <td>{punto.nombre}</td>
+                      <td>{punto.visitas}</td>
+                      <td>{punto.p50_minutos ?? '-'}</td>
+                      <td>{punto.p95_minutos ?? '-'}</td>
+                      <td>{punto.max_minutos ?? '-'}</td>
+                      <td>
+                        {punto.sobre_intervalo > 0 ? (
+                          <span className="badge badge-warning">{punto.sobre_intervalo}</span>
+                        ) : 0}
+                      </td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+
+          {/* Recorridos por guardia y turno */}
+          {tipoReporte === 'recorridos' && reporteData.recorridos && (
+            <div className="table-container">
+              <table className="admin-table">
+                <thead>
+                  <tr>
+                    <th>Guardia</th>
+                    <th>Turno</th>
+                    <th>Visitas</th>
+                    <th>Distancia (km)</th>
+                    <th>Duración (min)</th>
+                    <th>Vel. media (km/h)</th>
+                    <th>Vel. máxima (km/h)</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {reporteData.recorridos.map((recorrido) => (
+                    <tr key={`${recorrido.guardia_id}-${recorrido.turno_inicio}`}>
+                      <td>{recorrido.nombre}</td>
+                      <td>
+                        {new Date(recorrido.turno_inicio).toLocaleString('es-MX')}
+                        {!recorrido.en_turno && <span className="badge badge-warning"> Fuera de turno</span>}
+                      </td>
+                      <td>{recorrido.visitas}</td>
+                      <td>{(recorrido.distancia_m / 1000).toFixed(2)}</td>
+                      <td>{recorrido.duracion_minutos}</td>
+                      <td>{recorrido.velocidad_media_kmh ?? '-'}</td>
+                      <td>{recorrido.velocidad_max_kmh ?? '-'}</td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
+            </div>
+          )}
+
           {/* Tabla de Ranking */}
           {tipoReporte === 'ranking' && reporteData.ranking && (
             <div className="table-container">
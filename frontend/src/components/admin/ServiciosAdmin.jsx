@@ -1,11 +1,16 @@
 import React, { useState, useEffect } from 'react';
 import { serviciosAPI } from '../../services/adminAPI';
 
+const TAMANO_PAGINA = 50;
+
 const ServiciosAdmin = ({ onUpdate }) => {
   const [servicios, setServicios] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showForm, setShowForm] = useState(false);
   const [editingServicio, setEditingServicio] = useState(null);
+  const [busqueda, setBusqueda] = useState('');
+  const [siguienteCursor, setSiguienteCursor] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
   
   const [formData, setFormData] = useState({
     nombre: '',
@@ -27,15 +32,18 @@ const ServiciosAdmin = ({ onUpdate }) => {
     { id: 6, nombre: 'Dom' }
   ];
 
+  // La búsqueda espera a que se deje de escribir
   useEffect(() => {
-    cargarServicios();
-  }, []);
+    const timer = setTimeout(cargarServicios, busqueda ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [busqueda]);
 
   const cargarServicios = async () => {
     try {
       setLoading(true);
-      const data = await serviciosAPI.listar();
-      setServicios(data);
+      const pagina = await serviciosAPI.pagina({ q: busqueda, limit: TAMANO_PAGINA });
+      setServicios(pagina.servicios);
+      setSiguienteCursor(pagina.siguiente_cursor);
     } catch (error) {
       console.error('Error cargando servicios:', error);
       alert('Error al cargar servicios');
@@ -44,6 +52,22 @@ const ServiciosAdmin = ({ onUpdate }) => {
     }
   };
 
+  const cargarMas = async () => {
+    if (!siguienteCursor) return;
+
+    setCargandoMas(true);
+    try {
+      const pagina = await serviciosAPI.pagina({ q: busqueda, limit: TAMANO_PAGINA, cursor: siguienteCursor });
+      setServicios(prev => [...prev, ...pagina.servicios]);
+      setSiguienteCursor(pagina.siguiente_cursor);
+    } catch (error) {
+      console.error('Error cargando servicios:', error);
+      alert('Error al cargar más servicios');
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -152,6 +176,16 @@ const ServiciosAdmin = ({ onUpdate }) => {
         </button>
       </div>
 
+      {/* Búsqueda */}
+      <div className="filtros">
+        <input
+          type="search"
+          placeholder="Buscar por nombre"
+          value={busqueda}
+          onChange={(e) => setBusqueda(e.target.value)}
+        />
+      </div>
+
       {/* Formulario */}
       {showForm && (
         <form className="admin-form" onSubmit={handleSubmit}>
@@ -319,7 +353,15 @@ const ServiciosAdmin = ({ onUpdate }) => {
           ))}
 
           {servicios.length === 0 && (
-            <p className="no-data">No hay servicios creados</p>
+            <p className="no-data">{busqueda ? 'No se encontraron servicios' : 'No hay servicios creados'}</p>
+          )}
+
+          {siguienteCursor && (
+            <div style={{ textAlign: 'center', marginTop: '1rem' }}>
+              <button className="btn-secondary" onClick={cargarMas} disabled={cargandoMas}>
+                {cargandoMas ? 'Cargando...' : 'Cargar más'}
+              </button>
+            </div>
           )}
         </div>
       )}
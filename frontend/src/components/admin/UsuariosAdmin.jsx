@@ -1,6 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { usuariosAPI, serviciosAPI } from '../../services/adminAPI';
 
+const TAMANO_PAGINA = 50;
+
 const UsuariosAdmin = ({ onUpdate }) => {
   const [usuarios, setUsuarios] = useState([]);
   const [servicios, setServicios] = useState([]);
@@ -8,6 +10,10 @@ const UsuariosAdmin = ({ onUpdate }) => {
   const [showForm, setShowForm] = useState(false);
   const [editingUser, setEditingUser] = useState(null);
   const [filtros, setFiltros] = useState({ activo: null, rol: '' });
+  const [busqueda, setBusqueda] = useState('');
+  const [siguienteCursor, setSiguienteCursor] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
+  const [importando, setImportando] = useState(false);
   
   const [formData, setFormData] = useState({
     email: '',
@@ -20,18 +26,21 @@ const UsuariosAdmin = ({ onUpdate }) => {
     activo: true
   });
 
+  // La búsqueda espera a que se deje de escribir
   useEffect(() => {
-    cargarDatos();
-  }, [filtros]);
+    const timer = setTimeout(cargarDatos, busqueda ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [filtros, busqueda]);
 
   const cargarDatos = async () => {
     try {
       setLoading(true);
-      const [usuariosData, serviciosData] = await Promise.all([
-        usuariosAPI.listar(filtros),
+      const [pagina, serviciosData] = await Promise.all([
+        usuariosAPI.pagina({ ...filtros, q: busqueda, limit: TAMANO_PAGINA }),
         serviciosAPI.listar({ activo: true })
       ]);
-      setUsuarios(usuariosData);
+      setUsuarios(pagina.usuarios);
+      setSiguienteCursor(pagina.siguiente_cursor);
       setServicios(serviciosData);
     } catch (error) {
       console.error('Error cargando datos:', error);
@@ -41,6 +50,51 @@ const UsuariosAdmin = ({ onUpdate }) => {
     }
   };
 
+  const cargarMas = async () => {
+    if (!siguienteCursor) return;
+
+    setCargandoMas(true);
+    try {
+      const pagina = await usuariosAPI.pagina({
+        ...filtros, q: busqueda, limit: TAMANO_PAGINA, cursor: siguienteCursor
+      });
+      setUsuarios(prev => [...prev, ...pagina.usuarios]);
+      setSiguienteCursor(pagina.siguiente_cursor);
+    } catch (error) {
+      console.error('Error cargando usuarios:', error);
+      alert('Error al cargar más usuarios');
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
+  const handleImportar = async (e) => {
+    const archivo = e.target.files[0];
+    e.target.value = '';
+    if (!archivo) return;
+
+    try {
+      setImportando(true);
+      const resultado = await usuariosAPI.importar(archivo);
+      const errores = resultado.errores
+        .slice(0, 10)
+        .map(err => `Fila ${err.fila}: ${err.error}`)
+        .join('\n');
+      alert(
+        `Importación finalizada: ${resultado.creados} creados, ${resultado.errores.length} con errores` +
+        (errores ? `\n\n${errores}` : '') +
+        (resultado.errores.length > 10 ? '\n...' : '')
+      );
+      cargarDatos();
+      if (onUpdate) onUpdate();
+    } catch (error) {
+      console.error('Error importando usuarios:', error);
+      alert(error.message || 'Error al importar usuarios');
+    } finally {
+      setImportando(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -154,16 +208,35 @@ const UsuariosAdmin = ({ onUpdate }) => {
     <div className="usuarios-admin">
       <div className="admin-section-header">
         <h2>Gestión de Usuarios</h2>
-        <button 
-          className="btn-primary"
-          onClick={() => setShowForm(!showForm)}
-        >
-          {showForm ? '❌ Cancelar' : '➕ Nuevo Usuario'}
-        </button>
+        <div style={{ display: 'flex', gap: '10px' }}>
+          <label className="btn-secondary" title="CSV o JSON con email, password, nombre, rol, servicio_id, telefono, activo">
+            {importando ? '⏳ Importando...' : '📥 Importar CSV/JSON'}
+            <input
+              type="file"
+              accept=".csv,.json"
+              onChange={handleImportar}
+              disabled={importando}
+              style={{ display: 'none' }}
+            />
+          </label>
+          <button 
+            className="btn-primary"
+            onClick={() => setShowForm(!showForm)}
+          >
+            {showForm ? '❌ Cancelar' : '➕ Nuevo Usuario'}
+          </button>
+        </div>
       </div>
 
       {/* Filtros */}
       <div className="filtros">
+        <input
+          type="search"
+          placeholder="Buscar por nombre o email"
+          value={busqueda}
+          onChange={(e) => setBusqueda(e.target.value)}
+        />
+
         <select 
           value={filtros.activo === null ? '' : filtros.activo}
           onChange={(e) => setFiltros({
@@ -374,6 +447,14 @@ const UsuariosAdmin = ({ onUpdate }) => {
           {usuarios.length === 0 && (
             <p className="no-data">No se encontraron usuarios</p>
           )}
+
+          {siguienteCursor && (
+            <div style={{ textAlign: 'center', marginTop: '1rem' }}>
+              <button className="btn-secondary" onClick={cargarMas} disabled={cargandoMas}>
+                {cargandoMas ? 'Cargando...' : 'Cargar más'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
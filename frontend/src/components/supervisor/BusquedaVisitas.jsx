@@ -0,0 +1,154 @@
+import { useState } from 'react';
+import { reportesAPI } from '../../services/adminAPI';
+
+const TAMANO_PAGINA = 20;
+
+// El backend marca las coincidencias entre « »
+function Fragmento({ texto }) {
+  const partes = (texto || '').split(/(«[^»]*»)/);
+  return (
+    <span>
+      {partes.map((parte, i) =>
+        parte.startsWith('«') && parte.endsWith('»')
+          ? <mark key={i}>{parte.slice(1, -1)}</mark>
+          : <span key={i}>{parte}</span>
+      )}
+    </span>
+  );
+}
+
+function BusquedaVisitas({ servicioId }) {
+  const [consulta, setConsulta] = useState('');
+  const [tipo, setTipo] = useState('');
+  const [fechaInicio, setFechaInicio] = useState('');
+  const [fechaFin, setFechaFin] = useState('');
+  const [resultados, setResultados] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [buscado, setBuscado] = useState(false);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState(null);
+
+  const buscar = async (siguiente = null) => {
+    if (consulta.trim().length < 2) return;
+    setLoading(true);
+    setError(null);
+    try {
+      const params = new URLSearchParams({ q: consulta.trim(), limit: TAMANO_PAGINA });
+      if (servicioId) params.append('servicio_id', servicioId);
+      if (tipo) params.append('tipo', tipo);
+      if (fechaInicio) params.append('fecha_inicio', fechaInicio + 'T00:00:00Z');
+      if (fechaFin) params.append('fecha_fin', fechaFin + 'T00:00:00Z');
+      if (siguiente) params.append('cursor', siguiente);
+
+      const data = await reportesAPI.buscarVisitas(params.toString());
+      setResultados(siguiente ? [...resultados, ...data.resultados] : data.resultados);
+      setCursor(data.siguiente_cursor);
+      setBuscado(true);
+    } catch (err) {
+      setError(err.message || 'Error al buscar');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const handleSubmit = (e) => {
+    e.preventDefault();
+    buscar();
+  };
+
+  const inputStyle = {
+    padding: '10px',
+    fontSize: '16px',
+    borderRadius: '4px',
+    border: '1px solid #ccc'
+  };
+
+  return (
+    <div style={{ padding: '20px' }}>
+      <h2>🔎 Búsqueda en observaciones</h2>
+
+      <form onSubmit={handleSubmit} style={{ display: 'flex', flexWrap: 'wrap', gap: '10px', marginBottom: '20px' }}>
+        <input
+          type="text"
+          value={consulta}
+          onChange={(e) => setConsulta(e.target.value)}
+          placeholder='Ej: puerta abierta, "luz apagada", ruido -perro'
+          style={{ ...inputStyle, flex: '1 1 280px' }}
+        />
+        <select value={tipo} onChange={(e) => setTipo(e.target.value)} style={inputStyle}>
+          <option value="">Todos los tipos</option>
+          <option value="normal">Normal</option>
+          <option value="observacion">Observación</option>
+          <option value="incidencia">Incidencia</option>
+        </select>
+        <input type="date" value={fechaInicio} onChange={(e) => setFechaInicio(e.target.value)} style={inputStyle} />
+        <input type="date" value={fechaFin} onChange={(e) => setFechaFin(e.target.value)} style={inputStyle} />
+        <button
+          type="submit"
+          disabled={loading || consulta.trim().length < 2}
+          style={{
+            padding: '10px 20px',
+            fontSize: '16px',
+            color: 'white',
+            background: loading ? '#ccc' : '#1976d2',
+            border: 'none',
+            borderRadius: '4px',
+            cursor: loading ? 'not-allowed' : 'pointer'
+          }}
+        >
+          {loading ? '⏳ Buscando...' : 'Buscar'}
+        </button>
+      </form>
+
+      {error && (
+        <div style={{ background: '#ffcdd2', padding: '10px', borderRadius: '8px', marginBottom: '15px', color: '#c62828' }}>
+          {error}
+        </div>
+      )}
+
+      {buscado && resultados.length === 0 && !loading && (
+        <div style={{ textAlign: 'center', padding: '40px', background: 'white', borderRadius: '8px', color: '#757575' }}>
+          No se encontraron visitas
+        </div>
+      )}
+
+      {resultados.map((visita) => (
+        <div
+          key={visita.id}
+          style={{
+            background: 'white',
+            padding: '15px',
+            borderRadius: '8px',
+            marginBottom: '10px',
+            borderLeft: `4px solid ${visita.tipo === 'incidencia' ? '#f44336' : visita.tipo === 'observacion' ? '#ff9800' : '#4caf50'}`
+          }}
+        >
+          <div style={{ display: 'flex', justifyContent: 'space-between', color: '#555', fontSize: '14px' }}>
+            <span><strong>{visita.punto_nombre}</strong> · {visita.usuario_nombre}</span>
+            <span>{new Date(visita.created_at).toLocaleString('es-MX')}</span>
+          </div>
+          <p style={{ margin: '8px 0 0' }}>
+            <Fragmento texto={visita.fragmento || visita.observacion} />
+          </p>
+          {visita.adjuntos && visita.adjuntos.length > 0 && (
+            <div style={{ marginTop: '5px', fontSize: '13px', color: '#757575' }}>
+              📷 {visita.adjuntos.length} foto(s)
+            </div>
+          )}
+        </div>
+      ))}
+
+      {cursor && (
+        <button
+          onClick={() => buscar(cursor)}
+          disabled={loading}
+          style={{ padding: '10px 20px', fontSize: '16px', borderRadius: '4px', border: '1px solid #1976d2', background: 'white', color: '#1976d2', cursor: 'pointer' }}
+        >
+          {loading ? '⏳ Cargando...' : 'Ver más resultados'}
+        </button>
+      )}
+    </div>
+  );
+}
+
+export default BusquedaVisitas;
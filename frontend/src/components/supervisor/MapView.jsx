@@ -1,7 +1,8 @@
 import { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, Circle } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Popup, Circle, CircleMarker, Tooltip, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import L from 'leaflet';
+import api from '../../services/api';
 
 // Fix para iconos de Leaflet
 delete L.Icon.Default.prototype._getIconUrl;
@@ -11,8 +12,43 @@ L.Icon.Default.mergeOptions({
   shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.7.1/images/marker-shadow.png',
 });
 
-function MapView({ puntos, visitas }) {
+// Minutos a texto corto ("hace 5 min", "hace 3 h")
+const formatearAntiguedad = (minutos) => {
+  if (minutos === null || minutos === undefined) return 'Sin visitas en el período';
+  if (minutos < 60) return `hace ${minutos} min`;
+  if (minutos < 1440) return `hace ${Math.floor(minutos / 60)} h`;
+  return `hace ${Math.floor(minutos / 1440)} d`;
+};
+
+// Pide al servidor los grupos de la vista actual cada vez que el mapa se mueve
+function GruposMapa({ servicioId, onGrupos }) {
+  const map = useMapEvents({
+    moveend: () => cargar(),
+  });
+
+  const cargar = async () => {
+    try {
+      const data = await api.getMapaGrupos({
+        zoom: map.getZoom(),
+        bounds: map.getBounds(),
+        servicioId,
+      });
+      onGrupos(data.grupos);
+    } catch (error) {
+      console.error('Error cargando mapa:', error);
+    }
+  };
+
+  useEffect(() => {
+    cargar();
+  }, [servicioId]);
+
+  return null;
+}
+
+function MapView({ puntos, servicioId }) {
   const [center, setCenter] = useState([20.6296, -87.0739]); // Playa del Carmen por defecto
+  const [grupos, setGrupos] = useState([]);
 
   useEffect(() => {
     if (puntos && puntos.length > 0) {
@@ -30,15 +66,6 @@ function MapView({ puntos, visitas }) {
     shadowSize: [41, 41]
   });
 
-  const getLastVisit = (puntoId) => {
-    if (!visitas) return null;
-    const puntoVisits = visitas.filter(v => v.punto_qr_id === puntoId);
-    if (puntoVisits.length === 0) return null;
-    return puntoVisits.sort((a, b) => 
-      new Date(b.fecha_hora) - new Date(a.fecha_hora)
-    )[0];
-  };
-
   return (
     <div style={{ padding: '20px' }}>
       <h2>🗺️ Mapa de Puntos QR</h2>
@@ -50,6 +77,7 @@ function MapView({ puntos, visitas }) {
         border: '2px solid #e0e0e0'
       }}>
         <MapContainer 
+          key={center.join(',')}
           center={center} 
           zoom={15} 
           style={{ height: '100%', width: '100%' }}
@@ -58,53 +86,83 @@ function MapView({ puntos, visitas }) {
             attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
             url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
           />
+
+          <GruposMapa servicioId={servicioId} onGrupos={setGrupos} />
           
-          {puntos && puntos.map((punto) => {
-            const lastVisit = getLastVisit(punto.id);
-            
-            return (
-              <div key={punto.id}>
-                {/* Marcador del punto */}
-                <Marker 
-                  position={[punto.latitud, punto.longitud]}
-                  icon={qrIcon}
-                >
-                  <Popup>
-                    <div style={{ minWidth: '200px' }}>
-                      <h3 style={{ margin: '0 0 10px 0' }}>{punto.nombre}</h3>
-                      <p style={{ margin: '5px 0' }}>
-                        <strong>Descripción:</strong> {punto.descripcion || 'N/A'}
-                      </p>
-                      {lastVisit ? (
-                        <>
+          {grupos.map((grupo) => {
+            const visitado = grupo.puntos_sin_visitas === 0;
+            const color = visitado ? '#4caf50' : '#f44336';
+
+            if (grupo.puntos === 1) {
+              return (
+                <div key={`punto-${grupo.punto_id}`}>
+                  {/* Marcador del punto */}
+                  <Marker 
+                    position={[grupo.latitud, grupo.longitud]}
+                    icon={qrIcon}
+                  >
+                    <Popup>
+                      <div style={{ minWidth: '200px' }}>
+                        <h3 style={{ margin: '0 0 10px 0' }}>{grupo.nombre}</h3>
+                        {visitado ? (
                           <p style={{ margin: '5px 0', color: '#4caf50' }}>
                             <strong>✅ Última visita:</strong><br/>
-                            {new Date(lastVisit.fecha_hora).toLocaleString('es-MX')}
+                            {formatearAntiguedad(grupo.minutos_desde_ultima_visita)}
                           </p>
-                          <p style={{ margin: '5px 0' }}>
-                            <strong>Tipo:</strong> {lastVisit.tipo}
+                        ) : (
+                          <p style={{ margin: '5px 0', color: '#f44336' }}>
+                            <strong>⚠️ Sin visitas registradas</strong>
                           </p>
-                        </>
-                      ) : (
-                        <p style={{ margin: '5px 0', color: '#f44336' }}>
-                          <strong>⚠️ Sin visitas registradas</strong>
+                        )}
+                        <p style={{ margin: '5px 0' }}>
+                          <strong>Visitas:</strong> {grupo.visitas} · <strong>Incidencias:</strong> {grupo.incidencias}
                         </p>
-                      )}
-                    </div>
-                  </Popup>
-                </Marker>
-                
-                {/* Círculo de radio GPS (50m) */}
-                <Circle
-                  center={[punto.latitud, punto.longitud]}
-                  radius={50}
-                  pathOptions={{ 
-                    color: lastVisit ? '#4caf50' : '#f44336',
-                    fillColor: lastVisit ? '#4caf50' : '#f44336',
-                    fillOpacity: 0.1
-                  }}
-                />
-              </div>
+                      </div>
+                    </Popup>
+                  </Marker>
+                  
+                  {/* Círculo de radio GPS (50m) */}
+                  <Circle
+                    center={[grupo.latitud, grupo.longitud]}
+                    radius={50}
+                    pathOptions={{ 
+                      color,
+                      fillColor: color,
+                      fillOpacity: 0.1
+                    }}
+                  />
+                </div>
+              );
+            }
+
+            // Grupo de varios puntos: tamaño según la cantidad
+            return (
+              <CircleMarker
+                key={`grupo-${grupo.latitud}-${grupo.longitud}`}
+                center={[grupo.latitud, grupo.longitud]}
+                radius={12 + Math.min(Math.log2(grupo.puntos) * 4, 30)}
+                pathOptions={{ color, fillColor: color, fillOpacity: 0.5 }}
+              >
+                <Tooltip direction="center" permanent>
+                  {grupo.puntos}
+                </Tooltip>
+                <Popup>
+                  <div style={{ minWidth: '200px' }}>
+                    <h3 style={{ margin: '0 0 10px 0' }}>{grupo.puntos} puntos</h3>
+                    <p style={{ margin: '5px 0' }}>
+                      <strong>Visitas:</strong> {grupo.visitas} · <strong>Incidencias:</strong> {grupo.incidencias}
+                    </p>
+                    <p style={{ margin: '5px 0' }}>
+                      <strong>Última visita:</strong> {formatearAntiguedad(grupo.minutos_desde_ultima_visita)}
+                    </p>
+                    {grupo.puntos_sin_visitas > 0 && (
+                      <p style={{ margin: '5px 0', color: '#f44336' }}>
+                        <strong>⚠️ {grupo.puntos_sin_visitas} sin visitas</strong>
+                      </p>
+                    )}
+                  </div>
+                </Popup>
+              </CircleMarker>
             );
           })}
         </MapContainer>
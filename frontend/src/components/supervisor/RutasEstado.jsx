@@ -0,0 +1,99 @@
+import { useState, useEffect } from 'react';
+import { rutasAPI } from '../../services/adminAPI';
+import api from '../../services/api';
+
+function RutasEstado({ servicioId, puntos = [] }) {
+  const [estado, setEstado] = useState(null);
+  const [guardias, setGuardias] = useState({});
+  const [error, setError] = useState(null);
+
+  useEffect(() => {
+    cargar();
+    const interval = setInterval(cargar, 60000);
+    return () => clearInterval(interval);
+  }, [servicioId]);
+
+  const cargar = async () => {
+    try {
+      const [estadoData, guardiasData] = await Promise.all([
+        rutasAPI.estado(servicioId),
+        api.getGuardias(servicioId)
+      ]);
+      setEstado(estadoData);
+      setGuardias(Object.fromEntries(guardiasData.map(g => [g.id, g.nombre])));
+      setError(null);
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
+  const nombrePunto = (id) => {
+    const punto = puntos.find(p => p.id === id);
+    return punto ? punto.nombre : `#${id}`;
+  };
+
+  if (error) {
+    return <div style={{ padding: '20px', color: '#c62828' }}>{error}</div>;
+  }
+
+  if (!estado) {
+    return <div style={{ padding: '20px' }}>⏳ Cargando rutas...</div>;
+  }
+
+  return (
+    <div style={{ padding: '20px' }}>
+      <h2>🧭 Avance de rutas</h2>
+      {estado.atrasados > 0 && (
+        <div style={{ background: '#fff3cd', padding: '10px', borderRadius: '8px', marginBottom: '15px', color: '#856404' }}>
+          ⚠️ {estado.atrasados} guardia(s) atrasado(s) para su próximo punto
+        </div>
+      )}
+
+      {estado.guardias.length === 0 ? (
+        <div style={{ textAlign: 'center', padding: '40px', background: 'white', borderRadius: '8px', color: '#757575' }}>
+          Ningún guardia registró visitas en una ruta
+        </div>
+      ) : (
+        <table style={{ width: '100%', background: 'white', borderCollapse: 'collapse', borderRadius: '8px' }}>
+          <thead>
+            <tr style={{ background: '#f5f5f5', textAlign: 'left' }}>
+              <th style={{ padding: '10px' }}>Guardia</th>
+              <th style={{ padding: '10px' }}>Ruta</th>
+              <th style={{ padding: '10px' }}>Vuelta</th>
+              <th style={{ padding: '10px' }}>Avance</th>
+              <th style={{ padding: '10px' }}>Próximo punto</th>
+              <th style={{ padding: '10px' }}>Saltados</th>
+              <th style={{ padding: '10px' }}>Fuera de orden</th>
+              <th style={{ padding: '10px' }}>Última visita</th>
+            </tr>
+          </thead>
+          <tbody>
+            {estado.guardias.map(g => (
+              <tr key={g.guardia_id} style={{ borderTop: '1px solid #eee', background: g.atrasado ? '#ffebee' : 'white' }}>
+                <td style={{ padding: '10px' }}>{guardias[g.guardia_id] || `#${g.guardia_id}`}</td>
+                <td style={{ padding: '10px' }}>{g.ruta_activa ? g.ruta_nombre : 'Ruta inactiva'}</td>
+                <td style={{ padding: '10px' }}>{g.vuelta} ({g.completadas} completas)</td>
+                <td style={{ padding: '10px' }}>
+                  {g.avance !== null ? `${Math.round(g.avance * 100)}%` : '-'}
+                </td>
+                <td style={{ padding: '10px' }}>
+                  {g.siguiente_punto_id ? nombrePunto(g.siguiente_punto_id) : '-'}
+                  {g.atrasado && ' ⏰'}
+                </td>
+                <td style={{ padding: '10px' }}>
+                  {g.saltados.length > 0 ? g.saltados.map(nombrePunto).join(', ') : '-'}
+                </td>
+                <td style={{ padding: '10px' }}>{g.fuera_de_orden}</td>
+                <td style={{ padding: '10px' }}>
+                  {g.minutos_desde_ultima_visita !== null ? `Hace ${g.minutos_desde_ultima_visita} min` : '-'}
+                </td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      )}
+    </div>
+  );
+}
+
+export default RutasEstado;
@@ -6,7 +6,10 @@ import RecentVisits from './RecentVisits';
 import Alertas from './Alertas';
 import GeneradorQR from '../admin/GeneradorQR';
 import ReportesSupervisor from './ReportesSupervisor';
+import BusquedaVisitas from './BusquedaVisitas';
+import RutasEstado from './RutasEstado';
 import api from '../../services/api';
+import sync from '../../services/sync';
 
 function SupervisorPanel({ user }) {
   const [activeTab, setActiveTab] = useState('dashboard');
@@ -31,7 +34,7 @@ function SupervisorPanel({ user }) {
       const visitasData = await api.getVisits(user.servicio_id);
       setVisitas(visitasData);
 
-      const puntosData = await api.getPuntos(user.servicio_id);
+      const puntosData = await sync.syncPuntos(user.servicio_id);
       setPuntos(puntosData);
 
       setLoading(false);
@@ -78,10 +81,12 @@ function SupervisorPanel({ user }) {
         {[
           { id: 'dashboard', label: '📊 Dashboard' },
           { id: 'mapa', label: '🗺️ Mapa' },
+          { id: 'rutas', label: '🧭 Rutas' },
           { id: 'guardias', label: '👥 Guardias' },
           { id: 'alertas', label: '🔔 Alertas', badge: alertasCount },
           { id: 'qr', label: '📱 Códigos QR' },
           { id: 'reportes', label: '📊 Reportes' },
+          { id: 'busqueda', label: '🔎 Búsqueda' },
           { id: 'recientes', label: '🕐 Recientes' }
         ].map(tab => (
           <button
@@ -129,11 +134,13 @@ function SupervisorPanel({ user }) {
       {/* Contenido */}
       <div>
         {activeTab === 'dashboard' && <Dashboard servicioId={user.servicio_id} />}
-        {activeTab === 'mapa' && <MapView puntos={puntos} visitas={visitas} />}
+        {activeTab === 'mapa' && <MapView puntos={puntos} servicioId={user.servicio_id} />}
+        {activeTab === 'rutas' && <RutasEstado servicioId={user.servicio_id} puntos={puntos} />}
         {activeTab === 'guardias' && <GuardiasList servicioId={user.servicio_id} visitas={visitas} />}
         {activeTab === 'alertas' && <Alertas servicioId={user.servicio_id} />}
         {activeTab === 'qr' && <GeneradorQR servicioId={user.servicio_id} />}
         {activeTab === 'reportes' && <ReportesSupervisor servicioId={user.servicio_id} />}
+        {activeTab === 'busqueda' && <BusquedaVisitas servicioId={user.servicio_id} />}
         {activeTab === 'recientes' && <RecentVisits visitas={visitas} />}
       </div>
     </div>
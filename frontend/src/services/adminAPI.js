@@ -44,6 +44,16 @@ export const usuariosAPI = {
     return response.json();
   },
 
+  // Búsqueda y paginación en el servidor: devuelve la página y siguiente_cursor
+  async pagina(params = {}) {
+    const queryString = new URLSearchParams(cleanParams(params)).toString();
+    const response = await fetch(`${API_BASE_URL}/usuarios/pagina?${queryString}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener usuarios');
+    return response.json();
+  },
+
   async crear(usuario) {
     const cleanedData = cleanParams(usuario);
     const response = await fetch(`${API_BASE_URL}/usuarios/`, {
@@ -58,6 +68,25 @@ export const usuariosAPI = {
     return response.json();
   },
 
+  async importar(archivo, servicioId = null) {
+    const formData = new FormData();
+    formData.append('archivo', archivo);
+    if (servicioId) formData.append('servicio_id', servicioId);
+
+    // Sin Content-Type: el navegador lo arma con el boundary del multipart
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/usuarios/importar`, {
+      method: 'POST',
+      headers: { 'Authorization': `Bearer ${token}` },
+      body: formData
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Error al importar usuarios');
+    }
+    return response.json();
+  },
+
   async actualizar(id, usuario) {
     const cleanedData = cleanParams(usuario);
     const response = await fetch(`${API_BASE_URL}/usuarios/${id}`, {
@@ -119,6 +148,16 @@ export const serviciosAPI = {
     return response.json();
   },
 
+  // Búsqueda y paginación en el servidor: devuelve la página y siguiente_cursor
+  async pagina(params = {}) {
+    const queryString = new URLSearchParams(cleanParams(params)).toString();
+    const response = await fetch(`${API_BASE_URL}/servicios/pagina?${queryString}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener servicios');
+    return response.json();
+  },
+
   async crear(servicio) {
     const cleanedData = cleanParams(servicio);
     const response = await fetch(`${API_BASE_URL}/servicios/`, {
@@ -196,6 +235,16 @@ export const puntosAdminAPI = {
     return response.json();
   },
 
+  // Búsqueda y paginación en el servidor: devuelve la página y siguiente_cursor
+  async pagina(params = {}) {
+    const queryString = new URLSearchParams(cleanParams(params)).toString();
+    const response = await fetch(`${API_BASE_URL}/admin/puntos/pagina?${queryString}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener puntos QR');
+    return response.json();
+  },
+
   async crear(punto) {
     const cleanedData = cleanParams(punto);
     const response = await fetch(`${API_BASE_URL}/admin/puntos/`, {
@@ -210,6 +259,26 @@ export const puntosAdminAPI = {
     return response.json();
   },
 
+  async importar(archivo, servicioId = null, actualizar = true) {
+    const formData = new FormData();
+    formData.append('archivo', archivo);
+    if (servicioId) formData.append('servicio_id', servicioId);
+    formData.append('actualizar', actualizar);
+
+    // Sin Content-Type: el navegador lo arma con el boundary del multipart
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/admin/puntos/importar`, {
+      method: 'POST',
+      headers: { 'Authorization': `Bearer ${token}` },
+      body: formData
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Error al importar puntos QR');
+    }
+    return response.json();
+  },
+
   async actualizar(id, punto) {
     const cleanedData = cleanParams(punto);
     const response = await fetch(`${API_BASE_URL}/admin/puntos/${id}`, {
@@ -269,6 +338,54 @@ export const reportesAPI = {
     return response.json();
   },
 
+  async getEstadisticasVisitas(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/visitas/estadisticas?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener estadísticas de visitas');
+    return response.json();
+  },
+
+  // Página de visitas: { visitas, siguiente_cursor } (cursor null = no hay más)
+  async getPaginaVisitas(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/visitas/pagina?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener visitas');
+    return response.json();
+  },
+
+  // Lee el NDJSON de /reportes/visitas/stream y llama onLote con cada grupo de visitas recibido
+  async streamVisitas(queryParams = '', onLote) {
+    const response = await fetch(`${API_BASE_URL}/reportes/visitas/stream?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener visitas');
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let pendiente = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      pendiente += decoder.decode(value, { stream: true });
+      const lineas = pendiente.split('\n');
+      pendiente = lineas.pop();
+      const lote = lineas.filter(l => l.trim()).map(l => JSON.parse(l));
+      if (lote.length) onLote(lote);
+    }
+    if (pendiente.trim()) onLote([JSON.parse(pendiente)]);
+  },
+
+  // Búsqueda en observaciones: { resultados, siguiente_cursor } (cursor null = no hay más)
+  async buscarVisitas(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/visitas/buscar?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al buscar visitas');
+    return response.json();
+  },
+
   async getRankingPuntos(queryParams = '') {
     const response = await fetch(`${API_BASE_URL}/reportes/puntos-ranking?${queryParams}`, {
       headers: getAuthHeaders()
@@ -277,6 +394,30 @@ export const reportesAPI = {
     return response.json();
   },
 
+  async getCumplimiento(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/cumplimiento?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener cumplimiento de rondas');
+    return response.json();
+  },
+
+  async getIntervalos(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/intervalos?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener intervalos entre visitas');
+    return response.json();
+  },
+
+  async getRecorridos(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/recorridos?${queryParams}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener recorridos');
+    return response.json();
+  },
+
   async getReporteAlertas(queryParams = '') {
     const response = await fetch(`${API_BASE_URL}/reportes/alertas?${queryParams}`, {
       headers: getAuthHeaders()
@@ -301,5 +442,93 @@ export const reportesAPI = {
     });
     if (!response.ok) throw new Error('Error al exportar PDF');
     return response.blob();
+  },
+
+  // Reportes en segundo plano: encolar -> consultar estado -> descargar
+  async crearTrabajo(queryParams = '') {
+    const response = await fetch(`${API_BASE_URL}/reportes/trabajos?${queryParams}`, {
+      method: 'POST',
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Error al encolar reporte');
+    }
+    return response.json();
+  },
+
+  async estadoTrabajo(trabajoId) {
+    const response = await fetch(`${API_BASE_URL}/reportes/trabajos/${trabajoId}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al consultar reporte');
+    return response.json();
+  },
+
+  async descargarTrabajo(trabajoId) {
+    const response = await fetch(`${API_BASE_URL}/reportes/trabajos/${trabajoId}/descarga`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al descargar reporte');
+    return response.blob();
   }
-};
\ No newline at end of file
+};
+// ============ RUTAS ============
+export const rutasAPI = {
+  async listar(servicioId = null) {
+    const query = servicioId ? `?servicio_id=${servicioId}` : '';
+    const response = await fetch(`${API_BASE_URL}/rutas/${query}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener rutas');
+    return response.json();
+  },
+
+  // Avance de cada guardia en su ruta: { guardias, atrasados }
+  async estado(servicioId = null) {
+    const query = servicioId ? `?servicio_id=${servicioId}` : '';
+    const response = await fetch(`${API_BASE_URL}/rutas/estado${query}`, {
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) throw new Error('Error al obtener el estado de las rutas');
+    return response.json();
+  },
+
+  async crear(ruta) {
+    const response = await fetch(`${API_BASE_URL}/rutas/`, {
+      method: 'POST',
+      headers: getAuthHeaders(),
+      body: JSON.stringify(ruta)
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Error al crear ruta');
+    }
+    return response.json();
+  },
+
+  async actualizar(id, cambios) {
+    const response = await fetch(`${API_BASE_URL}/rutas/${id}`, {
+      method: 'PUT',
+      headers: getAuthHeaders(),
+      body: JSON.stringify(cambios)
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Error al actualizar ruta');
+    }
+    return response.json();
+  },
+
+  async eliminar(id) {
+    const response = await fetch(`${API_BASE_URL}/rutas/${id}`, {
+      method: 'DELETE',
+      headers: getAuthHeaders()
+    });
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.detail || 'Error al desactivar ruta');
+    }
+    return response.json();
+  }
+};
@@ -96,6 +96,73 @@ class ApiService {
     });
   }
 
+  // ADJUNTOS
+  // Sube una foto de la visita por partes; si una parte falla, consulta lo
+  // recibido y sigue desde ahí. Si el servidor ya tiene el archivo no lo sube.
+  async subirAdjunto(visitaId, archivo, onProgress = null) {
+    const TAMANO_PARTE = 256 * 1024;
+    const INTENTOS = 5;
+
+    const digest = await crypto.subtle.digest('SHA-256', await archivo.arrayBuffer());
+    const sha256 = Array.from(new Uint8Array(digest))
+      .map((b) => b.toString(16).padStart(2, '0'))
+      .join('');
+
+    let estado = await this.request('/adjuntos/subidas', {
+      method: 'POST',
+      body: JSON.stringify({
+        visita_id: visitaId,
+        tamano: archivo.size,
+        tipo_contenido: archivo.type,
+        nombre: archivo.name,
+        sha256,
+      }),
+    });
+
+    let fallos = 0;
+    while (!estado.completo) {
+      if (onProgress) onProgress(estado.recibido / estado.tamano);
+      const parte = archivo.slice(estado.recibido, estado.recibido + TAMANO_PARTE);
+      const token = this.getToken();
+      try {
+        const response = await fetch(
+          `${API_BASE_URL}/adjuntos/subidas/${estado.subida_id}?offset=${estado.recibido}`,
+          {
+            method: 'PUT',
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              ...(token && { 'Authorization': `Bearer ${token}` }),
+            },
+            body: parte,
+          }
+        );
+        if (!response.ok && response.status !== 409) {
+          const error = await response.json();
+          throw new Error(JSON.stringify(error.detail) || 'Error al subir la foto');
+        }
+        if (response.status === 409) {
+          // El offset no coincide: retomar desde lo que el servidor ya tiene
+          estado = await this.request(`/adjuntos/subidas/${estado.subida_id}`);
+        } else {
+          estado = await response.json();
+        }
+        fallos = 0;
+      } catch (error) {
+        fallos += 1;
+        if (fallos >= INTENTOS) throw error;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * fallos));
+        estado = await this.request(`/adjuntos/subidas/${estado.subida_id}`);
+      }
+    }
+
+    if (onProgress) onProgress(1);
+    return estado.adjunto;
+  }
+
+  async getAdjuntos(visitaId) {
+    return this.request(`/adjuntos/?visita_id=${visitaId}`);
+  }
+
   // GPS VALIDATION
   async validateGPS(puntoLat, puntoLng, deviceLat, deviceLng) {
     return this.request('/visits/validate-gps', {
@@ -115,6 +182,47 @@ class ApiService {
     return this.request(`/puntos/${query}`);
   }
 
+  // Cambios de puntos desde una versión (sincronización delta).
+  // Devuelve null si el servidor responde 304 (la copia local está al día).
+  async getCambiosPuntos({ servicioId = null, version = null } = {}, etag = null) {
+    const params = new URLSearchParams();
+    if (servicioId) params.append('servicio_id', servicioId);
+    if (version !== null && version !== undefined) params.append('version', version);
+
+    const token = this.getToken();
+    const response = await fetch(`${API_BASE_URL}/puntos/cambios?${params.toString()}`, {
+      headers: {
+        ...(token && { 'Authorization': `Bearer ${token}` }),
+        ...(etag && { 'If-None-Match': etag }),
+      },
+    });
+
+    if (response.status === 304) return null;
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(JSON.stringify(error.detail) || 'Error en la petición');
+    }
+    return { ...(await response.json()), etag: response.headers.get('ETag') };
+  }
+
+  // Paquete offline del servicio (servicio + puntos). null si el ETag sigue vigente
+  async getPaqueteOffline(servicioId, etag = null) {
+    const token = this.getToken();
+    const response = await fetch(`${API_BASE_URL}/servicios/${servicioId}/offline`, {
+      headers: {
+        ...(token && { 'Authorization': `Bearer ${token}` }),
+        ...(etag && { 'If-None-Match': etag }),
+      },
+    });
+
+    if (response.status === 304) return null;
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(JSON.stringify(error.detail) || 'Error en la petición');
+    }
+    return { ...(await response.json()), etag: response.headers.get('ETag') };
+  }
+
   async getPunto(puntoId) {
     return this.request(`/puntos/${puntoId}`);
   }
@@ -130,6 +238,20 @@ class ApiService {
     return this.request(`/alertas/count${query}`);
   }
 
+  // MAPA
+  async getMapaGrupos({ zoom, bounds, servicioId = null, dias = 7 }) {
+    const params = new URLSearchParams({
+      zoom,
+      min_lat: Math.max(bounds.getSouth(), -90),
+      min_lon: Math.max(bounds.getWest(), -180),
+      max_lat: Math.min(bounds.getNorth(), 90),
+      max_lon: Math.min(bounds.getEast(), 180),
+      dias
+    });
+    if (servicioId) params.append('servicio_id', servicioId);
+    return this.request(`/mapa/grupos?${params.toString()}`);
+  }
+
   // GUARDIAS
   async getGuardias(servicioId = null) {
     const query = servicioId ? `?servicio_id=${servicioId}` : '';
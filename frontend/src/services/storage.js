@@ -47,6 +47,42 @@ class StorageService {
     }
   }
 
+  // Copia offline de puntos: { servicio_id, version, etag, puntos: { [id]: punto } }
+  async getPuntosOffline() {
+    try {
+      return await localforage.getItem('puntos-offline');
+    } catch (error) {
+      console.error('Error getting offline puntos:', error);
+      return null;
+    }
+  }
+
+  async savePuntosOffline(copia) {
+    try {
+      await localforage.setItem('puntos-offline', copia);
+    } catch (error) {
+      console.error('Error saving offline puntos:', error);
+    }
+  }
+
+  // Paquete offline del servicio: { etag, servicio }
+  async getPaqueteOffline() {
+    try {
+      return await localforage.getItem('paquete-offline');
+    } catch (error) {
+      console.error('Error getting offline bundle:', error);
+      return null;
+    }
+  }
+
+  async savePaqueteOffline(paquete) {
+    try {
+      await localforage.setItem('paquete-offline', paquete);
+    } catch (error) {
+      console.error('Error saving offline bundle:', error);
+    }
+  }
+
   // Guardar usuario
   async saveUser(user) {
     try {
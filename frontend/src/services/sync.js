@@ -54,6 +54,69 @@ class SyncService {
     }
   }
 
+  // Actualizar la copia offline de puntos pidiendo solo los cambios
+  async syncPuntos(servicioId = null) {
+    let copia = await storage.getPuntosOffline();
+    if (copia && servicioId && copia.servicio_id !== servicioId) {
+      copia = null;
+    }
+
+    if (!this.isOnline()) {
+      return copia ? Object.values(copia.puntos) : [];
+    }
+
+    // Sin versión (sin migración en el servidor) se pide la lista completa
+    const tieneVersion = copia && copia.version !== null && copia.version !== undefined;
+    const cambios = await api.getCambiosPuntos(
+      { servicioId, version: tieneVersion ? copia.version : null },
+      tieneVersion ? copia.etag : null
+    );
+
+    if (cambios === null) {
+      return Object.values(copia.puntos);
+    }
+
+    const puntos = cambios.completo || !copia ? {} : { ...copia.puntos };
+    for (const punto of cambios.puntos) {
+      puntos[punto.id] = punto;
+    }
+    for (const id of cambios.eliminados) {
+      delete puntos[id];
+    }
+
+    await storage.savePuntosOffline({
+      servicio_id: cambios.servicio_id,
+      version: cambios.version,
+      etag: cambios.etag,
+      puntos
+    });
+    return Object.values(puntos);
+  }
+
+  // Descargar el paquete offline del servicio (una sola petición al iniciar sesión).
+  // También deja lista la copia de puntos para las sincronizaciones delta.
+  async syncPaqueteOffline(servicioId) {
+    if (!servicioId || !this.isOnline()) return;
+
+    const actual = await storage.getPaqueteOffline();
+    const mismoServicio = actual && actual.servicio && actual.servicio.id === servicioId;
+    const paquete = await api.getPaqueteOffline(servicioId, mismoServicio ? actual.etag : null);
+    if (paquete === null) return;
+
+    await storage.savePaqueteOffline({ etag: paquete.etag, servicio: paquete.servicio });
+
+    const puntos = {};
+    for (const punto of paquete.puntos) {
+      puntos[punto.id] = punto;
+    }
+    await storage.savePuntosOffline({
+      servicio_id: servicioId,
+      version: paquete.version_puntos,
+      etag: paquete.version_puntos !== null ? `"puntos-${servicioId}-${paquete.version_puntos}"` : null,
+      puntos
+    });
+  }
+
   // Iniciar sincronización automática
   startAutoSync(intervalMinutes = 5) {
     // Sincronizar cada X minutos